@@ -0,0 +1,204 @@
+"""
+Асинхронный журнал запросов к ИИ (AiRequest)
+
+Запись аудита не выполняется на пути ответа пользователю: записи кладутся
+в ограниченную очередь в памяти, а фоновый поток пишет их пачками через
+bulk_create — по размеру пачки, по таймеру или при остановке процесса.
+При переполнении очереди запись отбрасывается (счетчик dropped), ответ
+пользователю не ждет базу. Большие промпты и ответы обрезаются,
+поддерживается выборочное логирование (SAMPLE_RATE).
+
+bulk_create не отправляет post_save, поэтому сигналы AiRequest для
+записей из журнала не срабатывают.
+"""
+
+import atexit
+import logging
+import queue
+import random
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUDIT_CONFIG = {
+    "ENABLED": True,
+    "ASYNC": True,  # False — писать сразу (удобно в отладке)
+    "QUEUE_SIZE": 5000,
+    "BATCH_SIZE": 100,
+    "FLUSH_INTERVAL": 2.0,  # секунд
+    "SAMPLE_RATE": 1.0,
+    "MAX_PROMPT_CHARS": 4000,
+    "MAX_RESPONSE_CHARS": 4000,
+}
+
+
+def get_audit_config() -> dict:
+    """Возвращает настройки журнала с учетом AI_AUDIT_CONFIG"""
+    config = dict(DEFAULT_AUDIT_CONFIG)
+    config.update(getattr(settings, "AI_AUDIT_CONFIG", {}))
+    return config
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = text or ""
+    if limit and len(text) > limit:
+        return text[:limit] + "…"
+    return text
+
+
+class AuditLogSink:
+    """Очередь записей AiRequest с фоновой пакетной записью"""
+
+    def __init__(self, config: dict | None = None):
+        self.config = {**get_audit_config(), **(config or {})}
+        self._queue: queue.Queue = queue.Queue(maxsize=self.config["QUEUE_SIZE"])
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.counters = {
+            "logged": 0,
+            "dropped": 0,
+            "sampled_out": 0,
+            "written": 0,
+            "failed": 0,
+        }
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def log(self, **fields) -> bool:
+        """
+        Ставит запись AiRequest в очередь
+
+        Returns:
+            True, если запись принята (не отброшена и не пропущена выборкой)
+        """
+        if not self.config["ENABLED"]:
+            return False
+
+        sample_rate = self.config["SAMPLE_RATE"]
+        if sample_rate < 1.0 and random.random() >= sample_rate:  # noqa: S311
+            self._count("sampled_out")
+            return False
+
+        fields["prompt"] = _truncate(
+            fields.get("prompt", ""), self.config["MAX_PROMPT_CHARS"]
+        )
+        fields["response"] = _truncate(
+            fields.get("response", ""), self.config["MAX_RESPONSE_CHARS"]
+        )
+
+        if not self.config["ASYNC"]:
+            self._write([fields])
+            self._count("logged")
+            return True
+
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            self._count("dropped")
+            return False
+
+        self._count("logged")
+        self._ensure_worker()
+        if self._queue.qsize() >= self.config["BATCH_SIZE"]:
+            self._wake.set()
+        return True
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="ai-audit-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.config["FLUSH_INTERVAL"])
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка записи журнала ИИ: {e}")
+            finally:
+                close_old_connections()
+
+    def _drain(self, limit: int) -> list[dict]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self) -> int:
+        """Записывает все накопленные записи пачками; возвращает число записанных"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.config["BATCH_SIZE"])
+                if not batch:
+                    break
+                written += self._write(batch)
+        return written
+
+    def _write(self, batch: list[dict]) -> int:
+        from .models import AiRequest
+
+        try:
+            AiRequest.objects.bulk_create(  # type: ignore
+                [AiRequest(**fields) for fields in batch]
+            )
+        except Exception as e:
+            self._count("failed", len(batch))
+            logger.error(f"Не удалось записать {len(batch)} записей журнала ИИ: {e}")
+            return 0
+        self._count("written", len(batch))
+        return len(batch)
+
+    def shutdown(self) -> None:
+        """Останавливает фоновый поток и дописывает очередь"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Ошибка записи журнала ИИ при остановке: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "pending": self._queue.qsize()}
+
+
+_sink: AuditLogSink | None = None
+_sink_lock = threading.Lock()
+
+
+def get_audit_sink() -> AuditLogSink:
+    """Общий для процесса журнал; при остановке процесса очередь дописывается"""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = AuditLogSink()
+                atexit.register(_sink.shutdown)
+    return _sink
+
+
+def log_ai_request(**fields) -> bool:
+    """Ставит запись AiRequest в общий журнал"""
+    return get_audit_sink().log(**fields)
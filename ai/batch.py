@@ -0,0 +1,157 @@
+"""
+Пакетная генерация ответов ИИ для офлайн-задач
+
+BatchGenerator принимает N промптов, пропускает уже готовые (кэш и
+AiResponse), остальные упаковывает по PROMPTS_PER_REQUEST в один запрос
+к провайдеру с пронумерованными разделами и раскладывает ответ обратно.
+Пачки отправляются параллельно (WORKERS) с общим лимитом частоты
+RATE_PER_SECOND. Если ответ пачки не удалось разобрать, промпты этой
+пачки запрашиваются по одному. Результаты сохраняются в кэш и AiResponse
+одной пачкой.
+"""
+
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from core.tts_pipeline import RateLimiter
+
+from .response_cache import get_cached_responses, store_responses
+from .services import AiResult, BaseProvider, GeminiProvider
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_CONFIG = {
+    "WORKERS": 4,
+    "RATE_PER_SECOND": 1.0,  # запросов к провайдеру в секунду
+    "PROMPTS_PER_REQUEST": 5,  # промптов в одном запросе, 1 — без упаковки
+    "MAX_TOKENS_PER_PROMPT": 700,
+    "TASK_TYPE": "task_explanation",
+}
+
+SECTION_HEADER = "### ОТВЕТ {number}"
+_SECTION_RE = re.compile(r"^\s*#{2,4}\s*ОТВЕТ\s+(\d+)\s*$", re.MULTILINE)
+
+
+def get_batch_config() -> dict:
+    """Возвращает настройки пакетной генерации с учетом AI_BATCH_CONFIG"""
+    config = dict(DEFAULT_BATCH_CONFIG)
+    config.update(getattr(settings, "AI_BATCH_CONFIG", {}))
+    return config
+
+
+def pack_prompts(prompts: list[str]) -> str:
+    """Один промпт из нескольких: ответ на каждый в своем пронумерованном разделе"""
+    header = SECTION_HEADER.format(number="N")
+    lines = [
+        f"Ниже {len(prompts)} независимых запросов. Ответь на каждый отдельно.",
+        f"Начинай ответ на запрос N со строки «{header}» и не пропускай запросы.",
+        "",
+    ]
+    for number, prompt in enumerate(prompts, 1):
+        lines += [f"=== ЗАПРОС {number} ===", prompt, ""]
+    return "\n".join(lines)
+
+
+def unpack_response(text: str, count: int) -> list[str] | None:
+    """Разбирает ответ на разделы; None, если разделов не count или какой-то пуст"""
+    matches = list(_SECTION_RE.finditer(text))
+    sections: dict[int, str] = {}
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        sections[int(match.group(1))] = text[match.end() : end].strip()
+    answers = [sections.get(number, "") for number in range(1, count + 1)]
+    if len(sections) != count or not all(answers):
+        return None
+    return answers
+
+
+@dataclass
+class BatchResult:
+    """Итог пакетной генерации"""
+
+    responses: dict[str, AiResult] = field(default_factory=dict)
+    generated: int = 0
+    cached: int = 0
+    failed: list[str] = field(default_factory=list)
+    requests: int = 0
+    duration: float = 0.0
+
+
+class BatchGenerator:
+    """Пакетная генерация с упаковкой промптов и ограниченным параллелизмом"""
+
+    def __init__(self, provider: BaseProvider | None = None, **config):
+        self.config = {**get_batch_config(), **config}
+        self.provider = provider or GeminiProvider(task_type=self.config["TASK_TYPE"])
+        self.rate_limiter = RateLimiter(self.config["RATE_PER_SECOND"])
+
+    def _call(self, prompt: str, max_tokens: int) -> AiResult | None:
+        self.rate_limiter.acquire()
+        try:
+            result = self.provider.generate(prompt, max_tokens=max_tokens)
+        except Exception as e:
+            logger.warning(f"Ошибка пакетного запроса к {self.provider.name}: {e}")
+            return None
+        return None if result.failed or not result.text else result
+
+    def _run_group(self, prompts: list[str]) -> tuple[dict[str, AiResult], int]:
+        """Ответы на пачку промптов и число запросов к провайдеру"""
+        per_prompt = self.config["MAX_TOKENS_PER_PROMPT"]
+        if len(prompts) > 1:
+            result = self._call(pack_prompts(prompts), per_prompt * len(prompts))
+            answers = unpack_response(result.text, len(prompts)) if result else None
+            if answers:
+                tokens = result.tokens_used // len(prompts)  # type: ignore
+                return {
+                    prompt: AiResult(
+                        text=answer,
+                        tokens_used=tokens,
+                        provider_name=self.provider.name,
+                    )
+                    for prompt, answer in zip(prompts, answers, strict=True)
+                }, 1
+            logger.info(f"Ответ пачки из {len(prompts)} не разобран, запросы по одному")
+
+        responses = {}
+        for prompt in prompts:
+            result = self._call(prompt, per_prompt)
+            if result:
+                responses[prompt] = result
+        return responses, len(prompts) + (1 if len(prompts) > 1 else 0)
+
+    def generate(self, prompts: list[str], force: bool = False) -> BatchResult:
+        """Генерирует ответы на prompts, пропуская готовые (кроме force)"""
+        started = time.monotonic()
+        batch = BatchResult()
+        unique = list(dict.fromkeys(prompt for prompt in prompts if prompt))
+
+        if not force:
+            for prompt, value in get_cached_responses(unique).items():
+                batch.responses[prompt] = AiResult(
+                    text=value["text"],
+                    tokens_used=value["tokens_used"],
+                    provider_name=value["provider"],
+                )
+            batch.cached = len(batch.responses)
+        pending = [prompt for prompt in unique if prompt not in batch.responses]
+
+        size = max(1, self.config["PROMPTS_PER_REQUEST"])
+        groups = [pending[i : i + size] for i in range(0, len(pending), size)]
+        generated: dict[str, AiResult] = {}
+        if groups:
+            with ThreadPoolExecutor(max_workers=self.config["WORKERS"]) as executor:
+                for responses, requests in executor.map(self._run_group, groups):
+                    generated.update(responses)
+                    batch.requests += requests
+
+        store_responses(generated, self.provider.name)
+        batch.responses.update(generated)
+        batch.generated = len(generated)
+        batch.failed = [prompt for prompt in pending if prompt not in generated]
+        batch.duration = time.monotonic() - started
+        return batch
@@ -0,0 +1 @@
+# Management commands for ai app
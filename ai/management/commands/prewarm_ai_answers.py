@@ -0,0 +1,89 @@
+"""
+Команда Django для предгенерации объяснений и подсказок популярных заданий
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from ai.batch import BatchGenerator
+from ai.services import task_explanation_prompt, task_hint_prompt, task_prompt_text
+from learning.models import Task
+
+PROMPT_BUILDERS = {
+    "explanation": task_explanation_prompt,
+    "hint": task_hint_prompt,
+}
+
+
+class Command(BaseCommand):
+    help = "Заранее генерирует объяснения и подсказки для самых решаемых заданий"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help="Сколько самых популярных заданий обработать (по умолчанию: 100)",
+        )
+        parser.add_argument(
+            "--kind",
+            choices=["explanation", "hint", "all"],
+            default="explanation",
+            help="Что генерировать (по умолчанию: explanation)",
+        )
+        parser.add_argument(
+            "--subject-id", type=int, help="Только задания указанного предмета"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Промптов в одном запросе к ИИ (по умолчанию из AI_BATCH_CONFIG)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Перегенерировать уже готовые ответы",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать, сколько промптов будет сгенерировано",
+        )
+
+    def popular_tasks(self, limit, subject_id=None):
+        """Задания с наибольшим числом попыток пользователей"""
+        tasks = Task.objects.annotate(  # type: ignore
+            views=Count("userprogress")
+        ).order_by("-views", "id")
+        if subject_id:
+            tasks = tasks.filter(subject_id=subject_id)
+        return list(tasks.only("id", "title", "description")[:limit])
+
+    def handle(self, *args, **options):
+        kinds = list(PROMPT_BUILDERS) if options["kind"] == "all" else [options["kind"]]
+        tasks = self.popular_tasks(options["limit"], options["subject_id"])
+        prompts = [
+            PROMPT_BUILDERS[kind](task_prompt_text(task))
+            for task in tasks
+            for kind in kinds
+        ]
+
+        self.stdout.write(f"📚 Заданий: {len(tasks)}, промптов: {len(prompts)}")
+        if options["dry_run"] or not prompts:
+            return
+
+        config = {}
+        if options["batch_size"]:
+            config["PROMPTS_PER_REQUEST"] = options["batch_size"]
+        result = BatchGenerator(**config).generate(prompts, force=options["force"])
+
+        self.stdout.write(
+            self.style.SUCCESS(  # type: ignore
+                f"✅ Сгенерировано: {result.generated}, уже готово: {result.cached}, "
+                f"запросов к ИИ: {result.requests}, за {result.duration:.1f} с"
+            )
+        )
+        if result.failed:
+            self.stdout.write(
+                self.style.WARNING(f"⚠️ Не удалось: {len(result.failed)}")  # type: ignore
+            )
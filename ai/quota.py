@@ -0,0 +1,334 @@
+"""
+Квоты запросов к ИИ на атомарных счетчиках
+
+Проверка лимита — одна атомарная операция над счетчиком в кэше (INCRBY в
+Redis, локальный счетчик под блокировкой без Redis) вместо
+get_or_create/save модели AiLimit на каждый запрос. Запрос сначала
+резервирует единицу квоты и получает отказ, если резерв превысил лимит,
+поэтому параллельные запросы одного пользователя не проходят оба. При
+ошибке генерации резерв возвращается. Итоги периодически сохраняются в
+AiLimit для отчетов и админки.
+
+Окна: daily — календарные сутки (сброс в полночь по TIME_ZONE),
+sliding — скользящее окно WINDOW_SECONDS, оцениваемое по двум соседним
+интервалам.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUOTA_CONFIG = {
+    "GUEST_LIMIT": 10,
+    "USER_LIMIT": 30,
+    "WINDOW": "daily",  # daily | sliding
+    "WINDOW_SECONDS": 86400,
+    "PERSIST_INTERVAL": 300,  # секунд между сохранениями в AiLimit, 0 — вручную
+    "KEY_PREFIX": "ai_quota",
+}
+
+
+def get_quota_config() -> dict:
+    """Возвращает настройки квот с учетом AI_QUOTA_CONFIG"""
+    config = dict(DEFAULT_QUOTA_CONFIG)
+    config.update(getattr(settings, "AI_QUOTA_CONFIG", {}))
+    return config
+
+
+class LocalCounterStore:
+    """Счетчики в памяти процесса (когда общего кэша нет)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: dict[str, tuple[int, float]] = {}
+
+    def incr(self, key: str, delta: int, ttl: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            value, expires = self._values.get(key, (0, now + ttl))
+            if expires <= now:
+                value, expires = 0, now + ttl
+            value += delta
+            self._values[key] = (value, expires)
+            return value
+
+    def get_many(self, keys: list[str]) -> dict[str, int]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: self._values[key][0]
+                for key in keys
+                if key in self._values and self._values[key][1] > now
+            }
+
+
+class CacheCounterStore:
+    """Счетчики в кэше Django (add + атомарный incr бэкенда)"""
+
+    def __init__(self, backend=None):
+        self.cache = backend or cache
+
+    def incr(self, key: str, delta: int, ttl: int) -> int:
+        self.cache.add(key, 0, ttl)
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            # Ключ истек между add и incr
+            self.cache.add(key, 0, ttl)
+            return self.cache.incr(key, delta)
+
+    def get_many(self, keys: list[str]) -> dict[str, int]:
+        return self.cache.get_many(keys)
+
+
+class RedisCounterStore:
+    """Счетчики в Redis: один INCRBY на резерв, EXPIRE только для нового ключа"""
+
+    def __init__(self, backend=None):
+        self.cache = backend or cache
+
+    def _client(self, key: str):
+        return self.cache._cache.get_client(key, write=True)
+
+    def incr(self, key: str, delta: int, ttl: int) -> int:
+        redis_key = self.cache.make_key(key)
+        client = self._client(redis_key)
+        value = client.incrby(redis_key, delta)
+        if value == delta:
+            client.expire(redis_key, ttl)
+        return int(value)
+
+    def get_many(self, keys: list[str]) -> dict[str, int]:
+        if not keys:
+            return {}
+        redis_keys = [self.cache.make_key(key) for key in keys]
+        values = self._client(redis_keys[0]).mget(redis_keys)
+        return {
+            key: int(value)
+            for key, value in zip(keys, values, strict=True)
+            if value is not None
+        }
+
+
+def get_counter_store():
+    """Выбирает хранилище счетчиков по бэкенду кэша по умолчанию"""
+    backend_name = type(cache).__name__
+    if backend_name == "RedisCache":
+        return RedisCounterStore()
+    if backend_name == "DummyCache":
+        return LocalCounterStore()
+    return CacheCounterStore()
+
+
+@dataclass
+class QuotaDecision:
+    """Результат проверки квоты"""
+
+    allowed: bool
+    used: int
+    limit: int
+    reset_at: datetime
+    key: str = ""
+    cost: int = 1
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.used)
+
+
+@dataclass
+class _Subject:
+    user_id: int | None
+    session_id: str | None
+    limit: int
+
+    @property
+    def name(self) -> str:
+        if self.user_id is not None:
+            return f"u{self.user_id}"
+        return f"s{self.session_id}"
+
+
+class QuotaEngine:
+    """Атомарные квоты запросов к ИИ"""
+
+    def __init__(self, store=None, config: dict | None = None):
+        self.config = {**get_quota_config(), **(config or {})}
+        self.store = store or get_counter_store()
+        self.window = self.config["WINDOW"]
+        self.window_seconds = int(self.config["WINDOW_SECONDS"])
+        self._dirty: dict[str, tuple[_Subject, str, datetime]] = {}
+        self._dirty_lock = threading.Lock()
+        self._last_persist = time.monotonic()
+        self._persisting = False
+
+    def _subject(self, user, session_id: str | None) -> _Subject:
+        # Без регистрации — лимит гостя по сессии, с регистрацией — по пользователю
+        if user is not None and getattr(user, "is_authenticated", False):
+            return _Subject(user.pk, None, self.config["USER_LIMIT"])
+        return _Subject(None, session_id or "guest", self.config["GUEST_LIMIT"])
+
+    def _buckets(self, now: datetime) -> tuple[str, str | None, float, datetime]:
+        """(текущий интервал, предыдущий интервал, вес предыдущего, сброс)"""
+        if self.window == "sliding":
+            timestamp = now.timestamp()
+            bucket = int(timestamp // self.window_seconds)
+            weight = 1 - (timestamp % self.window_seconds) / self.window_seconds
+            reset_at = datetime.fromtimestamp(
+                (bucket + 1) * self.window_seconds, tz=now.tzinfo
+            )
+            return str(bucket), str(bucket - 1), weight, reset_at
+
+        today = timezone.localdate(now)
+        reset_at = timezone.make_aware(
+            datetime.combine(today + timedelta(days=1), datetime.min.time())
+        )
+        return today.isoformat(), None, 0.0, reset_at
+
+    def _key(self, subject: _Subject, bucket: str) -> str:
+        return f"{self.config['KEY_PREFIX']}:{self.window}:{subject.name}:{bucket}"
+
+    @property
+    def _ttl(self) -> int:
+        # Предыдущий интервал нужен скользящему окну, поэтому храним два
+        return self.window_seconds * 2 + 60
+
+    def reserve(self, user=None, session_id: str | None = None, cost: int = 1):
+        """
+        Резервирует cost единиц квоты до обращения к провайдеру
+
+        Returns:
+            QuotaDecision; при allowed=False резерв уже отменен
+        """
+        subject = self._subject(user, session_id)
+        bucket, previous, weight, reset_at = self._buckets(timezone.now())
+        key = self._key(subject, bucket)
+
+        count = self.store.incr(key, cost, self._ttl)
+        used = count
+        if previous is not None:
+            previous_key = self._key(subject, previous)
+            previous_count = self.store.get_many([previous_key]).get(previous_key, 0)
+            used += int(previous_count * weight)
+
+        if used > subject.limit:
+            self.store.incr(key, -cost, self._ttl)
+            return QuotaDecision(False, used - cost, subject.limit, reset_at, key, cost)
+
+        self._mark_dirty(subject, key, reset_at)
+        return QuotaDecision(True, used, subject.limit, reset_at, key, cost)
+
+    def refund(self, decision: QuotaDecision | None) -> None:
+        """Возвращает резерв, если генерация не удалась"""
+        if decision is None or not decision.allowed or not decision.key:
+            return
+        self.store.incr(decision.key, -decision.cost, self._ttl)
+        decision.allowed = False
+
+    def status(self, user=None, session_id: str | None = None) -> QuotaDecision:
+        """Текущее использование без резервирования"""
+        subject = self._subject(user, session_id)
+        bucket, previous, weight, reset_at = self._buckets(timezone.now())
+        key = self._key(subject, bucket)
+        keys = [key] + ([self._key(subject, previous)] if previous else [])
+        values = self.store.get_many(keys)
+
+        used = values.get(key, 0)
+        if previous:
+            used += int(values.get(keys[1], 0) * weight)
+        return QuotaDecision(used < subject.limit, used, subject.limit, reset_at, key)
+
+    def _mark_dirty(self, subject: _Subject, key: str, reset_at: datetime) -> None:
+        with self._dirty_lock:
+            self._dirty[subject.name] = (subject, key, reset_at)
+            interval = self.config["PERSIST_INTERVAL"]
+            due = interval and time.monotonic() - self._last_persist >= interval
+            if not due or self._persisting:
+                return
+            self._persisting = True
+
+        threading.Thread(target=self._persist_in_background, daemon=True).start()
+
+    def _persist_in_background(self) -> None:
+        try:
+            self.persist_usage()
+        except Exception as e:
+            logger.error(f"Ошибка сохранения квот ИИ: {e}")
+        finally:
+            self._persisting = False
+            close_old_connections()
+
+    def persist_usage(self) -> int:
+        """Сохраняет накопленные счетчики в AiLimit пачкой; возвращает число записей"""
+        from .models import AiLimit
+
+        with self._dirty_lock:
+            dirty = list(self._dirty.values())
+            self._dirty.clear()
+            self._last_persist = time.monotonic()
+        if not dirty:
+            return 0
+
+        values = self.store.get_many([key for _, key, _ in dirty])
+        user_ids = [s.user_id for s, _, _ in dirty if s.user_id is not None]
+        session_ids = [s.session_id for s, _, _ in dirty if s.user_id is None]
+        existing = {}
+        for limit in AiLimit.objects.filter(  # type: ignore
+            Q(user_id__in=user_ids) | Q(user__isnull=True, session_id__in=session_ids),
+            limit_type="daily",
+        ):
+            name = f"u{limit.user_id}" if limit.user_id else f"s{limit.session_id}"
+            existing[name] = limit
+
+        to_update, to_create = [], []
+        for subject, key, reset_at in dirty:
+            usage = values.get(key, 0)
+            limit = existing.get(subject.name)
+            if limit is None:
+                to_create.append(
+                    AiLimit(
+                        user_id=subject.user_id,
+                        session_id=subject.session_id,
+                        limit_type="daily",
+                        current_usage=usage,
+                        max_limit=subject.limit,
+                        reset_date=reset_at,
+                    )
+                )
+            else:
+                limit.current_usage = usage
+                limit.max_limit = subject.limit
+                limit.reset_date = reset_at
+                to_update.append(limit)
+
+        if to_update:
+            AiLimit.objects.bulk_update(  # type: ignore
+                to_update, ["current_usage", "max_limit", "reset_date"]
+            )
+        if to_create:
+            AiLimit.objects.bulk_create(to_create, ignore_conflicts=True)  # type: ignore
+        return len(dirty)
+
+
+_engine: QuotaEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_quota_engine() -> QuotaEngine:
+    """Общий для процесса экземпляр QuotaEngine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = QuotaEngine()
+    return _engine
@@ -0,0 +1,151 @@
+"""
+Кэш готовых ответов ИИ
+
+Ответы хранятся в двух уровнях: в кэше Django (быстрый доступ по хешу
+промпта) и в таблице AiResponse (долговременно, переживает очистку кэша).
+Чтение и запись идут пачками: get_many/set_many и один запрос к базе на
+все промпты, поэтому массовая предгенерация не делает запрос на промпт.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.metrics import CACHE_LOOKUPS
+
+DEFAULT_RESPONSE_CACHE_CONFIG = {
+    "CACHE_TTL": 7 * 24 * 3600,  # секунд в кэше Django
+    "KEY_PREFIX": "ai_response",
+}
+
+
+def get_response_cache_config() -> dict:
+    """Возвращает настройки кэша ответов с учетом AI_RESPONSE_CACHE_CONFIG"""
+    config = dict(DEFAULT_RESPONSE_CACHE_CONFIG)
+    config.update(getattr(settings, "AI_RESPONSE_CACHE_CONFIG", {}))
+    return config
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def _cache_key(digest: str) -> str:
+    return f"{get_response_cache_config()['KEY_PREFIX']}:{digest}"
+
+
+def get_cached_responses(prompts: list[str]) -> dict[str, dict]:
+    """
+    Готовые ответы для списка промптов
+
+    Returns:
+        {промпт: {"text", "tokens_used", "provider"}} только для найденных
+    """
+    from .models import AiResponse
+
+    hashes = {prompt_hash(prompt): prompt for prompt in prompts}
+    if not hashes:
+        return {}
+
+    keys = {_cache_key(digest): digest for digest in hashes}
+    found = {
+        hashes[keys[key]]: value for key, value in cache.get_many(list(keys)).items()
+    }
+
+    missing = [digest for digest in hashes if hashes[digest] not in found]
+    if missing:
+        rows = AiResponse.objects.filter(  # type: ignore
+            prompt_hash__in=missing
+        ).select_related("provider")
+        restored = {}
+        for row in rows:
+            value = {
+                "text": row.response,
+                "tokens_used": row.tokens_used,
+                "provider": row.provider.name,
+            }
+            found[hashes[row.prompt_hash]] = value
+            restored[_cache_key(row.prompt_hash)] = value
+        if restored:
+            cache.set_many(restored, get_response_cache_config()["CACHE_TTL"])
+        CACHE_LOOKUPS.inc(len(restored), cache="ai_response", result="db")
+    CACHE_LOOKUPS.inc(len(hashes) - len(missing), cache="ai_response", result="hit")
+    CACHE_LOOKUPS.inc(len(hashes) - len(found), cache="ai_response", result="miss")
+    return found
+
+
+def get_cached_response(prompt: str) -> dict | None:
+    """Готовый ответ на один промпт или None"""
+    return get_cached_responses([prompt]).get(prompt)
+
+
+def get_provider_row(name: str):
+    """Запись AiProvider для ответов провайдера name (создается при отсутствии)"""
+    from .models import AiProvider
+
+    provider = AiProvider.objects.filter(name__iexact=name).first()  # type: ignore
+    if provider is None:
+        provider, _ = AiProvider.objects.get_or_create(  # type: ignore
+            name=name, defaults={"provider_type": name, "is_active": True}
+        )
+    return provider
+
+
+def store_responses(results: dict, provider_name: str) -> int:
+    """
+    Сохраняет ответы {промпт: AiResult} в кэш и AiResponse пачкой
+
+    Returns:
+        Число новых строк AiResponse
+    """
+    from .models import AiResponse
+
+    if not results:
+        return 0
+    provider = get_provider_row(provider_name)
+    rows = [
+        AiResponse(
+            prompt_hash=prompt_hash(prompt),
+            prompt=prompt,
+            response=result.text,
+            tokens_used=result.tokens_used,
+            provider=provider,
+        )
+        for prompt, result in results.items()
+    ]
+    existing = set(
+        AiResponse.objects.filter(  # type: ignore
+            prompt_hash__in=[row.prompt_hash for row in rows]
+        ).values_list("prompt_hash", flat=True)
+    )
+    new_rows = [row for row in rows if row.prompt_hash not in existing]
+    AiResponse.objects.bulk_create(new_rows, ignore_conflicts=True)  # type: ignore
+
+    # Перегенерированные ответы (--force) обновляются одним bulk_update
+    changed = [row for row in rows if row.prompt_hash in existing]
+    if changed:
+        by_hash = {row.prompt_hash: row for row in changed}
+        stale = list(
+            AiResponse.objects.filter(prompt_hash__in=list(by_hash))  # type: ignore
+        )
+        for row in stale:
+            row.response = by_hash[row.prompt_hash].response
+            row.tokens_used = by_hash[row.prompt_hash].tokens_used
+            row.provider = provider
+        AiResponse.objects.bulk_update(  # type: ignore
+            stale, ["response", "tokens_used", "provider"]
+        )
+
+    cache.set_many(
+        {
+            _cache_key(row.prompt_hash): {
+                "text": row.response,
+                "tokens_used": row.tokens_used,
+                "provider": provider.name,
+            }
+            for row in rows
+        },
+        get_response_cache_config()["CACHE_TTL"],
+    )
+    return len(new_rows)
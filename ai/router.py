@@ -0,0 +1,426 @@
+"""
+Маршрутизация запросов между провайдерами ИИ
+
+Для каждой пары провайдер+модель ведется скользящая статистика (p50/p95
+задержки и доля ошибок) и автомат защиты (circuit breaker): после
+FAILURE_THRESHOLD ошибок подряд провайдер исключается на
+RECOVERY_TIMEOUT секунд, затем пропускается один пробный запрос.
+
+Запрос уходит первому доступному провайдеру по приоритету (AiProvider.priority,
+если провайдер заведен в базе). Если ответ не пришел за p95 этого
+провайдера, параллельно запускается следующий (hedged request) и
+берется первый успешный ответ. Если все цепи разомкнуты, все провайдеры
+ответили ошибкой или истек DEADLINE, сразу отвечает FallbackProvider —
+время ответа ограничено и не равно полному таймауту провайдера.
+
+Статистика периодически сохраняется в AiProvider (response_time_avg,
+success_rate, daily_usage) одной пачкой, а не save() на каждый запрос.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_SECONDS = metrics.histogram(
+    "ai_provider_latency_seconds",
+    "Задержка ответа провайдера ИИ",
+    ("provider", "outcome"),
+)
+PROVIDER_TOKENS = metrics.counter(
+    "ai_tokens_total", "Токены, потраченные провайдером ИИ", ("provider",)
+)
+
+DEFAULT_ROUTER_CONFIG = {
+    "FAILURE_THRESHOLD": 3,  # ошибок подряд до размыкания цепи
+    "RECOVERY_TIMEOUT": 30.0,  # секунд до пробного запроса
+    "WINDOW": 100,  # запросов в скользящей статистике
+    "DEADLINE": 8.0,  # секунд на ответ провайдеров, затем fallback
+    "HEDGE": True,
+    "HEDGE_MIN_SAMPLES": 20,  # не дублировать запросы без статистики
+    "HEDGE_MIN_DELAY": 1.0,  # секунд, нижняя граница ожидания перед дублем
+    "WORKERS": 8,
+    "PRIORITY_TTL": 60,  # секунд кэша приоритетов из AiProvider
+    "STATS_INTERVAL": 300,  # секунд между сохранениями в AiProvider, 0 — вручную
+    "EXTRA_GEMINI_MODELS": [],  # запасные модели Gemini для дублирования
+}
+
+
+def get_router_config() -> dict:
+    """Возвращает настройки маршрутизации с учетом AI_ROUTER_CONFIG"""
+    config = dict(DEFAULT_ROUTER_CONFIG)
+    config.update(getattr(settings, "AI_ROUTER_CONFIG", {}))
+    return config
+
+
+def provider_key(provider) -> str:
+    """Ключ статистики: имя провайдера и модель"""
+    model = getattr(provider, "model", "")
+    return f"{provider.name}:{model}" if model else str(provider.name)
+
+
+class CircuitBreaker:
+    """Автомат защиты: closed → open после серии ошибок → half_open → closed"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос; в half_open пропускает один пробный"""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ProviderHealth:
+    """Скользящая статистика и автомат защиты одного провайдера+модели"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.samples: deque[tuple[float, bool]] = deque(maxlen=config["WINDOW"])
+        self.breaker = CircuitBreaker(
+            config["FAILURE_THRESHOLD"], config["RECOVERY_TIMEOUT"]
+        )
+        self.calls_since_sync = 0
+        self.last_success_at: float | None = None  # time.time() успешного ответа
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.samples.append((latency, ok))
+            self.calls_since_sync += 1
+            if ok:
+                self.last_success_at = time.time()
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def percentile(self, fraction: float) -> float | None:
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(fraction * (len(latencies) - 1))))
+        return latencies[index]
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self.samples:
+                return 0.0
+            return sum(not ok for _, ok in self.samples) / len(self.samples)
+
+    def hedge_delay(self, min_samples: int, min_delay: float) -> float | None:
+        """Сколько ждать ответа перед дублем; None — статистики мало"""
+        with self._lock:
+            enough = len(self.samples) >= min_samples
+        p95 = self.percentile(0.95)
+        if not enough or p95 is None:
+            return None
+        return max(p95, min_delay)
+
+    def stats(self) -> dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "state": self.breaker.state,
+            "samples": len(self.samples),
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+        }
+
+
+_health: dict[str, ProviderHealth] = {}
+_health_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_provider_health(key: str, config: dict | None = None) -> ProviderHealth:
+    """Общая для процесса статистика провайдера по ключу"""
+    health = _health.get(key)
+    if health is None:
+        with _health_lock:
+            health = _health.get(key)
+            if health is None:
+                health = _health[key] = ProviderHealth(config or get_router_config())
+    return health
+
+
+def router_stats() -> dict:
+    """Статистика всех провайдеров для health check"""
+    return {key: health.stats() for key, health in list(_health.items())}
+
+
+def last_success_at() -> float | None:
+    """Время последнего успешного ответа любого провайдера (реальный трафик)"""
+    times = [h.last_success_at for h in list(_health.values()) if h.last_success_at]
+    return max(times, default=None)
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _health_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="ai-router"
+                )
+    return _executor
+
+
+class ProviderRouter:
+    """Выбор провайдера с учетом приоритета, задержек и автоматов защиты"""
+
+    _priorities: dict[str, tuple[int, bool]] = {}
+    _priorities_loaded = float("-inf")
+    _last_sync = time.monotonic()
+    _syncing = False
+
+    def __init__(self, providers: list, fallback=None, config: dict | None = None):
+        from .services import FallbackProvider
+
+        self.config = {**get_router_config(), **(config or {})}
+        self.source = providers
+        self.fallback = fallback
+        self.providers = []
+        for provider in providers:
+            if isinstance(provider, FallbackProvider):
+                self.fallback = self.fallback or provider
+            else:
+                self.providers.append(provider)
+        if self.fallback is None:
+            self.fallback = FallbackProvider()
+
+    def health(self, provider) -> ProviderHealth:
+        return get_provider_health(provider_key(provider), self.config)
+
+    def _load_priorities(self) -> dict[str, tuple[int, bool]]:
+        """(приоритет, can_handle_request) из AiProvider, с кэшем на PRIORITY_TTL"""
+        cls = type(self)
+        if time.monotonic() - cls._priorities_loaded < self.config["PRIORITY_TTL"]:
+            return cls._priorities
+        from .models import AiProvider
+
+        try:
+            cls._priorities = {
+                provider.name.lower(): (provider.priority, provider.can_handle_request())
+                for provider in AiProvider.objects.all()  # type: ignore
+            }
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить приоритеты провайдеров: {e}")
+        cls._priorities_loaded = time.monotonic()
+        return cls._priorities
+
+    def candidates(self, providers: list | None = None) -> list:
+        """Доступные провайдеры с замкнутой цепью, по приоритету"""
+        priorities = self._load_priorities()
+        ordered = []
+        for position, provider in enumerate(providers or self.providers):
+            priority, can_handle = priorities.get(
+                str(provider.name).lower(), (None, True)
+            )
+            if not can_handle or not provider.is_available():
+                continue
+            if self.health(provider).breaker.is_open():
+                continue
+            ordered.append((priority if priority is not None else position, provider))
+        ordered.sort(key=lambda item: item[0])
+        return [provider for _, provider in ordered]
+
+    def select(self, providers: list | None = None):
+        """Провайдер для одиночного (например, потокового) запроса"""
+        for provider in self.candidates(providers):
+            if self.health(provider).breaker.allow():
+                return provider
+        return self.fallback
+
+    def record(self, provider, latency: float, ok: bool) -> None:
+        """Учитывает результат запроса к провайдеру"""
+        if provider is self.fallback:
+            return
+        # Ответ позже DEADLINE для пользователя уже бесполезен
+        ok = ok and latency <= self.config["DEADLINE"]
+        self.health(provider).record(latency, ok)
+        PROVIDER_SECONDS.observe(
+            latency, provider=provider_key(provider), outcome="ok" if ok else "error"
+        )
+        self._maybe_sync()
+
+    def _call(self, provider, prompt: str, kwargs: dict):
+        started = time.monotonic()
+        try:
+            result = provider.generate(prompt, **kwargs)
+        except Exception as e:
+            self.record(provider, time.monotonic() - started, False)
+            logger.warning(f"Провайдер {provider_key(provider)} ответил ошибкой: {e}")
+            raise
+        self.record(provider, time.monotonic() - started, not result.failed)
+        if result.tokens_used:
+            PROVIDER_TOKENS.inc(result.tokens_used, provider=provider_key(provider))
+        return result
+
+    def generate(self, prompt: str, providers: list | None = None, **kwargs):
+        """
+        Ответ первого успешного провайдера с дублированием медленных запросов
+
+        Returns:
+            AiResult провайдера или FallbackProvider, если провайдеры не
+            ответили успешно за DEADLINE
+        """
+        queue = [
+            provider
+            for provider in self.candidates(providers)
+            if self.health(provider).breaker.allow()
+        ]
+        if not queue:
+            logger.warning("Все провайдеры ИИ недоступны, отвечает fallback")
+            return self.fallback.generate(prompt, **kwargs)
+
+        executor = _get_executor(self.config["WORKERS"])
+        deadline = time.monotonic() + self.config["DEADLINE"]
+        pending = {}
+
+        def launch():
+            provider = queue.pop(0)
+            pending[executor.submit(self._call, provider, prompt, kwargs)] = provider
+            return provider
+
+        current = launch()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wait_for = remaining
+            hedge_delay = self.health(current).hedge_delay(
+                self.config["HEDGE_MIN_SAMPLES"], self.config["HEDGE_MIN_DELAY"]
+            )
+            if queue and self.config["HEDGE"] and hedge_delay is not None:
+                wait_for = min(remaining, hedge_delay)
+
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+            if not done:
+                if queue and self.config["HEDGE"]:
+                    logger.info(
+                        f"Провайдер {provider_key(current)} медленнее p95, дублируем запрос"
+                    )
+                    current = launch()
+                continue
+
+            for future in done:
+                pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception:
+                    continue
+                if not result.failed:
+                    return result
+            if not pending and queue:
+                current = launch()
+
+        if pending:
+            logger.warning("Провайдеры ИИ не ответили вовремя, отвечает fallback")
+        else:
+            logger.warning("Провайдеры ИИ ответили ошибкой, отвечает fallback")
+        return self.fallback.generate(prompt, **kwargs)
+
+    def _maybe_sync(self) -> None:
+        cls = type(self)
+        interval = self.config["STATS_INTERVAL"]
+        if not interval or cls._syncing:
+            return
+        if time.monotonic() - cls._last_sync < interval:
+            return
+        cls._syncing = True
+        threading.Thread(target=self._sync_in_background, daemon=True).start()
+
+    def _sync_in_background(self) -> None:
+        try:
+            sync_provider_stats()
+        except Exception as e:
+            logger.error(f"Ошибка сохранения статистики провайдеров ИИ: {e}")
+        finally:
+            type(self)._syncing = False
+            close_old_connections()
+
+
+def sync_provider_stats() -> int:
+    """Сохраняет статистику в AiProvider по имени провайдера; возвращает число строк"""
+    from .models import AiProvider
+
+    ProviderRouter._last_sync = time.monotonic()
+    by_name: dict[str, list[ProviderHealth]] = {}
+    for key, health in list(_health.items()):
+        by_name.setdefault(key.split(":", 1)[0].lower(), []).append(health)
+
+    updated = 0
+    rows = AiProvider.objects.all()  # type: ignore
+    for provider in rows:
+        healths = by_name.get(provider.name.lower())
+        if not healths:
+            continue
+        calls = 0
+        for health in healths:
+            with health._lock:
+                calls += health.calls_since_sync
+                health.calls_since_sync = 0
+        latencies = [h.percentile(0.5) for h in healths if h.percentile(0.5)]
+        error_rate = sum(h.error_rate for h in healths) / len(healths)
+        updated += AiProvider.objects.filter(pk=provider.pk).update(  # type: ignore
+            daily_usage=F("daily_usage") + calls,
+            response_time_avg=(
+                sum(latencies) / len(latencies)
+                if latencies
+                else provider.response_time_avg
+            ),
+            success_rate=round((1 - error_rate) * 100, 1),
+            last_used=timezone.now() if calls else provider.last_used,
+        )
+    return updated
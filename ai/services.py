@@ -1,9 +1,11 @@
 import hashlib
+import json
+import time
+from collections.abc import Iterator
 from dataclasses import dataclass
 from typing import Any
 
 from django.conf import settings
-from django.utils import timezone
 
 try:
     import requests  # type: ignore
@@ -12,7 +14,11 @@ except Exception:  # pragma: no cover
 
 from core.rag_system.orchestrator import RAGOrchestrator
 
-from .models import AiLimit, AiProvider, AiRequest, AiResponse
+from .audit import log_ai_request
+from .models import AiProvider, AiResponse
+from .quota import get_quota_engine
+from .response_cache import get_cached_response
+from .router import PROVIDER_TOKENS, ProviderRouter, get_router_config, provider_key
 
 
 @dataclass
@@ -23,6 +29,7 @@ class AiResult:
     tokens_used: int = 0
     cost: float = 0.0
     provider_name: str = "local"
+    failed: bool = False
 
 
 class BaseProvider:
@@ -36,6 +43,13 @@ class BaseProvider:
     def generate(self, prompt: str, max_tokens: int = 512) -> AiResult:
         raise NotImplementedError
 
+    def generate_stream(self, prompt: str, max_tokens: int = 512) -> Iterator[str]:
+        """Ответ частями по мере генерации; по умолчанию — одним куском"""
+        result = self.generate(prompt, max_tokens=max_tokens)
+        if result.failed:
+            raise RuntimeError(result.text)
+        yield result.text
+
 
 class GeminiProvider(BaseProvider):
     """Провайдер Google Gemini AI - быстрый и надежный!"""
@@ -50,6 +64,7 @@ class GeminiProvider(BaseProvider):
         self.api_url = getattr(settings, "GEMINI_BASE_URL", "")
 
         # Выбираем timeout в зависимости от устройства
+        self.is_mobile = is_mobile
         if is_mobile:
             self.timeout = getattr(settings, "GEMINI_MOBILE_TIMEOUT", 5)
         else:
@@ -68,6 +83,51 @@ class GeminiProvider(BaseProvider):
         """Проверяем доступность Gemini API"""
         return bool(self.api_key and self.api_url)
 
+    def _model_url(self, method: str) -> str:
+        """URL метода API для модели этого экземпляра"""
+        return (
+            "https://generativelanguage.googleapis.com/v1beta/models/"
+            f"{self.model}:{method}"
+        )
+
+    def _build_prompt(self, prompt: str) -> str:
+        if self.system_prompt:
+            return f"{self.system_prompt}\n\nПользователь: {prompt}\n\nОтвет:"
+        return prompt
+
+    def generate_stream(  # type: ignore
+        self, prompt: str, max_tokens: int = 512
+    ) -> Iterator[str]:
+        """
+        Потоковая генерация через streamGenerateContent (SSE)
+
+        Возвращает фрагменты текста по мере их прихода от API, поэтому
+        пользователь видит начало ответа через время до первого токена,
+        а не через время генерации всего ответа.
+        """
+        if not self.is_available():
+            raise RuntimeError("Gemini API недоступен")
+
+        payload = {"contents": [{"parts": [{"text": self._build_prompt(prompt)}]}]}
+        headers = {
+            "Content-Type": "application/json",
+            "X-goog-api-key": self.api_key,
+        }
+        api_url = self._model_url("streamGenerateContent?alt=sse")
+
+        with requests.post(  # type: ignore
+            api_url, json=payload, headers=headers, timeout=self.timeout, stream=True
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = json.loads(line[5:].strip())
+                for candidate in data.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+
     def generate(self, prompt: str, max_tokens: int = 512) -> AiResult:  # type: ignore
         """Генерируем ответ через Gemini API"""
         if not self.is_available():
@@ -76,13 +136,12 @@ class GeminiProvider(BaseProvider):
                 tokens_used=0,
                 cost=0.0,
                 provider_name=self.name,
+                failed=True,
             )
 
         try:
             # Формируем полный промпт с системным промптом
-            full_prompt = prompt
-            if self.system_prompt:
-                full_prompt = "{self.system_prompt}\n\nПользователь: {prompt}\n\nОтвет:"
+            full_prompt = self._build_prompt(prompt)
 
             # Используем настройки из конфигурации с учетом мобильных устройств
             if self.is_mobile:
@@ -107,8 +166,8 @@ class GeminiProvider(BaseProvider):
                 "X-goog-api-key": self.api_key,
             }
 
-            # URL без ключа (ключ в заголовке)
-            api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+            # URL без ключа (ключ в заголовке); модель — своя у каждого экземпляра
+            api_url = self._model_url("generateContent")
 
             response = requests.post(  # type: ignore
                 api_url, json=payload, headers=headers, timeout=self.timeout
@@ -144,6 +203,7 @@ class GeminiProvider(BaseProvider):
                         tokens_used=0,
                         cost=0.0,
                         provider_name=self.name,
+                        failed=True,
                     )
             else:
                 logger.error(
@@ -154,6 +214,7 @@ class GeminiProvider(BaseProvider):
                     tokens_used=0,
                     cost=0.0,
                     provider_name=self.name,
+                    failed=True,
                 )
 
         except requests.exceptions.RequestException:  # type: ignore
@@ -163,6 +224,7 @@ class GeminiProvider(BaseProvider):
                 tokens_used=0,
                 cost=0.0,
                 provider_name=self.name,
+                failed=True,
             )
         except Exception:
             logger.error("Неожиданная ошибка Gemini: {str(e)}")
@@ -171,9 +233,34 @@ class GeminiProvider(BaseProvider):
                 tokens_used=0,
                 cost=0.0,
                 provider_name=self.name,
+                failed=True,
             )
 
 
+class StubProvider(BaseProvider):
+    """Локальный провайдер с заданным ответом и потоковой выдачей (для тестов)"""
+
+    name = "stub"
+
+    def __init__(self, text: str = "Ответ", chunk_size: int = 8, delay: float = 0.0):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+    def generate(self, prompt: str, max_tokens: int = 512) -> AiResult:
+        return AiResult(
+            text=self.text,
+            tokens_used=len(prompt.split()) + len(self.text.split()),
+            provider_name=self.name,
+        )
+
+    def generate_stream(self, prompt: str, max_tokens: int = 512) -> Iterator[str]:
+        for start in range(0, len(self.text), self.chunk_size):
+            if self.delay:
+                time.sleep(self.delay)
+            yield self.text[start : start + self.chunk_size]
+
+
 class FallbackProvider(BaseProvider):
     """Fallback провайдер для локального тестирования"""
 
@@ -184,6 +271,16 @@ class FallbackProvider(BaseProvider):
         self.is_available = lambda: True
         self.task_type = task_type or "chat"
 
+    def generate(self, prompt: str, max_tokens: int = 512) -> AiResult:
+        """Локальный ответ в формате остальных провайдеров"""
+        response = self.generate_response(prompt)
+        return AiResult(
+            text=response["text"],
+            tokens_used=response["tokens_used"],
+            cost=response["cost"],
+            provider_name=self.name,
+        )
+
     def generate_response(self, prompt, **kwargs):
         """Генерирует ответ на основе локальных данных"""
         try:
@@ -229,6 +326,19 @@ class FallbackProvider(BaseProvider):
             }
 
 
+def task_prompt_text(task) -> str:
+    """Текст задания для промптов объяснения и подсказки"""
+    return "\n\n".join(part for part in (task.title, task.description) if part)
+
+
+def task_explanation_prompt(task_text: str) -> str:
+    return f"Объясни подробно, как решить эту задачу:\n\n{task_text}"
+
+
+def task_hint_prompt(task_text: str) -> str:
+    return f"Дай краткую подсказку (не полное решение!) для этой задачи:\n\n{task_text}"
+
+
 class AiService:
     """Сервис управления провайдерами, лимитами и кэшем ответов."""
 
@@ -256,6 +366,10 @@ class AiService:
         if gemini_provider.is_available():
             ordered.append(gemini_provider)
             logger.info("Gemini провайдер доступен")
+
+            # Запасные модели: маршрутизатор дублирует на них медленные запросы
+            for model in get_router_config()["EXTRA_GEMINI_MODELS"]:
+                ordered.append(GeminiProvider(model=model, is_mobile=self.is_mobile))
         else:
             logger.warning("Gemini провайдер недоступен!")
 
@@ -266,6 +380,14 @@ class AiService:
         logger.info("Загружено провайдеров: {len(ordered)}")
         return ordered
 
+    @property
+    def router(self) -> ProviderRouter:
+        """Маршрутизатор по текущему списку провайдеров"""
+        router = getattr(self, "_router", None)
+        if router is None or router.source is not self.providers:
+            router = self._router = ProviderRouter(self.providers)
+        return router
+
     def get_provider_for_task(self, task_type: str = "chat") -> BaseProvider | None:
         """Получить провайдера для конкретного типа задачи"""
         import logging
@@ -273,14 +395,14 @@ class AiService:
         logger = logging.getLogger(__name__)
         logger.info("Запрашиваем провайдера для задачи типа: {task_type}")
 
-        # Используем только Gemini
-        provider = GeminiProvider(task_type=task_type)
-        if provider.is_available():
-            logger.info("Провайдер {provider.name} доступен для задачи {task_type}")
+        provider = GeminiProvider(task_type=task_type, is_mobile=self.is_mobile)
+        if self.router.candidates([provider]):
+            logger.info(f"Провайдер {provider.name} доступен для задачи {task_type}")
             return provider
 
-        logger.warning("Gemini провайдер недоступен для задачи {task_type}")
-        return None
+        # Цепь провайдера разомкнута или ключ не настроен: отвечаем сразу локально
+        logger.warning(f"Gemini провайдер недоступен для задачи {task_type}")
+        return self.router.fallback
 
     def ask_with_rag(
         self,
@@ -444,27 +566,49 @@ class AiService:
             provider=ai_provider,
         )
 
-    def _get_or_create_limits(self, user, session_id: str | None) -> AiLimit:
-        # Без регистрации: 10/день; с регистрацией: 30/день
-        is_auth = bool(user and getattr(user, "is_authenticated", False))
-        max_daily = 30 if is_auth else 10
-        limit, _ = AiLimit.objects.get_or_create(  # type: ignore
-            user=user if is_auth else None,
-            session_id=None if is_auth else (session_id or "guest"),
-            limit_type="daily",
-            defaults={
-                "current_usage": 0,
-                "max_limit": max_daily,
-                "reset_date": timezone.now(),
-            },
+    def _precomputed(
+        self, prompt: str, user, session_id: str | None, request_type: str
+    ) -> dict[str, Any] | None:
+        """Заранее сгенерированный ответ (prewarm_ai_answers); квоту не расходует"""
+        cached = get_cached_response(prompt)
+        if not cached:
+            return None
+        log_ai_request(
+            user=user,
+            session_id=session_id,
+            request_type=request_type,
+            prompt=prompt,
+            response=cached["text"],
+            tokens_used=0,
+            cost=0,
+            ip_address=None,
         )
-        # Автосброс, если пора
-        if timezone.now() >= limit.reset_date:
-            limit.current_usage = 0
-            limit.reset_date = timezone.now() + timezone.timedelta(days=1)
-            limit.max_limit = max_daily
-            limit.save()  # type: ignore
-        return limit
+        return {
+            "response": cached["text"],
+            "provider": cached["provider"],
+            "cached": True,
+            "tokens_used": cached["tokens_used"],
+        }
+
+    def _reserve_quota(self, user, session_id: str | None):
+        """Резервирует запрос в квоте пользователя одной атомарной операцией"""
+        return get_quota_engine().reserve(user, session_id)
+
+    def _generate(
+        self, prompt: str, quota, provider: BaseProvider | None = None, **kwargs
+    ):
+        """Генерирует ответ через маршрутизатор, возвращая резерв квоты при ошибке"""
+        try:
+            result = self.router.generate(
+                prompt, providers=[provider] if provider else None, **kwargs
+            )
+        except Exception:
+            get_quota_engine().refund(quota)
+            raise
+        # Локальный ответ fallback не расходует квоту
+        if result.failed or result.provider_name == self.router.fallback.name:
+            get_quota_engine().refund(quota)
+        return result
 
     def _ask_ai(
         self, prompt: str, user=None, task_type: str = "chat", use_cache: bool = True
@@ -488,7 +632,7 @@ class AiService:
                 return {"error": "Нет доступных ИИ провайдеров для этого типа задачи."}
 
             # Генерируем ответ
-            result = provider.generate(prompt)
+            result = self.router.generate(prompt, providers=[provider])
 
             return {
                 "response": result.text,
@@ -504,6 +648,10 @@ class AiService:
             logger.error("Ошибка в _ask_ai: {e}")
             return {"error": "Ошибка при обращении к AI: {str(e)}"}
 
+    def _select_provider(self) -> BaseProvider:
+        """Провайдер с замкнутой цепью по приоритету, иначе fallback"""
+        return self.router.select()
+
     def ask(
         self,
         prompt: str,
@@ -534,8 +682,8 @@ class AiService:
             logger.info("Получен запрос к ИИ: пользователь={user}, сессия={session_id}")
 
         # Проверяем лимиты
-        limit = self._get_or_create_limits(user, session_id)
-        if not limit.can_make_request():
+        quota = self._reserve_quota(user, session_id)
+        if not quota.allowed:
             logger.warning(
                 "Лимит исчерпан для пользователя={user}, сессии={session_id}"
             )
@@ -556,40 +704,14 @@ class AiService:
         # cached.provider else "local", "cached": True, "tokens_used":
         # cached.tokens_used}
 
-        # Выбор провайдера: используем локальный список в порядке приоритета
-        provider_client = None
-
-        # Проходим по провайдерам в порядке приоритета
-        for provider in self.providers:
-            if provider.is_available():
-                provider_client = provider
-                logger.info("Выбран провайдер: {provider.name}")
-                break
-
-        # Если ни один не доступен, используем fallback
-        if not provider_client:
-            logger.warning("Основные провайдеры недоступны, используем fallback")
-            # Ищем fallback провайдер
-            for provider in self.providers:
-                if isinstance(provider, FallbackProvider):
-                    provider_client = provider
-                    logger.info("Используем fallback провайдер: {provider.name}")
-                    break
-
-        # Если и fallback недоступен, возвращаем ошибку
-        if not provider_client:
-            logger.error("Нет доступных ИИ провайдеров")
-            return {"error": "Нет доступных ИИ провайдеров. Проверьте настройки API."}
-
-        # Генерация ответа
-        logger.info("Начинаем генерацию ответа через {provider_client.name}")
-        result = provider_client.generate(prompt)
+        # Генерация ответа: маршрутизатор выбирает провайдера и fallback
+        result = self._generate(prompt, quota)
         logger.info(
             "Ответ сгенерирован: токены={result.tokens_used}, провайдер={result.provider_name}"
         )
 
         # Логирование и сохранение
-        AiRequest.objects.create(  # type: ignore
+        log_ai_request(
             user=user,
             session_id=session_id,
             request_type="question",
@@ -600,10 +722,6 @@ class AiService:
             ip_address=None,
         )
 
-        # Обновляем лимит
-        limit.current_usage += 1  # type: ignore
-        limit.save()  # type: ignore
-
         # Сохраняем кэш - ВРЕМЕННО ОТКЛЮЧЕНО
         # self._set_cache(prompt, result, None)
 
@@ -617,6 +735,100 @@ class AiService:
             "tokens_used": result.tokens_used,
         }
 
+    def ask_stream(
+        self,
+        prompt: str,
+        user: object | None = None,
+        session_id: str | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Потоковый вариант ask: события по мере генерации ответа
+
+        События: {"type": "delta", "text": ...} для каждого фрагмента,
+        затем {"type": "done", "provider": ..., "tokens_used": ...} или
+        {"type": "error", "error": ...}. Квота резервируется до обращения к
+        провайдеру и возвращается, если поток оборвался.
+        """
+        import logging
+
+        logger = logging.getLogger(__name__)
+
+        prompt = (prompt or "").strip()
+        if not prompt:
+            yield {"type": "error", "error": "Пустой запрос"}
+            return
+
+        quota = self._reserve_quota(user, session_id)
+        if not quota.allowed:
+            yield {
+                "type": "error",
+                "error": "Лимит запросов на сегодня исчерпан. Попробуйте завтра.",
+            }
+            return
+
+        provider = self._select_provider()
+        started = time.monotonic()
+        first_chunk_latency = None
+        parts: list[str] = []
+        # None — поток закрыт клиентом (GeneratorExit) до конца ответа
+        succeeded = None
+        try:
+            for chunk in provider.generate_stream(prompt):
+                if first_chunk_latency is None:
+                    first_chunk_latency = time.monotonic() - started
+                parts.append(chunk)
+                yield {"type": "delta", "text": chunk}
+            succeeded = True
+        except Exception as e:
+            succeeded = False
+            logger.error(f"Ошибка потоковой генерации ({provider.name}): {e}")
+        finally:
+            self._finish_stream(
+                provider, quota, succeeded, started, first_chunk_latency
+            )
+
+        if not succeeded:
+            yield {"type": "error", "error": "Ошибка при обращении к AI"}
+            return
+
+        text = "".join(parts)
+        tokens_used = len(prompt.split()) + len(text.split())
+        PROVIDER_TOKENS.inc(tokens_used, provider=provider_key(provider))
+        log_ai_request(
+            user=user,
+            session_id=session_id,
+            request_type="question",
+            prompt=prompt,
+            response=text,
+            tokens_used=tokens_used,
+            cost=0,
+            ip_address=None,
+        )
+        yield {"type": "done", "provider": provider.name, "tokens_used": tokens_used}
+
+    def _finish_stream(
+        self,
+        provider: BaseProvider,
+        quota,
+        succeeded: bool | None,
+        started: float,
+        first_chunk_latency: float | None,
+    ) -> None:
+        """
+        Учитывает исход потока у маршрутизатора и возвращает резерв квоты
+
+        Квота возвращается, если ответ не дошел целиком (ошибка или клиент
+        отключился) или его дал локальный fallback, как в _generate.
+        """
+        elapsed = time.monotonic() - started
+        if succeeded is False:
+            self.router.record(provider, elapsed, False)
+        elif succeeded or first_chunk_latency is not None:
+            # Для потока важна задержка до первого фрагмента
+            self.router.record(provider, first_chunk_latency or elapsed, True)
+        if not succeeded or provider.name == self.router.fallback.name:
+            get_quota_engine().refund(quota)
+
     def chat(
         self, message: str, user=None, session_id: str | None = None
     ) -> dict[str, Any]:
@@ -627,7 +839,10 @@ class AiService:
         self, task_text: str, user=None, session_id: str | None = None
     ) -> dict[str, Any]:
         """Объяснение решения задачи"""
-        prompt = "Объясни подробно, как решить эту задачу:\n\n{task_text}"
+        prompt = task_explanation_prompt(task_text)
+        cached = self._precomputed(prompt, user, session_id, "task_explanation")
+        if cached:
+            return cached
 
         # Добавляем логирование для отладки
         import logging
@@ -644,8 +859,8 @@ class AiService:
             return {"error": "Нет доступных ИИ провайдеров для объяснения задач."}
 
         # Проверяем лимиты
-        limit = self._get_or_create_limits(user, session_id)
-        if not limit.can_make_request():
+        quota = self._reserve_quota(user, session_id)
+        if not quota.allowed:
             logger.warning(
                 "Лимит исчерпан для объяснения задачи: пользователь={user}, сессия={session_id}"
             )
@@ -653,13 +868,13 @@ class AiService:
 
         # Генерируем ответ
         logger.info("Начинаем генерацию объяснения задачи через {provider.name}")
-        result = provider.generate(prompt)
+        result = self._generate(prompt, quota, provider)
         logger.info(
             "Объяснение задачи сгенерировано: токены={result.tokens_used}, провайдер={result.provider_name}"
         )
 
         # Логируем
-        AiRequest.objects.create(  # type: ignore
+        log_ai_request(
             user=user,
             session_id=session_id,
             request_type="task_explanation",
@@ -670,10 +885,6 @@ class AiService:
             ip_address=None,
         )
 
-        # Обновляем лимит
-        limit.current_usage += 1  # type: ignore
-        limit.save()  # type: ignore
-
         logger.info(
             "Объяснение задачи завершено успешно: пользователь={user}, сессия={session_id}"
         )
@@ -688,9 +899,10 @@ class AiService:
         self, task_text: str, user=None, session_id: str | None = None
     ) -> dict[str, Any]:
         """Получение подсказки для решения задачи"""
-        prompt = (
-            "Дай краткую подсказку (не полное решение!) для этой задачи:\n\n{task_text}"
-        )
+        prompt = task_hint_prompt(task_text)
+        cached = self._precomputed(prompt, user, session_id, "hint_generation")
+        if cached:
+            return cached
 
         # Добавляем логирование для отладки
         import logging
@@ -705,8 +917,8 @@ class AiService:
             return {"error": "Нет доступных ИИ провайдеров для генерации подсказок."}
 
         # Проверяем лимиты
-        limit = self._get_or_create_limits(user, session_id)
-        if not limit.can_make_request():
+        quota = self._reserve_quota(user, session_id)
+        if not quota.allowed:
             logger.warning(
                 "Лимит исчерпан для подсказки: пользователь={user}, сессия={session_id}"
             )
@@ -714,13 +926,15 @@ class AiService:
 
         # Генерируем ответ
         logger.info("Начинаем генерацию подсказки через {provider.name}")
-        result = provider.generate(prompt, max_tokens=300)  # Краткие подсказки
+        result = self._generate(
+            prompt, quota, provider, max_tokens=300
+        )  # Краткие подсказки
         logger.info(
             "Подсказка сгенерирована: токены={result.tokens_used}, провайдер={result.provider_name}"
         )
 
         # Логируем
-        AiRequest.objects.create(  # type: ignore
+        log_ai_request(
             user=user,
             session_id=session_id,
             request_type="hint_generation",
@@ -731,10 +945,6 @@ class AiService:
             ip_address=None,
         )
 
-        # Обновляем лимит
-        limit.current_usage += 1  # type: ignore
-        limit.save()  # type: ignore
-
         logger.info(
             "Генерация подсказки завершена успешно: пользователь={user}, сессия={session_id}"
         )
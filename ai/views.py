@@ -5,12 +5,11 @@ import re
 from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
 from django.shortcuts import render
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django_ratelimit.decorators import ratelimit
 
-from .models import AiLimit  # для получения лимитов
+from .quota import get_quota_engine
 
 logger = logging.getLogger(__name__)
 
@@ -325,29 +324,13 @@ def api_limits(request):
             request.session.save()
         session_id = None if is_auth else request.session.session_key
 
-        max_daily = 30 if is_auth else 10
-        limit, _ = AiLimit.objects.get_or_create(  # type: ignore
-            user=request.user if is_auth else None,
-            session_id=session_id,
-            limit_type="daily",
-            defaults={
-                "current_usage": 0,
-                "max_limit": max_daily,
-                "reset_date": timezone.now().date(),  # type: ignore
-            },
-        )
-        # Синхронизируем максимальный лимит на случай смены статуса
-        if limit.max_limit != max_daily:
-            limit.max_limit = max_daily
-            limit.save()
-
-        remaining = max(0, limit.max_limit - limit.current_usage)
+        quota = get_quota_engine().status(request.user, session_id)
         return JsonResponse(
             {
                 "daily": {
-                    "used": limit.current_usage,
-                    "max": limit.max_limit,
-                    "remaining": remaining,
+                    "used": quota.used,
+                    "max": quota.limit,
+                    "remaining": quota.remaining,
                 }
             }
         )
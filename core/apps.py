@@ -1,6 +1,12 @@
-from django.apps import AppConfig
-
-
-class CoreConfig(AppConfig):
-    name = "core"
-    default_auto_field = "django.db.models.BigAutoField"  # type: ignore
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = "core"
+    default_auto_field = "django.db.models.BigAutoField"  # type: ignore
+
+    def ready(self):
+        """Запускает сохранение снимков метрик для общего эндпоинта воркеров"""
+        from .metrics import start_flusher
+
+        start_flusher()
@@ -0,0 +1,210 @@
+"""
+Отдача сгенерированных аудиофайлов с поддержкой HTTP Range
+
+Файлы в MEDIA_ROOT/audio адресуются хешем содержимого и никогда не
+меняются, поэтому ETag — это сам ключ, а ответы кэшируются браузером и
+CDN навсегда (immutable). Полный файл отдается через FileResponse, который
+использует wsgi.file_wrapper / sendfile сервера; запросы с Range получают
+206 только с нужным фрагментом, так что перемотка и повторное
+воспроизведение не скачивают файл целиком. Если задан
+AUDIO_DELIVERY_CONFIG["SENDFILE_HEADER"], отдачу берет на себя веб-сервер
+(X-Accel-Redirect / X-Sendfile).
+"""
+
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.urls import reverse
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from core.tts_pipeline import AUDIO_EXTENSION, AudioIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUDIO_DELIVERY_CONFIG = {
+    "MAX_AGE": 31536000,  # год: файлы неизменяемы
+    "CHUNK_SIZE": 64 * 1024,
+    "SENDFILE_HEADER": "",  # например, X-Accel-Redirect
+    "SENDFILE_PREFIX": "/protected/audio/",
+}
+
+AUDIO_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_audio_delivery_config() -> dict:
+    """Возвращает настройки отдачи аудио с учетом AUDIO_DELIVERY_CONFIG"""
+    config = dict(DEFAULT_AUDIO_DELIVERY_CONFIG)
+    config.update(getattr(settings, "AUDIO_DELIVERY_CONFIG", {}))
+    return config
+
+
+def audio_key_from_path(relative_path: str) -> str:
+    """Ключ аудио из относительного пути audio/<key>.mp3"""
+    return os.path.splitext(os.path.basename(relative_path or ""))[0]
+
+
+def audio_url(relative_path: str) -> str | None:
+    """URL эндпоинта отдачи для относительного пути аудиофайла"""
+    key = audio_key_from_path(relative_path)
+    if not AUDIO_KEY_RE.match(key):
+        return None
+    return reverse("audio_file", kwargs={"key": key})
+
+
+def audio_metadata(relative_paths) -> dict:
+    """
+    Метаданные файлов из индекса без обращения к диску
+
+    Returns:
+        {относительный путь: {"url", "size", "duration"}} для известных файлов
+    """
+    entries = AudioIndex().entries()
+    metadata = {}
+    for relative_path in relative_paths:
+        key = audio_key_from_path(relative_path)
+        entry = entries.get(key)
+        if entry:
+            metadata[relative_path] = {
+                "url": audio_url(relative_path),
+                "size": entry["size"],
+                "duration": entry.get("duration"),
+            }
+    return metadata
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Разбирает одиночный диапазон Range в (start, end) включительно
+
+    Returns:
+        Диапазон, None для некорректного заголовка (отдается весь файл)
+
+    Raises:
+        ValueError: диапазон за пределами файла (ответ 416)
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def _iter_file_range(audio_file, start: int, length: int, chunk_size: int):
+    with audio_file:
+        audio_file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = audio_file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _not_modified(request, etag: str, mtime: int) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return etag in tags or "*" in tags
+    if_modified_since = parse_http_date_safe(
+        request.headers.get("If-Modified-Since", "")
+    )
+    return bool(if_modified_since and mtime <= if_modified_since)
+
+
+@require_safe
+def audio_file_view(request, key):
+    """Отдает аудиофайл по ключу с поддержкой Range и условных запросов"""
+    if not AUDIO_KEY_RE.match(key):
+        raise Http404("Аудиофайл не найден")
+
+    index = AudioIndex()
+    path = index.audio_dir / f"{key}.{AUDIO_EXTENSION}"
+    meta = index.get(key)
+    if meta is None:
+        # Файл мог появиться до индекса: читаем метаданные с диска, но индекс
+        # не пишем — его пополняет конвейер и generate_voices --reindex
+        meta = index.describe(key)
+        if meta is None:
+            raise Http404("Аудиофайл не найден")
+
+    config = get_audio_delivery_config()
+    etag = f'"{key}"'
+    size = meta["size"]
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(meta["mtime"]),
+        "Cache-Control": f"public, max-age={config['MAX_AGE']}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, meta["mtime"]):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    if config["SENDFILE_HEADER"]:
+        response = HttpResponse(content_type="audio/mpeg")
+        response[config["SENDFILE_HEADER"]] = (
+            f"{config['SENDFILE_PREFIX']}{key}.{AUDIO_EXTENSION}"
+        )
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            response["Accept-Ranges"] = "bytes"
+            return response
+
+    try:
+        audio_file = open(path, "rb")
+    except FileNotFoundError:
+        raise Http404("Аудиофайл не найден") from None
+
+    if byte_range is None:
+        response = FileResponse(audio_file, content_type="audio/mpeg")
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _iter_file_range(audio_file, start, length, config["CHUNK_SIZE"]),
+            status=206,
+            content_type="audio/mpeg",
+        )
+        response["Content-Length"] = str(length)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -1,148 +1,121 @@
-"""
-Автоматический запуск задач при старте Django приложения
-Запускается при первом запросе к сайту (бесплатно)
-"""
-
-import logging
-import os
-import threading
-
-from django.core.management import call_command
-
-from learning.models import Subject, Task
-
-logger = logging.getLogger(__name__)
-
-# Флаг для предотвращения повторного запуска
-_startup_executed = False
-_startup_lock = threading.Lock()
-
-
-def should_run_startup():
-    """Проверяет, нужно ли запускать автозапуск"""
-    # Проверяем переменную окружения
-    auto_startup = os.getenv("AUTO_STARTUP_ENABLED", "true").lower()
-    if auto_startup not in ["true", "1", "yes"]:
-        logger.info("Автозапуск отключен через AUTO_STARTUP_ENABLED")
-        return False
-
-    # Проверяем, есть ли уже данные
-    try:
-        subjects_count = Subject.objects.count()
-        tasks_count = Task.objects.count()
-
-        logger.info(
-            "Текущее состояние: {subjects_count} предметов, {tasks_count} заданий"
-        )
-
-        # Если данных мало, запускаем парсинг
-        if subjects_count < 3 or tasks_count < 10:
-            logger.info("Данных недостаточно, запускаем автозагрузку")
-            return True
-        else:
-            logger.info("Данные уже загружены, пропускаем автозапуск")
-            return False
-
-    except Exception:
-        logger.error("Ошибка проверки данных: {str(e)}")
-        return True  # В случае ошибки пытаемся загрузить
-
-
-def run_startup_tasks():
-    """Выполняет задачи автозапуска"""
-    global _startup_executed
-
-    with _startup_lock:
-        if _startup_executed:
-            return
-
-        logger.info("🚀 Запуск автоматических задач при старте...")
-
-        try:
-            # 1. Применяем миграции
-            logger.info("📋 Применение миграций...")
-            call_command("migrate", verbosity=0)
-
-            # 2. Загружаем базовые данные
-            logger.info("📊 Загрузка базовых данных...")
-            call_command("load_sample_data", verbosity=0)
-
-            # 3. Быстрый парсинг ФИПИ (только основные предметы)
-            logger.info("🔥 Быстрый парсинг материалов ФИПИ...")
-            call_command("parse_all_fipi", quick=True, verbosity=1)
-
-            # 4. Настройка webhook
-            logger.info("🤖 Настройка Telegram webhook...")
-            try:
-                # Передаём вычисленный SITE_URL для корректного webhook
-                call_command(
-                    "setup_webhook",
-                    "set",
-                    url="{dj_settings.SITE_URL}/bot/webhook/",
-                    verbosity=0,
-                )
-            except Exception:
-                logger.warning("Ошибка настройки webhook: {str(e)}")
-
-            # 5. Генерация голосовых подсказок (ограниченно)
-            logger.info("🎤 Генерация голосовых подсказок...")
-            try:
-                call_command("generate_voices", limit=20, verbosity=0)
-            except Exception:
-                logger.warning("Ошибка генерации голоса: {str(e)}")
-
-            # 6. Keep-alive ОТКЛЮЧЁН (на паузе) — не пингуем сайт/БД/бота
-            # Чтобы включить снова: раскомментировать блок и установить core.keepalive
-            # try:
-            #     from core.keepalive import start_keepalive
-            #     start_keepalive()
-            #     logger.info("🌐 Keep-alive запущен ...")
-            # except Exception:
-            #     logger.warning("Не удалось запустить keep-alive: {str(e)}")
-            logger.info("⏸️ Keep-alive на паузе (не запускается)")
-
-            _startup_executed = True
-            logger.info("✅ Автозапуск завершен успешно!")
-
-            # Логируем финальную статистику
-            subjects_count = Subject.objects.count()
-            tasks_count = Task.objects.count()
-            logger.info("📊 Итого: {subjects_count} предметов, {tasks_count} заданий")
-
-        except Exception:
-            logger.error("❌ Ошибка автозапуска: {str(e)}")
-            _startup_executed = True  # Помечаем как выполненное, чтобы не повторять
-
-
-def run_startup_in_background():
-    """Запускает автозапуск в фоновом потоке"""
-    if not should_run_startup():
-        return
-
-    def background_task():
-        # Небольшая задержка для стабилизации
-        import time
-
-        time.sleep(2)
-        run_startup_tasks()
-
-    # Запускаем в отдельном потоке
-    thread = threading.Thread(target=background_task, daemon=True)
-    thread.start()
-    logger.info("🔄 Автозапуск запущен в фоновом режиме...")
-
-
-def trigger_startup_on_first_request(get_response):
-    """Middleware для запуска автозадач при первом запросе"""
-
-    def middleware(request):
-        global _startup_executed
-
-        # Запускаем только при первом запросе
-        if not _startup_executed and not request.path.startswith("/admin"):
-            run_startup_in_background()
-
-        response = get_response(request)
-        return response
-
-    return middleware
+"""
+Фоновые задачи после старта Django приложения
+
+Первый запрос воркера только планирует фоновый поток и сразу уходит
+дальше: поток заранее импортирует модули webhook бота (PREWARM_MODULES),
+а если включен RUN_JOBS и данных мало — выполняет тяжелые задачи
+(миграции, базовые данные, webhook, озвучка). Время каждого шага пишется
+в лог и startup_step_seconds. Те же задачи запускаются вне веб-процесса
+командой manage.py startup_jobs.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.core.management import call_command
+
+from core.startup_profile import get_startup_config, prewarm, startup_step
+from learning.models import Subject, Task
+
+logger = logging.getLogger(__name__)
+
+# Флаги для предотвращения повторного запуска в процессе
+_startup_executed = False
+_startup_scheduled = False
+_startup_lock = threading.Lock()
+
+
+def should_run_startup():
+    """Проверяет, нужно ли запускать тяжелые задачи запуска"""
+    if not get_startup_config()["RUN_JOBS"]:
+        logger.info("Задачи запуска отключены (AUTO_STARTUP_ENABLED)")
+        return False
+
+    # Проверяем, есть ли уже данные
+    try:
+        subjects_count = Subject.objects.count()
+        tasks_count = Task.objects.count()
+    except Exception as e:
+        logger.error(f"Ошибка проверки данных: {e}")
+        return True  # В случае ошибки пытаемся загрузить
+
+    logger.info(f"Текущее состояние: {subjects_count} предметов, {tasks_count} заданий")
+    # Если данных мало, запускаем загрузку
+    return subjects_count < 3 or tasks_count < 10
+
+
+def _setup_webhook():
+    # Передаём SITE_URL для корректного webhook
+    call_command(
+        "setup_webhook", "set", url=f"{settings.SITE_URL}/bot/webhook/", verbosity=0
+    )
+
+
+STARTUP_STEPS = [
+    ("migrate", lambda: call_command("migrate", verbosity=0)),
+    ("load_sample_data", lambda: call_command("load_sample_data", verbosity=0)),
+    ("setup_webhook", _setup_webhook),
+    (
+        "generate_voices",
+        lambda: call_command("generate_voices", limit=20, verbosity=0),
+    ),
+]
+
+
+def run_startup_tasks(steps: list[str] | None = None):
+    """Выполняет задачи запуска по шагам; ошибка шага не останавливает остальные"""
+    global _startup_executed
+
+    with _startup_lock:
+        if _startup_executed:
+            return
+        _startup_executed = True
+
+    logger.info("🚀 Запуск задач старта...")
+    for name, func in STARTUP_STEPS:
+        if steps is not None and name not in steps:
+            continue
+        try:
+            with startup_step(name):
+                func()
+        except Exception as e:
+            logger.warning(f"Шаг запуска {name} не выполнен: {e}")
+    logger.info("✅ Задачи старта завершены")
+
+
+def _background_startup():
+    config = get_startup_config()
+    if config["PREWARM"]:
+        try:
+            prewarm(config["PREWARM_MODULES"])
+        except Exception as e:
+            logger.warning(f"Не удалось заранее загрузить модули: {e}")
+    if should_run_startup():
+        run_startup_tasks()
+
+
+def run_startup_in_background():
+    """Запускает прогрев и задачи запуска в фоновом потоке (один раз)"""
+    global _startup_scheduled
+
+    with _startup_lock:
+        if _startup_scheduled:
+            return
+        _startup_scheduled = True
+
+    threading.Thread(
+        target=_background_startup, name="startup-jobs", daemon=True
+    ).start()
+    logger.info("🔄 Прогрев и задачи запуска запущены в фоне")
+
+
+def trigger_startup_on_first_request(get_response):
+    """Middleware: первый запрос воркера планирует фоновый запуск"""
+
+    def middleware(request):
+        if not _startup_scheduled:
+            run_startup_in_background()
+        return get_response(request)
+
+    return middleware
@@ -9,9 +9,10 @@ from datetime import timedelta
 
 import schedule
 from django.conf import settings
-from django.core.management import call_command
 from django.utils import timezone
 
+from core.crawl_frontier import CrawlFrontier
+from core.enhanced_parser import DataIntegrator
 from core.fipi_loader import FipiLoader
 from learning.models import Subject, Task
 
@@ -25,6 +26,14 @@ class AutoUpdater:
         self.is_running = False
         self.thread = None
         self.fipi_loader = FipiLoader()
+        self._data_integrator = None
+
+    @property
+    def data_integrator(self):
+        """Ленивая инициализация интегратора РешуЕГЭ/ФИПИ"""
+        if self._data_integrator is None:
+            self._data_integrator = DataIntegrator()
+        return self._data_integrator
 
     def start_scheduler(self):
         """Запускает планировщик обновлений"""
@@ -72,16 +81,18 @@ class AutoUpdater:
         logger.info("📅 Начинаем ежедневное обновление материалов...")
 
         try:
-            # Загружаем новые материалы с ФИПИ
-            subjects_count, tasks_count = self.fipi_loader.load_subjects()
+            # Проверяем только те источники, которым пора обновиться
+            self.fipi_loader.register_sources()
+            stats = self.run_frontier()
+            tasks_count = stats.tasks_created
 
             if tasks_count > 0:
-                logger.info("✅ Загружено новых заданий: {tasks_count}")
+                logger.info(f"✅ Загружено новых заданий: {tasks_count}")
 
                 # Отправляем уведомление админу
                 self._send_admin_notification(
                     "📚 Ежедневное обновление ExamFlow\n"
-                    "Новых заданий: {tasks_count}\n"
+                    f"Новых заданий: {tasks_count}\n"
                     "Время: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
                 )
             else:
@@ -100,8 +111,13 @@ class AutoUpdater:
         logger.info("📅 Начинаем еженедельное полное обновление...")
 
         try:
-            # Полная перезагрузка данных
-            call_command("load_fipi_data")
+            # Обновляем список источников и обходим все просроченные
+            self.data_integrator.discover_sources()
+            self.fipi_loader.register_sources()
+            frontier_config = getattr(settings, "FIPI_FRONTIER_CONFIG", {})
+            self.run_frontier(
+                time_budget=frontier_config.get("WEEKLY_TIME_BUDGET", 3600)
+            )
 
             # Генерируем голосовые файлы для новых заданий
             self.generate_voices_batch()
@@ -130,50 +146,61 @@ class AutoUpdater:
                 "Время: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
             )
 
-    def generate_voices_batch(self):
-        """Генерирует голосовые файлы пакетами"""
+    def run_frontier(self, time_budget=None):
+        """Обходит просроченные источники FIPISourceMap и разбирает изменения"""
+        frontier = CrawlFrontier(
+            crawler=self.fipi_loader.crawler, time_budget=time_budget
+        )
+        return frontier.run(handler=self.handle_crawl_result)
+
+    def handle_crawl_result(self, result):
+        """
+        Передает изменившуюся страницу загрузчику, который ее зарегистрировал
+
+        Ошибки разбора пробрасываются планировщику, чтобы он не сохранил
+        состояние источника. Возвращает число созданных заданий.
+        """
+        source_id = result.source.source_id
+        if source_id.startswith("subject_"):
+            return self.fipi_loader.handle_crawl_result(result)[1]
+        if source_id.startswith("url_"):
+            return self.data_integrator.handle_crawl_result(result).created
+        return 0
+
+    def generate_voices_batch(self, limit=None):
+        """Генерирует голосовые файлы одной параллельной пачкой"""
         logger.info("🎤 Начинаем генерацию голосовых файлов...")
 
         try:
-            # Генерируем голоса для заданий без аудио (максимум 20 за раз)
-            tasks_without_audio = Task.objects.filter(
-                is_active=True, audio_file__isnull=True
-            )[:20]
+            from core.tts_pipeline import get_tts_config
+            from core.voice_service import voice_service
 
-            if not tasks_without_audio:
-                logger.info("ℹ️ Все активные задания уже имеют голосовые файлы")
+            limit = limit or get_tts_config()["BATCH_SIZE"]
+            # Берем только задания без аудио (файл ищется по хешу текста),
+            # сначала новые, поэтому пачка не застревает на уже озвученных
+            tasks = voice_service.tasks_without_audio(
+                Task.objects.select_related("subject")  # type: ignore
+                .order_by("-id")
+                .iterator(chunk_size=500),
+                limit,
+            )
+            if not tasks:
+                logger.info("ℹ️ Нет заданий для озвучивания")
                 return
 
-            generated_count = 0
-
-            for task in tasks_without_audio:
-                try:
-                    from core.voice_service import voice_service
-
-                    result = voice_service.generate_task_audio(task)
+            _, batch = voice_service.generate_tasks_audio(tasks)
+            logger.info(f"✅ Сгенерировано голосовых файлов: {batch.synthesized}")
 
-                    if result and result["task_audio"]:
-                        generated_count += 1
-                        logger.info("🎤 Создан голос для: {task.title}")
-
-                    # Пауза между генерациями
-                    time.sleep(2)
-
-                except Exception:
-                    logger.error("Ошибка генерации голоса для {task.id}: {str(e)}")
-                    continue
-
-            logger.info("✅ Сгенерировано голосовых файлов: {generated_count}")
-
-            if generated_count > 0:
+            if batch.synthesized > 0:
                 self._send_admin_notification(
                     "🎤 Генерация голосов ExamFlow\n"
-                    "Создано файлов: {generated_count}\n"
-                    "Время: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+                    f"Создано файлов: {batch.synthesized}\n"
+                    f"Переиспользовано: {batch.reused}\n"
+                    f"Время: {timezone.now().strftime('%d.%m.%Y %H:%M')}"
                 )
 
-        except Exception:
-            logger.error("❌ Ошибка генерации голосов: {str(e)}")
+        except Exception as e:
+            logger.error(f"❌ Ошибка генерации голосов: {e}")
 
     def cleanup_old_data(self):
         """Очищает старые данные"""
@@ -0,0 +1,247 @@
+"""
+Массовые рассылки в Telegram с учетом лимитов Bot API
+
+Получатели читаются пачками по первичному ключу (keyset), сообщения
+отправляются параллельно (WORKERS) через общий requests.Session клиента
+Telegram (telegram_bot.client.api_session) с общим лимитом GLOBAL_RATE сообщений в секунду и не чаще раза в PER_CHAT_INTERVAL
+в один чат. Ответ 429 приостанавливает все потоки на retry_after секунд,
+после чего сообщение отправляется повторно. Успешные отправки пишутся в
+ReminderLog одним запросом на пачку, а последний обработанный ключ —
+в кэш: прерванная рассылка продолжается с места остановки.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.tts_pipeline import RateLimiter
+from telegram_bot.client import api_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROADCAST_CONFIG = {
+    "API_URL": "https://api.telegram.org",
+    "GLOBAL_RATE": 28,  # сообщений в секунду на бота (лимит Telegram ~30)
+    "PER_CHAT_INTERVAL": 1.0,  # секунд между сообщениями в один чат
+    "WORKERS": 8,
+    "BATCH_SIZE": 500,  # получателей в пачке (запрос к базе и запись логов)
+    "MAX_RETRIES": 3,  # повторов при 429, 5xx и сетевых ошибках
+    "TIMEOUT": 10,
+    "CHECKPOINT_TTL": 2 * 24 * 3600,
+}
+
+
+def get_broadcast_config() -> dict:
+    """Возвращает настройки рассылок с учетом BROADCAST_CONFIG"""
+    config = dict(DEFAULT_BROADCAST_CONFIG)
+    config.update(getattr(settings, "BROADCAST_CONFIG", {}))
+    return config
+
+
+@dataclass
+class SendResult:
+    """Итог отправки одного сообщения"""
+
+    chat_id: int
+    ok: bool
+    blocked: bool = False  # бот заблокирован или чат недоступен (403)
+    error: str = ""
+
+
+@dataclass
+class BroadcastStats:
+    """Итог рассылки"""
+
+    processed: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    resumed_from: int = 0
+    duration: float = 0.0
+
+
+class TelegramSender:
+    """Потокобезопасная отправка sendMessage с лимитами и повторами"""
+
+    def __init__(self, bot_token: str, **config):
+        self.config = {**get_broadcast_config(), **config}
+        self.url = f"{self.config['API_URL']}/bot{bot_token}/sendMessage"
+        self.session = api_session()
+        self.rate_limiter = RateLimiter(self.config["GLOBAL_RATE"])
+        self._lock = threading.Lock()
+        self._chat_slots: dict[int, float] = {}
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Приостанавливает отправку во всех потоках (flood control)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_turn(self, chat_id: int) -> None:
+        interval = self.config["PER_CHAT_INTERVAL"]
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._paused_until, self._chat_slots.get(chat_id, 0.0))
+            self._chat_slots[chat_id] = start + interval
+        if start > now:
+            time.sleep(start - now)
+        self.rate_limiter.acquire()
+        # Пауза могла начаться, пока поток ждал слот
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def send(self, chat_id: int, text: str, **params) -> SendResult:
+        if self.session is None:
+            return SendResult(chat_id, ok=False, error="requests недоступен")
+
+        payload = {"chat_id": chat_id, "text": text, **params}
+        error = ""
+        for attempt in range(self.config["MAX_RETRIES"] + 1):
+            self._wait_turn(chat_id)
+            try:
+                resp = self.session.post(
+                    self.url, json=payload, timeout=self.config["TIMEOUT"]
+                )
+            except Exception as e:
+                error = str(e)
+                time.sleep(min(2**attempt, 10) * 0.5)
+                continue
+
+            if resp.status_code == 429:
+                try:
+                    data = resp.json()
+                except ValueError:
+                    data = {}
+                retry_after = (data.get("parameters") or {}).get("retry_after", 1)
+                logger.warning(f"Telegram 429: пауза рассылки на {retry_after} с")
+                self.pause(float(retry_after))
+                error = "429 Too Many Requests"
+                continue
+            if resp.status_code >= 500:
+                error = f"HTTP {resp.status_code}"
+                time.sleep(min(2**attempt, 10) * 0.5)
+                continue
+            if resp.status_code == 403:
+                return SendResult(chat_id, ok=False, blocked=True, error="HTTP 403")
+            if resp.status_code != 200:
+                return SendResult(chat_id, ok=False, error=f"HTTP {resp.status_code}")
+            return SendResult(chat_id, ok=True)
+
+        return SendResult(chat_id, ok=False, error=error)
+
+
+def _checkpoint_key(campaign: str) -> str:
+    return f"broadcast_checkpoint:{campaign}"
+
+
+class Broadcaster:
+    """Рассылка пачками с записью ReminderLog и контрольной точкой"""
+
+    def __init__(self, sender: TelegramSender | None = None, **config):
+        self.config = {**get_broadcast_config(), **config}
+        if sender is None:
+            token = getattr(settings, "TELEGRAM_BOT_TOKEN", "")
+            sender = TelegramSender(token, **self.config) if token else None
+        self.sender = sender
+
+    def send_many(self, messages: Iterable[tuple[int, str]]) -> list[SendResult]:
+        """Отправляет сообщения (chat_id, текст) параллельно"""
+        messages, sender = list(messages), self.sender
+        if not (sender and messages):
+            return []
+        workers = max(1, min(self.config["WORKERS"], len(messages)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda item: sender.send(*item), messages))
+
+    def run(
+        self,
+        campaign: str,
+        recipients,
+        text: str | Callable[[int], str],
+        limit: int | None = None,
+        resume: bool = True,
+    ) -> BroadcastStats:
+        """
+        Рассылка получателям из queryset recipients (поле telegram_id)
+
+        Args:
+            campaign: тип рассылки, он же reminder_type в ReminderLog
+            text: текст или функция telegram_id -> текст
+            limit: максимум успешных отправок за запуск
+            resume: продолжить с контрольной точки прерванного запуска
+        """
+        from core.models import ReminderLog
+
+        started = time.monotonic()
+        stats = BroadcastStats()
+        if self.sender is None:
+            logger.info("Telegram недоступен или токен не задан, рассылка пропущена")
+            return stats
+
+        key = _checkpoint_key(campaign)
+        cursor = (cache.get(key) or 0) if resume else 0
+        stats.resumed_from = cursor
+        render = text if callable(text) else (lambda _chat_id: text)
+        finished = True
+
+        while True:
+            size = self.config["BATCH_SIZE"]
+            if limit is not None:
+                if stats.sent >= limit:
+                    finished = False
+                    break
+                size = min(size, limit - stats.sent)
+            batch = list(
+                recipients.filter(pk__gt=cursor)
+                .order_by("pk")
+                .values_list("pk", "telegram_id")[:size]
+            )
+            if not batch:
+                break
+
+            results = self.send_many(
+                (chat_id, render(chat_id)) for _, chat_id in batch
+            )
+            now = timezone.now()
+            ReminderLog.objects.bulk_create(  # type: ignore
+                [
+                    ReminderLog(
+                        telegram_id=result.chat_id,
+                        reminder_type=campaign,
+                        last_sent_at=now,
+                    )
+                    for result in results
+                    if result.ok
+                ],
+                update_conflicts=True,
+                unique_fields=["telegram_id", "reminder_type"],
+                update_fields=["last_sent_at"],
+            )
+            cursor = batch[-1][0]
+            cache.set(key, cursor, self.config["CHECKPOINT_TTL"])
+
+            stats.processed += len(batch)
+            for result in results:
+                if result.ok:
+                    stats.sent += 1
+                elif result.blocked:
+                    stats.blocked += 1
+                else:
+                    stats.failed += 1
+
+        if finished:
+            cache.delete(key)
+        stats.duration = time.monotonic() - started
+        logger.info(
+            f"Рассылка {campaign}: отправлено {stats.sent}, ошибок {stats.failed}, "
+            f"заблокировали бота {stats.blocked} за {stats.duration:.1f} с"
+        )
+        return stats
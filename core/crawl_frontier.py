@@ -0,0 +1,244 @@
+"""
+Планировщик обхода источников ФИПИ (crawl frontier)
+
+Источники из FIPISourceMap лежат в очереди с приоритетом по времени
+следующей проверки и FIPISourceMap.priority. За один запуск забираются
+только источники, которым пора обновиться, пачками по concurrency штук,
+пока не исчерпан бюджет времени. Интервал повторной проверки каждого
+источника подстраивается под то, как часто он реально меняется: статичные
+PDF проверяются все реже, часто меняющиеся страницы — чаще.
+"""
+
+import heapq
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.fipi_crawler import FetchResult, FipiCrawler
+from core.models import FIPISourceMap
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FRONTIER_CONFIG = {
+    "CONCURRENCY": 8,
+    "TIME_BUDGET": 600,  # секунд на один запуск
+    "MAX_SOURCES": 500,
+    "MIN_INTERVAL_HOURS": 6,
+    "MAX_INTERVAL_DAYS": 365,
+    "ERROR_RETRY_HOURS": 1,
+    "CHANGED_FACTOR": 0.5,
+    "UNCHANGED_FACTOR": 1.5,
+}
+
+BASE_INTERVALS = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(days=7),
+    "monthly": timedelta(days=30),
+    "annually": timedelta(days=365),
+}
+
+# Поля расписания, сохраняемые вместе с валидаторами источника
+SCHEDULE_FIELDS = [
+    "next_check_at",
+    "revisit_interval",
+    "check_count",
+    "change_count",
+    "last_fetch_duration",
+    "avg_fetch_duration",
+]
+
+# Вес нового замера в скользящем среднем длительности загрузки
+DURATION_EMA_WEIGHT = 0.3
+
+# Обработчик изменившейся страницы возвращает число созданных заданий
+ChangeHandler = Callable[[FetchResult], int | None]
+
+
+def get_frontier_config() -> dict:
+    """Возвращает настройки планировщика с учетом FIPI_FRONTIER_CONFIG"""
+    config = dict(DEFAULT_FRONTIER_CONFIG)
+    config.update(getattr(settings, "FIPI_FRONTIER_CONFIG", {}))
+    return config
+
+
+@dataclass
+class FrontierRunStats:
+    """Итоги одного запуска планировщика"""
+
+    fetched: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    errors: int = 0
+    handler_errors: int = 0
+    tasks_created: int = 0
+    remaining: int = 0
+    duration: float = 0.0
+    budget_exhausted: bool = False
+    changed_sources: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class CrawlFrontier:
+    """Очередь источников с адаптивными интервалами повторной проверки"""
+
+    def __init__(
+        self,
+        crawler: FipiCrawler | None = None,
+        concurrency: int | None = None,
+        time_budget: float | None = None,
+        max_sources: int | None = None,
+    ):
+        self.config = get_frontier_config()
+        self.crawler = crawler or FipiCrawler()
+        self.concurrency = concurrency or self.config["CONCURRENCY"]
+        self.time_budget = (
+            self.config["TIME_BUDGET"] if time_budget is None else time_budget
+        )
+        self.max_sources = max_sources or self.config["MAX_SOURCES"]
+        self.min_interval = timedelta(hours=self.config["MIN_INTERVAL_HOURS"])
+        self.max_interval = timedelta(days=self.config["MAX_INTERVAL_DAYS"])
+        self.error_retry = timedelta(hours=self.config["ERROR_RETRY_HOURS"])
+
+    def due_sources(self, now=None) -> list[FIPISourceMap]:
+        """Источники, которым пора обновиться, одним запросом"""
+        now = now or timezone.now()
+        queryset = FIPISourceMap.objects.filter(  # type: ignore
+            Q(next_check_at__lte=now) | Q(next_check_at__isnull=True),
+            is_active=True,
+        )
+        # Источники без next_check_at, проверенные раньше, решаются
+        # по старому правилу needs_update()
+        return [
+            source
+            for source in queryset.order_by("priority")[: self.max_sources * 2]
+            if source.next_check_at or source.needs_update()
+        ][: self.max_sources]
+
+    def build_queue(self, sources: list[FIPISourceMap]) -> list[tuple]:
+        """Куча (время проверки, приоритет, порядковый номер, источник)"""
+        epoch = timezone.now() - timedelta(days=3650)
+        heap = [
+            (source.next_check_at or epoch, source.priority, index, source)
+            for index, source in enumerate(sources)
+        ]
+        heapq.heapify(heap)
+        return heap
+
+    def run(
+        self,
+        handler: ChangeHandler | None = None,
+        sources: list[FIPISourceMap] | None = None,
+    ) -> FrontierRunStats:
+        """
+        Обходит просроченные источники в рамках бюджета времени
+
+        Args:
+            handler: вызывается для каждой изменившейся страницы до записи
+                ее состояния; если он упал, валидаторы и хеш не сохраняются
+                и страница загрузится снова через ERROR_RETRY_HOURS
+            sources: явный список источников вместо выборки due_sources()
+        """
+        stats = FrontierRunStats()
+        started = time.monotonic()
+        queue = self.build_queue(sources if sources is not None else self.due_sources())
+
+        while queue:
+            if self.time_budget and time.monotonic() - started >= self.time_budget:
+                stats.budget_exhausted = True
+                break
+
+            batch = [
+                heapq.heappop(queue)[3]
+                for _ in range(min(self.concurrency, len(queue)))
+            ]
+            results = self.crawler.fetch_sources(batch, record=False)
+
+            for result in results:
+                stats.fetched += 1
+                if not result.ok:
+                    stats.errors += 1
+                elif result.changed:
+                    stats.changed += 1
+                    stats.changed_sources.append(result.source.source_id)  # type: ignore
+                    if handler:
+                        self._handle(handler, result, stats)
+                else:
+                    stats.unchanged += 1
+                self._update_schedule(result)
+
+            self.crawler.record_results(results, extra_fields=SCHEDULE_FIELDS)
+
+        stats.remaining = len(queue)
+        stats.duration = time.monotonic() - started
+        logger.info(
+            f"Frontier: загружено {stats.fetched}, изменилось {stats.changed}, "
+            f"без изменений {stats.unchanged}, ошибок {stats.errors}, "
+            f"осталось {stats.remaining} за {stats.duration:.1f} с"
+        )
+        return stats
+
+    def _handle(
+        self, handler: ChangeHandler, result: FetchResult, stats: FrontierRunStats
+    ) -> None:
+        """Вызывает обработчик; ошибка переводит результат в неудачный"""
+        try:
+            stats.tasks_created += handler(result) or 0
+        except Exception as e:
+            stats.handler_errors += 1
+            result.error = f"Ошибка обработки: {e}"
+            logger.error(f"Ошибка обработки {result.url}: {e}")
+
+    def _update_schedule(self, result: FetchResult) -> None:
+        """Пересчитывает статистику и следующую проверку источника"""
+        source = result.source
+        if source is None:
+            return
+
+        now = timezone.now()
+        source.last_fetch_duration = result.duration
+        if source.avg_fetch_duration:
+            source.avg_fetch_duration = (
+                DURATION_EMA_WEIGHT * result.duration
+                + (1 - DURATION_EMA_WEIGHT) * source.avg_fetch_duration
+            )
+        else:
+            source.avg_fetch_duration = result.duration
+
+        if not result.ok:
+            source.next_check_at = now + self.error_retry
+            return
+
+        # Первое скачивание (хеша еще нет) изменением не считается
+        first_fetch = not source.content_hash
+        source.check_count += 1
+        if result.changed and not first_fetch:
+            source.change_count += 1
+
+        source.revisit_interval = self.next_interval(
+            source, result.changed, first_fetch=first_fetch
+        )
+        source.next_check_at = now + source.revisit_interval
+
+    def next_interval(
+        self, source: FIPISourceMap, changed: bool, first_fetch: bool = False
+    ) -> timedelta:
+        """Адаптивный интервал: сокращается при изменении, растет без изменений"""
+        base = BASE_INTERVALS.get(source.update_frequency, timedelta(days=1))
+        interval = source.revisit_interval or base
+
+        if first_fetch:
+            interval = base
+        elif changed:
+            interval = interval * self.config["CHANGED_FACTOR"]
+        else:
+            interval = interval * self.config["UNCHANGED_FACTOR"]
+
+        return max(self.min_interval, min(self.max_interval, interval))
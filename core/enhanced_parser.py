@@ -14,6 +14,8 @@ from bs4 import BeautifulSoup
 from django.db import transaction
 from django.utils import timezone
 
+from core.fipi_crawler import FipiCrawler, source_id_for_url
+from core.task_ingest import bulk_upsert_tasks, task_data_key
 from learning.models import Subject, Task
 
 logger = logging.getLogger(__name__)
@@ -67,35 +69,38 @@ class FipiParser:
         try:
             response = self.session.get(subject_url)
             response.raise_for_status()
-
-            soup = BeautifulSoup(response.content, "html.parser")
-            tasks: list[dict] = []
-
-            task_elements = soup.find_all("a", href=True)
-
-            for element in task_elements:
-                try:
-                    title = element.get_text(strip=True)[:200]
-                    if len(title) > 10:
-                        task = {
-                            "title": title,
-                            "description": title,
-                            "difficulty": random.randint(1, 5),
-                            "source": "ФИПИ",
-                            "subject_name": subject_name,
-                        }
-                        tasks.append(task)
-                except Exception as task_error:
-                    logger.warning(f"Ошибка парсинга задания: {task_error}")
-                    continue
-
-            logger.info(f"Найдено {len(tasks)} заданий для предмета {subject_name}")
-            return tasks
+            return self.parse_tasks(response.content, subject_name)
 
         except Exception as e:
             logger.error(f"Ошибка получения заданий для {subject_name}: {e}")
             return []
 
+    def parse_tasks(self, content: bytes, subject_name: str) -> list[dict]:
+        """Разбирает страницу предмета в список заданий"""
+        soup = BeautifulSoup(content, "html.parser")
+        tasks: list[dict] = []
+
+        task_elements = soup.find_all("a", href=True)
+
+        for element in task_elements:
+            try:
+                title = element.get_text(strip=True)[:200]
+                if len(title) > 10:
+                    task = {
+                        "title": title,
+                        "description": title,
+                        "difficulty": random.randint(1, 5),  # noqa: S311
+                        "source": "ФИПИ",
+                        "subject_name": subject_name,
+                    }
+                    tasks.append(task)
+            except Exception as task_error:
+                logger.warning(f"Ошибка парсинга задания: {task_error}")
+                continue
+
+        logger.info(f"Найдено {len(tasks)} заданий для предмета {subject_name}")
+        return tasks
+
 
 class ReshuEGEParser:
     """Парсер для сайта РешуЕГЭ (ege.sdamgia.ru)"""
@@ -145,35 +150,38 @@ class ReshuEGEParser:
         try:
             response = self.session.get(subject_url)
             response.raise_for_status()
-
-            soup = BeautifulSoup(response.content, "html.parser")
-            tasks: list[dict] = []
-
-            task_elements = soup.find_all("a", href=True)
-
-            for element in task_elements:
-                try:
-                    title = element.get_text(strip=True)[:200]
-                    if len(title) > 10:
-                        task = {
-                            "title": title,
-                            "description": title,
-                            "difficulty": random.randint(1, 5),
-                            "source": "РешуЕГЭ",
-                            "subject_name": subject_name,
-                        }
-                        tasks.append(task)
-                except Exception as task_error:
-                    logger.warning(f"Ошибка парсинга задания: {task_error}")
-                    continue
-
-            logger.info(f"Найдено {len(tasks)} заданий для предмета {subject_name}")
-            return tasks
+            return self.parse_tasks(response.content, subject_name)
 
         except Exception as e:
             logger.error(f"Ошибка получения заданий для {subject_name}: {e}")
             return []
 
+    def parse_tasks(self, content: bytes, subject_name: str) -> list[dict]:
+        """Разбирает страницу предмета в список заданий"""
+        soup = BeautifulSoup(content, "html.parser")
+        tasks: list[dict] = []
+
+        task_elements = soup.find_all("a", href=True)
+
+        for element in task_elements:
+            try:
+                title = element.get_text(strip=True)[:200]
+                if len(title) > 10:
+                    task = {
+                        "title": title,
+                        "description": title,
+                        "difficulty": random.randint(1, 5),  # noqa: S311
+                        "source": "РешуЕГЭ",
+                        "subject_name": subject_name,
+                    }
+                    tasks.append(task)
+            except Exception as task_error:
+                logger.warning(f"Ошибка парсинга задания: {task_error}")
+                continue
+
+        logger.info(f"Найдено {len(tasks)} заданий для предмета {subject_name}")
+        return tasks
+
 
 class DataIntegrator:
     """Интегратор данных в базу Django"""
@@ -181,6 +189,7 @@ class DataIntegrator:
     def __init__(self):
         self.fipi_parser = FipiParser()
         self.reshu_parser = ReshuEGEParser()
+        self.crawler = FipiCrawler()
 
     def create_or_update_subject(self, subject_data: dict) -> Subject:
         """Создает или обновляет предмет в базе"""
@@ -226,6 +235,7 @@ class DataIntegrator:
                 description=task_data["description"][:1000],
                 difficulty=task_data["difficulty"],
                 source=task_data["source"],
+                source_hash=task_data_key(task_data),
                 created_at=timezone.now(),
             )
 
@@ -236,58 +246,111 @@ class DataIntegrator:
             logger.error(f"Ошибка создания задания: {e}")
             raise
 
-    def run_data_update(self, max_tasks_per_subject: int = 50) -> dict:
+    def discover_sources(self) -> tuple[list, dict[str, dict]]:
+        """Находит страницы предметов и регистрирует их в FIPISourceMap"""
+        logger.info("📚 Получаем данные с ФИПИ...")
+        fipi_subjects = self.fipi_parser.get_subjects()
+
+        logger.info("📚 Получаем данные с РешуЕГЭ...")
+        reshu_subjects = self.reshu_parser.get_subjects()
+
+        all_subjects = fipi_subjects + reshu_subjects
+
+        unique_subjects: dict[str, dict] = {}
+        for subject in all_subjects:
+            name = subject["name"].strip()
+            if name not in unique_subjects:
+                unique_subjects[name] = subject
+
+        logger.info(f"📊 Найдено {len(unique_subjects)} уникальных предметов")
+
+        subjects_list = list(unique_subjects.values())
+        sources = self.crawler.ensure_sources(
+            {
+                "source_id": source_id_for_url(subject_data["url"]),
+                "name": subject_data["name"][:500],
+                "url": subject_data["url"],
+                "data_type": "tasks",
+                "exam_type": "ege",
+                "subject": subject_data["name"][:100],
+                "update_frequency": "daily",
+            }
+            for subject_data in subjects_list
+        )
+        subjects_by_source = {
+            source_id_for_url(subject_data["url"]): subject_data
+            for subject_data in subjects_list
+        }
+
+        return sources, subjects_by_source
+
+    def handle_crawl_result(self, result, max_tasks_per_subject: int = 50):
+        """Обрабатывает изменившуюся страницу, загруженную планировщиком"""
+        source = result.source
+        subject_data = {
+            "name": source.subject or source.name,
+            "url": source.url,
+            "source": "ФИПИ" if "fipi.ru" in source.url else "РешуЕГЭ",
+        }
+        return self._process_subject_page(
+            subject_data, result.content, max_tasks_per_subject
+        )
+
+    def _process_subject_page(
+        self, subject_data: dict, content: bytes, max_tasks_per_subject: int = 50
+    ):
+        """Разбирает страницу предмета и пишет задания одной транзакцией"""
+        parser = (
+            self.fipi_parser if subject_data["source"] == "ФИПИ" else self.reshu_parser
+        )
+        tasks = parser.parse_tasks(content, subject_data["name"])
+        tasks = tasks[:max_tasks_per_subject]
+
+        with transaction.atomic():
+            subject = self.create_or_update_subject(subject_data)
+            return bulk_upsert_tasks(
+                dict(task_data, subject=subject) for task_data in tasks
+            )
+
+    def run_data_update(
+        self, max_tasks_per_subject: int = 50, force: bool = False
+    ) -> dict:
         """Запускает полное обновление данных"""
         start_time = time.time()
         total_subjects = 0
         total_tasks = 0
+        ingest_totals: dict[str, int] = {}
         errors: list[str] = []
 
         try:
             logger.info("🚀 Начинаем обновление базы данных...")
 
-            logger.info("📚 Получаем данные с ФИПИ...")
-            fipi_subjects = self.fipi_parser.get_subjects()
-
-            logger.info("📚 Получаем данные с РешуЕГЭ...")
-            reshu_subjects = self.reshu_parser.get_subjects()
-
-            all_subjects = fipi_subjects + reshu_subjects
-
-            unique_subjects: dict[str, dict] = {}
-            for subject in all_subjects:
-                name = subject["name"].strip()
-                if name not in unique_subjects:
-                    unique_subjects[name] = subject
-
-            logger.info(f"📊 Найдено {len(unique_subjects)} уникальных предметов")
+            sources, subjects_by_source = self.discover_sources()
+
+            # Страницы качаются параллельно с лимитами на хост, в БД пишем
+            # только изменившиеся и уже разобранные страницы. Состояние
+            # источника сохраняется лишь после успешной записи заданий
+            processed = []
+            for result in self.crawler.crawl(sources, force=force, record=False):
+                subject_data = subjects_by_source[result.source.source_id]  # type: ignore
+                if not result.ok:
+                    errors.append(
+                        f"Ошибка загрузки {subject_data['name']}: {result.error or result.status}"
+                    )
+                    continue
+                if not result.changed:
+                    processed.append(result)
+                    continue
 
-            for subject_data in unique_subjects.values():
                 try:
-                    subject = self.create_or_update_subject(subject_data)
+                    stats = self._process_subject_page(
+                        subject_data, result.content, max_tasks_per_subject
+                    )
                     total_subjects += 1
-
-                    if subject_data["source"] == "ФИПИ":
-                        tasks = self.fipi_parser.get_tasks_for_subject(
-                            subject_data["url"], subject_data["name"]
-                        )
-                    else:
-                        tasks = self.reshu_parser.get_tasks_for_subject(
-                            subject_data["url"], subject_data["name"]
-                        )
-
-                    tasks = tasks[:max_tasks_per_subject]
-
-                    with transaction.atomic():
-                        for task_data in tasks:
-                            try:
-                                self.create_or_update_task(task_data, subject)
-                                total_tasks += 1
-                            except Exception as task_error:
-                                errors.append(f"Ошибка создания задания: {task_error}")
-                                continue
-
-                    time.sleep(random.uniform(1, 3))
+                    total_tasks += stats.created + stats.updated
+                    for key, value in stats.as_dict().items():
+                        ingest_totals[key] = ingest_totals.get(key, 0) + value
+                    processed.append(result)
 
                 except Exception as subject_error:
                     error_msg = f"Ошибка обработки предмета {subject_data['name']}: {subject_error}"
@@ -295,6 +358,8 @@ class DataIntegrator:
                     logger.error(error_msg)
                     continue
 
+            self.crawler.record_results(processed)
+
             execution_time = time.time() - start_time
             logger.info(f"✅ Обновление завершено за {execution_time:.2f} секунд")
             logger.info(f"📊 Обработано предметов: {total_subjects}")
@@ -309,6 +374,7 @@ class DataIntegrator:
                 "success": True,
                 "subjects_processed": total_subjects,
                 "tasks_processed": total_tasks,
+                "tasks_stats": ingest_totals,
                 "execution_time": execution_time,
                 "errors": errors,
             }
@@ -0,0 +1,316 @@
+"""
+Конкурентный краулер материалов ФИПИ с условными GET-запросами
+
+Страницы загружаются пулом потоков с ограничением параллельности и
+минимальным интервалом запросов на каждый хост. Для каждого источника
+хранятся ETag / Last-Modified и хеш содержимого (FIPISourceMap), поэтому
+неизменившаяся страница стоит один ответ 304, а не полную загрузку и разбор.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from core.models import FIPISourceMap
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CRAWLER_CONFIG = {
+    "MAX_WORKERS": 8,
+    "PER_HOST_CONCURRENCY": 2,
+    "PER_HOST_DELAY": 0.5,
+    "TIMEOUT": 30,
+}
+
+
+def get_crawler_config() -> dict:
+    """Возвращает настройки краулера с учетом FIPI_CRAWLER_CONFIG"""
+    config = dict(DEFAULT_CRAWLER_CONFIG)
+    config.update(getattr(settings, "FIPI_CRAWLER_CONFIG", {}))
+    return config
+
+
+def content_hash(content: bytes) -> str:
+    """SHA-256 содержимого страницы"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def source_id_for_url(url: str) -> str:
+    """Стабильный идентификатор источника для произвольного URL"""
+    return "url_" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:24]  # noqa: S324
+
+
+@dataclass
+class FetchResult:
+    """Результат загрузки одной страницы"""
+
+    url: str
+    status: int = 0
+    content: bytes = b""
+    etag: str = ""
+    last_modified: str = ""
+    content_hash: str = ""
+    duration: float = 0.0
+    error: str = ""
+    changed: bool = False
+    source: FIPISourceMap | None = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.error and self.status in (200, 304)
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+class HostThrottle:
+    """Ограничение параллельности и частоты запросов к одному хосту"""
+
+    def __init__(self, concurrency: int = 2, delay: float = 0.5):
+        self.concurrency = max(1, concurrency)
+        self.delay = max(0.0, delay)
+        self._lock = threading.Lock()
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._next_slot: dict[str, float] = {}
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.concurrency)
+            return self._semaphores[host]
+
+    def _reserve_slot(self, host: str) -> float:
+        """Резервирует момент старта запроса и возвращает время ожидания"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + self.delay
+            return start - now
+
+    def acquire(self, host: str) -> None:
+        self._semaphore(host).acquire()
+        wait = self._reserve_slot(host)
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(self, host: str) -> None:
+        self._semaphore(host).release()
+
+
+class FipiCrawler:
+    """Загрузчик страниц с вежливыми лимитами и условными GET"""
+
+    def __init__(
+        self,
+        session: requests.Session | None = None,
+        max_workers: int | None = None,
+        per_host_concurrency: int | None = None,
+        per_host_delay: float | None = None,
+        timeout: float | None = None,
+    ):
+        config = get_crawler_config()
+        self.max_workers = max_workers or config["MAX_WORKERS"]
+        self.timeout = timeout or config["TIMEOUT"]
+        self.throttle = HostThrottle(
+            per_host_concurrency or config["PER_HOST_CONCURRENCY"],
+            config["PER_HOST_DELAY"] if per_host_delay is None else per_host_delay,
+        )
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.max_workers, pool_maxsize=self.max_workers
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def fetch(
+        self,
+        url: str,
+        etag: str = "",
+        last_modified: str = "",
+        known_hash: str = "",
+    ) -> FetchResult:
+        """Загружает страницу, отправляя сохраненные валидаторы кэша"""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        host = urlparse(url).netloc
+        result = FetchResult(url=url, etag=etag, last_modified=last_modified)
+        self.throttle.acquire(host)
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            result.status = response.status_code
+
+            if response.status_code == 304:
+                result.content_hash = known_hash
+                return result
+
+            response.raise_for_status()
+            result.content = response.content
+            result.etag = response.headers.get("ETag", "")
+            result.last_modified = response.headers.get("Last-Modified", "")
+            result.content_hash = content_hash(response.content)
+            result.changed = result.content_hash != known_hash
+            return result
+
+        except Exception as e:
+            result.error = str(e)
+            logger.error(f"Ошибка загрузки {url}: {e}")
+            return result
+
+        finally:
+            result.duration = time.monotonic() - started
+            self.throttle.release(host)
+
+    def fetch_many(self, requests_data: Iterable[dict]) -> list[FetchResult]:
+        """
+        Загружает набор страниц параллельно
+
+        Args:
+            requests_data: словари с ключами url и, опционально,
+                etag, last_modified, known_hash
+
+        Returns:
+            Результаты в том же порядке, что и запросы
+        """
+        items = list(requests_data)
+        if not items:
+            return []
+
+        workers = min(self.max_workers, len(items))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda item: self.fetch(**item), items))
+
+    def ensure_sources(self, pages: Iterable[dict]) -> list[FIPISourceMap]:
+        """
+        Возвращает записи FIPISourceMap для страниц, создавая недостающие
+
+        Args:
+            pages: словари с полями FIPISourceMap (обязательны source_id,
+                name и url)
+
+        Returns:
+            Источники в порядке переданных страниц
+        """
+        pages = list(pages)
+        ids = [page["source_id"] for page in pages]
+        existing = FIPISourceMap.objects.in_bulk(ids, field_name="source_id")  # type: ignore
+
+        missing = [
+            FIPISourceMap(**page) for page in pages if page["source_id"] not in existing
+        ]
+        if missing:
+            FIPISourceMap.objects.bulk_create(missing, ignore_conflicts=True)  # type: ignore
+            existing = FIPISourceMap.objects.in_bulk(ids, field_name="source_id")  # type: ignore
+
+        return [existing[source_id] for source_id in ids if source_id in existing]
+
+    def crawl(
+        self,
+        sources: Iterable[FIPISourceMap],
+        force: bool = False,
+        record: bool = True,
+    ) -> list[FetchResult]:
+        """
+        Проверяет источники, которым пора обновиться, и сохраняет их состояние
+
+        Неизменившиеся страницы (304 или совпавший хеш) возвращаются с
+        changed=False и пустым content, разбирать их не нужно. С record=False
+        состояние не сохраняется: вызывающий передает в record_results()
+        только успешно обработанные страницы, остальные загрузятся снова.
+        """
+        due = [source for source in sources if force or source.needs_update()]
+        if not due:
+            return []
+        return self.fetch_sources(due, conditional=not force, record=record)
+
+    def fetch_sources(
+        self,
+        sources: list[FIPISourceMap],
+        conditional: bool = True,
+        record: bool = True,
+    ) -> list[FetchResult]:
+        """Загружает переданные источники без проверки расписания"""
+        results = self.fetch_many(
+            {
+                "url": source.url,
+                "etag": (source.etag or "") if conditional else "",
+                "last_modified": (
+                    (source.last_modified_header or "") if conditional else ""
+                ),
+                "known_hash": source.content_hash or "",
+            }
+            for source in sources
+        )
+
+        for source, result in zip(sources, results, strict=True):
+            result.source = source
+
+        if record:
+            self.record_results(results)
+
+        changed = sum(1 for result in results if result.changed)
+        unchanged = sum(1 for result in results if result.ok and not result.changed)
+        logger.info(
+            f"Краулер: проверено {len(results)}, изменилось {changed}, "
+            f"без изменений {unchanged}, ошибок {len(results) - changed - unchanged}"
+        )
+        return results
+
+    def record_results(
+        self, results: Iterable[FetchResult], extra_fields: Iterable[str] = ()
+    ) -> None:
+        """Сохраняет валидаторы и хеши источников одним bulk_update
+
+        extra_fields позволяет сохранить в том же запросе поля, которые
+        вызывающий код уже проставил источникам (например, расписание).
+        """
+        now = timezone.now()
+        updated = []
+        extra_fields = list(extra_fields)
+        for result in results:
+            source = result.source
+            if source is None:
+                continue
+            if not result.ok:
+                if extra_fields:
+                    updated.append(source)
+                continue
+
+            source.last_checked = now
+            if result.etag:
+                source.etag = result.etag
+            if result.last_modified:
+                source.last_modified_header = result.last_modified
+            if result.changed:
+                source.content_hash = result.content_hash
+                source.last_updated = now
+            updated.append(source)
+
+        if updated:
+            FIPISourceMap.objects.bulk_update(  # type: ignore
+                updated,
+                [
+                    "last_checked",
+                    "etag",
+                    "last_modified_header",
+                    "content_hash",
+                    "last_updated",
+                    *extra_fields,
+                ],
+            )
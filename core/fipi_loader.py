@@ -3,13 +3,14 @@
 """
 
 import logging
-import time
 from urllib.parse import urljoin
 
 import requests
 from bs4 import BeautifulSoup
 from django.db import transaction
 
+from core.fipi_crawler import FipiCrawler
+from core.task_ingest import bulk_upsert_tasks
 from learning.models import ExamType, Subject, Task, Topic
 
 logger = logging.getLogger(__name__)
@@ -26,6 +27,7 @@ class FipiLoader:
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
             }
         )
+        self.crawler = FipiCrawler(session=self.session)
 
         # Структура предметов ФИПИ
         self.subjects_data = {
@@ -161,117 +163,131 @@ class FipiLoader:
             },
         }
 
-    def load_subjects(self):
-        """Загружает все предметы и их структуру"""
+    def load_subjects(self, force=False):
+        """Загружает все предметы и их структуру
+
+        Страницы предметов скачиваются параллельно через FipiCrawler,
+        неизменившиеся страницы пропускаются. Запись в БД выполняется
+        короткими транзакциями по предмету уже после разбора.
+        """
         logger.info("Начинаем загрузку предметов ФИПИ...")
 
-        with transaction.atomic():
-            ege, _ = ExamType.objects.get_or_create(  # type: ignore
-                code="EGE", defaults={"name": "Единый государственный экзамен"}
-            )
-            oge, _ = ExamType.objects.get_or_create(  # type: ignore
-                code="OGE", defaults={"name": "Основной государственный экзамен"}
-            )
+        ExamType.objects.get_or_create(  # type: ignore
+            code="EGE", defaults={"name": "Единый государственный экзамен"}
+        )
+        ExamType.objects.get_or_create(  # type: ignore
+            code="OGE", defaults={"name": "Основной государственный экзамен"}
+        )
 
-            exam_types = {"ЕГЭ": ege, "ОГЭ": oge}
+        pages = self._subject_pages()
+        sources = self.crawler.ensure_sources(page["source"] for page in pages)
+        pages_by_source = {page["source"]["source_id"]: page for page in pages}
 
-            total_subjects = 0
-            total_tasks = 0
+        total_subjects = 0
+        total_tasks = 0
+        processed = []
 
-            for exam_type_name, subjects in self.subjects_data.items():
-                _ = exam_types[exam_type_name]
+        # Валидаторы и хеш сохраняем только для разобранных страниц, иначе
+        # следующий запуск получит 304 и не повторит неудавшуюся загрузку
+        for result in self.crawler.crawl(sources, force=force, record=False):
+            if result.changed:
+                page = pages_by_source[result.source.source_id]  # type: ignore
+                try:
+                    created, tasks_count = self._process_subject_page(
+                        page, result.content
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"Ошибка при загрузке предмета "
+                        f"{page['subject_data']['name']}: {e}"
+                    )
+                    continue
+                total_subjects += created
+                total_tasks += tasks_count
+            processed.append(result)
 
-                for _subject_key, subject_data in subjects.items():
-                    try:
-                        subject, created = Subject.objects.get_or_create(  # type: ignore
-                            name=subject_data["name"],
-                            exam_type=exam_type_name,
-                            defaults={
-                                "icon": subject_data.get("icon", "fas fa-book"),
-                                "color": subject_data.get("color", "#00ff88"),
-                            },
-                        )
+        self.crawler.record_results(processed)
 
-                        if created:
-                            total_subjects += 1
-                            logger.info(
-                                f"Создан предмет: {subject.name} ({exam_type_name})"
-                            )
+        logger.info(
+            f"Загрузка завершена. Предметов: {total_subjects}, заданий: {total_tasks}"
+        )
+        return total_subjects, total_tasks
 
-                        tasks_count = self._load_subject_materials(
-                            subject, subject_data
-                        )
-                        total_tasks += tasks_count
+    def register_sources(self):
+        """Регистрирует страницы предметов в FIPISourceMap для планировщика"""
+        return self.crawler.ensure_sources(
+            page["source"] for page in self._subject_pages()
+        )
 
-                        time.sleep(1)
+    def handle_crawl_result(self, result):
+        """Обрабатывает изменившуюся страницу, загруженную планировщиком"""
+        pages = {page["source"]["source_id"]: page for page in self._subject_pages()}
+        page = pages.get(result.source.source_id)
+        if page is None:
+            return 0, 0
+        return self._process_subject_page(page, result.content)
 
-                    except Exception as e:
-                        logger.error(
-                            f"Ошибка при загрузке предмета {subject_data['name']}: {str(e)}"
-                        )
-                        continue
+    def _process_subject_page(self, page, content):
+        """Разбирает страницу предмета и сохраняет ее в короткой транзакции"""
+        subject_data = page["subject_data"]
+        demo_links = self._find_demo_links(BeautifulSoup(content, "html.parser"))
 
-            logger.info(
-                f"Загрузка завершена. Предметов: {total_subjects}, заданий: {total_tasks}"
+        with transaction.atomic():
+            subject, created = Subject.objects.get_or_create(  # type: ignore
+                name=subject_data["name"],
+                exam_type=page["exam_type"],
+                defaults={
+                    "icon": subject_data.get("icon", "fas fa-book"),
+                    "color": subject_data.get("color", "#00ff88"),
+                },
             )
-            return total_subjects, total_tasks
-
-    def _load_subject_materials(self, subject, subject_data):
-        """Загружает материалы для конкретного предмета"""
-        try:
-            url = urljoin(self.base_url, subject_data["url_path"])
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
 
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            demo_links = self._find_demo_links(soup)
-
-            tasks_created = 0
-
-            for link_data in demo_links:
-                try:
-                    topic, _ = Topic.objects.get_or_create(  # type: ignore
-                        subject=subject,
-                        name=link_data.get("topic", "Демоверсия"),
-                        defaults={
-                            "code": f"{subject.name.upper()}_DEMO",
-                            "description": link_data.get("description", ""),
-                            "order": 0,
-                        },
-                    )
-
-                    task, created = Task.objects.get_or_create(  # type: ignore
-                        subject=subject,
-                        title=link_data["title"],
-                        defaults={
-                            "topic": topic,
-                            "description": link_data.get("description", ""),
-                            "difficulty": self._determine_difficulty(
-                                link_data["title"]
-                            ),
-                            "answer": "Ответ будет добавлен после анализа материала",
-                            "solution": "",
-                            "source": "ФИПИ",
-                            "year": 2025,
-                            "tags": link_data.get("tags", ""),
-                            "is_active": True,
+            if created:
+                logger.info(f"Создан предмет: {subject.name} ({page['exam_type']})")
+
+            return int(created), self._save_subject_materials(subject, demo_links)
+
+    def _subject_pages(self):
+        """Описание страниц предметов вместе с записями FIPISourceMap"""
+        pages = []
+        for exam_type_name, subjects in self.subjects_data.items():
+            exam_code = "ege" if exam_type_name == "ЕГЭ" else "oge"
+            for subject_key, subject_data in subjects.items():
+                pages.append(
+                    {
+                        "exam_type": exam_type_name,
+                        "subject_data": subject_data,
+                        "source": {
+                            "source_id": f"subject_{exam_code}_{subject_key}",
+                            "name": f"{subject_data['name']} ({exam_type_name})",
+                            "url": urljoin(self.base_url, subject_data["url_path"]),
+                            "data_type": "tasks",
+                            "exam_type": exam_code,
+                            "subject": subject_data["name"],
+                            "update_frequency": "daily",
                         },
-                    )
-
-                    if created:
-                        tasks_created += 1
-                        logger.info(f"Создано задание: {task.title}")
-
-                except Exception as e:
-                    logger.error(f"Ошибка при создании задания: {str(e)}")
-                    continue
-
-            return tasks_created
+                    }
+                )
+        return pages
 
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке материалов для {subject.name}: {str(e)}")
-            return 0
+    def _save_subject_materials(self, subject, demo_links):
+        """Сохраняет разобранные ссылки на материалы предмета одной пачкой"""
+        stats = bulk_upsert_tasks(
+            {
+                "subject": subject,
+                "title": link_data["title"],
+                "topic": link_data.get("topic", "Демоверсия"),
+                "description": link_data.get("description", ""),
+                "difficulty": self._determine_difficulty(link_data["title"]),
+                "answer": "Ответ будет добавлен после анализа материала",
+                "source": "ФИПИ",
+                "url": link_data.get("url", ""),
+            }
+            for link_data in demo_links
+        )
+        if stats.created:
+            logger.info(f"Создано заданий для {subject.name}: {stats.created}")
+        return stats.created
 
     def _find_demo_links(self, soup):
         """Находит ссылки на демоверсии и материалы"""
@@ -5,12 +5,14 @@ Health check views for ExamFlow
 import logging
 from datetime import datetime
 
-from django.core.cache import cache
-from django.db import connection
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from ai.audit import get_audit_sink
+from ai.router import router_stats
+from core.health_probes import get_health_report
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,33 +20,24 @@ logger = logging.getLogger(__name__)
 def health_check_view(request):
     """
     Comprehensive health check endpoint
+
+    Serves the cached probe report (core.health_probes); probes run at most
+    once per CACHE_TTL, so polling does not load the database or AI quota.
     """
-    try:
-        # Check database connection
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-
-        database_status = "connected"
-    except Exception as e:
-        logger.error(f"Database health check failed: {e}")
-        database_status = "error"
-
-    try:
-        # Check cache connection
-        cache.set("health_check", "ok", 10)
-        cache_status = cache.get("health_check") == "ok"
-        cache_status_text = "connected" if cache_status else "error"
-    except Exception as e:
-        logger.error(f"Cache health check failed: {e}")
-        cache_status_text = "error"
-
-    # Determine overall status
-    overall_status = "healthy" if database_status == "connected" else "unhealthy"
+    report = get_health_report()
+    probes = report["probes"]
+
+    def _status(name):
+        return "connected" if probes.get(name, {}).get("ok") else "error"
 
     status = {
-        "status": overall_status,
-        "database": database_status,
-        "cache": cache_status_text,
+        "status": report["status"],
+        "database": _status("database"),
+        "cache": _status("cache"),
+        "probes": probes,
+        "checked_at": report["checked_at"],
+        "ai_audit": get_audit_sink().stats(),
+        "ai_providers": router_stats(),
         "timestamp": str(datetime.now()),
     }
 
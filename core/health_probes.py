@@ -0,0 +1,216 @@
+"""
+Дешевые проверки зависимостей для health check и мониторинга бота
+
+Пробы не тратят квоту и не нагружают базу: ИИ считается живым по
+последнему успешному ответу реального трафика (ai.router), а без трафика —
+по бесплатному запросу списка моделей; база проверяется через SELECT 1 на
+постоянном соединении потока, кэш — записью и чтением ключа, Telegram —
+getMe. Пробы выполняются параллельно с таймаутом на каждую, отчет
+хранится в кэше CACHE_TTL секунд и отдается всем процессам оттуда.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+
+try:
+    import requests  # type: ignore
+except Exception:  # pragma: no cover
+    requests = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEALTH_CONFIG = {
+    "CACHE_KEY": "health_probes_report",
+    "CACHE_TTL": 30,  # секунд, сколько отдается готовый отчет
+    "TIMEOUT": 3.0,  # секунд на пробу по умолчанию
+    "WORKERS": 4,
+    "AI_TRAFFIC_WINDOW": 900,  # успешный ответ ИИ за это время заменяет пробу
+    "GEMINI_MODELS_URL": "https://generativelanguage.googleapis.com/v1beta/models",
+}
+
+
+def get_health_config() -> dict:
+    """Возвращает настройки проб с учетом HEALTH_PROBES_CONFIG"""
+    config = dict(DEFAULT_HEALTH_CONFIG)
+    config.update(getattr(settings, "HEALTH_PROBES_CONFIG", {}))
+    return config
+
+
+@dataclass
+class Probe:
+    """Проверка зависимости: check() возвращает описание или бросает исключение"""
+
+    name: str
+    check: Callable[[], str]
+    timeout: float | None = None
+    critical: bool = False  # ошибка пробы делает весь сервис unhealthy
+
+
+PROBES: dict[str, Probe] = {}
+
+
+def register_probe(name: str, timeout: float | None = None, critical: bool = False):
+    """Декоратор: регистрирует функцию как пробу name"""
+
+    def decorator(func: Callable[[], str]) -> Callable[[], str]:
+        PROBES[name] = Probe(name, func, timeout, critical)
+        return func
+
+    return decorator
+
+
+_session = None
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+
+def _get_session():
+    global _session
+    if _session is None and requests is not None:
+        with _lock:
+            if _session is None:
+                _session = requests.Session()
+    return _session
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    # Потоки постоянные: проба базы пингует уже открытое соединение потока
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="health-probe"
+                )
+    return _executor
+
+
+@register_probe("database", critical=True)
+def check_database() -> str:
+    close_old_connections()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return connection.vendor
+
+
+@register_probe("cache")
+def check_cache() -> str:
+    key, token = f"health_probe:{uuid.uuid4().hex}", uuid.uuid4().hex
+    cache.set(key, token, 10)
+    if cache.get(key) != token:
+        raise RuntimeError("значение не прочитано из кэша")
+    cache.delete(key)
+    return "round-trip"
+
+
+@register_probe("ai")
+def check_ai() -> str:
+    from ai.router import last_success_at
+
+    config = get_health_config()
+    last = last_success_at()
+    if last and time.time() - last < config["AI_TRAFFIC_WINDOW"]:
+        return f"последний успешный ответ {int(time.time() - last)} с назад"
+
+    api_key = getattr(settings, "GEMINI_API_KEY", "")
+    session = _get_session()
+    if not (api_key and session):
+        raise RuntimeError("GEMINI_API_KEY не задан")
+    # Список моделей — бесплатный запрос метаданных, генерации нет
+    resp = session.get(
+        config["GEMINI_MODELS_URL"],
+        params={"pageSize": 1},
+        headers={"X-goog-api-key": api_key},
+        timeout=config["TIMEOUT"],
+    )
+    resp.raise_for_status()
+    return "models.list"
+
+
+@register_probe("telegram")
+def check_telegram() -> str:
+    from telegram_bot.client import call_api
+
+    if not getattr(settings, "TELEGRAM_BOT_TOKEN", ""):
+        raise RuntimeError("TELEGRAM_BOT_TOKEN не задан")
+    me = call_api("getMe", timeout=get_health_config()["TIMEOUT"]) or {}
+    return f"@{me.get('username', '')}"
+
+
+def _run_probe(probe: Probe) -> dict:
+    started = time.monotonic()
+    try:
+        detail, ok = str(probe.check()), True
+    except Exception as e:
+        detail, ok = str(e) or type(e).__name__, False
+        logger.warning(f"Проба {probe.name} не прошла: {detail}")
+    return {
+        "ok": ok,
+        "detail": detail,
+        "latency": round(time.monotonic() - started, 3),
+    }
+
+
+def run_probes(names: list[str] | None = None) -> dict:
+    """Выполняет пробы параллельно и возвращает отчет"""
+    config = get_health_config()
+    probes = [PROBES[name] for name in (names or list(PROBES)) if name in PROBES]
+    executor = _get_executor(config["WORKERS"])
+    started = time.monotonic()
+    futures = {probe.name: executor.submit(_run_probe, probe) for probe in probes}
+
+    results = {}
+    for probe in probes:
+        deadline = started + (probe.timeout or config["TIMEOUT"])
+        try:
+            results[probe.name] = futures[probe.name].result(
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+        except FutureTimeoutError:
+            results[probe.name] = {"ok": False, "detail": "timeout", "latency": None}
+
+    healthy = all(results[p.name]["ok"] for p in probes if p.critical)
+    return {
+        "status": "healthy" if healthy else "unhealthy",
+        "checked_at": datetime.now().isoformat(),
+        "probes": results,
+    }
+
+
+def _cached_report(key: str) -> dict | None:
+    try:
+        report = cache.get(key)
+    except Exception:
+        return None
+    return report if isinstance(report, dict) else None
+
+
+def get_health_report(refresh: bool = False) -> dict:
+    """Отчет о состоянии из кэша; пробы запускаются, если отчет устарел"""
+    config = get_health_config()
+    report = None if refresh else _cached_report(config["CACHE_KEY"])
+    if report is not None:
+        return report
+
+    with _refresh_lock:
+        # Пока ждали блокировку, отчет мог обновить другой поток
+        report = None if refresh else _cached_report(config["CACHE_KEY"])
+        if report is None:
+            report = run_probes()
+            try:
+                cache.set(config["CACHE_KEY"], report, config["CACHE_TTL"])
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить отчет health check: {e}")
+    return report
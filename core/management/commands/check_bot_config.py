@@ -58,10 +58,10 @@ class Command(BaseCommand):
             from telegram_bot.bot_main import get_bot
 
             bot = get_bot()
-            # get_me() - асинхронная функция, нужно использовать синхронно
-            import asyncio
+            # get_me() - асинхронная функция, выполняем в цикле общего клиента
+            from telegram_bot.client import get_bot_client
 
-            bot_info = asyncio.run(bot.get_me())
+            bot_info = get_bot_client().run(bot.get_me())
             self.stdout.write("✅ Бот доступен: @{bot_info.username}")
             logger.info("Бот доступен: @{bot_info.username}")
         except Exception:
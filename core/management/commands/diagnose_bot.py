@@ -66,9 +66,9 @@ class Command(BaseCommand):
         # 4. Проверяем API бота
         self.stdout.write("\n🌐 4. API БОТА:")
         try:
-            import asyncio
+            from telegram_bot.client import get_bot_client
 
-            bot_info = asyncio.run(bot.get_me())
+            bot_info = get_bot_client().run(bot.get_me())
             self.stdout.write(
                 "   ✅ Бот доступен: @{bot_info.username} (ID: {bot_info.id})"
             )
@@ -37,12 +37,24 @@ class Command(BaseCommand):
             action="store_true",
             help="Принудительно перегенерировать существующие аудиофайлы",
         )
+        parser.add_argument(
+            "--reindex",
+            action="store_true",
+            help="Пересобрать индекс метаданных аудио (размер, длительность)",
+        )
 
     def handle(self, *args, **options):
         if options["cleanup"]:
             self.cleanup_old_files()
             return
 
+        if options["reindex"]:
+            count = voice_service.pipeline.index.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ В индексе аудио: {count}")  # type: ignore
+            )
+            return
+
         if options["task_id"]:
             self.generate_single_task(options["task_id"])
         else:
@@ -79,63 +91,24 @@ class Command(BaseCommand):
             raise CommandError("❌ Ошибка: {str(e)}")
 
     def generate_multiple_tasks(self, limit, force):
-        """Генерирует аудио для множества заданий"""
+        """Генерирует аудио для множества заданий одной параллельной пачкой"""
         self.stdout.write(
             self.style.SUCCESS(
                 "🎤 Начинаем генерацию голосовых файлов..."
             )  # type: ignore
         )
 
-        # Выбираем задания
-        if force:
-            tasks = Task.objects.filter(is_active=True)[:limit]
-            self.stdout.write("📋 Принудительная генерация для {tasks.count()} заданий")
-        else:
-            tasks = Task.objects.filter(is_active=True, audio_file__isnull=True)[:limit]
-            self.stdout.write("📋 Генерация для {tasks.count()} заданий без аудио")
-
+        tasks = list(Task.objects.select_related("subject")[:limit])
         if not tasks:
             self.stdout.write(
                 self.style.WARNING("⚠️  Нет заданий для обработки")  # type: ignore
             )
             return
 
-        generated_count = 0
-        error_count = 0
-
-        for i, task in enumerate(tasks, 1):
-            try:
-                self.stdout.write("[{i}/{len(tasks)}] Обработка: {task.title[:50]}...")
-
-                result = voice_service.generate_task_audio(task)
-
-                if result and result["task_audio"]:
-                    generated_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            '  ✅ Создано: {result["task_audio"]}'
-                        )  # type: ignore
-                    )
-                else:
-                    error_count += 1
-                    self.stdout.write(
-                        self.style.ERROR("  ❌ Ошибка создания аудио")  # type: ignore
-                    )
+        mode = "Принудительная генерация" if force else "Генерация"
+        self.stdout.write(f"📋 {mode} для {len(tasks)} заданий")
 
-                # Показываем прогресс каждые 10 заданий
-                if i % 10 == 0:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            "📊 Прогресс: {i}/{len(tasks)} | Создано: {generated_count} | Ошибок: {error_count}"
-                        )  # type: ignore
-                    )
-
-            except Exception:
-                error_count += 1
-                self.stdout.write(
-                    self.style.ERROR("  ❌ Ошибка: {str(e)}")  # type: ignore
-                )
-                continue
+        _, batch = voice_service.generate_tasks_audio(tasks, force=force)
 
         self.stdout.write(
             self.style.SUCCESS(  # type: ignore
@@ -144,13 +117,15 @@ class Command(BaseCommand):
         )
         self.stdout.write(
             self.style.SUCCESS(  # type: ignore
-                "📊 Создано файлов: {generated_count}"  # type: ignore
+                f"📊 Создано файлов: {batch.synthesized}, "
+                f"уже было: {batch.reused}, дубликатов: {batch.duplicates}, "
+                f"за {batch.duration:.1f} с"
             )
         )
-        if error_count > 0:
+        if batch.failed > 0:
             self.stdout.write(
                 self.style.WARNING(  # type: ignore
-                    "⚠️  Ошибок: {error_count}"  # type: ignore
+                    f"⚠️  Ошибок: {batch.failed}"  # type: ignore
                 )
             )
 
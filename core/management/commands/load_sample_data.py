@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from learning.catalog import invalidate_catalog
 from learning.models import Subject, Task, Topic
 
 
@@ -91,6 +92,9 @@ class Command(BaseCommand):
             )  # type: ignore
             return
 
+        # bulk_create не отправляет сигналы: сбрасываем снимок каталога явно
+        invalidate_catalog()
+
         self.stdout.write("=" * 50)
         self.stdout.write(
             self.style.SUCCESS("🎉 ОБРАЗЦЫ ДАННЫХ ЗАГРУЖЕНЫ!")
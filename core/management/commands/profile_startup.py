@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup_profile import get_startup_config, profile_boot
+
+
+class Command(BaseCommand):
+    help = "Профилировать холодный старт: шаги загрузки, импорты, первый ответ"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help="Адрес первого запроса")
+        parser.add_argument(
+            "--top", type=int, help="Сколько самых дорогих импортов показать"
+        )
+        parser.add_argument(
+            "--target-ms",
+            type=float,
+            help="Цель для первого ответа, мс (ошибка, если превышена)",
+        )
+
+    def handle(self, *args, **options):
+        config = get_startup_config()
+        target = options["target_ms"] or config["FIRST_RESPONSE_TARGET_MS"]
+        try:
+            report = profile_boot(options["path"])
+        except Exception as e:
+            raise CommandError(f"Профилирование не удалось: {e}") from e
+
+        self.stdout.write("Шаги запуска, мс:")
+        for step, elapsed in report.steps.items():
+            self.stdout.write(f"  {step:<16} {elapsed:8.1f}")
+        self.stdout.write(
+            f"Первый ответ ({report.status_code}): {report.first_response_ms:.1f} мс"
+            f" при цели {target:.0f} мс"
+        )
+        if report.heavy_before_response:
+            self.stdout.write(
+                "Тяжелые модули до первого ответа: "
+                + ", ".join(report.heavy_before_response)
+            )
+
+        self.stdout.write("Самые дорогие импорты, мс (всего / собственное):")
+        for record in report.top_imports(options["top"] or config["TOP_MODULES"]):
+            self.stdout.write(
+                f"  {record.cumulative_us / 1000:8.1f} {record.self_us / 1000:8.1f}"
+                f"  {record.module}"
+            )
+
+        if report.first_response_ms > target:
+            raise CommandError(
+                f"Первый ответ {report.first_response_ms:.0f} мс "
+                f"дольше цели {target:.0f} мс"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Первый ответ укладывается в цель"))
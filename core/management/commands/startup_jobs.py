@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.auto_startup import STARTUP_STEPS, run_startup_tasks
+
+
+class Command(BaseCommand):
+    help = "Выполнить задачи запуска (миграции, данные, webhook) вне веб-процесса"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--steps",
+            nargs="+",
+            choices=[name for name, _ in STARTUP_STEPS],
+            help="Только указанные шаги (по умолчанию все)",
+        )
+
+    def handle(self, *args, **options):
+        run_startup_tasks(options["steps"])
+        self.stdout.write(self.style.SUCCESS("✅ Задачи запуска выполнены"))
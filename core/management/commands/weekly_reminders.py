@@ -8,12 +8,21 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument(
-            "--limit", type=int, default=200, help="Максимум уведомлений за запуск"
+            "--limit",
+            type=int,
+            default=200,
+            help="Максимум уведомлений за запуск (0 — без ограничения)",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Начать рассылку сначала, игнорируя контрольную точку",
         )
 
     def handle(self, *args, **options):
-        limit = options["limit"]
-        sent = send_weekly_inactive_reminders(limit=limit)
+        sent = send_weekly_inactive_reminders(
+            limit=options["limit"] or None, resume=not options["restart"]
+        )
         self.stdout.write(
-            self.style.SUCCESS("✅ Отправлено напоминаний: {sent}")
+            self.style.SUCCESS(f"✅ Отправлено напоминаний: {sent}")
         )  # type: ignore
@@ -0,0 +1,396 @@
+"""
+Метрики времени выполнения, собранные с реального трафика
+
+Легковесный реестр в памяти процесса: счетчики и гистограммы с
+фиксированными корзинами, запись — одно сложение под коротким локом
+метрики. Экспорт в текстовом формате Prometheus (metrics_view).
+
+Под gunicorn у каждого воркера свой реестр. Если задан MULTIPROCESS_DIR,
+процесс раз в FLUSH_INTERVAL секунд (и при выходе) сохраняет снимок в
+metrics_<pid>.json этого каталога, а эндпоинт суммирует снимки всех
+процессов.
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_CONFIG = {
+    "ENABLED": True,
+    "MULTIPROCESS_DIR": "",  # общий каталог снимков для нескольких воркеров
+    "FLUSH_INTERVAL": 10.0,  # секунд между сохранениями снимка процесса
+    "TOKEN": "",  # если задан, эндпоинт требует Authorization: Bearer <TOKEN>
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+STARTED_AT = time.time()
+
+
+def get_metrics_config() -> dict:
+    """Возвращает настройки метрик с учетом METRICS_CONFIG"""
+    config = dict(DEFAULT_METRICS_CONFIG)
+    config.update(getattr(settings, "METRICS_CONFIG", {}))
+    return config
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _select(self, labels: dict) -> list:
+        """Значения серий, подходящих под labels (неуказанные метки — любые)"""
+        wanted = {
+            index: str(labels[name])
+            for index, name in enumerate(self.labelnames)
+            if name in labels
+        }
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            value
+            for key, value in items
+            if all(key[index] == label for index, label in wanted.items())
+        ]
+
+
+class Counter(_Metric):
+    """Монотонный счетчик"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount  # type: ignore
+
+    def value(self, **labels) -> float:
+        """Сумма по всем сериям, подходящим под labels"""
+        return sum(self._select(labels))  # type: ignore
+
+    def dump(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными корзинами (верхние границы)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1  # type: ignore
+            state[1] += value  # type: ignore
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет время блока; labels можно дополнить внутри блока"""
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def totals(self, **labels) -> tuple[list[int], float]:
+        """Корзины и сумма по сериям, подходящим под labels"""
+        counts, total = [0] * (len(self.buckets) + 1), 0.0
+        for bucket_counts, value_sum in self._select(labels):
+            counts = [a + b for a, b in zip(counts, bucket_counts)]
+            total += value_sum
+        return counts, total
+
+    def count(self, **labels) -> int:
+        return sum(self.totals(**labels)[0])
+
+    def quantile(self, fraction: float, **labels) -> float | None:
+        """Оценка квантиля по корзинам (верхняя граница корзины)"""
+        counts, _ = self.totals(**labels)
+        target = fraction * sum(counts)
+        if not target:
+            return None
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[min(index, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+    def dump(self) -> list:
+        with self._lock:
+            return [
+                [list(key), list(counts), value_sum]
+                for key, (counts, value_sum) in self._values.items()  # type: ignore
+            ]
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса"""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(
+                        name, documentation, labelnames, **kwargs
+                    )
+        if not isinstance(metric, cls):
+            raise ValueError(f"Метрика {name} уже зарегистрирована как {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def snapshot(self) -> dict:
+        """Сериализуемый снимок всех метрик"""
+        return {
+            name: {
+                "kind": metric.kind,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "values": metric.dump(),  # type: ignore
+            }
+            for name, metric in list(self._metrics.items())
+        }
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames=()) -> Counter:
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def histogram(
+    name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS
+) -> Histogram:
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+# Общая метрика попаданий для кэшей приложения: result = hit | miss | ...
+CACHE_LOOKUPS = counter(
+    "cache_lookups_total", "Обращения к кэшам приложения", ("cache", "result")
+)
+
+
+def timed(metric: Histogram, **labels):
+    """
+    Декоратор: время вызова функции (обычной или async) в гистограмму
+
+    Если у метрики есть метка outcome, она равна "ok" или "error" (исключение).
+    """
+    if "outcome" in metric.labelnames:
+        labels.setdefault("outcome", "ok")
+
+    def _failed(current: dict) -> None:
+        if "outcome" in current:
+            current["outcome"] = "error"
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with metric.time(**labels) as current:
+                    try:
+                        return await func(*args, **kwargs)
+                    except BaseException:
+                        _failed(current)
+                        raise
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metric.time(**labels) as current:
+                try:
+                    return func(*args, **kwargs)
+                except BaseException:
+                    _failed(current)
+                    raise
+
+        return wrapper
+
+    return decorator
+
+
+def merge_snapshots(snapshots: list[dict]) -> dict:
+    """Суммирует снимки нескольких процессов"""
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            target = merged.setdefault(name, {**data, "values": {}})
+            for item in data["values"]:
+                key = tuple(item[0])
+                if data["kind"] == "counter":
+                    target["values"][key] = target["values"].get(key, 0.0) + item[1]
+                    continue
+                counts, value_sum = target["values"].get(
+                    key, ([0] * len(item[1]), 0.0)
+                )
+                target["values"][key] = (
+                    [a + b for a, b in zip(counts, item[1])],
+                    value_sum + item[2],
+                )
+    return merged
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra: dict | None = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_text(merged: dict) -> str:
+    """Текстовый формат экспозиции Prometheus 0.0.4"""
+    lines = []
+    for name in sorted(merged):
+        data = merged[name]
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['kind']}")
+        names = data["labelnames"]
+        for key in sorted(data["values"]):
+            value = data["values"][key]
+            if data["kind"] == "counter":
+                lines.append(
+                    f"{name}{_format_labels(names, key)} {_format_number(value)}"
+                )
+                continue
+            counts, value_sum = value
+            cumulative = 0
+            bounds = [_format_number(b) for b in data["buckets"]] + ["+Inf"]
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels(names, key, {"le": bound})
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _format_labels(names, key)
+            lines.append(f"{name}_sum{labels} {_format_number(value_sum)}")
+            lines.append(f"{name}_count{labels} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _snapshot_path(directory: str, pid: int | None = None) -> Path:
+    return Path(directory) / f"metrics_{pid or os.getpid()}.json"
+
+
+def flush_snapshot() -> None:
+    """Сохраняет снимок процесса в MULTIPROCESS_DIR (атомарная замена файла)"""
+    directory = get_metrics_config()["MULTIPROCESS_DIR"]
+    if not directory:
+        return
+    path = _snapshot_path(directory)
+    tmp = path.with_suffix(".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(REGISTRY.snapshot()), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить снимок метрик: {e}")
+
+
+_flusher_started = False
+_flusher_lock = threading.Lock()
+
+
+def start_flusher() -> None:
+    """Запускает фоновое сохранение снимков, если задан MULTIPROCESS_DIR"""
+    global _flusher_started
+    config = get_metrics_config()
+    if _flusher_started or not config["MULTIPROCESS_DIR"]:
+        return
+    with _flusher_lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+
+    def _loop():
+        while True:
+            time.sleep(config["FLUSH_INTERVAL"])
+            flush_snapshot()
+
+    threading.Thread(target=_loop, name="metrics-flusher", daemon=True).start()
+    atexit.register(flush_snapshot)
+
+
+def collect() -> dict:
+    """Метрики всех процессов: свой реестр плюс снимки других воркеров"""
+    snapshots = [REGISTRY.snapshot()]
+    directory = get_metrics_config()["MULTIPROCESS_DIR"]
+    if directory:
+        own = _snapshot_path(directory)
+        for path in Path(directory).glob("metrics_*.json"):
+            if path == own:
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+    return merge_snapshots(snapshots)
+
+
+def metrics_view(request):
+    """Эндпоинт метрик в текстовом формате Prometheus"""
+    config = get_metrics_config()
+    if not config["ENABLED"]:
+        return HttpResponse(status=404)
+    token = config["TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+    return HttpResponse(
+        render_text(collect()), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
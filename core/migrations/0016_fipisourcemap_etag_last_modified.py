@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0015_alter_dailychallenge_challenge_type_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fipisourcemap",
+            name="etag",
+            field=models.CharField(
+                blank=True, default="", max_length=255, verbose_name="ETag"
+            ),
+        ),
+        migrations.AddField(
+            model_name="fipisourcemap",
+            name="last_modified_header",
+            field=models.CharField(
+                blank=True,
+                default="",
+                max_length=64,
+                verbose_name="Заголовок Last-Modified",
+            ),
+        ),
+    ]
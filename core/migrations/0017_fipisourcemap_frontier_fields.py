@@ -0,0 +1,58 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0016_fipisourcemap_etag_last_modified"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fipisourcemap",
+            name="next_check_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Следующая проверка"
+            ),
+        ),
+        migrations.AddField(
+            model_name="fipisourcemap",
+            name="revisit_interval",
+            field=models.DurationField(
+                blank=True, null=True, verbose_name="Интервал повторной проверки"
+            ),
+        ),
+        migrations.AddField(
+            model_name="fipisourcemap",
+            name="check_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество проверок"
+            ),
+        ),
+        migrations.AddField(
+            model_name="fipisourcemap",
+            name="change_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество изменений"
+            ),
+        ),
+        migrations.AddField(
+            model_name="fipisourcemap",
+            name="last_fetch_duration",
+            field=models.FloatField(
+                default=0.0, verbose_name="Длительность последней загрузки, с"
+            ),
+        ),
+        migrations.AddField(
+            model_name="fipisourcemap",
+            name="avg_fetch_duration",
+            field=models.FloatField(
+                default=0.0, verbose_name="Средняя длительность загрузки, с"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fipisourcemap",
+            index=models.Index(
+                fields=["next_check_at"], name="core_fipiso_next_ch_c3cc1c_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_fipisourcemap_frontier_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('telegram_id', models.BigIntegerField(verbose_name='Telegram ID')),
+                ('reminder_type', models.CharField(default='weekly_inactive', max_length=50, verbose_name='Тип рассылки')),
+                ('last_sent_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последняя отправка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Лог напоминаний',
+                'verbose_name_plural': 'Логи напоминаний',
+                'indexes': [models.Index(fields=['reminder_type', 'last_sent_at'], name='core_remind_reminde_bfcfe2_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reminderlog',
+            constraint=models.UniqueConstraint(fields=('telegram_id', 'reminder_type'), name='uniq_reminder_log_chat_type'),
+        ),
+    ]
@@ -72,10 +72,14 @@ class Task(models.Model):
         return f"{self.subject.name}: {self.title}"
 
     def check_answer(self, user_answer):
-        """Проверяет правильность ответа пользователя"""
+        """Проверяет правильность ответа пользователя (learning.answers)"""
+        from learning.answers import check_answer, compile_answer
+
         if not self.answer:
             return False
-        return str(user_answer).strip().lower() == str(self.answer).strip().lower()
+        if self.pk is None:
+            return compile_answer(self.answer).matches(user_answer)
+        return check_answer(self.pk, user_answer, answer=self.answer, model=type(self))
 
 
 class UserProgress(models.Model):
@@ -500,6 +504,48 @@ class UserProfile(models.Model):
         return self.subscription_type == "premium"
 
 
+class ReminderLog(models.Model):
+    """Последняя отправка рассылки пользователю Telegram (по типу рассылки)"""
+
+    telegram_id = models.BigIntegerField(verbose_name="Telegram ID")
+    reminder_type = models.CharField(
+        max_length=50, default="weekly_inactive", verbose_name="Тип рассылки"
+    )
+    last_sent_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Последняя отправка"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Лог напоминаний"
+        verbose_name_plural = "Логи напоминаний"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["telegram_id", "reminder_type"],
+                name="uniq_reminder_log_chat_type",
+            )
+        ]
+        indexes = [models.Index(fields=["reminder_type", "last_sent_at"])]
+
+    def __str__(self):
+        return f"{self.reminder_type} → {self.telegram_id}"
+
+
+class ChatState(models.Model):
+    """Снимок состояния диалога с ботом (текущее задание, режим ИИ, меню)"""
+
+    chat_id = models.BigIntegerField(unique=True, verbose_name="Chat ID")
+    data = models.JSONField(default=dict, verbose_name="Состояние")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Состояние чата"
+        verbose_name_plural = "Состояния чатов"
+
+    def __str__(self):
+        return f"Чат {self.chat_id}"
+
+
 class FIPISourceMap(models.Model):
     """Модель для хранения карты источников данных fipi.ru"""
 
@@ -582,6 +628,30 @@ class FIPISourceMap(models.Model):
     last_updated = models.DateTimeField(
         null=True, blank=True, verbose_name="Последнее обновление"
     )
+    etag = models.CharField(max_length=255, blank=True, default="", verbose_name="ETag")
+    last_modified_header = models.CharField(
+        max_length=64, blank=True, default="", verbose_name="Заголовок Last-Modified"
+    )
+
+    # Планирование обхода
+    next_check_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Следующая проверка"
+    )
+    revisit_interval = models.DurationField(
+        null=True, blank=True, verbose_name="Интервал повторной проверки"
+    )
+    check_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество проверок"
+    )  # type: ignore
+    change_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество изменений"
+    )  # type: ignore
+    last_fetch_duration = models.FloatField(
+        default=0.0, verbose_name="Длительность последней загрузки, с"
+    )  # type: ignore
+    avg_fetch_duration = models.FloatField(
+        default=0.0, verbose_name="Средняя длительность загрузки, с"
+    )  # type: ignore
 
     # Временные метки
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
@@ -598,11 +668,19 @@ class FIPISourceMap(models.Model):
             models.Index(fields=["subject"]),
             models.Index(fields=["is_active"]),
             models.Index(fields=["last_checked"]),
+            models.Index(fields=["next_check_at"]),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.get_data_type_display()})"  # type: ignore
 
+    @property
+    def change_rate(self) -> float:
+        """Доля проверок, на которых содержимое изменилось"""
+        if not self.check_count:
+            return 0.0
+        return self.change_count / self.check_count  # type: ignore
+
     @property
     def is_critical(self) -> bool:
         """Проверяет, является ли источник критически важным"""
@@ -637,6 +715,9 @@ class FIPISourceMap(models.Model):
         from django.utils import timezone
 
         now = timezone.now()
+        if self.next_check_at:
+            return now >= self.next_check_at  # type: ignore
+
         last_checked = self.last_checked  # type: ignore
         if self.update_frequency == "daily":
             return (now - last_checked).days >= 1  # type: ignore
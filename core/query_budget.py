@@ -0,0 +1,141 @@
+"""
+Учет SQL-запросов на HTTP-запрос или обновление бота
+
+track_queries() считает запросы, суммарное время в базе и повторы одного
+и того же SQL внутри блока. Учет ведется через execute_wrapper каждого
+соединения и contextvar, поэтому в него попадают и запросы из
+sync_to_async в обработчиках бота. Для меток из QUERY_BUDGET_CONFIG
+["BUDGETS"] (имя маршрута или "bot:<обработчик>") превышение бюджета
+пишется в лог с самыми частыми повторами.
+
+В тестах: @pytest.mark.query_budget(n) проверяет, что тест делает не
+больше n запросов (см. tests/conftest.py).
+"""
+
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_BUDGET_CONFIG = {
+    "ENABLED": True,
+    "BUDGETS": {},  # {"learning:home": 5, "bot:subjects_menu": 2}
+    "DEFAULT_BUDGET": None,  # бюджет для меток без своего, None — не проверять
+    "DUPLICATES_IN_LOG": 3,  # сколько самых частых повторов показать в логе
+}
+
+_NUMBERS_RE = re.compile(r"\b\d+\b")
+
+
+def get_query_budget_config() -> dict:
+    """Возвращает настройки бюджета запросов с учетом QUERY_BUDGET_CONFIG"""
+    config = dict(DEFAULT_QUERY_BUDGET_CONFIG)
+    config.update(getattr(settings, "QUERY_BUDGET_CONFIG", {}))
+    return config
+
+
+@dataclass
+class QueryStats:
+    """Запросы одного блока track_queries"""
+
+    label: str = ""
+    count: int = 0
+    duration: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, sql: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        # Литералы чисел не различаем: WHERE id = 1 и id = 2 — один и тот же запрос
+        self.statements[_NUMBERS_RE.sub("?", sql)] += 1
+
+    @property
+    def duplicates(self) -> int:
+        """Сколько запросов повторяют уже выполненный SQL"""
+        return sum(n - 1 for n in self.statements.values() if n > 1)
+
+    def most_duplicated(self, limit: int) -> list[tuple[str, int]]:
+        return [(sql, n) for sql, n in self.statements.most_common(limit) if n > 1]
+
+
+_active: contextvars.ContextVar[tuple[QueryStats, ...]] = contextvars.ContextVar(
+    "query_budget_active", default=()
+)
+
+
+def _record(execute, sql, params, many, context):
+    active = _active.get()
+    if not active:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for stats in active:
+            stats.record(sql, elapsed)
+
+
+def install(connection, **kwargs) -> None:
+    """Подключает учет к соединению (идемпотентно)"""
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+connection_created.connect(install, dispatch_uid="core.query_budget.install")
+
+
+@contextmanager
+def track_queries(label: str = ""):
+    """Считает запросы блока; вложенные блоки учитываются во всех внешних"""
+    for alias in connections:
+        install(connections[alias])
+    stats = QueryStats(label=label)
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+def check_budget(stats: QueryStats, budget: int | None = None) -> bool:
+    """
+    Сверяет запросы с бюджетом метки; при превышении пишет предупреждение
+
+    Returns:
+        True, если проверка выключена, бюджет не задан или не превышен
+    """
+    config = get_query_budget_config()
+    if not config["ENABLED"]:
+        return True
+    if budget is None:
+        budget = config["BUDGETS"].get(stats.label, config["DEFAULT_BUDGET"])
+    if budget is None or stats.count <= budget:
+        return True
+    details = "; ".join(
+        f"{n}× {sql[:120]}"
+        for sql, n in stats.most_duplicated(config["DUPLICATES_IN_LOG"])
+    )
+    logger.warning(
+        f"Бюджет запросов превышен для {stats.label}: {stats.count} > {budget}, "
+        f"{stats.duration * 1000:.1f} мс в базе, повторов {stats.duplicates}"
+        + (f" ({details})" if details else "")
+    )
+    return False
+
+
+@contextmanager
+def query_budget(label: str, budget: int | None = None):
+    """track_queries с проверкой бюджета метки при выходе из блока"""
+    with track_queries(label) as stats:
+        yield stats
+    check_budget(stats, budget)
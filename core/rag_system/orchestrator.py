@@ -5,8 +5,14 @@ RAG Orchestrator - полноценная система поиска и пол
 import logging
 from typing import Any
 
+from core import metrics
+
 logger = logging.getLogger(__name__)
 
+RAG_STAGE_SECONDS = metrics.histogram(
+    "rag_stage_seconds", "Время этапов RAG-поиска", ("stage",)
+)
+
 
 class RAGOrchestrator:
     """Полноценная RAG система для поиска контекста"""
@@ -30,10 +36,12 @@ class RAGOrchestrator:
         """
         try:
             # Поиск релевантных заданий и материалов
-            sources = self._find_relevant_sources(prompt, subject, limit)
+            with RAG_STAGE_SECONDS.time(stage="retrieve"):
+                sources = self._find_relevant_sources(prompt, subject, limit)
 
             # Формирование контекста
-            context = self._build_context(sources, prompt)
+            with RAG_STAGE_SECONDS.time(stage="build_context"):
+                context = self._build_context(sources, prompt)
 
             return {
                 "context": context,
@@ -6,8 +6,14 @@ import logging
 import re
 from typing import Any
 
+from core import metrics
+
 logger = logging.getLogger(__name__)
 
+RAG_STAGE_SECONDS = metrics.histogram(
+    "rag_stage_seconds", "Время этапов RAG-поиска", ("stage",)
+)
+
 
 class VectorStore:
     """Полноценное векторное хранилище с семантическим поиском"""
@@ -41,6 +47,7 @@ class VectorStore:
 
         logger.debug(f"Добавлен документ {doc_id}: {content[:50]}...")
 
+    @metrics.timed(RAG_STAGE_SECONDS, stage="vector_search")
     def search(self, query: str, limit: int = 5) -> list[dict[str, Any]]:
         """
         Семантический поиск документов
@@ -0,0 +1,234 @@
+"""
+Профилирование холодного старта и ленивые импорты
+
+profile_boot() запускает чистый процесс Python с -X importtime и меряет
+шаги загрузки: django.setup(), импорт URLconf, первый ответ на
+PROBE_PATH и импорт модулей webhook бота. Время импорта разбирается по
+модулям. Команда manage.py profile_startup печатает отчет и сверяет первый
+ответ с целью FIRST_RESPONSE_TARGET_MS.
+
+lazy_import() откладывает загрузку тяжелого модуля до первого обращения
+к атрибуту, startup_step() пишет время шага запуска в лог и метрики.
+"""
+
+import importlib.util
+import json
+import logging
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STARTUP_CONFIG = {
+    "PROBE_PATH": "/health/",
+    "FIRST_RESPONSE_TARGET_MS": 2000,  # от запуска процесса до первого ответа
+    "TOP_MODULES": 20,
+    # Импортируются в фоне после первого запроса воркера (webhook бота)
+    "PREWARM_MODULES": [],
+    "PREWARM": True,
+    "RUN_JOBS": False,  # тяжелые задачи запуска в фоне веб-воркера (auto_startup)
+    "TIMEOUT": 120,  # секунд на профилирующий процесс
+}
+
+STARTUP_STEP_SECONDS = metrics.histogram(
+    "startup_step_seconds",
+    "Время шага запуска приложения",
+    ("step", "outcome"),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0),
+)
+
+
+def get_startup_config() -> dict:
+    """Возвращает настройки запуска с учетом STARTUP_CONFIG"""
+    config = dict(DEFAULT_STARTUP_CONFIG)
+    config.update(getattr(settings, "STARTUP_CONFIG", {}))
+    return config
+
+
+def lazy_import(name: str):
+    """Модуль, который загрузится при первом обращении к атрибуту"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+@contextmanager
+def startup_step(name: str):
+    """Замеряет шаг запуска: лог и startup_step_seconds"""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STARTUP_STEP_SECONDS.observe(elapsed, step=name, outcome=outcome)
+        logger.info(f"Шаг запуска {name}: {elapsed:.2f} с ({outcome})")
+
+
+@dataclass
+class ImportRecord:
+    """Строка вывода -X importtime (микросекунды)"""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass
+class StartupReport:
+    """Итог профилирования холодного старта"""
+
+    steps: dict[str, float] = field(default_factory=dict)  # шаг -> мс
+    imports: list[ImportRecord] = field(default_factory=list)
+    status_code: int | None = None
+    heavy_before_response: list[str] = field(default_factory=list)
+
+    @property
+    def first_response_ms(self) -> float:
+        """От запуска процесса до первого ответа"""
+        return sum(
+            self.steps.get(step, 0.0)
+            for step in ("interpreter", "django_setup", "urlconf", "first_response")
+        )
+
+    def top_imports(self, limit: int) -> list[ImportRecord]:
+        """Самые дорогие модули верхнего уровня по суммарному времени"""
+        roots = [record for record in self.imports if record.depth == 0]
+        roots.sort(key=lambda record: record.cumulative_us, reverse=True)
+        return roots[:limit]
+
+
+HEAVY_MODULES = ("telegram", "google.generativeai", "gtts", "bs4")
+
+# Выполняется в отдельном процессе: import time пишет -X importtime в stderr
+_BOOT_SCRIPT = """
+import importlib, json, os, sys, time
+started_at = time.time()
+t0 = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "examflow_project.settings")
+import django
+django.setup()
+t1 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t2 = time.perf_counter()
+from django.conf import settings
+from django.test import Client
+hosts = [h for h in settings.ALLOWED_HOSTS if h not in ("*", "")]
+host = (hosts[0].lstrip(".") if hosts else "localhost")
+status = Client().get(sys.argv[1], HTTP_HOST=host).status_code
+t3 = time.perf_counter()
+# Модуль lazy_import еще не загружен, пока его тип _LazyModule
+heavy = [
+    m for m in json.loads(sys.argv[2])
+    if m in sys.modules and type(sys.modules[m]).__name__ != "_LazyModule"
+]
+for name in json.loads(sys.argv[3]):
+    importlib.import_module(name)
+t4 = time.perf_counter()
+print(json.dumps({
+    "started_at": started_at,
+    "status": status,
+    "heavy": heavy,
+    "steps": {
+        "django_setup": (t1 - t0) * 1000,
+        "urlconf": (t2 - t1) * 1000,
+        "first_response": (t3 - t2) * 1000,
+        "bot_modules": (t4 - t3) * 1000,
+    },
+}))
+"""
+
+
+def parse_importtime(output: str) -> list[ImportRecord]:
+    """Разбирает stderr процесса, запущенного с -X importtime"""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # заголовок "self [us] | cumulative | imported package"
+        name = parts[2].rstrip()
+        records.append(
+            ImportRecord(
+                module=name.strip(),
+                self_us=int(parts[0]),
+                cumulative_us=int(parts[1]),
+                depth=(len(name) - len(name.lstrip()) - 1) // 2,
+            )
+        )
+    return records
+
+
+def profile_boot(
+    path: str | None = None, bot_modules: list[str] | None = None
+) -> StartupReport:
+    """Холодный старт в чистом процессе: шаги загрузки и время импортов"""
+    config = get_startup_config()
+    if bot_modules is None:
+        bot_modules = config["PREWARM_MODULES"]
+    spawned_at = time.time()
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            _BOOT_SCRIPT,
+            path or config["PROBE_PATH"],
+            json.dumps(HEAVY_MODULES),
+            json.dumps(bot_modules),
+        ],
+        capture_output=True,
+        text=True,
+        timeout=config["TIMEOUT"],
+        cwd=settings.BASE_DIR,
+    )
+    if result.returncode != 0:
+        lines = [
+            line
+            for line in result.stderr.strip().splitlines()
+            if not line.startswith("import time:")
+        ]
+        raise RuntimeError(lines[-1] if lines else f"код выхода {result.returncode}")
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    steps = {"interpreter": (data["started_at"] - spawned_at) * 1000}
+    steps.update(data["steps"])
+    return StartupReport(
+        steps=steps,
+        imports=parse_importtime(result.stderr),
+        status_code=data["status"],
+        heavy_before_response=data["heavy"],
+    )
+
+
+def prewarm(modules: list[str] | None = None) -> None:
+    """Импортирует модули заранее, чтобы первый webhook их не ждал"""
+    if modules is None:
+        modules = get_startup_config()["PREWARM_MODULES"]
+    for name in modules:
+        with startup_step(f"import:{name}"):
+            importlib.import_module(name)
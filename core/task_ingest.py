@@ -0,0 +1,293 @@
+"""
+Массовая загрузка спарсенных заданий в базу
+
+Вместо get_or_create на каждое задание пачка словарей разрешается в
+предметы и темы одним IN-запросом на модель, а задания записываются
+через bulk_create(update_conflicts=True) по естественному ключу
+(предмет, хеш источника). Число запросов не зависит от размера пачки.
+"""
+
+import hashlib
+import logging
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+
+from django.db import transaction
+
+from learning.answers import invalidate_matchers
+from learning.catalog import invalidate_catalog
+from learning.models import Subject, Task, Topic
+
+logger = logging.getLogger(__name__)
+
+# Поля задания, которые обновляются при повторной загрузке
+TASK_UPDATE_FIELDS = ["title", "description", "difficulty", "answer", "source"]
+
+
+@dataclass
+class IngestStats:
+    """Статистика массовой загрузки"""
+
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    topics_created: int = 0
+    subjects_created: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def task_natural_key(title: str, source: str = "") -> str:
+    """Естественный ключ задания: хеш нормализованного заголовка и источника"""
+    normalized = " ".join((title or "").split()).lower()
+    return hashlib.sha256(f"{source or ''}\n{normalized}".encode()).hexdigest()
+
+
+def task_data_key(item: dict) -> str:
+    """Естественный ключ для словаря задания (url важнее общего источника)"""
+    return item.get("source_hash") or task_natural_key(
+        item["title"].strip()[:200], item.get("url") or item.get("source", "")
+    )
+
+
+def _subject_key(name: str, exam_type: str = "") -> tuple[str, str]:
+    return (name.strip(), exam_type or "")
+
+
+class TaskBulkIngestor:
+    """
+    Загрузчик пачек заданий
+
+    Каждый словарь задания содержит title и предмет в одном из видов:
+    subject (объект), subject_id или subject_name (+ необязательный
+    exam_type). Необязательные поля: topic, description, difficulty,
+    answer, source, url.
+    """
+
+    def __init__(self, batch_size: int = 500, default_exam_type: str = "ege"):
+        self.batch_size = batch_size
+        self.default_exam_type = default_exam_type
+
+    def ingest(self, tasks_data: Iterable[dict]) -> IngestStats:
+        """Записывает пачку заданий и возвращает статистику"""
+        stats = IngestStats()
+        items = [item for item in tasks_data if item.get("title")]
+        if not items:
+            return stats
+
+        with transaction.atomic():
+            subjects = self._resolve_subjects(items, stats)
+            rows = self._build_rows(items, subjects, stats)
+            self._resolve_topics(items, subjects, stats)
+            self._write_tasks(rows, stats)
+
+        # bulk-операции не отправляют post_save: сбрасываем снимок каталога явно
+        if stats.created or stats.updated or stats.topics_created:
+            invalidate_catalog()
+        if stats.updated:
+            invalidate_matchers()
+
+        logger.info(
+            f"Массовая загрузка заданий: создано {stats.created}, "
+            f"обновлено {stats.updated}, без изменений {stats.unchanged}, "
+            f"пропущено {stats.skipped}"
+        )
+        return stats
+
+    def _resolve_subjects(self, items: list[dict], stats: IngestStats) -> dict:
+        """Разрешает предметы пачки одним IN-запросом, создавая недостающие"""
+        subjects: dict = {}
+        names = set()
+        ids = set()
+        for item in items:
+            if item.get("subject") is not None:
+                subject = item["subject"]
+                subjects[("id", subject.pk)] = subject
+            elif item.get("subject_id"):
+                ids.add(item["subject_id"])
+            elif item.get("subject_name"):
+                names.add(item["subject_name"].strip())
+
+        if ids:
+            for subject in Subject.objects.filter(pk__in=ids):  # type: ignore
+                subjects[("id", subject.pk)] = subject
+
+        if names:
+            found = Subject.objects.filter(name__in=names).order_by("pk")  # type: ignore
+            for subject in found:
+                subjects.setdefault(
+                    _subject_key(subject.name, subject.exam_type), subject
+                )
+                subjects.setdefault(_subject_key(subject.name), subject)
+
+            missing: dict[tuple[str, str], Subject] = {}
+            for item in items:
+                if not item.get("subject_name") or item.get("subject") is not None:
+                    continue
+                key = self._item_subject_key(item)
+                if key in subjects or _subject_key(key[0]) in subjects and not key[1]:
+                    continue
+                if key not in missing:
+                    missing[key] = Subject(
+                        name=key[0], exam_type=key[1] or self.default_exam_type
+                    )
+
+            if missing:
+                created = Subject.objects.bulk_create(list(missing.values()))  # type: ignore
+                stats.subjects_created += len(created)
+                for key, subject in zip(missing.keys(), created, strict=True):
+                    subjects[key] = subject
+                    subjects.setdefault(_subject_key(key[0]), subject)
+
+        return subjects
+
+    def _item_subject_key(self, item: dict) -> tuple[str, str]:
+        return _subject_key(item["subject_name"], item.get("exam_type", ""))
+
+    def _subject_for(self, item: dict, subjects: dict) -> Subject | None:
+        if item.get("subject") is not None:
+            return subjects.get(("id", item["subject"].pk))
+        if item.get("subject_id"):
+            return subjects.get(("id", item["subject_id"]))
+        if item.get("subject_name"):
+            key = self._item_subject_key(item)
+            return subjects.get(key) or subjects.get(_subject_key(key[0]))
+        return None
+
+    def _resolve_topics(self, items: list[dict], subjects: dict, stats: IngestStats):
+        """Создает отсутствующие темы пачки после одного IN-запроса"""
+        wanted: dict[tuple[int, str], Subject] = {}
+        for item in items:
+            subject = self._subject_for(item, subjects)
+            topic_name = (item.get("topic") or "").strip()
+            if subject is not None and topic_name:
+                wanted[(subject.pk, topic_name[:200])] = subject
+
+        if not wanted:
+            return
+
+        existing = set(
+            Topic.objects.filter(  # type: ignore
+                subject_id__in={subject_id for subject_id, _ in wanted},
+                name__in={name for _, name in wanted},
+            ).values_list("subject_id", "name")
+        )
+        missing = [
+            Topic(subject=subject, name=name, code=f"T{subject.pk}_{index}"[:20])
+            for index, ((subject_id, name), subject) in enumerate(wanted.items())
+            if (subject_id, name) not in existing
+        ]
+        if missing:
+            Topic.objects.bulk_create(missing)  # type: ignore
+            stats.topics_created += len(missing)
+
+    def _build_rows(
+        self, items: list[dict], subjects: dict, stats: IngestStats
+    ) -> list[Task]:
+        """Готовит объекты Task, убирая дубликаты внутри пачки"""
+        rows: dict[tuple[int, str], Task] = {}
+        for item in items:
+            subject = self._subject_for(item, subjects)
+            if subject is None:
+                stats.skipped += 1
+                continue
+
+            title = item["title"].strip()[:200]
+            key = task_data_key(item)
+            if (subject.pk, key) in rows:
+                stats.skipped += 1
+                continue
+
+            rows[(subject.pk, key)] = Task(
+                subject=subject,
+                title=title,
+                description=(item.get("description") or "")[:1000],
+                difficulty=item.get("difficulty") or 1,
+                answer=item.get("answer") or "",
+                source=(item.get("source") or "")[:200],
+                source_hash=key,
+            )
+        return list(rows.values())
+
+    def _write_tasks(self, rows: list[Task], stats: IngestStats):
+        """Классифицирует задания и пишет только новые и изменившиеся"""
+        if not rows:
+            return
+
+        subject_ids = {row.subject_id for row in rows}  # type: ignore
+        existing = {
+            (values["subject_id"], values["source_hash"]): values
+            for values in Task.objects.filter(  # type: ignore
+                subject_id__in=subject_ids,
+                source_hash__in={row.source_hash for row in rows},
+            ).values("subject_id", "source_hash", *TASK_UPDATE_FIELDS)
+        }
+
+        self._adopt_legacy_tasks(rows, existing)
+
+        to_write = []
+        for row in rows:
+            current = existing.get((row.subject_id, row.source_hash))  # type: ignore
+            if current is None:
+                stats.created += 1
+            elif any(
+                (current[field] or "") != (getattr(row, field) or "")
+                for field in TASK_UPDATE_FIELDS
+            ):
+                stats.updated += 1
+            else:
+                stats.unchanged += 1
+                continue
+            to_write.append(row)
+
+        if to_write:
+            Task.objects.bulk_create(  # type: ignore
+                to_write,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=["subject", "source_hash"],
+                update_fields=TASK_UPDATE_FIELDS,
+            )
+
+    def _adopt_legacy_tasks(self, rows: list[Task], existing: dict):
+        """
+        Проставляет ключ заданиям, созданным до появления source_hash
+
+        Такие задания совпадают по (предмет, заголовок); без этого шага
+        повторная загрузка создала бы их дубликаты.
+        """
+        pending = {
+            (row.subject_id, row.title): row  # type: ignore
+            for row in rows
+            if (row.subject_id, row.source_hash) not in existing  # type: ignore
+        }
+        if not pending:
+            return
+
+        legacy = list(
+            Task.objects.filter(  # type: ignore
+                subject_id__in={subject_id for subject_id, _ in pending},
+                title__in={title for _, title in pending},
+                source_hash__isnull=True,
+            )
+        )
+        adopted = []
+        for task in legacy:
+            row = pending.pop((task.subject_id, task.title), None)
+            if row is None:
+                continue
+            task.source_hash = row.source_hash
+            adopted.append(task)
+            existing[(task.subject_id, task.source_hash)] = {
+                field: getattr(task, field) for field in TASK_UPDATE_FIELDS
+            }
+
+        if adopted:
+            Task.objects.bulk_update(adopted, ["source_hash"])  # type: ignore
+
+
+def bulk_upsert_tasks(tasks_data: Iterable[dict], batch_size: int = 500) -> IngestStats:
+    """Массово создает или обновляет задания"""
+    return TaskBulkIngestor(batch_size=batch_size).ingest(tasks_data)
@@ -0,0 +1,410 @@
+"""
+Параллельный конвейер озвучивания текстов
+
+Текст нормализуется (VoiceService._clean_text_for_speech) и адресуется
+хешем содержимого: одинаковые тексты разных заданий озвучиваются один раз
+и делят один файл audio/<hash>.mp3. Дубликаты внутри пачки схлопываются
+до синтеза, уже существующие файлы не генерируются повторно, а сам синтез
+идет в ограниченном пуле потоков с общим лимитом частоты обращений к
+движку TTS. Размер и длительность созданных файлов записываются в индекс
+audio/index.json (AudioIndex).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: остается блокировка внутри процесса
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTS_CONFIG = {
+    "ENGINE": "gtts",
+    "WORKERS": 4,
+    "RATE_PER_SECOND": 2.0,  # обращений к движку в секунду на процесс
+    "LANGUAGE": "ru",
+    "SLOW": False,
+    "BATCH_SIZE": 100,  # заданий за один плановый запуск
+}
+
+AUDIO_SUBDIR = "audio"
+AUDIO_EXTENSION = "mp3"
+AUDIO_INDEX_NAME = "index.json"
+AUDIO_INDEX_LOCK_NAME = "index.json.lock"
+
+# Битрейты MPEG Layer III, кбит/с: MPEG-1 и MPEG-2/2.5
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+
+def get_tts_config() -> dict:
+    """Возвращает настройки конвейера с учетом TTS_PIPELINE_CONFIG"""
+    config = dict(DEFAULT_TTS_CONFIG)
+    config.update(getattr(settings, "TTS_PIPELINE_CONFIG", {}))
+    return config
+
+
+def audio_key(text: str, language: str = "ru") -> str:
+    """Ключ аудиофайла: SHA-256 нормализованного текста и языка"""
+    return hashlib.sha256(f"{language}\n{text}".encode()).hexdigest()
+
+
+def audio_relative_path(key: str) -> str:
+    """Путь аудиофайла относительно MEDIA_ROOT"""
+    return f"{AUDIO_SUBDIR}/{key}.{AUDIO_EXTENSION}"
+
+
+def mp3_duration(path: str | Path, size: int | None = None) -> float | None:
+    """
+    Длительность MP3 в секундах по заголовку первого кадра
+
+    gTTS отдает файлы с постоянным битрейтом, поэтому достаточно
+    пропустить ID3-тег, прочитать битрейт первого кадра и разделить на
+    него размер аудиоданных.
+    """
+    size = os.path.getsize(path) if size is None else size
+    with open(path, "rb") as audio_file:
+        offset = 0
+        head = audio_file.read(10)
+        if head[:3] == b"ID3" and len(head) == 10:
+            offset = 10 + (
+                (head[6] & 0x7F) << 21
+                | (head[7] & 0x7F) << 14
+                | (head[8] & 0x7F) << 7
+                | (head[9] & 0x7F)
+            )
+        audio_file.seek(offset)
+        data = audio_file.read(4096)
+
+    for index in range(len(data) - 3):
+        if data[index] != 0xFF or data[index + 1] & 0xE0 != 0xE0:
+            continue
+        version = (data[index + 1] >> 3) & 0x03  # 3 — MPEG-1
+        layer = (data[index + 1] >> 1) & 0x03  # 1 — Layer III
+        bitrate_index = data[index + 2] >> 4
+        if version == 1 or layer != 1 or bitrate_index in (0, 15):
+            continue
+        kbps = MP3_BITRATES[1 if version == 3 else 2][bitrate_index]
+        return round((size - offset - index) * 8 / (kbps * 1000), 2)
+    return None
+
+
+@contextmanager
+def _locked(path: Path):
+    """Межпроцессная блокировка через flock на отдельном файле"""
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class AudioIndex:
+    """
+    Индекс метаданных аудиофайлов (размер, длительность, время создания)
+
+    Хранится рядом с файлами в audio/index.json и пополняется конвейером
+    при синтезе, поэтому страницам и эндпоинту отдачи не нужно обращаться
+    к каждому файлу. В памяти процесса индекс перечитывается только при
+    изменении самого index.json. Запись идет под блокировкой
+    index.json.lock: изменения читаются заново, сливаются и подменяют файл
+    через os.replace, так что параллельные процессы не теряют записи друг
+    друга.
+    """
+
+    _lock = threading.Lock()
+    _loaded: dict[str, tuple[int, dict]] = {}
+
+    def __init__(self, audio_dir: str | Path | None = None):
+        self.audio_dir = Path(audio_dir or Path(settings.MEDIA_ROOT) / AUDIO_SUBDIR)
+        self.path = self.audio_dir / AUDIO_INDEX_NAME
+        self.lock_path = self.audio_dir / AUDIO_INDEX_LOCK_NAME
+
+    def entries(self) -> dict:
+        """Все записи индекса {ключ: метаданные}"""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+
+        cached = self._loaded.get(str(self.path))
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Индекс аудио поврежден, будет пересобран: {e}")
+            entries = {}
+        self._loaded[str(self.path)] = (mtime, entries)
+        return entries
+
+    def get(self, key: str) -> dict | None:
+        return self.entries().get(key)
+
+    def describe(self, key: str) -> dict | None:
+        """Метаданные одного файла с диска (размер, длительность, mtime)"""
+        path = self.audio_dir / f"{key}.{AUDIO_EXTENSION}"
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        try:
+            duration = mp3_duration(path, stat.st_size)
+        except OSError:
+            duration = None
+        return {"size": stat.st_size, "duration": duration, "mtime": int(stat.st_mtime)}
+
+    def record(self, keys) -> None:
+        """Добавляет файлы в индекс одной атомарной перезаписью"""
+        self._update(add=keys)
+
+    def forget(self, keys) -> None:
+        self._update(remove=keys)
+
+    def rebuild(self) -> int:
+        """Пересобирает индекс по всем файлам каталога"""
+        keys = [path.stem for path in self.audio_dir.glob(f"*.{AUDIO_EXTENSION}")]
+        self._update(add=keys, reset=True)
+        return len(keys)
+
+    def _update(self, add=(), remove=(), reset=False) -> None:
+        with self._lock, _locked(self.lock_path):
+            entries = {} if reset else dict(self.entries())
+            for key in add:
+                meta = self.describe(key)
+                if meta:
+                    entries[key] = meta
+            for key in remove:
+                entries.pop(key, None)
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.audio_dir, suffix=".json.tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as index_file:
+                json.dump(entries, index_file)
+            os.replace(tmp_path, self.path)
+            self._loaded[str(self.path)] = (self.path.stat().st_mtime_ns, entries)
+
+
+class GTTSEngine:
+    """Синтез речи через gTTS"""
+
+    def __init__(self, language: str = "ru", slow: bool = False):
+        self.language = language
+        self.slow = slow
+
+    def synthesize(self, text: str, path: str) -> None:
+        from gtts import gTTS
+
+        gTTS(text=text, lang=self.language, slow=self.slow).save(path)
+
+
+class StubTTSEngine:
+    """Локальный движок без сети: пишет кадр MP3 128 кбит/с и текст (для тестов)"""
+
+    def __init__(self, language: str = "ru", slow: bool = False, delay: float = 0.0):
+        self.language = language
+        self.delay = delay
+        self.calls: list[str] = []
+        self._lock = threading.Lock()
+
+    def synthesize(self, text: str, path: str) -> None:
+        with self._lock:
+            self.calls.append(text)
+        if self.delay:
+            time.sleep(self.delay)
+        with open(path, "wb") as audio_file:
+            audio_file.write(b"\xff\xfb\x90\x64" + text.encode("utf-8"))
+
+
+TTS_ENGINES = {
+    "gtts": GTTSEngine,
+    "stub": StubTTSEngine,
+}
+
+
+class RateLimiter:
+    """Общий для потоков лимит частоты: не чаще rate обращений в секунду"""
+
+    def __init__(self, rate_per_second: float = 0.0):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot)
+            self._next_slot = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+@dataclass
+class TTSJob:
+    """Задача на озвучивание одного текста"""
+
+    text: str
+    voice_type: str = "task"
+    task_id: int | None = None
+
+
+@dataclass
+class TTSBatchResult:
+    """Итоги пачки: пути в порядке заданий и статистика"""
+
+    paths: list[str | None] = field(default_factory=list)
+    synthesized: int = 0
+    reused: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    empty: int = 0
+    duration: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "synthesized": self.synthesized,
+            "reused": self.reused,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "empty": self.empty,
+            "duration": self.duration,
+        }
+
+
+class TTSPipeline:
+    """Конвейер озвучивания с адресацией файлов по содержимому"""
+
+    def __init__(
+        self,
+        engine=None,
+        workers: int | None = None,
+        rate_per_second: float | None = None,
+        audio_dir: str | Path | None = None,
+        language: str | None = None,
+        normalizer=None,
+    ):
+        config = get_tts_config()
+        self.language = language or config["LANGUAGE"]
+        self.engine = engine or TTS_ENGINES[config["ENGINE"]](
+            language=self.language, slow=config["SLOW"]
+        )
+        self.workers = workers or config["WORKERS"]
+        self.rate_limiter = RateLimiter(
+            config["RATE_PER_SECOND"] if rate_per_second is None else rate_per_second
+        )
+        self.audio_dir = Path(audio_dir or Path(settings.MEDIA_ROOT) / AUDIO_SUBDIR)
+        self.audio_dir.mkdir(parents=True, exist_ok=True)
+        self.normalizer = normalizer or (lambda text: " ".join((text or "").split()))
+        self.index = AudioIndex(self.audio_dir)
+
+    def prepare(self, text: str) -> tuple[str, str]:
+        """Нормализует текст и возвращает (текст, ключ)"""
+        clean_text = self.normalizer(text)
+        return clean_text, audio_key(clean_text, self.language)
+
+    def exists(self, key: str) -> bool:
+        return (self.audio_dir / f"{key}.{AUDIO_EXTENSION}").exists()
+
+    def synthesize(self, text: str) -> str | None:
+        """Озвучивает один текст, переиспользуя готовый файл"""
+        return self.run([TTSJob(text=text)]).paths[0]
+
+    def run(self, jobs: list[TTSJob], force: bool = False) -> TTSBatchResult:
+        """
+        Озвучивает пачку текстов параллельно
+
+        Args:
+            jobs: тексты для озвучивания
+            force: синтезировать заново даже при наличии готового файла
+
+        Returns:
+            TTSBatchResult с относительными путями (или None) в порядке jobs
+        """
+        started = time.monotonic()
+        result = TTSBatchResult()
+        keys: list[str | None] = []
+        pending: dict[str, str] = {}
+
+        for job in jobs:
+            clean_text, key = self.prepare(job.text)
+            if not clean_text:
+                result.empty += 1
+                keys.append(None)
+                continue
+            keys.append(key)
+            if key in pending:
+                result.duplicates += 1
+            elif not force and self.exists(key):
+                result.reused += 1
+                pending[key] = ""
+            else:
+                pending[key] = clean_text
+
+        to_synthesize = {key: text for key, text in pending.items() if text}
+        done: dict[str, bool] = {key: True for key in pending if not pending[key]}
+
+        if to_synthesize:
+            workers = min(self.workers, len(to_synthesize))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outcomes = executor.map(
+                    lambda item: self._synthesize_file(*item), to_synthesize.items()
+                )
+                for key, ok in zip(to_synthesize, outcomes, strict=True):
+                    done[key] = ok
+                    if ok:
+                        result.synthesized += 1
+                    else:
+                        result.failed += 1
+
+        created = [key for key in to_synthesize if done.get(key)]
+        if created:
+            self.index.record(created)
+
+        result.paths = [
+            audio_relative_path(key) if key and done.get(key) else None for key in keys
+        ]
+        result.duration = time.monotonic() - started
+        logger.info(
+            f"TTS: создано {result.synthesized}, переиспользовано {result.reused}, "
+            f"дубликатов {result.duplicates}, ошибок {result.failed} "
+            f"за {result.duration:.1f} с"
+        )
+        return result
+
+    def _synthesize_file(self, key: str, text: str) -> bool:
+        """Синтезирует файл во временный путь и атомарно переносит на место"""
+        target = self.audio_dir / f"{key}.{AUDIO_EXTENSION}"
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.audio_dir, suffix=f".{AUDIO_EXTENSION}.tmp"
+        )
+        os.close(fd)
+        try:
+            self.rate_limiter.acquire()
+            self.engine.synthesize(text, tmp_path)
+            os.replace(tmp_path, target)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка синтеза речи {key[:12]}: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
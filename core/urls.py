@@ -7,7 +7,7 @@ from django.contrib.sitemaps import Sitemap
 from django.contrib.sitemaps import views as sitemap_views
 from django.http import HttpResponse
 from django.shortcuts import redirect, render
-from django.urls import path
+from django.urls import path, re_path
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularRedocView,
@@ -93,8 +93,10 @@ from core.rag_system import ai_api  # noqa: E402
 from core.rag_system.search_api import fipi_semantic_search  # noqa: E402
 
 from . import api  # noqa: E402
+from .audio_delivery import audio_file_view  # noqa: E402
 from . import fallback_views  # noqa: E402
 from .health_check import health_check_view, simple_health_check  # noqa: E402
+from .metrics import metrics_view  # noqa: E402
 
 urlpatterns = [
     # API для RAG-системы
@@ -116,6 +118,8 @@ urlpatterns = [
     path("health/", health_check_view, name="health_check_basic"),
     path("health/simple/", simple_health_check, name="health_check_simple"),
     path("health/minimal/", simple_health_check, name="health_check_minimal"),
+    # Метрики в текстовом формате Prometheus
+    path("metrics/", metrics_view, name="metrics"),
     path("robots.txt", robots_txt, name="robots_txt"),
     path(
         "sitemap.xml",
@@ -124,6 +128,10 @@ urlpatterns = [
         name="sitemap",
     ),
     path("faq/", faq_view, name="faq"),
+    # Озвучка заданий: Range, ETag и неизменяемый кэш
+    re_path(
+        r"^audio/(?P<key>[0-9a-f]{64})\.mp3$", audio_file_view, name="audio_file"
+    ),
     path("api/fipi/search/", fipi_semantic_search, name="fipi_semantic_search"),
     # Новые AI API эндпоинты
     path("api/ai/ask/", ai_api.ai_ask, name="ai_ask"),
@@ -1,17 +1,15 @@
 """
 Сервис для генерации голосовых подсказок и озвучивания заданий
-Использует gTTS (Google Text-to-Speech) для минимальных затрат
+Использует gTTS (Google Text-to-Speech) для минимальных затрат, синтез
+идет через параллельный конвейер core.tts_pipeline
 """
 
-import hashlib
 import logging
-import os
-import tempfile
 from pathlib import Path
 
 from django.conf import settings
-from django.core.cache import cache
-from gtts import gTTS
+
+from core.tts_pipeline import TTSJob, TTSPipeline
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +17,7 @@ logger = logging.getLogger(__name__)
 class VoiceService:
     """Сервис для работы с голосовыми подсказками"""
 
-    def __init__(self):
-        self.cache_timeout = 86400 * 7  # 7 дней кэширования
+    def __init__(self, engine=None):
         self.audio_format = "mp3"
         self.language = "ru"
         self.slow_speed = False
@@ -29,62 +26,92 @@ class VoiceService:
         self.audio_dir = Path(settings.MEDIA_ROOT) / "audio"
         self.audio_dir.mkdir(parents=True, exist_ok=True)
 
+        # Файлы адресуются хешем очищенного текста, поэтому одинаковые
+        # тексты разных заданий делят один файл
+        self.pipeline = TTSPipeline(
+            engine=engine,
+            audio_dir=self.audio_dir,
+            language=self.language,
+            normalizer=self._clean_text_for_speech,
+        )
+
     def text_to_speech(self, text, task_id=None, voice_type="task"):
         """
         Преобразует текст в речь и возвращает путь к файлу
 
         Args:
             text (str): Текст для озвучивания
-            task_id (int): ID задания для кэширования
+            task_id (int): ID задания (для журнала)
             voice_type (str): Тип озвучивания (task, solution, hint)
 
         Returns:
             str: Относительный путь к аудиофайлу или None при ошибке
         """
-        try:
-            # Создаем уникальный хеш для кэширования
-            text_hash = hashlib.md5(text.encode("utf-8")).hexdigest()
-            cache_key = "voice_{voice_type}_{text_hash}"
-
-            # Проверяем кэш
-            cached_path = cache.get(cache_key)
-            if cached_path and os.path.exists(
-                os.path.join(settings.MEDIA_ROOT, cached_path)
-            ):
-                logger.info("Используем кэшированный аудиофайл: {cached_path}")
-                return cached_path
-
-            # Очищаем текст для лучшего озвучивания
-            clean_text = self._clean_text_for_speech(text)
-
-            if not clean_text.strip():
-                logger.warning("Пустой текст после очистки")
-                return None
-
-            # Генерируем аудио
-            tts = gTTS(text=clean_text, lang=self.language, slow=self.slow_speed)
-
-            # Сохраняем в временный файл
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                tts.save(tmp_file.name)
-
-                # Создаем финальный путь
-                filename = "{voice_type}_{text_hash}.mp3"
-                audio_path = self.audio_dir / filename
-                relative_path = "audio/{filename}"
-
-                # Перемещаем файл в медиа директорию
-                os.rename(tmp_file.name, str(audio_path))
-
-                # Кэшируем путь
-                cache.set(cache_key, relative_path, self.cache_timeout)
-
-                logger.info("Создан аудиофайл: {relative_path}")
-                return relative_path
+        result = self.pipeline.run(
+            [TTSJob(text=text, voice_type=voice_type, task_id=task_id)]
+        )
+        if result.empty:
+            logger.warning("Пустой текст после очистки")
+        return result.paths[0]
+
+    def synthesize_batch(self, jobs):
+        """Озвучивает пачку TTSJob параллельно, см. TTSPipeline.run"""
+        return self.pipeline.run(jobs)
+
+    def task_jobs(self, task):
+        """Задачи на озвучивание условия и решения задания"""
+        text = getattr(task, "text", None) or task.description or ""
+        jobs = [
+            TTSJob(
+                text=f"Задание по предмету {task.subject.name}. {task.title}. {text}",
+                voice_type="task",
+                task_id=task.id,
+            )
+        ]
+        solution = getattr(task, "solution", "")
+        if solution:
+            jobs.append(
+                TTSJob(
+                    text=f"Решение. {solution}", voice_type="solution", task_id=task.id
+                )
+            )
+        return jobs
+
+    def generate_tasks_audio(self, tasks, force=False):
+        """
+        Озвучивает набор заданий одной параллельной пачкой
 
-        except Exception:
-            logger.error("Ошибка генерации аудио: {str(e)}")
-            return None
+        Returns:
+            tuple: ({task_id: {"task_audio", "solution_audio"}}, TTSBatchResult)
+        """
+        jobs = [job for task in tasks for job in self.task_jobs(task)]
+        batch = self.pipeline.run(jobs, force=force)
+
+        audio = {}
+        for job, path in zip(jobs, batch.paths, strict=True):
+            entry = audio.setdefault(
+                job.task_id, {"task_audio": None, "solution_audio": None}
+            )
+            entry[f"{job.voice_type}_audio"] = path
+        return audio, batch
+
+    def has_audio(self, task):
+        """Все тексты задания уже озвучены (файлы с их хешами существуют)"""
+        for job in self.task_jobs(task):
+            clean_text, key = self.pipeline.prepare(job.text)
+            if clean_text and not self.pipeline.exists(key):
+                return False
+        return True
+
+    def tasks_without_audio(self, tasks, limit):
+        """Первые limit заданий из tasks, у которых еще нет аудио"""
+        found = []
+        for task in tasks:
+            if not self.has_audio(task):
+                found.append(task)
+                if len(found) >= limit:
+                    break
+        return found
 
     def _clean_text_for_speech(self, text):
         """Очищает текст для лучшего озвучивания"""
@@ -139,31 +166,19 @@ class VoiceService:
     def generate_task_audio(self, task):
         """Генерирует аудио для задания"""
         try:
-            # Озвучиваем условие задания
-            task_text = "Задание по предмету {task.subject.name}. {task.title}. {task.description}"
-            task_audio = self.text_to_speech(task_text, task.id, "task")
-
-            # Озвучиваем решение если есть
-            solution_audio = None
-            if task.solution:
-                solution_text = "Решение. {task.solution}"
-                solution_audio = self.text_to_speech(solution_text, task.id, "solution")
-
-            # Обновляем модель задания
-            if task_audio:
-                task.audio_file = task_audio
-                task.save()
-                logger.info("Аудио для задания {task.id} сохранено")
-
-            return {"task_audio": task_audio, "solution_audio": solution_audio}
-
-        except Exception:
-            logger.error("Ошибка генерации аудио для задания {task.id}: {str(e)}")
+            audio, _ = self.generate_tasks_audio([task])
+            result = audio[task.id]
+            if result["task_audio"]:
+                logger.info(f"Аудио для задания {task.id} создано")
+            return result
+
+        except Exception as e:
+            logger.error(f"Ошибка генерации аудио для задания {task.id}: {e}")
             return None
 
     def generate_hint_audio(self, hint_text):
         """Генерирует аудио для подсказки"""
-        hint_text = "Подсказка. {hint_text}"
+        hint_text = f"Подсказка. {hint_text}"
         return self.text_to_speech(hint_text, voice_type="hint")
 
     def cleanup_old_audio(self, days=30):
@@ -172,57 +187,44 @@ class VoiceService:
             import time
 
             cutoff_time = time.time() - (days * 24 * 60 * 60)
-            deleted_count = 0
+            deleted = []
 
             for audio_file in self.audio_dir.glob("*.mp3"):
                 if audio_file.stat().st_mtime < cutoff_time:
                     audio_file.unlink()
-                    deleted_count += 1
+                    deleted.append(audio_file.stem)
+
+            if deleted:
+                self.pipeline.index.forget(deleted)
 
-            logger.info("Удалено старых аудиофайлов: {deleted_count}")
-            return deleted_count
+            logger.info(f"Удалено старых аудиофайлов: {len(deleted)}")
+            return len(deleted)
 
-        except Exception:
-            logger.error("Ошибка очистки аудиофайлов: {str(e)}")
+        except Exception as e:
+            logger.error(f"Ошибка очистки аудиофайлов: {e}")
             return 0
 
     def get_audio_url(self, relative_path):
-        """Возвращает полный URL аудиофайла"""
+        """Возвращает URL эндпоинта отдачи аудиофайла (с поддержкой Range)"""
         if not relative_path:
             return None
-        return "{settings.MEDIA_URL}{relative_path}"
+        from core.audio_delivery import audio_url
+
+        return audio_url(relative_path) or f"{settings.MEDIA_URL}{relative_path}"
 
 
 # Глобальный экземпляр сервиса
 voice_service = VoiceService()
 
 
-def generate_task_voices():
-    """Генерирует голосовые файлы для всех активных заданий"""
+def generate_task_voices(limit=50):
+    """Генерирует голосовые файлы для заданий одной параллельной пачкой"""
     from learning.models import Task
 
     logger.info("Начинаем генерацию голосовых файлов...")
 
-    tasks = Task.objects.filter(is_active=True, audio_file__isnull=True)[  # type: ignore
-        :50
-    ]  # Ограничиваем для экономии
-    generated_count = 0
-
-    for task in tasks:
-        try:
-            result = voice_service.generate_task_audio(task)
-            if result and result["task_audio"]:
-                generated_count += 1
-                logger.info("Аудио создано для задания: {task.title}")
-
-            # Пауза между генерациями для экономии ресурсов
-            import time
-
-            time.sleep(1)
-
-        except Exception:
-            logger.error("Ошибка генерации аудио для {task.id}: {str(e)}")
-            continue
+    tasks = list(Task.objects.select_related("subject").order_by("-id")[:limit])  # type: ignore
+    _, batch = voice_service.generate_tasks_audio(tasks)
 
-    logger.info("Генерация завершена. Создано аудиофайлов: {generated_count}")
-    return generated_count
+    logger.info(f"Генерация завершена. Создано аудиофайлов: {batch.synthesized}")
+    return batch.synthesized
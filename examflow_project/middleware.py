@@ -3,6 +3,7 @@ Middleware для обработки заголовков безопасност
 """
 
 import logging
+import time
 
 from django.conf import settings
 from django.db import connection
@@ -10,8 +11,56 @@ from django.db.utils import OperationalError
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 
+from core import metrics
+from core.query_budget import check_budget, track_queries
+
 logger = logging.getLogger(__name__)
 
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_seconds", "Время обработки HTTP-запроса", ("view", "method", "status")
+)
+REQUEST_QUERIES = metrics.histogram(
+    "http_request_db_queries",
+    "SQL-запросов на HTTP-запрос",
+    ("view",),
+    buckets=metrics.COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = metrics.histogram(
+    "http_request_db_seconds", "Время в базе на HTTP-запрос", ("view",)
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Время ответа и число SQL-запросов каждого запроса в core.metrics
+
+    Метка view — имя маршрута (resolver_match.view_name), а не путь, чтобы
+    число серий не росло с числом URL. Запросы сверяются с бюджетом
+    маршрута из QUERY_BUDGET_CONFIG (core.query_budget).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with track_queries() as stats:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        stats.label = match.view_name if match else "unmatched"
+        REQUEST_SECONDS.observe(
+            elapsed,
+            view=stats.label,
+            method=request.method,
+            status=f"{response.status_code // 100}xx",
+        )
+        REQUEST_QUERIES.observe(stats.count, view=stats.label)
+        REQUEST_DB_SECONDS.observe(stats.duration, view=stats.label)
+        check_budget(stats)
+        return response
+
 
 class DatabaseErrorMiddleware(MiddlewareMixin):
     """
@@ -131,6 +131,44 @@ TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 SITE_URL = os.getenv("SITE_URL", "https://examflow.ru")
 
+# Квоты запросов к ИИ (ai.quota): атомарные счетчики в кэше
+AI_QUOTA_CONFIG = {
+    "GUEST_LIMIT": 10,
+    "USER_LIMIT": 30,
+    "WINDOW": "daily",  # daily | sliding
+    "WINDOW_SECONDS": 86400,
+    "PERSIST_INTERVAL": 300,
+}
+
+# Журнал запросов к ИИ (ai.audit): очередь и пакетная запись AiRequest
+AI_AUDIT_CONFIG = {
+    "QUEUE_SIZE": 5000,
+    "BATCH_SIZE": 100,
+    "FLUSH_INTERVAL": 2.0,
+    "SAMPLE_RATE": float(os.getenv("AI_AUDIT_SAMPLE_RATE", "1.0")),
+    "MAX_RESPONSE_CHARS": 4000,
+}
+
+# Маршрутизация провайдеров ИИ (ai.router): автоматы защиты и дублирование
+AI_ROUTER_CONFIG = {
+    "FAILURE_THRESHOLD": 3,
+    "RECOVERY_TIMEOUT": 30.0,
+    "DEADLINE": float(os.getenv("AI_ROUTER_DEADLINE", "8.0")),
+    "HEDGE": True,
+    "EXTRA_GEMINI_MODELS": [
+        model
+        for model in os.getenv("AI_ROUTER_EXTRA_GEMINI_MODELS", "").split(",")
+        if model
+    ],
+}
+
+# Пакетная генерация ответов ИИ (ai.batch, команда prewarm_ai_answers)
+AI_BATCH_CONFIG = {
+    "WORKERS": 4,
+    "RATE_PER_SECOND": float(os.getenv("AI_BATCH_RATE_PER_SECOND", "1.0")),
+    "PROMPTS_PER_REQUEST": 5,
+}
+
 # Настройки RAG системы
 RAG_CONFIG = {
     "MAX_CONTEXT_LENGTH": 4000,
@@ -146,6 +184,40 @@ FIPI_CONFIG = {
     "MAX_RETRIES": 3,
 }
 
+# Настройки краулера ФИПИ: параллельность и вежливость к хостам
+FIPI_CRAWLER_CONFIG = {
+    "MAX_WORKERS": int(os.getenv("FIPI_CRAWLER_MAX_WORKERS", "8")),
+    "PER_HOST_CONCURRENCY": 2,  # одновременных запросов к одному хосту
+    "PER_HOST_DELAY": 0.5,  # секунд между стартами запросов к хосту
+    "TIMEOUT": 30,
+}
+
+# Планировщик обхода источников FIPISourceMap
+FIPI_FRONTIER_CONFIG = {
+    "CONCURRENCY": 8,
+    "TIME_BUDGET": 600,  # секунд на ежедневный запуск
+    "WEEKLY_TIME_BUDGET": 3600,
+    "MAX_SOURCES": 500,
+    "MIN_INTERVAL_HOURS": 6,
+    "MAX_INTERVAL_DAYS": 365,
+}
+
+# Конвейер озвучивания (core.tts_pipeline)
+TTS_PIPELINE_CONFIG = {
+    "ENGINE": os.getenv("TTS_ENGINE", "gtts"),  # gtts | stub
+    "WORKERS": 4,
+    "RATE_PER_SECOND": 2.0,
+    "BATCH_SIZE": 100,
+}
+
+# Отдача озвучки (core.audio_delivery)
+AUDIO_DELIVERY_CONFIG = {
+    "MAX_AGE": 31536000,
+    # За nginx: "X-Accel-Redirect" и internal location для SENDFILE_PREFIX
+    "SENDFILE_HEADER": os.getenv("AUDIO_SENDFILE_HEADER", ""),
+    "SENDFILE_PREFIX": "/protected/audio/",
+}
+
 # Настройки Telegram бота
 TELEGRAM_BOT_CONFIG = {
     "WEBHOOK_URL": os.getenv("TELEGRAM_WEBHOOK_URL", ""),
@@ -155,6 +227,57 @@ TELEGRAM_BOT_CONFIG = {
     "MOBILE_TIMEOUT": 15,  # Сокращенный timeout для мобильных
     "AI_RESPONSE_TIMEOUT": 10,  # Timeout для AI ответов
     "CACHE_AI_RESPONSES": True,  # Кэширование AI ответов
+    "STREAM_EDIT_INTERVAL": 1.5,  # Секунд между правками потокового ответа
+    "STREAM_MIN_DELTA": 40,  # Символов прироста для промежуточной правки
+}
+
+# Снимок каталога предметов/тем для меню (learning.catalog)
+CATALOG_CONFIG = {
+    "CACHE_TTL": 24 * 3600,
+    "CHECK_INTERVAL": 30,
+    "MENU_LIMIT": 15,
+}
+
+# Сводка прогресса по предметам (learning/progress.py)
+PROGRESS_CONFIG = {
+    "CACHE_TTL": 60,
+}
+
+# Темы оформления: cookie, кэш предпочтений и учет переключений (themes/preferences.py)
+THEME_CONFIG = {
+    "CACHE_TTL": 24 * 3600,
+    "USAGE_FLUSH_INTERVAL": 30.0,
+}
+
+# Кэш профиля пользователя бота и запись активности (telegram_bot/profile_cache.py)
+PROFILE_CACHE_CONFIG = {
+    "CACHE_TTL": 15 * 60,
+    "ACTIVITY_INTERVAL": 5 * 60,
+}
+
+# Состояние диалогов бота: текущее задание, режим ИИ, меню (telegram_bot/chat_state.py)
+CHAT_STATE_CONFIG = {
+    "TTL": 24 * 3600,
+    "SNAPSHOT_INTERVAL": 60,
+}
+
+# Очки и достижения бота (telegram_bot/gamification/achievement_engine.py)
+ACHIEVEMENT_CONFIG = {
+    "POINTS_PER_CORRECT": 10,
+    "POINTS_PER_LEVEL": 100,
+}
+
+# Выбор случайного нерешенного задания (learning/sampling.py)
+SAMPLING_CONFIG = {
+    "BATCH_SIZE": 32,
+    "ATTEMPTS": 3,
+}
+
+# Проверка ответов на задания (learning/answers.py)
+ANSWER_CONFIG = {
+    "CACHE_SIZE": 4096,
+    "MAX_AGE": 300,
+    "DIGIT_SET_SUBJECTS": ["русск"],
 }
 
 # Настройки кэширования
@@ -171,6 +294,55 @@ MONITORING_CONFIG = {
     "ERROR_REPORTING": True,
 }
 
+# Общий клиент Telegram Bot API процесса (telegram_bot.client)
+TELEGRAM_CLIENT_CONFIG = {
+    "POOL_SIZE": int(os.getenv("TELEGRAM_POOL_SIZE", "32")),
+    "CONNECT_TIMEOUT": 5.0,
+    "READ_TIMEOUT": 10.0,
+    "POOL_TIMEOUT": 3.0,
+}
+
+# Холодный старт: прогрев модулей бота и задачи запуска (core.startup_profile)
+STARTUP_CONFIG = {
+    "PROBE_PATH": "/health/",
+    "FIRST_RESPONSE_TARGET_MS": 2000,
+    "PREWARM": os.getenv("STARTUP_PREWARM", "true").lower() in ("true", "1", "yes"),
+    "PREWARM_MODULES": ["telegram", "telegram_bot.bot_handlers"],
+    # Миграции и загрузка данных выполняются при деплое (start.sh, startup_jobs)
+    "RUN_JOBS": os.getenv("AUTO_STARTUP_ENABLED", "false").lower()
+    in ("true", "1", "yes"),
+}
+
+# Метрики с реального трафика, эндпоинт /metrics/ (core.metrics)
+METRICS_CONFIG = {
+    # Общий каталог снимков воркеров gunicorn; пусто — только текущий процесс
+    "MULTIPROCESS_DIR": os.getenv("METRICS_MULTIPROC_DIR", ""),
+    "FLUSH_INTERVAL": 10.0,
+    "TOKEN": os.getenv("METRICS_TOKEN", ""),
+}
+
+# Пробы зависимостей для health check и мониторинга бота (core.health_probes)
+HEALTH_PROBES_CONFIG = {
+    "CACHE_TTL": 30,  # секунд между запусками проб
+    "TIMEOUT": 3.0,
+    "AI_TRAFFIC_WINDOW": 900,
+}
+
+# Бюджеты SQL-запросов по маршрутам и обработчикам бота (core.query_budget)
+QUERY_BUDGET_CONFIG = {
+    "ENABLED": True,
+    "BUDGETS": {
+        "learning:home": 10,
+        "learning:subjects_list": 10,
+        "learning:subject_detail": 10,
+        "learning:task_detail": 10,
+        "bot:subjects_menu": 2,
+        "bot:show_subject_topics": 4,
+        "bot:subjects_progress_handler": 2,
+    },
+    "DEFAULT_BUDGET": 50,  # выше — почти наверняка N+1
+}
+
 # Настройки безопасности
 SECURITY_CONFIG = {
     "RATE_LIMIT_PER_MINUTE": 60,
@@ -195,6 +367,14 @@ NOTIFICATION_CONFIG = {
     "DIGEST_FREQUENCY": "weekly",
 }
 
+# Массовые рассылки в Telegram (core.broadcast)
+BROADCAST_CONFIG = {
+    "GLOBAL_RATE": 28,  # сообщений в секунду (лимит Bot API ~30)
+    "PER_CHAT_INTERVAL": 1.0,
+    "WORKERS": 8,
+    "BATCH_SIZE": 500,
+}
+
 # Настройки для тестирования
 if "test" in sys.argv:
     # Упрощенные настройки для тестов
@@ -65,6 +65,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "examflow_project.middleware.RequestMetricsMiddleware",
+    "core.auto_startup.trigger_startup_on_first_request",
     "corsheaders.middleware.CorsMiddleware",
     "csp.middleware.CSPMiddleware",
     "telegram_auth.middleware.TelegramAuthMiddleware",
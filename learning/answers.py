@@ -0,0 +1,232 @@
+"""
+Проверка ответов на задания
+
+Ответ задания разбирается один раз в AnswerMatcher: варианты "a|b",
+числа (0,5 = 0.5 = 1/2, с допуском), наборы цифр без учета порядка для
+заданий по русскому языку ("134" = "4, 3, 1") и текст без учета регистра,
+пробелов и "ё". Разобранные ответы держатся в LRU по ID задания и хешу
+текста ответа: проверка — поиск в словаре и разбор ответа пользователя.
+Без текста ответа (get_matcher(task_id)) он читается из базы только при
+промахе или по истечении MAX_AGE; изменение задания (сигналы, массовая
+загрузка) сбрасывает разобранный ответ.
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fractions import Fraction
+
+from django.conf import settings
+
+from core.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANSWER_CONFIG = {
+    "CACHE_SIZE": 4096,  # разобранных ответов в памяти процесса
+    "MAX_AGE": 300,  # секунд до перечитывания ответа из базы
+    "REL_TOLERANCE": 1e-9,
+    "ABS_TOLERANCE": 1e-9,
+    "VARIANT_SEPARATOR": "|",
+    # Предметы (подстрока названия), где ответ из цифр — набор без порядка
+    "DIGIT_SET_SUBJECTS": ["русск"],
+}
+
+_SPACES_RE = re.compile(r"\s+")
+_NUMBER_RE = re.compile(r"[+-]?(\d+(\.\d*)?|\.\d+)(/\d+)?")
+_DIGIT_SET_RE = re.compile(r"\d(?:[\s,;]*\d)+")
+_TRAILING = " .;"
+
+
+def get_answer_config() -> dict:
+    """Возвращает настройки проверки ответов с учетом ANSWER_CONFIG"""
+    config = dict(DEFAULT_ANSWER_CONFIG)
+    config.update(getattr(settings, "ANSWER_CONFIG", {}))
+    return config
+
+
+def normalize_text(value) -> str:
+    """Текст ответа без регистра, лишних пробелов, "ё" и точки в конце"""
+    text = _SPACES_RE.sub(" ", str(value)).strip().rstrip(_TRAILING).lower()
+    return text.replace("ё", "е")
+
+
+def parse_number(text: str) -> Fraction | None:
+    """Число из нормализованного текста: 0,5, -1/2, 1 000, 2.5"""
+    compact = text.replace(" ", "").replace("−", "-").replace(",", ".")
+    if not _NUMBER_RE.fullmatch(compact):
+        return None
+    try:
+        return Fraction(compact)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def parse_digit_set(text: str) -> str | None:
+    """Цифры ответа по порядку ("4, 1, 3" -> "134") или None"""
+    if not _DIGIT_SET_RE.fullmatch(text):
+        return None
+    return "".join(sorted(ch for ch in text if ch.isdigit()))
+
+
+@dataclass(frozen=True)
+class AnswerMatcher:
+    """Разобранный ответ задания"""
+
+    answer: str
+    digest: int
+    texts: frozenset[str]
+    numbers: tuple[Fraction, ...]
+    digit_sets: frozenset[str]
+    rel_tolerance: float
+    abs_tolerance: float
+    loaded_at: float = 0.0
+
+    def matches(self, user_answer) -> bool:
+        """Совпадает ли ответ пользователя с одним из вариантов"""
+        if user_answer is None:
+            return False
+        text = normalize_text(user_answer)
+        if not text:
+            return False
+        if text in self.texts:
+            return True
+        if self.digit_sets and parse_digit_set(text) in self.digit_sets:
+            return True
+        if self.numbers:
+            number = parse_number(text)
+            if number is not None:
+                return any(
+                    number == expected
+                    or math.isclose(
+                        number,
+                        expected,
+                        rel_tol=self.rel_tolerance,
+                        abs_tol=self.abs_tolerance,
+                    )
+                    for expected in self.numbers
+                )
+        return False
+
+
+def compile_answer(
+    answer, digit_set: bool = False, config: dict | None = None
+) -> AnswerMatcher:
+    """Разбирает текст ответа задания в AnswerMatcher"""
+    config = config or get_answer_config()
+    answer = "" if answer is None else str(answer)
+    texts, numbers, digit_sets = set(), [], set()
+    for variant in answer.split(config["VARIANT_SEPARATOR"]):
+        text = normalize_text(variant)
+        if not text:
+            continue
+        texts.add(text)
+        digits = parse_digit_set(text) if digit_set else None
+        if digits is not None:
+            digit_sets.add(digits)
+            continue  # "134" в русском — не число сто тридцать четыре
+        number = parse_number(text)
+        if number is not None:
+            numbers.append(number)
+    return AnswerMatcher(
+        answer=answer,
+        digest=hash(answer),
+        texts=frozenset(texts),
+        numbers=tuple(numbers),
+        digit_sets=frozenset(digit_sets),
+        rel_tolerance=config["REL_TOLERANCE"],
+        abs_tolerance=config["ABS_TOLERANCE"],
+        loaded_at=time.monotonic(),
+    )
+
+
+def is_digit_set_subject(subject_name: str | None, config: dict | None = None) -> bool:
+    """Ответы предмета из цифр сравниваются как набор без порядка"""
+    config = config or get_answer_config()
+    name = (subject_name or "").lower()
+    return any(marker in name for marker in config["DIGIT_SET_SUBJECTS"])
+
+
+# (модель, ID задания) -> AnswerMatcher, самые старые в начале
+_matchers: OrderedDict[tuple[str, int], AnswerMatcher] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _task_model(model):
+    if model is not None:
+        return model
+    from learning.models import Task
+
+    return Task
+
+
+def get_matcher(task_id: int, answer=None, model=None) -> AnswerMatcher | None:
+    """
+    Разобранный ответ задания из LRU
+
+    Args:
+        task_id: ID задания
+        answer: текущий текст ответа, если он уже есть у вызывающего;
+            без него ответ читается из базы только при промахе
+        model: модель задания (по умолчанию learning.Task)
+
+    Returns:
+        AnswerMatcher или None, если задания нет
+    """
+    model = _task_model(model)
+    key = (model._meta.label_lower, task_id)
+    config = get_answer_config()
+    with _lock:
+        matcher = _matchers.get(key)
+        if matcher is not None:
+            fresh = (
+                matcher.digest == hash(str(answer))
+                if answer is not None
+                else time.monotonic() - matcher.loaded_at < config["MAX_AGE"]
+            )
+            if fresh:
+                _matchers.move_to_end(key)
+                CACHE_LOOKUPS.inc(cache="answers", result="hit")
+                return matcher
+    CACHE_LOOKUPS.inc(cache="answers", result="miss")
+
+    row = (
+        model.objects.filter(pk=task_id)  # type: ignore
+        .values_list("answer", "subject__name")
+        .first()
+    )
+    if row is None:
+        return None
+    db_answer, subject_name = row
+    matcher = compile_answer(
+        db_answer if answer is None else answer,
+        digit_set=is_digit_set_subject(subject_name, config),
+        config=config,
+    )
+    with _lock:
+        _matchers[key] = matcher
+        _matchers.move_to_end(key)
+        while len(_matchers) > config["CACHE_SIZE"]:
+            _matchers.popitem(last=False)
+    return matcher
+
+
+def check_answer(task_id: int, user_answer, answer=None, model=None) -> bool:
+    """Проверяет ответ пользователя на задание task_id"""
+    matcher = get_matcher(task_id, answer=answer, model=model)
+    return matcher is not None and matcher.matches(user_answer)
+
+
+def invalidate_matchers(task_ids=None, model=None) -> None:
+    """Сбрасывает разобранные ответы заданий (все, если task_ids не задан)"""
+    with _lock:
+        if task_ids is None:
+            _matchers.clear()
+            return
+        label = _task_model(model)._meta.label_lower
+        for task_id in task_ids:
+            _matchers.pop((label, task_id), None)
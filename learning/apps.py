@@ -16,3 +16,7 @@ class LearningConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"  # type: ignore
     name = "learning"
     verbose_name = "Обучение"
+
+    def ready(self):
+        """Подключает сигналы сброса снимка каталога"""
+        import learning.signals  # noqa: F401
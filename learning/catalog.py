@@ -0,0 +1,247 @@
+"""
+Снимок каталога предметов, тем и заданий
+
+Каталог меняется редко (загрузка заданий, правка в админке), а меню бота и
+страницы читают его на каждое нажатие. Снимок собирается двумя запросами,
+неизменяем, версионируется хешем содержимого и хранит готовые раскладки
+клавиатур (текст кнопки, callback_data). Снимок держится в памяти процесса
+и в кэше Django под ключом с номером поколения: другие процессы сверяют
+поколение не реже CHECK_INTERVAL секунд. Изменение Subject/Topic/Task
+(сигналы) или запуск загрузчика увеличивает поколение (cache.incr), поэтому
+снимок, собранный до сброса, ложится под старый ключ и никем не читается.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from core.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_CONFIG = {
+    "CACHE_KEY": "learning_catalog_snapshot",
+    "CACHE_TTL": 24 * 3600,
+    "CHECK_INTERVAL": 30,  # секунд между сверками версии с кэшем
+    "MENU_LIMIT": 15,  # предметов в меню бота
+    "TOPICS_LIMIT": 8,  # тем в меню предмета
+}
+
+
+def get_catalog_config() -> dict:
+    """Возвращает настройки каталога с учетом CATALOG_CONFIG"""
+    config = dict(DEFAULT_CATALOG_CONFIG)
+    config.update(getattr(settings, "CATALOG_CONFIG", {}))
+    return config
+
+
+@dataclass(frozen=True)
+class CatalogTopic:
+    id: int
+    name: str
+    code: str
+
+
+@dataclass(frozen=True)
+class CatalogSubject:
+    id: int
+    name: str
+    code: str
+    exam_type: str
+    exam_type_display: str
+    description: str
+    icon: str
+    is_primary: bool
+    is_archived: bool
+    tasks_count: int
+    topics: tuple[CatalogTopic, ...] = ()
+
+
+# Раскладка клавиатуры: строки из кнопок (текст, callback_data)
+KeyboardLayout = tuple[tuple[tuple[str, str], ...], ...]
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога"""
+
+    version: str
+    built_at: float
+    subjects: tuple[CatalogSubject, ...]
+    keyboards: dict[str, KeyboardLayout] = field(default_factory=dict)
+    _by_id: dict[int, CatalogSubject] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        object.__setattr__(self, "_by_id", {s.id: s for s in self.subjects})
+
+    def subject(self, subject_id: int) -> CatalogSubject | None:
+        return self._by_id.get(subject_id)
+
+    @property
+    def active_subjects(self) -> list[CatalogSubject]:
+        return [s for s in self.subjects if not s.is_archived]
+
+    @property
+    def menu_subjects(self) -> list[CatalogSubject]:
+        """Предметы с заданиями, больше заданий — выше"""
+        with_tasks = [s for s in self.subjects if s.tasks_count]
+        return sorted(with_tasks, key=lambda s: (-s.tasks_count, s.name))
+
+    @property
+    def total_tasks(self) -> int:
+        return sum(s.tasks_count for s in self.subjects)
+
+    def keyboard(self, name: str) -> KeyboardLayout:
+        return self.keyboards.get(name, ())
+
+
+def _build_keyboards(subjects: list[CatalogSubject], config: dict) -> dict:
+    menu = sorted(
+        (s for s in subjects if s.tasks_count), key=lambda s: (-s.tasks_count, s.name)
+    )
+    keyboards: dict[str, KeyboardLayout] = {
+        "subjects": tuple(
+            ((f"{s.name} ({s.tasks_count} заданий)", f"subject_{s.id}"),)
+            for s in menu[: config["MENU_LIMIT"]]
+        )
+        + ((("🏠 Главная", "main_menu"),),)
+    }
+    for subject in subjects:
+        keyboards[f"topics_{subject.id}"] = tuple(
+            ((topic.name, f"topic_{subject.id}_{index}"),)
+            for index, topic in enumerate(subject.topics[: config["TOPICS_LIMIT"]])
+        ) + ((("🔙 Назад", "subjects"),),)
+    return keyboards
+
+
+def build_catalog(config: dict | None = None) -> CatalogSnapshot:
+    """Собирает снимок каталога из базы (два запроса)"""
+    from .models import Subject, Topic
+
+    config = config or get_catalog_config()
+    topics: dict[int, list[CatalogTopic]] = {}
+    for topic in Topic.objects.order_by("subject_id", "code", "id").values(  # type: ignore
+        "id", "name", "code", "subject_id"
+    ):
+        topics.setdefault(topic["subject_id"], []).append(
+            CatalogTopic(topic["id"], topic["name"], topic["code"])
+        )
+
+    exam_types = dict(Subject.EXAM_TYPES)
+    subjects = [
+        CatalogSubject(
+            id=row["id"],
+            name=row["name"],
+            code=row["code"],
+            exam_type=row["exam_type"],
+            exam_type_display=exam_types.get(row["exam_type"], row["exam_type"]),
+            description=row["description"],
+            icon=row["icon"],
+            is_primary=row["is_primary"],
+            is_archived=row["is_archived"],
+            tasks_count=row["tasks_count"],
+            topics=tuple(topics.get(row["id"], ())),
+        )
+        for row in Subject.objects.annotate(tasks_count=Count("task"))  # type: ignore
+        .order_by("name", "id")
+        .values(
+            "id",
+            "name",
+            "code",
+            "exam_type",
+            "description",
+            "icon",
+            "is_primary",
+            "is_archived",
+            "tasks_count",
+        )
+    ]
+
+    content = json.dumps([asdict(s) for s in subjects], ensure_ascii=False)
+    return CatalogSnapshot(
+        version=hashlib.sha256(content.encode("utf-8")).hexdigest()[:16],
+        built_at=time.time(),
+        subjects=tuple(subjects),
+        keyboards=_build_keyboards(subjects, config),
+    )
+
+
+_snapshot: CatalogSnapshot | None = None
+_generation: int | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _generation_key(config: dict) -> str:
+    return f"{config['CACHE_KEY']}:generation"
+
+
+def _current_generation(config: dict) -> int:
+    """Номер поколения каталога из кэша, создает его при отсутствии"""
+    key = _generation_key(config)
+    generation = cache.get(key)
+    if generation is None:
+        # Счетчик вытеснен или еще не создан: новое значение не совпадет
+        # с поколениями, под которыми могли остаться старые снимки
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key) or 0
+    return generation
+
+
+def get_catalog() -> CatalogSnapshot:
+    """
+    Текущий снимок каталога
+
+    Пока снимок в памяти свежий, обращений к базе и кэшу нет. Раз в
+    CHECK_INTERVAL поколение сверяется с кэшем; база читается, только если
+    снимка текущего поколения в кэше нет.
+    """
+    global _snapshot, _generation, _checked_at
+    config = get_catalog_config()
+    snapshot = _snapshot
+    if snapshot and time.monotonic() - _checked_at < config["CHECK_INTERVAL"]:
+        CACHE_LOOKUPS.inc(cache="catalog", result="hit")
+        return snapshot
+
+    with _lock:
+        generation = _current_generation(config)
+        if _snapshot is not None and generation == _generation:
+            CACHE_LOOKUPS.inc(cache="catalog", result="shared")
+        else:
+            key = f"{config['CACHE_KEY']}:{generation}"
+            cached = cache.get(key)
+            if cached is not None:
+                CACHE_LOOKUPS.inc(cache="catalog", result="shared")
+                _snapshot = cached
+            else:
+                # Снимка поколения нет: каталог изменился или кэш вытеснен.
+                # Если за время сборки поколение сменится, снимок останется
+                # под старым ключом и не перекроет новый
+                CACHE_LOOKUPS.inc(cache="catalog", result="miss")
+                _snapshot = build_catalog(config)
+                logger.info(f"Собран снимок каталога {_snapshot.version}")
+                cache.set(key, _snapshot, config["CACHE_TTL"])
+            _generation = generation
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+def invalidate_catalog() -> None:
+    """Сбрасывает снимок в процессе и поколение в кэше"""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+    config = get_catalog_config()
+    try:
+        cache.incr(_generation_key(config))
+    except ValueError:
+        _current_generation(config)
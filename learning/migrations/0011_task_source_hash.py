@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("learning", "0010_alter_subject_exam_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="source_hash",
+            field=models.CharField(
+                blank=True,
+                help_text="Естественный ключ задания для массовой загрузки",
+                max_length=64,
+                null=True,
+                verbose_name="Хеш источника",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="task",
+            constraint=models.UniqueConstraint(
+                fields=("subject", "source_hash"),
+                name="learning_task_subject_source_hash_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("learning", "0011_task_source_hash"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="userprogress",
+            index=models.Index(
+                fields=["user", "task"], name="learning_progress_user_task"
+            ),
+        ),
+    ]
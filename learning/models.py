@@ -109,14 +109,37 @@ class Task(models.Model):
     source = models.CharField(
         max_length=200, blank=True, null=True, verbose_name="Источник"
     )
+    source_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        verbose_name="Хеш источника",
+        help_text="Естественный ключ задания для массовой загрузки",
+    )
 
     class Meta:
         verbose_name = "Задание"
         verbose_name_plural = "Задания"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["subject", "source_hash"],
+                name="learning_task_subject_source_hash_uniq",
+            )
+        ]
 
     def __str__(self):
         return self.title
 
+    def check_answer(self, user_answer):
+        """Проверяет правильность ответа пользователя (learning.answers)"""
+        from learning.answers import check_answer, compile_answer
+
+        if not self.answer:
+            return False
+        if self.pk is None:
+            return compile_answer(self.answer).matches(user_answer)
+        return check_answer(self.pk, user_answer, answer=self.answer)
+
 
 class UserProgress(models.Model):
     """Прогресс пользователя по заданиям"""
@@ -141,6 +164,10 @@ class UserProgress(models.Model):
     class Meta:
         verbose_name = "Прогресс пользователя"
         verbose_name_plural = "Прогресс пользователей"
+        indexes = [
+            # Проверка "решено ли задание" по (пользователь, задание) без перебора
+            models.Index(fields=["user", "task"], name="learning_progress_user_task"),
+        ]
 
 
 class UserRating(models.Model):
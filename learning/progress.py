@@ -0,0 +1,147 @@
+"""
+Сводка прогресса пользователя по предметам
+
+Решенные и начатые задания по предметам считаются одним сгруппированным
+запросом к UserProgress, а общее число заданий предмета берется из снимка
+каталога (learning.catalog), поэтому число запросов не зависит от числа
+предметов. Сводка кэшируется на CACHE_TTL секунд по пользователю; новая
+запись прогресса (сигналы) сбрасывает кэш пользователя.
+"""
+
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from core.metrics import CACHE_LOOKUPS
+
+from .catalog import get_catalog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROGRESS_CONFIG = {
+    "CACHE_PREFIX": "progress_summary",
+    "CACHE_TTL": 60,  # секунд; новая попытка сбрасывает кэш раньше
+}
+
+
+def get_progress_config() -> dict:
+    """Возвращает настройки сводки прогресса с учетом PROGRESS_CONFIG"""
+    config = dict(DEFAULT_PROGRESS_CONFIG)
+    config.update(getattr(settings, "PROGRESS_CONFIG", {}))
+    return config
+
+
+@dataclass(frozen=True)
+class SubjectProgress:
+    """Прогресс по одному предмету"""
+
+    subject_id: int
+    name: str
+    total: int
+    attempted: int = 0
+    solved: int = 0
+
+    @property
+    def percent(self) -> float:
+        """Доля решенных заданий предмета, %"""
+        return round(self.solved / self.total * 100, 1) if self.total else 0.0
+
+    @property
+    def accuracy(self) -> float:
+        """Доля верно решенных среди начатых, %"""
+        return round(self.solved / self.attempted * 100, 1) if self.attempted else 0.0
+
+    def as_stats(self) -> dict:
+        return {
+            "total_tasks": self.total,
+            "attempted_tasks": self.attempted,
+            "solved_tasks": self.solved,
+            "progress_percent": self.percent,
+            "accuracy": self.accuracy,
+        }
+
+
+@dataclass(frozen=True)
+class ProgressSummary:
+    """Прогресс пользователя по всем предметам каталога"""
+
+    user_id: int
+    subjects: tuple[SubjectProgress, ...]
+
+    def subject(self, subject_id: int) -> SubjectProgress | None:
+        for item in self.subjects:
+            if item.subject_id == subject_id:
+                return item
+        return None
+
+    @property
+    def started(self) -> list[SubjectProgress]:
+        """Предметы, в которых есть попытки"""
+        return [item for item in self.subjects if item.attempted]
+
+    @property
+    def solved(self) -> int:
+        return sum(item.solved for item in self.subjects)
+
+    @property
+    def attempted(self) -> int:
+        return sum(item.attempted for item in self.subjects)
+
+    @property
+    def total(self) -> int:
+        return sum(item.total for item in self.subjects)
+
+
+def build_progress_summary(user_id: int) -> ProgressSummary:
+    """Собирает сводку из базы: один запрос к UserProgress"""
+    from .models import UserProgress
+
+    counts = {
+        row["task__subject_id"]: row
+        for row in UserProgress.objects.filter(user_id=user_id)  # type: ignore
+        .values("task__subject_id")
+        .annotate(
+            attempted=Count("id"),
+            solved=Count("id", filter=Q(is_correct=True)),
+        )
+        .order_by()
+    }
+    subjects = []
+    for subject in get_catalog().subjects:
+        row = counts.get(subject.id, {})
+        subjects.append(
+            SubjectProgress(
+                subject_id=subject.id,
+                name=subject.name,
+                total=subject.tasks_count,
+                attempted=row.get("attempted", 0),
+                solved=row.get("solved", 0),
+            )
+        )
+    return ProgressSummary(user_id=user_id, subjects=tuple(subjects))
+
+
+def _cache_key(user_id: int, config: dict) -> str:
+    return f"{config['CACHE_PREFIX']}:{user_id}"
+
+
+def get_progress_summary(user_id: int) -> ProgressSummary:
+    """Сводка прогресса пользователя из кэша или из базы"""
+    config = get_progress_config()
+    key = _cache_key(user_id, config)
+    summary = cache.get(key)
+    if summary is not None:
+        CACHE_LOOKUPS.inc(cache="progress", result="hit")
+        return summary
+    CACHE_LOOKUPS.inc(cache="progress", result="miss")
+    summary = build_progress_summary(user_id)
+    cache.set(key, summary, config["CACHE_TTL"])
+    return summary
+
+
+def invalidate_progress(user_id: int) -> None:
+    """Сбрасывает кэш сводки пользователя"""
+    cache.delete(_cache_key(user_id, get_progress_config()))
@@ -0,0 +1,101 @@
+"""
+Случайное нерешенное задание без выборки всех заданий
+
+Из диапазона ID заданий (крайние ID по индексу) берется пачка случайных
+чисел и одним запросом проверяется, какие из них — существующие задания,
+не решенные пользователем; из попаданий выбирается одно. Каждый ID
+попадает в пачку с одинаковой вероятностью, поэтому выбор равномерный,
+а стоимость не зависит от числа заданий и решенных. Если за ATTEMPTS
+пачек попаданий нет (разреженный диапазон, почти все решено), берется
+ближайшее нерешенное задание от случайной точки по индексу.
+"""
+
+import logging
+import random
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLING_CONFIG = {
+    "BATCH_SIZE": 32,  # случайных ID в одном запросе
+    "ATTEMPTS": 3,  # пачек до перехода к поиску от случайной точки
+}
+
+
+def get_sampling_config() -> dict:
+    """Возвращает настройки выбора заданий с учетом SAMPLING_CONFIG"""
+    config = dict(DEFAULT_SAMPLING_CONFIG)
+    config.update(getattr(settings, "SAMPLING_CONFIG", {}))
+    return config
+
+
+def unsolved_tasks(user_id: int | None = None, subject_id: int | None = None):
+    """Задания предмета (или все), которые пользователь еще не решил"""
+    from .models import Task, UserProgress
+
+    tasks = Task.objects.all()  # type: ignore
+    if subject_id is not None:
+        tasks = tasks.filter(subject_id=subject_id)
+    if user_id is not None:
+        solved = UserProgress.objects.filter(  # type: ignore
+            user_id=user_id, task_id=OuterRef("pk"), is_correct=True
+        )
+        tasks = tasks.filter(~Exists(solved))
+    return tasks
+
+
+def _id_bounds(subject_id: int | None) -> tuple[int | None, int | None]:
+    """Крайние ID заданий: два поиска по индексу"""
+    # Min и Max в одном запросе SQLite считает перебором таблицы
+    from .models import Task
+
+    ids = Task.objects.all()  # type: ignore
+    if subject_id is not None:
+        ids = ids.filter(subject_id=subject_id)
+    ids = ids.values_list("id", flat=True)
+    return ids.order_by("id").first(), ids.order_by("-id").first()
+
+
+def sample_task(tasks, subject_id: int | None = None, config: dict | None = None):
+    """
+    Равномерно случайная строка queryset заданий по диапазону ID
+
+    Returns:
+        элемент tasks (модель или значение values_list) или None
+    """
+    config = config or get_sampling_config()
+    low, high = _id_bounds(subject_id)
+    if low is None:
+        return None
+
+    for _ in range(config["ATTEMPTS"]):
+        candidates = {
+            random.randint(low, high)
+            for _ in range(min(config["BATCH_SIZE"], high - low + 1))
+        }
+        hits = list(tasks.filter(id__in=candidates))
+        if hits:
+            return random.choice(hits)
+
+    # Попаданий нет: ближайшее нерешенное после случайной точки, иначе до нее
+    pivot = random.randint(low, high)
+    return (
+        tasks.filter(id__gte=pivot).order_by("id").first()
+        or tasks.filter(id__lt=pivot).order_by("-id").first()
+    )
+
+
+def random_unsolved_task_id(
+    user_id: int | None = None, subject_id: int | None = None
+) -> int | None:
+    """ID случайного нерешенного задания или None, если таких нет"""
+    tasks = unsolved_tasks(user_id, subject_id).values_list("id", flat=True)
+    return sample_task(tasks, subject_id)
+
+
+def random_unsolved_task(user_id: int | None = None, subject_id: int | None = None):
+    """Случайное нерешенное задание (с предметом) или None"""
+    tasks = unsolved_tasks(user_id, subject_id).select_related("subject")
+    return sample_task(tasks, subject_id)
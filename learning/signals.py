@@ -0,0 +1,37 @@
+"""
+Сигналы модуля обучения
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .answers import invalidate_matchers
+from .catalog import invalidate_catalog
+from .models import Subject, Task, Topic, UserProgress
+from .progress import invalidate_progress
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def catalog_changed(sender, **kwargs):
+    """Сбрасывает снимок каталога после фиксации изменения"""
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def task_answer_changed(sender, instance, **kwargs):
+    """Сбрасывает разобранный ответ измененного задания"""
+    invalidate_matchers([instance.pk])
+
+
+@receiver(post_save, sender=UserProgress)
+@receiver(post_delete, sender=UserProgress)
+def progress_changed(sender, instance, **kwargs):
+    """Сбрасывает кэш сводки прогресса пользователя после фиксации"""
+    transaction.on_commit(lambda: invalidate_progress(instance.user_id))
@@ -11,16 +11,18 @@
 """
 
 import logging
-import random
 import time
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
-from core.models import UserProgress  # type: ignore
-from learning.models import Subject, Task  # type: ignore
+from learning.answers import get_matcher
+from learning.catalog import get_catalog
+from learning.models import Subject, Task, UserProgress  # type: ignore
+from learning.progress import get_progress_summary
+from learning.sampling import random_unsolved_task_id
 
 # import core.seo as seo_utils  # Модуль удален
 
@@ -39,31 +41,24 @@ def home(request):
     - Тарифные планы
     - Блок персонализации (для авторизованных)
     """
-    # Получаем статистику с обработкой ошибок БД
+    # Статистика и список предметов из снимка каталога
     try:
-        base_qs = Subject.objects.filter(  # type: ignore
-            is_archived=False, is_primary=True
-        )  # type: ignore
-        subjects_count = base_qs.count()  # type: ignore
-        tasks_count = Task.objects.count()  # type: ignore
+        catalog = get_catalog()
+        base = [s for s in catalog.active_subjects if s.is_primary]
+        subjects_count = len(base)
+        tasks_count = catalog.total_tasks
     except Exception as e:
         # Если БД недоступна, используем значения по умолчанию
         logger.warning(f"Database error in home view: {e}")
-        base_qs = Subject.objects.none()  # type: ignore
+        base = []
         subjects_count = 0
         tasks_count = 0
 
-    # Фокус: только математика и русский; безопасный запасной вариант
-    try:
-        if base_qs.exists():  # type: ignore
-            math_qs = base_qs.filter(name__icontains="математ")  # type: ignore
-            rus_qs = base_qs.filter(name__icontains="русск")  # type: ignore
-            subjects = math_qs.union(rus_qs).order_by("name")  # type: ignore
-        else:
-            subjects = base_qs  # type: ignore
-    except Exception as e:
-        logger.warning(f"Error filtering subjects: {e}")
-        subjects = base_qs  # type: ignore
+    # Фокус: только математика и русский
+    subjects = sorted(
+        (s for s in base if "математ" in s.name.lower() or "русск" in s.name.lower()),
+        key=lambda s: s.name,
+    )
 
     context = {
         "subjects_count": subjects_count,
@@ -95,18 +90,19 @@ def subjects_list(request):
     except Exception:
         subjects = Subject.objects.all().order_by("name")  # type: ignore
 
-    # Добавляем прогресс для авторизованных пользователей
-    if request.user.is_authenticated:
-        for subject in subjects:
-            # Считаем решенные задания для предмета
-            solved_tasks = UserProgress.objects.filter(  # type: ignore
-                user=request.user, task__subject=subject, is_correct=True
-            ).count()
-            subject.user_progress = solved_tasks
-
-    # Добавляем количество заданий для каждого предмета
+    # Число заданий — из снимка каталога, прогресс — одним запросом на сводку
+    catalog = get_catalog()
+    summary = (
+        get_progress_summary(request.user.pk)
+        if request.user.is_authenticated
+        else None
+    )
     for subject in subjects:
-        subject.task_count = Task.objects.filter(subject=subject).count()  # type: ignore
+        cached = catalog.subject(subject.id)
+        subject.task_count = cached.tasks_count if cached else 0
+        if summary is not None:
+            progress = summary.subject(subject.id)
+            subject.user_progress = progress.solved if progress else 0
 
     context = {
         "subjects": subjects,
@@ -158,18 +154,12 @@ def subject_detail(request, subject_id):
     user_stats = {}
     if request.user.is_authenticated:
         try:
-            total_tasks = Task.objects.filter(subject=subject).count()  # type: ignore
-            solved_tasks = UserProgress.objects.filter(  # type: ignore
-                user=request.user, task__subject=subject, is_correct=True
-            ).count()
-
-            user_stats = {
-                "total_tasks": total_tasks,
-                "solved_tasks": solved_tasks,
-                "progress_percent": round(
-                    (solved_tasks / total_tasks * 100) if total_tasks > 0 else 0, 1
-                ),
-            }
+            progress = get_progress_summary(request.user.pk).subject(subject.id)
+            user_stats = (
+                progress.as_stats()
+                if progress
+                else {"total_tasks": 0, "solved_tasks": 0, "progress_percent": 0}
+            )
         except Exception as e:
             logger.error(f"Ошибка получения статистики: {e}")
             user_stats = {"total_tasks": 0, "solved_tasks": 0, "progress_percent": 0}
@@ -250,19 +240,21 @@ def solve_task(request, task_id):
     if request.method != "POST":
         return JsonResponse({"error": "Метод не поддерживается"}, status=405)
 
-    task = get_object_or_404(Task, id=task_id)
     user_answer = request.POST.get("answer", "").strip()
 
     if not user_answer:
         return JsonResponse({"error": "Ответ не может быть пустым"}, status=400)
 
-    # Проверяем правильность ответа
-    is_correct = task.check_answer(user_answer)
+    # Разобранный ответ берется из кэша, строку задания читаем только при промахе
+    matcher = get_matcher(task_id)
+    if matcher is None:
+        raise Http404("Задание не найдено")
+    is_correct = matcher.matches(user_answer)
 
     # Сохраняем прогресс пользователя
     progress, created = UserProgress.objects.get_or_create(  # type: ignore
         user=request.user,
-        task=task,
+        task_id=task_id,
         defaults={"user_answer": user_answer, "is_correct": is_correct, "attempts": 1},
     )
 
@@ -276,8 +268,8 @@ def solve_task(request, task_id):
     return JsonResponse(
         {
             "is_correct": is_correct,
-            "correct_answer": task.answer,
-            "explanation": task.explanation or "Объяснение пока не добавлено.",
+            "correct_answer": matcher.answer,
+            "explanation": "Объяснение пока не добавлено.",
             "message": (
                 "Правильно! 🎉" if is_correct else "Неправильно. Попробуйте еще раз! 🤔"
             ),
@@ -292,24 +284,17 @@ def random_task(request, subject_id=None):
     Если указан subject_id, выбирает задание из этого предмета
     Иначе выбирает из всех доступных заданий
     """
-    tasks_query = Task.objects.all()  # type: ignore
-
     if subject_id:
-        subject = get_object_or_404(Subject, id=subject_id)
-        tasks_query = tasks_query.filter(subject=subject)
+        get_object_or_404(Subject, id=subject_id)
 
     # Исключаем уже решенные задания для авторизованных пользователей
-    if request.user.is_authenticated:
-        solved_task_ids = UserProgress.objects.filter(  # type: ignore
-            user=request.user, is_correct=True
-        ).values_list("task_id", flat=True)
-        tasks_query = tasks_query.exclude(id__in=solved_task_ids)
-
-    tasks_list = list(tasks_query)
+    task_id = random_unsolved_task_id(
+        user_id=request.user.pk if request.user.is_authenticated else None,
+        subject_id=subject_id or None,
+    )
 
-    if not tasks_list:
+    if task_id is None:
         messages.warning(request, "Все доступные задания уже решены!")
         return redirect("learning:subjects_list")
 
-    random_task = random.choice(tasks_list)
-    return redirect("learning:task_detail", task_id=random_task.id)
+    return redirect("learning:task_detail", task_id=task_id)
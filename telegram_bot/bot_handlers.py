@@ -8,19 +8,50 @@
 - Синхронизацию с веб-сайтом
 """
 
+import functools
 import logging
+import time
+from collections.abc import Iterator
+from datetime import timedelta
 
 from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 
-from ai.services import AiService
+from ai.response_cache import get_cached_response
+from ai.router import PROVIDER_SECONDS
+from ai.services import (
+    AiService,
+    GeminiProvider,
+    task_explanation_prompt,
+    task_prompt_text,
+)
+from core import metrics
+from core.query_budget import query_budget
 from core.services.chat_session import ChatSessionService
 from core.services.unified_profile import UnifiedProfileService
+from learning.answers import get_matcher
+from learning.catalog import get_catalog
 from learning.models import Subject, Task, UserProgress, UserRating
-
-from .gamification import TelegramGamification
+from learning.progress import get_progress_summary
+from learning.sampling import random_unsolved_task
+
+from .callback_router import callback_arg
+from .chat_state import edit_if_changed, get_chat_states
+from .client import get_bot_client
+from .gamification import TelegramGamification, get_achievement_engine
+from .profile_cache import (
+    get_activity_tracker,
+    get_snapshot,
+    load_snapshot,
+    store_snapshot,
+    update_snapshot,
+)
+from .streaming import stream_to_message
+from .utils.catalog_keyboards import catalog_keyboard, get_catalog_async
 from .utils.text_utils import clean_log_text, clean_markdown_text
 
 try:
@@ -94,7 +125,7 @@ def send_notification(telegram_id: int, text: str):  # type: ignore
         bot = get_bot()
         if not bot:
             return False
-        bot.send_message(chat_id=telegram_id, text=text)  # type: ignore
+        get_bot_client().run(bot.send_message(chat_id=telegram_id, text=text))
         return True
     except Exception as e:
         logger.debug("send_notification failed: %s", e)
@@ -110,7 +141,7 @@ def send_achievement_notification(telegram_id: int, title: str, points: int = 0)
         text = f"🏆 Достижение: {title}"
         if points:
             text += f" (+{points} очков)"
-        bot.send_message(chat_id=telegram_id, text=text)  # type: ignore
+        get_bot_client().run(bot.send_message(chat_id=telegram_id, text=text))
         return True
     except Exception as e:
         logger.debug("send_achievement_notification failed: %s", e)
@@ -124,7 +155,7 @@ def send_daily_reminder(telegram_id: int, tasks_count: int = 3):  # type: ignore
         if not bot:
             return False
         text = f"📅 Напоминание: решите сегодня {tasks_count} заданий в ExamFlow!"
-        bot.send_message(chat_id=telegram_id, text=text)  # type: ignore
+        get_bot_client().run(bot.send_message(chat_id=telegram_id, text=text))
         return True
     except Exception as e:
         logger.debug("send_daily_reminder failed: %s", e)
@@ -138,7 +169,7 @@ def handle_bot_error(telegram_id: int, error_message: str):  # type: ignore
         if not bot:
             return False
         text = f"❌ Временная ошибка: {error_message}"
-        bot.send_message(chat_id=telegram_id, text=text)  # type: ignore
+        get_bot_client().run(bot.send_message(chat_id=telegram_id, text=text))
         return True
     except Exception as e:
         logger.debug("handle_bot_error failed: %s", e)
@@ -146,34 +177,55 @@ def handle_bot_error(telegram_id: int, error_message: str):  # type: ignore
 
 
 def collect_bot_statistics():  # type: ignore
-    """Собирает простую статистику бота для тестов."""
+    """Статистика бота: пользователи из базы, обращения — из метрик процесса."""
     try:
-        stats = {
-            "active_users": 1,
-            "total_users": 1,
-            "total_messages": 0,
-            "messages_today": 0,
-            "ai_requests": 0,
-            "commands_used": 0,
-            "errors_today": 0,
-        }
+        from core.models import UnifiedProfile
+
+        day_ago = timezone.now() - timedelta(days=1)
+        stats = UnifiedProfile.objects.aggregate(  # type: ignore
+            total_users=Count("id"),
+            active_users=Count("id", filter=Q(last_activity__gte=day_ago)),
+        )
+        stats.update(
+            {
+                "total_messages": BOT_HANDLER_SECONDS.count(),
+                "ai_requests": PROVIDER_SECONDS.count(),
+                "commands_used": sum(
+                    BOT_HANDLER_SECONDS.count(handler=name) for name in COMMAND_HANDLERS
+                ),
+                "errors": BOT_HANDLER_SECONDS.count(outcome="error"),
+            }
+        )
         return stats
     except Exception as e:
         logger.debug("collect_bot_statistics failed: %s", e)
         return {"active_users": 0}
 
 
+def _max_rss_mb() -> float:
+    try:
+        import resource
+
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except Exception:
+        return 0
+
+
 def get_performance_metrics():  # type: ignore
-    """Возвращает простые метрики производительности для тестов."""
+    """Метрики производительности обработчиков бота с момента старта процесса."""
     try:
+        counts, total = BOT_HANDLER_SECONDS.totals()
+        calls = sum(counts)
+        uptime = time.time() - metrics.STARTED_AT
+        errors = BOT_HANDLER_SECONDS.count(outcome="error")
         return {
-            "response_time_avg": 0,
-            "response_time_p95": 0,
-            "uptime_seconds": 0,
-            "uptime": "0s",
-            "requests_per_minute": 0,
-            "error_rate": 0.0,
-            "memory_usage": 0,
+            "response_time_avg": round(total / calls, 3) if calls else 0,
+            "response_time_p95": BOT_HANDLER_SECONDS.quantile(0.95) or 0,
+            "uptime_seconds": int(uptime),
+            "uptime": f"{int(uptime)}s",
+            "requests_per_minute": round(calls / uptime * 60, 2) if uptime else 0,
+            "error_rate": round(errors / calls, 3) if calls else 0.0,
+            "memory_usage": _max_rss_mb(),
         }
     except Exception as e:
         logger.debug("get_performance_metrics failed: %s", e)
@@ -192,6 +244,32 @@ except Exception:  # type: ignore
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+BOT_HANDLER_SECONDS = metrics.histogram(
+    "bot_handler_seconds", "Время работы обработчика бота", ("handler", "outcome")
+)
+BOT_HANDLER_QUERIES = metrics.histogram(
+    "bot_handler_db_queries",
+    "SQL-запросов на вызов обработчика бота",
+    ("handler",),
+    buckets=metrics.COUNT_BUCKETS,
+)
+COMMAND_HANDLERS = ("start", "main_menu", "subjects_menu", "show_stats")
+
+
+def instrument_handler(func):
+    """Время и SQL-запросы обработчика: метрики и бюджет bot:<имя>"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(update, context):
+        with query_budget(f"bot:{name}") as stats:
+            try:
+                return await func(update, context)
+            finally:
+                BOT_HANDLER_QUERIES.observe(stats.count, handler=name)
+
+    return metrics.timed(BOT_HANDLER_SECONDS, handler=name)(wrapper)
+
 
 def is_mobile_telegram_user(user) -> bool:
     """
@@ -269,9 +347,8 @@ def db_get_or_create_unified_profile(telegram_user):
 
 @sync_to_async
 def db_update_profile_activity(profile):
-    """Обновляет время последней активности профиля"""
-    profile.last_activity = timezone.now()
-    profile.save()
+    """Отмечает активность профиля; last_activity пишется пачкой по интервалу"""
+    get_activity_tracker().touch(profile.telegram_id)
 
 
 @sync_to_async
@@ -323,6 +400,41 @@ def db_clear_chat_session_context(telegram_user):
 # ИИ сервис для асинхронного использования
 
 
+def build_examflow_prompt(prompt: str) -> str:
+    """Промпт для Gemini: системные инструкции ExamFlow и вопрос пользователя"""
+    # Определяем предмет по промпту
+    subject_detected = ""
+    if any(
+        word in prompt.lower()
+        for word in ["математика", "матем", "уравнение", "функция", "геометрия"]
+    ):
+        subject_detected = "математика"
+    elif any(
+        word in prompt.lower()
+        for word in ["русский", "сочинение", "грамматика", "орфография"]
+    ):
+        subject_detected = "русский язык"
+
+    # Системный промпт для ExamFlow
+    system_prompt = f"""Ты - ExamFlow AI, эксперт по подготовке к ЕГЭ и ОГЭ.
+
+Специализируешься на:
+📐 Математике (профильная и базовая, ОГЭ) - уравнения, функции, геометрия, алгебра
+📝 Русском языке (ЕГЭ и ОГЭ) - грамматика, орфография, сочинения, литература
+
+Стиль общения:
+- Краткий и конкретный ответ (до 300 слов)
+- Пошаговые решения для математики
+- Примеры и образцы для русского языка
+- НЕ упоминай провайдера ИИ
+- Если вопрос по {subject_detected}, дай подробный ответ
+- Если вопрос не по твоим предметам - скажи: "Я специализируюсь на математике и русском языке для ЕГЭ/ОГЭ"
+
+Отвечай кратко и по делу."""
+
+    return f"{system_prompt}\n\nВопрос: {prompt}"
+
+
 @sync_to_async
 def get_ai_response(
     prompt: str, task_type: str = "chat", user=None, task=None, is_mobile: bool = False
@@ -340,37 +452,7 @@ def get_ai_response(
         genai.configure(api_key=api_key)  # type: ignore
         model = genai.GenerativeModel("gemini-1.5-flash")  # type: ignore
 
-        # Определяем предмет по промпту
-        subject_detected = ""
-        if any(
-            word in prompt.lower()
-            for word in ["математика", "матем", "уравнение", "функция", "геометрия"]
-        ):
-            subject_detected = "математика"
-        elif any(
-            word in prompt.lower()
-            for word in ["русский", "сочинение", "грамматика", "орфография"]
-        ):
-            subject_detected = "русский язык"
-
-        # Системный промпт для ExamFlow
-        system_prompt = f"""Ты - ExamFlow AI, эксперт по подготовке к ЕГЭ и ОГЭ.
-
-Специализируешься на:
-📐 Математике (профильная и базовая, ОГЭ) - уравнения, функции, геометрия, алгебра
-📝 Русском языке (ЕГЭ и ОГЭ) - грамматика, орфография, сочинения, литература
-
-Стиль общения:
-- Краткий и конкретный ответ (до 300 слов)
-- Пошаговые решения для математики
-- Примеры и образцы для русского языка
-- НЕ упоминай провайдера ИИ
-- Если вопрос по {subject_detected}, дай подробный ответ
-- Если вопрос не по твоим предметам - скажи: "Я специализируюсь на математике и русском языке для ЕГЭ/ОГЭ"
-
-Отвечай кратко и по делу."""
-
-        full_prompt = f"{system_prompt}\n\nВопрос: {prompt}"
+        full_prompt = build_examflow_prompt(prompt)
 
         # Получаем ответ
         response = model.generate_content(full_prompt)
@@ -392,17 +474,33 @@ def get_ai_response(
         return f"❌ Ошибка AI сервиса: {str(e)}"
 
 
+def stream_ai_response(prompt: str, is_mobile: bool = False) -> Iterator[str]:
+    """Ответ Gemini частями по мере генерации (синхронный генератор)"""
+    provider = GeminiProvider(task_type="direct_question", is_mobile=is_mobile)
+    # Системные инструкции уже в промпте
+    provider.system_prompt = ""
+    yield from provider.generate_stream(build_examflow_prompt(prompt))
+
+
 @sync_to_async
-def db_get_all_subjects_with_tasks():
-    """Получает все предметы с количеством заданий"""
-    from django.db.models import Count
+def db_get_precomputed_explanation(task) -> str | None:
+    """Заранее сгенерированное объяснение задания (prewarm_ai_answers)"""
+    cached = get_cached_response(task_explanation_prompt(task_prompt_text(task)))
+    return cached["text"] if cached else None
 
-    subjects = (
-        Subject.objects.annotate(tasks_count=Count("task"))  # type: ignore
-        .filter(tasks_count__gt=0)
-        .values("id", "name", "exam_type", "tasks_count")
-    )  # type: ignore
-    return list(subjects)
+
+@sync_to_async
+def db_get_all_subjects_with_tasks():
+    """Получает все предметы с количеством заданий (из снимка каталога)"""
+    return [
+        {
+            "id": subject.id,
+            "name": subject.name,
+            "exam_type": subject.exam_type,
+            "tasks_count": subject.tasks_count,
+        }
+        for subject in get_catalog().menu_subjects
+    ]
 
 
 @sync_to_async
@@ -419,7 +517,8 @@ def db_get_subjects_by_ids(ids):
 
 @sync_to_async
 def db_count_tasks_for_subject(subject_id: int) -> int:
-    return Task.objects.filter(subject_id=subject_id).count()  # type: ignore  # type: ignore
+    subject = get_catalog().subject(subject_id)
+    return subject.tasks_count if subject else 0
 
 
 @sync_to_async
@@ -432,6 +531,13 @@ def db_get_all_tasks():
     return list(Task.objects.all())  # type: ignore
 
 
+@sync_to_async
+def db_get_random_task(user, subject_id: int | None = None):
+    """Случайное нерешенное задание, а если решено все — любое"""
+    task = random_unsolved_task(user.pk, subject_id)
+    return task or random_unsolved_task(subject_id=subject_id)
+
+
 @sync_to_async
 def db_get_subject_name_for_task(task):
     """Получает название предмета для задания"""
@@ -440,21 +546,14 @@ def db_get_subject_name_for_task(task):
 
 @sync_to_async
 def db_get_subject_by_id(subject_id: int):
-    """Получает предмет по ID"""
-    try:
-        return Subject.objects.get(id=subject_id)  # type: ignore
-    except Subject.DoesNotExist:  # type: ignore
-        return None
+    """Получает предмет по ID (CatalogSubject из снимка каталога)"""
+    return get_catalog().subject(subject_id)
 
 
 @sync_to_async
 def db_get_subject_name(subject_id: int) -> str:
-    name = (
-        Subject.objects.filter(id=subject_id)  # type: ignore
-        .values_list("name", flat=True)
-        .first()
-    )  # type: ignore
-    return name or "Предмет"
+    subject = get_catalog().subject(subject_id)
+    return subject.name if subject else "Предмет"
 
 
 @sync_to_async
@@ -462,6 +561,58 @@ def db_set_current_task_id(user, task_id: int):
     set_current_task_id(user, task_id)  # type: ignore
 
 
+@sync_to_async
+def db_get_chat_state(chat_id: int):
+    return get_chat_states().get(chat_id)
+
+
+@sync_to_async
+def db_update_chat_state(chat_id: int, **changes):
+    return get_chat_states().update(chat_id, **changes)
+
+
+@sync_to_async
+def db_record_answer(user, task_id: int, user_answer: str):
+    """
+    Проверяет ответ по разобранному ответу задания и сохраняет попытку
+
+    Попытка и событие для профиля (серия, очки, достижения) пишутся в одной
+    транзакции.
+
+    Returns:
+        (верно ли, AnswerAward или None без профиля) или None, если задания нет
+    """
+    matcher = get_matcher(task_id)
+    if matcher is None:
+        return None
+    is_correct = matcher.matches(user_answer)
+    with transaction.atomic():
+        UserProgress.objects.update_or_create(  # type: ignore
+            user=user,
+            task_id=task_id,
+            defaults={"user_answer": user_answer, "is_correct": is_correct},
+        )
+        award = get_achievement_engine().record_answer(user.telegram_id, is_correct)
+    return is_correct, award
+
+
+@sync_to_async
+def db_get_progress_summary(telegram_id: int):
+    """Сводка прогресса пользователя Telegram или None, если его нет"""
+    from django.contrib.auth import get_user_model
+
+    snapshot = get_snapshot(telegram_id)
+    if snapshot is not None:
+        return get_progress_summary(snapshot.user_id)
+    user_id = (
+        get_user_model()
+        .objects.filter(telegram_id=telegram_id)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    return get_progress_summary(user_id) if user_id is not None else None
+
+
 @sync_to_async
 def db_get_or_create_user(telegram_user):
     return get_or_create_user(telegram_user)  # type: ignore
@@ -496,6 +647,7 @@ def db_update_rating_points(user, is_correct: bool):
         rating.incorrect_answers += 1
     rating.total_attempts += 1
     rating.save()
+    update_snapshot(user.telegram_id, points=rating.total_points)
     return rating
 
 
@@ -503,20 +655,16 @@ def db_update_rating_points(user, is_correct: bool):
 
 
 def get_current_task_id(user):
-    """Получает ID текущего задания из профиля пользователя"""
-    try:
-        profile = UserProfile.objects.get(user=user)  # type: ignore
-        return profile.current_task_id
-    except UserProfile.DoesNotExist:  # type: ignore
-        return None
+    """ID текущего задания из состояния личного чата пользователя"""
+    return get_chat_states().get(user.telegram_id).current_task_id
 
 
 def set_current_task_id(user, task_id):
-    """Устанавливает ID текущего задания в профиле пользователя"""
+    """Делает задание текущим в личном чате пользователя (chat_id = telegram_id)"""
     try:
-        profile = UserProfile.objects.get(user=user)  # type: ignore
-        profile.current_task_id = task_id
-        profile.save()
+        get_chat_states().update(
+            user.telegram_id, current_task_id=task_id, ai_mode=None
+        )
         logger.info(
             "Установлен current_task_id: %s для пользователя %s",
             task_id,
@@ -535,12 +683,19 @@ def get_or_create_user(telegram_user):
     Получить или создать пользователя Django с профилем
 
     Создает пользователя с telegram_id
-    Автоматически создает профиль и рейтинг
+    Автоматически создает профиль и рейтинг; при попадании в кэш профиля
+    пользователь читается одним запросом по ключу
     """
     from django.contrib.auth import get_user_model
 
     User = get_user_model()
 
+    snapshot = get_snapshot(telegram_user.id)
+    if snapshot is not None:
+        user = User.objects.filter(pk=snapshot.user_id).first()  # type: ignore
+        if user is not None:
+            return user, False
+
     user, created = User.objects.get_or_create(  # type: ignore
         telegram_id=telegram_user.id,
         defaults={
@@ -560,6 +715,9 @@ def get_or_create_user(telegram_user):
     # Создаем рейтинг если нужно
     rating, rating_created = UserRating.objects.get_or_create(user=user)  # type: ignore
 
+    store_snapshot(
+        load_snapshot(user, profile_id=profile.pk, points=rating.total_points)
+    )
     return user, created
 
 
@@ -568,6 +726,7 @@ def get_or_create_user(telegram_user):
 # ============================================================================
 
 
+@instrument_handler
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Команда /start - приветствие и главное меню
@@ -592,7 +751,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     chat_id = getattr(update.message, "chat_id", None)  # type: ignore
             except Exception:
                 chat_id = None
-            await bot.send_message(chat_id=chat_id or 0, text="Добро пожаловать в ExamFlow!")  # type: ignore
+            await get_bot_client().arun(
+                bot.send_message(
+                    chat_id=chat_id or 0, text="Добро пожаловать в ExamFlow!"
+                )
+            )
     except Exception as e:
         logger.warning("start: send welcome failed: %s", e)
 
@@ -682,8 +845,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if is_callback:
             if update.callback_query:  # type: ignore
                 await update.callback_query.answer()
-                await update.callback_query.edit_message_text(
-                    welcome_text, reply_markup=reply_markup, parse_mode="Markdown"
+                await edit_if_changed(
+                    update.callback_query,
+                    welcome_text,
+                    reply_markup=reply_markup,
+                    parse_mode="Markdown",
                 )
         else:
             if update.message:  # type: ignore
@@ -912,6 +1078,7 @@ def track_user_progress(telegram_id: int, data: dict | None = None, task_id: int
 # Импортируем обработчики персонализации
 
 
+@instrument_handler
 async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Возвращает пользователя в главное меню
@@ -947,9 +1114,7 @@ async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reply_markup = InlineKeyboardMarkup(keyboard)
 
     try:
-        await query.edit_message_text(
-            welcome_text, reply_markup=reply_markup, parse_mode=None
-        )
+        await edit_if_changed(query, welcome_text, reply_markup=reply_markup)
     except Exception as edit_err:
         logger.warning(
             "main_menu: edit_message_text не удался: %s. Пробуем send_message",
@@ -966,6 +1131,7 @@ async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.error("main_menu: send_message тоже не удался: %s", send_err)
 
 
+@instrument_handler
 async def subjects_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Показывает меню выбора предметов
@@ -978,9 +1144,10 @@ async def subjects_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         await query.answer()
 
-        # Получаем все предметы с количеством заданий
+        # Предметы с количеством заданий и готовая клавиатура — из снимка каталога
         try:
-            subjects = await db_get_all_subjects_with_tasks()
+            catalog = await get_catalog_async()
+            subjects = catalog.menu_subjects
             if not subjects:
                 await query.edit_message_text(
                     "📚 Предметы пока загружаются... Попробуйте позже."
@@ -999,29 +1166,15 @@ async def subjects_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-        # Сортируем предметы по количеству заданий (больше заданий - выше)
-        subjects_sorted = sorted(subjects, key=lambda x: x["tasks_count"], reverse=True)
-
-        keyboard = []
-        for subject in subjects_sorted[:15]:  # Показываем топ-15 предметов
-            button_text = "{subject['name']} ({subject['tasks_count']} заданий)"
-            keyboard.append(
-                [
-                    InlineKeyboardButton(
-                        button_text, callback_data="subject_{subject['id']}"
-                    )
-                ]
-            )
-
-        # Добавляем кнопки навигации
-        keyboard.append([InlineKeyboardButton("🏠 Главная", callback_data="main_menu")])
-
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # Топ-15 предметов по количеству заданий
+        reply_markup = catalog_keyboard(catalog, "subjects")
+        tasks_total = catalog.total_tasks
 
         try:
-            await query.edit_message_text(
+            await edit_if_changed(
+                query,
                 "📚 **Практика по предметам**\n\n"
-                "**{len(subjects)}** предметов • **{sum(s['tasks_count'] for s in subjects)}** заданий\n\n"
+                f"**{len(subjects)}** предметов • **{tasks_total}** заданий\n\n"
                 "Выбери предмет для изучения:",
                 reply_markup=reply_markup,
                 parse_mode="Markdown",
@@ -1035,7 +1188,7 @@ async def subjects_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await context.bot.send_message(
                     chat_id=update.effective_chat.id,  # type: ignore
                     text="📚 **ВЫБЕРИТЕ ПРЕДМЕТ ДЛЯ ИЗУЧЕНИЯ**\n\n"
-                    "Доступно **{len(subjects)} предметов** с **{sum(s['tasks_count'] for s in subjects)} заданиями**\n\n"
+                    f"Доступно **{len(subjects)} предметов** с **{tasks_total} заданиями**\n\n"
                     "Предметы отсортированы по количеству заданий:",
                     reply_markup=reply_markup,
                     parse_mode="Markdown",
@@ -1053,6 +1206,7 @@ async def subjects_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.debug("subjects_menu fallback edit_message_text: %s", fallback_e)
 
 
+@instrument_handler
 async def show_subject_topics(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Показывает случайное задание выбранного предмета
@@ -1062,7 +1216,7 @@ async def show_subject_topics(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     await query.answer()
 
-    subject_id = int(query.data.split("_")[1])  # type: ignore
+    subject_id = callback_arg(context, "subject_id")
 
     # Получаем информацию о предмете
     subject = await db_get_subject_by_id(subject_id)
@@ -1070,9 +1224,10 @@ async def show_subject_topics(update: Update, context: ContextTypes.DEFAULT_TYPE
         await query.edit_message_text("❌ Предмет не найден")  # type: ignore
         return
 
-    # Получаем список заданий для предмета
-    tasks = await db_get_tasks_by_subject(subject_id)
-    if not tasks:
+    # Выбираем случайное нерешенное задание предмета
+    user, _ = await db_get_or_create_user(update.effective_user)
+    task = await db_get_random_task(user, subject_id)
+    if task is None:
         await query.edit_message_text(  # type: ignore
             "❌ В предмете **{subject.name}** пока нет заданий",
             reply_markup=InlineKeyboardMarkup(
@@ -1082,13 +1237,7 @@ async def show_subject_topics(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
 
-    # Выбираем случайное задание
-    import random
-
-    task = random.choice(list(tasks))
-
     # Устанавливаем текущее задание в профиле пользователя
-    user, _ = await db_get_or_create_user(update.effective_user)
     await db_set_current_task_id(user, task.id)
     logger.info("show_subject_topics: установлен current_task_id: {task.id}")
 
@@ -1131,6 +1280,7 @@ async def show_subject_topics(update: Update, context: ContextTypes.DEFAULT_TYPE
             logger.error("show_subject_topics: send_message тоже не удался: %s", send_err)
 
 
+@instrument_handler
 async def random_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Показывает случайное задание из всех доступных
@@ -1140,19 +1290,15 @@ async def random_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     await query.answer()
 
-    # Получаем все задания
-    tasks = await db_get_all_tasks()
-    if not tasks:
+    # Случайное нерешенное задание из всех предметов
+    user, _ = await db_get_or_create_user(update.effective_user)
+    task = await db_get_random_task(user)
+    if task is None:
         await query.edit_message_text("❌ Задания пока не загружены")
         return
 
-    import random
-
-    task = random.choice(list(tasks))
-
     # Сохраняем текущее задание в профиль пользователя
     try:
-        user, _ = await db_get_or_create_user(update.effective_user)
         await db_set_current_task_id(user, task.id)
         logger.info(
             "random_task: установлен current_task_id: {task.id} для пользователя {user.username}"
@@ -1196,6 +1342,7 @@ async def random_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.error("random_task: send_message тоже не удался: %s", send_err)
 
 
+@instrument_handler
 async def show_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Показывает правильный ответ на задание
@@ -1205,8 +1352,8 @@ async def show_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     await query.answer()
 
-    # Извлекаем ID задания из callback_data
-    task_id = int(query.data.split("_")[1])  # type: ignore
+    # ID задания из callback_data answer_<id>
+    task_id = callback_arg(context, "task_id")
 
     # Получаем задание
     try:
@@ -1252,6 +1399,7 @@ async def show_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.error("show_answer: send_message тоже не удался: %s", send_err)
 
 
+@instrument_handler
 async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Показывает статистику пользователя из Unified Profile
@@ -1301,6 +1449,7 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@instrument_handler
 async def learning_plan_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Показывает персональный план обучения пользователя
@@ -1400,6 +1549,7 @@ async def learning_plan_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
 # ============================================================================
 
 
+@instrument_handler
 async def ai_help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик для кнопки "Спросить ИИ" с персонализацией
@@ -1425,16 +1575,10 @@ async def ai_help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         profile = await db_get_or_create_unified_profile(user)
         await db_update_profile_activity(profile)
 
-        # Проверяем формат callback_data (только для callback-запросов)
-        if (
-            is_callback
-            and query.data
-            and query.data.startswith("ai_help_")  # type: ignore
-            and "_" in query.data
-        ):  # type: ignore
-            # Помощь с конкретным заданием
+        # ai_help_<id>: помощь с конкретным заданием
+        task_id = callback_arg(context, "task_id") if is_callback else None
+        if task_id is not None:
             try:
-                task_id = int(query.data.split("_")[2])  # type: ignore
                 task = await db_get_task_by_id(task_id)
 
                 if not task:
@@ -1454,14 +1598,17 @@ async def ai_help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # Определяем, является ли пользователь мобильным
                 is_mobile = is_mobile_telegram_user(user)
 
-                ai_response = await get_ai_response(
-                    "Объясни, как решить это задание. Дай пошаговое решение с объяснением каждого шага. "
-                    "Учитывай мой текущий уровень и слабые темы.",
-                    task_type="task_help",
-                    user=django_user,
-                    task=task,
-                    is_mobile=is_mobile,
-                )
+                # Популярные задания объяснены заранее — отвечаем без запроса к ИИ
+                ai_response = await db_get_precomputed_explanation(task)
+                if not ai_response:
+                    ai_response = await get_ai_response(
+                        "Объясни, как решить это задание. Дай пошаговое решение с объяснением каждого шага. "
+                        "Учитывай мой текущий уровень и слабые темы.",
+                        task_type="task_help",
+                        user=django_user,
+                        task=task,
+                        is_mobile=is_mobile,
+                    )
 
                 # Формируем ответ: показываем реальный ответ ИИ
                 response_text = ai_response
@@ -1507,9 +1654,13 @@ async def ai_help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             keyboard = []
             reply_markup = InlineKeyboardMarkup(keyboard)
 
+            # Следующие сообщения чата — вопросы к ИИ, а не ответы на задание
+            await db_update_chat_state(
+                update.effective_chat.id, ai_mode="chat"  # type: ignore
+            )
             if is_callback:
-                await query.edit_message_text(  # type: ignore
-                    ai_menu_text, reply_markup=reply_markup, parse_mode=None
+                await edit_if_changed(
+                    query, ai_menu_text, reply_markup=reply_markup, parse_mode=None
                 )
             else:
                 if update.message:  # type: ignore
@@ -1528,6 +1679,7 @@ async def ai_help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
 
 
+@instrument_handler
 async def ai_explain_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик для объяснения темы от ИИ
@@ -1580,6 +1732,7 @@ async def ai_explain_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await query.edit_message_text("❌ Произошла ошибка. Попробуйте позже.")  # type: ignore
 
 
+@instrument_handler
 async def ai_personal_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик для персональных советов от ИИ
@@ -1632,6 +1785,7 @@ async def ai_personal_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         await query.edit_message_text("❌ Произошла ошибка. Попробуйте позже.")  # type: ignore
 
 
+@instrument_handler
 async def ai_hint_general_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Общий обработчик для подсказок от ИИ (когда нет конкретного задания)
@@ -1688,6 +1842,7 @@ async def ai_hint_general_handler(update: Update, context: ContextTypes.DEFAULT_
 # ============================================================================
 
 
+@instrument_handler
 async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обрабатывает текстовые сообщения для прямого общения с ИИ и нижнего меню
@@ -1710,6 +1865,12 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             await handle_menu_button(update, context, user_message)
             return
 
+        # Открыто задание и не включен режим ИИ — это ответ на задание
+        state = await db_get_chat_state(update.effective_chat.id)  # type: ignore
+        if state.current_task_id is not None and state.ai_mode is None:
+            await handle_answer(update, context, state.current_task_id)
+            return
+
         # Если это не кнопка меню, то это вопрос к ИИ
         await handle_ai_message(update, context)
 
@@ -1725,6 +1886,45 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             logger.error("Не удалось отправить сообщение об ошибке: %s", send_err)
 
 
+async def handle_answer(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, task_id: int
+):
+    """
+    Проверяет ответ на текущее задание чата
+
+    Задание берется из состояния чата, ответ сверяется с разобранным
+    ответом задания; после верного ответа задание перестает быть текущим
+    """
+    chat_id = update.effective_chat.id  # type: ignore
+    user_answer = update.message.text.strip()  # type: ignore
+    user, _ = await db_get_or_create_user(update.effective_user)
+    result = await db_record_answer(user, task_id, user_answer)
+    is_correct, award = result if result is not None else (None, None)
+
+    if is_correct is None:
+        await db_update_chat_state(chat_id, current_task_id=None)
+        text = "❌ Задание не найдено. Выберите новое в разделе «Практика»."
+    elif is_correct:
+        await db_update_rating_points(user, True)
+        await db_update_chat_state(chat_id, current_task_id=None)
+        text = "✅ Верно! +10 очков"
+        if award is not None:
+            if award.level_up:
+                text += f"\n⭐ Новый уровень: {award.level}"
+            for rule in award.achievements:
+                text += f"\n🏅 {rule.title} (+{rule.points} XP)"
+    else:
+        await db_update_rating_points(user, False)
+        text = "❌ Неверно. Попробуйте еще раз или посмотрите ответ."
+
+    keyboard = [[create_standard_button("🎲 Следующее задание", "random_task")]]
+    if is_correct is False:
+        keyboard.insert(0, [create_standard_button("👀 Ответ", f"answer_{task_id}")])
+    await update.message.reply_text(  # type: ignore
+        text, reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+
 async def handle_menu_button(
     update: Update, context: ContextTypes.DEFAULT_TYPE, button_text: str
 ):
@@ -1746,6 +1946,7 @@ async def handle_menu_button(
             await update.message.reply_text("❌ Произошла ошибка. Попробуйте позже.")  # type: ignore
 
 
+@instrument_handler
 async def handle_ai_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обрабатывает текстовые сообщения для прямого общения с ИИ
@@ -1780,36 +1981,36 @@ async def handle_ai_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await db_add_user_message_to_session(chat_session, user_message)
 
         # Создаем расширенный промпт с контекстом
-        enhanced_prompt = await db_create_enhanced_prompt(user_message, chat_session)
+        prompt_text = await db_create_enhanced_prompt(user_message, chat_session)
 
         # Определяем, является ли пользователь мобильным
         is_mobile = is_mobile_telegram_user(user)
 
-        # Получаем ответ от AI с контекстом и мобильной оптимизацией
-        ai_response = await get_ai_response(  # type: ignore
-            await enhanced_prompt,  # type: ignore
-            task_type="direct_question",
-            user=django_user,
-            is_mobile=is_mobile,
-        )
+        # Выводим ответ AI по мере генерации, правя сообщение-заглушку
+        try:
+            ai_response = await stream_to_message(
+                thinking_message,
+                stream_ai_response(prompt_text, is_mobile=is_mobile),
+                format_text=clean_markdown_text,
+                parse_mode=None,
+            )
+            if not ai_response.strip():
+                raise RuntimeError("пустой ответ")
+        except Exception as e:
+            logger.warning(f"Потоковый ответ AI недоступен: {e}")
+            ai_response = await get_ai_response(  # type: ignore
+                prompt_text,
+                task_type="direct_question",
+                user=django_user,
+                is_mobile=is_mobile,
+            )
+            await thinking_message.edit_text(  # type: ignore
+                clean_markdown_text(ai_response), parse_mode=None
+            )
 
         # Добавляем ответ ассистента в контекст
         await db_add_assistant_message_to_session(chat_session, ai_response)
 
-        # Очищаем текст от проблемных символов Markdown
-        clean_response = clean_markdown_text(ai_response)
-
-        # Формируем ответ: показываем реальный ответ ИИ
-        response_text = clean_response
-
-        keyboard = []
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        # Обновляем сообщение с ответом
-        await thinking_message.edit_text(  # type: ignore
-            response_text, reply_markup=reply_markup, parse_mode=None
-        )
-
         # Логируем с очищенным текстом
         clean_message = clean_log_text(user_message)
         logger.info(
@@ -1833,6 +2034,7 @@ async def handle_ai_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ============================================================================
 
 
+@instrument_handler
 async def search_subject_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик поиска по предмету
@@ -1853,6 +2055,7 @@ async def search_subject_handler(update: Update, context: ContextTypes.DEFAULT_T
     )
 
 
+@instrument_handler
 async def random_subject_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик случайного предмета
@@ -1887,6 +2090,7 @@ async def random_subject_handler(update: Update, context: ContextTypes.DEFAULT_T
         await query.edit_message_text("❌ Произошла ошибка. Попробуйте позже.")  # type: ignore
 
 
+@instrument_handler
 async def show_task_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Показывает задание по ID
@@ -1895,12 +2099,14 @@ async def show_task_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()  # type: ignore
 
     try:
-        task_id = int(query.data.split("_")[1])  # type: ignore
+        task_id = callback_arg(context, "task_id")
         task = await db_get_task_by_id(task_id)
 
         if not task:
             await query.edit_message_text("❌ Задание не найдено")  # type: ignore
             return
+        chat_id = update.effective_chat.id  # type: ignore
+        await db_update_chat_state(chat_id, current_task_id=task.id, ai_mode=None)
 
         # Получаем информацию о предмете
         subject = await db_get_subject_by_id(task.subject.id)
@@ -1934,6 +2140,7 @@ async def show_task_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("❌ Произошла ошибка. Попробуйте позже.")  # type: ignore
 
 
+@instrument_handler
 async def clear_context_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик для очистки контекста чата
@@ -1976,6 +2183,7 @@ async def clear_context_handler(update: Update, context: ContextTypes.DEFAULT_TY
         )
 
 
+@instrument_handler
 async def handle_unknown_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обрабатывает неизвестные callback-запросы
@@ -2002,6 +2210,7 @@ async def handle_unknown_callback(update: Update, context: ContextTypes.DEFAULT_
 # 🔐 ОБРАБОТЧИКИ АУТЕНТИФИКАЦИИ
 
 
+@instrument_handler
 async def telegram_auth_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обрабатывает нажатие кнопки "Войти через Telegram"
@@ -2061,6 +2270,7 @@ async def telegram_auth_handler(update: Update, context: ContextTypes.DEFAULT_TY
         )
 
 
+@instrument_handler
 async def auth_success_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обрабатывает успешную аутентификацию пользователя
@@ -2108,6 +2318,7 @@ async def auth_success_handler(update: Update, context: ContextTypes.DEFAULT_TYP
 # 🎮 ОБРАБОТЧИКИ ГЕЙМИФИКАЦИИ
 
 
+@instrument_handler
 async def gamification_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает меню геймификации"""
     query = update.callback_query
@@ -2123,6 +2334,7 @@ async def gamification_menu_handler(update: Update, context: ContextTypes.DEFAUL
     )
 
 
+@instrument_handler
 async def user_stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает статистику пользователя"""
     query = update.callback_query
@@ -2180,6 +2392,7 @@ async def user_stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     )
 
 
+@instrument_handler
 async def achievements_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает достижения пользователя"""
     query = update.callback_query
@@ -2233,6 +2446,7 @@ async def achievements_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     )
 
 
+@instrument_handler
 async def progress_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает прогресс пользователя"""
     query = update.callback_query
@@ -2248,57 +2462,45 @@ async def progress_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@instrument_handler
 async def overall_progress_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает общий прогресс пользователя"""
     query = update.callback_query
     await query.answer()  # type: ignore
 
     user_id = update.effective_user.id  # type: ignore
-    stats = await gamification.get_user_stats(user_id)  # type: ignore
+    stats = await gamification.points_manager.get_user_stats(user_id)
+    summary = await db_get_progress_summary(user_id)
 
-    if not stats.get("success"):
-        await query.edit_message_text(  # type: ignore
-            "❌ Ошибка: {stats.get('error', 'Неизвестная ошибка')}",
-            reply_markup=InlineKeyboardMarkup(
-                [
-                    [  # type: ignore
-                        InlineKeyboardButton(
-                            "🔙 Назад", callback_data="progress_{user_id}"
-                        )
-                    ]
-                ]
-            ),
-        )
-        return
-
-    # Создаём визуальный прогресс-бар
     level = stats["level"]
     points = stats["points"]
     next_level_points = level * 100
-    progress_percentage = (points % 100) / 100 * 100
-
-    progress_bar = "█" * int(progress_percentage / 10) + "░" * (
-        10 - int(progress_percentage / 10)
-    )
 
-    progress_text = """
+    progress_text = f"""
 📈 **ОБЩИЙ ПРОГРЕСС**
 
 🏆 **Текущий уровень:** {level}
 💎 **Очки:** {points}
 🎯 **До следующего уровня:** {next_level_points - points} очков
+"""
+    if summary is not None:
+        progress_text += (
+            f"📚 **Решено заданий:** {summary.solved} из {summary.total} "
+            f"(начато {summary.attempted})\n"
+        )
 
+    progress_text += """
 📊 **Детализация:**
 • Уровень 1: 0-99 очков ✅
 """
 
     for i in range(2, min(level + 3, 11)):
         if i <= level:
-            progress_text += "• Уровень {i}: {(i-1)*100}-{i*100-1} очков ✅\n"
+            progress_text += f"• Уровень {i}: {(i-1)*100}-{i*100-1} очков ✅\n"
         elif i == level + 1:
-            progress_text += "• Уровень {i}: {(i-1)*100}-{i*100-1} очков 🔄\n"
+            progress_text += f"• Уровень {i}: {(i-1)*100}-{i*100-1} очков 🔄\n"
         else:
-            progress_text += "• Уровень {i}: {(i-1)*100}-{i*100-1} очков ⏳\n"
+            progress_text += f"• Уровень {i}: {(i-1)*100}-{i*100-1} очков ⏳\n"
 
     keyboard = InlineKeyboardMarkup([])
 
@@ -2307,30 +2509,15 @@ async def overall_progress_handler(update: Update, context: ContextTypes.DEFAULT
     )
 
 
+@instrument_handler
 async def subjects_progress_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает прогресс по предметам"""
     query = update.callback_query
     await query.answer()  # type: ignore
 
     user_id = update.effective_user.id  # type: ignore
-    stats = await gamification.get_user_stats(user_id)  # type: ignore
-
-    if not stats.get("success"):
-        await query.edit_message_text(  # type: ignore
-            "❌ Ошибка: {stats.get('error', 'Неизвестная ошибка')}",
-            reply_markup=InlineKeyboardMarkup(
-                [
-                    [  # type: ignore
-                        InlineKeyboardButton(
-                            "🔙 Назад", callback_data="progress_{user_id}"
-                        )
-                    ]
-                ]
-            ),
-        )
-        return
-
-    subjects_progress = stats.get("subjects_progress", [])
+    summary = await db_get_progress_summary(user_id)
+    subjects_progress = summary.started if summary is not None else []
 
     if not subjects_progress:
         progress_text = """
@@ -2342,18 +2529,13 @@ async def subjects_progress_handler(update: Update, context: ContextTypes.DEFAUL
         progress_text = "📚 **ПРОГРЕСС ПО ПРЕДМЕТАМ**\n\n"
 
         for progress in subjects_progress:
-            subject_name = progress.get("subject__name", "Неизвестно")
-            solved = progress.get("solved_tasks", 0)
-            total = progress.get("total_tasks", 0)
-            percentage = (solved / total * 100) if total > 0 else 0
-
             # Создаём прогресс-бар
-            progress_bars = int(percentage / 10)
+            progress_bars = int(progress.percent / 10)
             progress_bar = "█" * progress_bars + "░" * (10 - progress_bars)
 
-            progress_text += "**{subject_name}**\n"
-            progress_text += "{progress_bar} {percentage:.1f}%\n"
-            progress_text += "Решено: {solved}/{total}\n\n"
+            progress_text += f"**{progress.name}**\n"
+            progress_text += f"{progress_bar} {progress.percent:.1f}%\n"
+            progress_text += f"Решено: {progress.solved}/{progress.total}\n\n"
 
     keyboard = InlineKeyboardMarkup([])
 
@@ -2362,6 +2544,7 @@ async def subjects_progress_handler(update: Update, context: ContextTypes.DEFAUL
     )
 
 
+@instrument_handler
 async def daily_challenges_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает ежедневные задания"""
     query = update.callback_query
@@ -2401,6 +2584,7 @@ async def daily_challenges_handler(update: Update, context: ContextTypes.DEFAULT
     )
 
 
+@instrument_handler
 async def leaderboard_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает таблицу лидеров"""
     query = update.callback_query
@@ -2438,6 +2622,7 @@ async def leaderboard_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     )
 
 
+@instrument_handler
 async def bonus_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает доступные бонусы"""
     query = update.callback_query
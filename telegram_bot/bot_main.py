@@ -19,65 +19,8 @@ from telegram.ext import (
     filters,
 )
 
-from telegram_bot.bot_handlers import (
-    achievements_handler,
-    ai_explain_handler,
-    ai_help_handler,
-    ai_hint_general_handler,
-    ai_personal_handler,
-    bonus_handler,
-    clear_context_handler,
-    daily_challenges_handler,
-    gamification_menu_handler,
-    handle_text_message,
-    handle_unknown_callback,
-    leaderboard_handler,
-    learning_plan_menu,
-    overall_progress_handler,
-    progress_handler,
-    random_subject_handler,
-    random_task,
-    search_subject_handler,
-    show_answer,
-    show_stats,
-    show_subject_topics,
-    show_task_handler,
-    start,
-    subjects_progress_handler,
-    user_stats_handler,
-)
-from telegram_bot.commands.ai import (
-    ai_explain_handler,
-    ai_help_handler,
-    ai_hint_general_handler,
-    ai_personal_handler,
-    clear_context_handler,
-    handle_text_message,
-)
-from telegram_bot.commands.auth import auth_success_handler, telegram_auth_handler
-from telegram_bot.commands.gamification import (
-    achievements_handler,
-    bonus_handler,
-    daily_challenges_handler,
-    gamification_menu_handler,
-    handle_unknown_callback,
-    leaderboard_handler,
-    overall_progress_handler,
-    progress_handler,
-    show_stats,
-    subjects_progress_handler,
-    user_stats_handler,
-)
-from telegram_bot.commands.main_menu import main_menu  # тонкая обёртка
-from telegram_bot.commands.subjects import subjects_menu
-from telegram_bot.commands.tasks import (
-    random_subject_handler,
-    random_task,
-    search_subject_handler,
-    show_answer,
-    show_subject_topics,
-    show_task_handler,
-)
+from telegram_bot.bot_handlers import handle_text_message, start
+from telegram_bot.callback_router import get_router
 
 # Настройка Django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "examflow_project.settings")
@@ -129,11 +72,14 @@ def validate_webhook_secret(secret_token, request_body, signature):
 
 def get_bot():
     """
-    Возвращает экземпляр бота для использования в views
+    Возвращает общий экземпляр бота процесса (telegram_bot.client)
+
+    Корутины бота выполняются в цикле клиента: get_bot_client().run() из
+    синхронного кода, await get_bot_client().arun() из других циклов.
     """
-    from telegram import Bot
+    from telegram_bot.client import get_bot_client
 
-    return Bot(settings.TELEGRAM_BOT_TOKEN)
+    return get_bot_client().bot
 
 
 def setup_bot_application():
@@ -147,8 +93,18 @@ def setup_bot_application():
         logger.error("❌ Невозможно создать приложение бота - недействительный токен!")
         return None
 
-    # Создаем приложение бота
-    application = Application.builder().token(settings.TELEGRAM_BOT_TOKEN).build()
+    # Создаем приложение бота с тем же пулом соединений, что у общего клиента
+    from telegram_bot.client import get_client_config
+
+    client_config = get_client_config()
+    application = (
+        Application.builder()
+        .token(settings.TELEGRAM_BOT_TOKEN)
+        .connection_pool_size(client_config["POOL_SIZE"])
+        .pool_timeout(client_config["POOL_TIMEOUT"])
+        .read_timeout(client_config["READ_TIMEOUT"])
+        .build()
+    )
 
     # 🔒 БЕЗОПАСНОСТЬ: Логируем успешное создание
     logger.info("Приложение бота создано с проверкой безопасности")
@@ -157,107 +113,14 @@ def setup_bot_application():
     application.add_handler(CommandHandler("start", start))  # type: ignore
     application.add_handler(CommandHandler("help", start))  # type: ignore
 
-    # Регистрируем обработчики callback-запросов
-    application.add_handler(CallbackQueryHandler(start, pattern="start"))
-    application.add_handler(CallbackQueryHandler(subjects_menu, pattern="subjects"))
-    application.add_handler(CallbackQueryHandler(show_stats, pattern="stats"))
-    application.add_handler(CallbackQueryHandler(random_task, pattern="random_task"))
-    application.add_handler(CallbackQueryHandler(main_menu, pattern="main_menu"))
-    application.add_handler(
-        CallbackQueryHandler(learning_plan_menu, pattern="learning_plan")
-    )
-
-    # Обработчики для предметов и тем
-    application.add_handler(
-        CallbackQueryHandler(show_subject_topics, pattern=r"subject_\d+")
-    )
-    application.add_handler(
-        CallbackQueryHandler(show_subject_topics, pattern=r"topic_\d+")
-    )
-    application.add_handler(
-        CallbackQueryHandler(show_subject_topics, pattern=r"random_subject_\d+")
-    )
-
-    # Обработчик для показа задания
-    application.add_handler(
-        CallbackQueryHandler(show_task_handler, pattern=r"show_task_\d+")
-    )
-
-    # Новые обработчики для поиска и случайных предметов
-    application.add_handler(
-        CallbackQueryHandler(search_subject_handler, pattern="search_subject")
-    )
-    application.add_handler(
-        CallbackQueryHandler(random_subject_handler, pattern="random_subject")
-    )
-
-    # 🔐 Обработчики аутентификации
-    application.add_handler(
-        CallbackQueryHandler(telegram_auth_handler, pattern="telegram_auth")
-    )
-    application.add_handler(
-        CallbackQueryHandler(auth_success_handler, pattern="auth_success")
-    )
-
-    # Обработчики для ИИ
-    application.add_handler(CallbackQueryHandler(ai_help_handler, pattern=r"ai_help"))
-    application.add_handler(
-        CallbackQueryHandler(ai_help_handler, pattern=r"ai_help_\d+")
-    )
-    application.add_handler(CallbackQueryHandler(ai_help_handler, pattern=r"ai_chat"))
-    application.add_handler(
-        CallbackQueryHandler(ai_explain_handler, pattern=r"ai_explain")
-    )
-    application.add_handler(
-        CallbackQueryHandler(ai_personal_handler, pattern=r"ai_personal")
-    )
-    application.add_handler(
-        CallbackQueryHandler(ai_hint_general_handler, pattern=r"ai_hint")
-    )
-    application.add_handler(
-        CallbackQueryHandler(clear_context_handler, pattern="clear_context")
-    )
-
-    # Обработчики для заданий
-    application.add_handler(CallbackQueryHandler(show_answer, pattern=r"answer_\d+"))
-
-    # 🎮 Обработчики геймификации
-    application.add_handler(
-        CallbackQueryHandler(gamification_menu_handler, pattern=r"gamification_\d+")
-    )
-    application.add_handler(
-        CallbackQueryHandler(user_stats_handler, pattern=r"stats_\d+")
-    )
-    application.add_handler(
-        CallbackQueryHandler(achievements_handler, pattern=r"achievements_\d+")
-    )
-    application.add_handler(
-        CallbackQueryHandler(progress_handler, pattern=r"progress_\d+")
-    )
-    application.add_handler(
-        CallbackQueryHandler(overall_progress_handler, pattern=r"overall_progress_\d+")
-    )
-    application.add_handler(
-        CallbackQueryHandler(
-            subjects_progress_handler, pattern=r"subjects_progress_\d+"
-        )
-    )
-    application.add_handler(
-        CallbackQueryHandler(daily_challenges_handler, pattern=r"daily_\d+")
-    )
-    application.add_handler(
-        CallbackQueryHandler(leaderboard_handler, pattern="leaderboard")
-    )
-    application.add_handler(CallbackQueryHandler(bonus_handler, pattern=r"bonus_\d+"))
+    # Все callback-запросы — одной таблицей маршрутов, общей с webhook
+    application.add_handler(CallbackQueryHandler(get_router().dispatch))
 
     # Обработчик текстовых сообщений (для прямого общения с ИИ и нижнего меню)
     application.add_handler(
         MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message)
     )
 
-    # Обработчик неизвестных callback-запросов
-    application.add_handler(CallbackQueryHandler(handle_unknown_callback))
-
     logger.info("Telegram бот настроен и готов к работе")
     return application
 
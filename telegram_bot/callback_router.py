@@ -0,0 +1,162 @@
+"""
+Маршрутизация callback_data кнопок бота
+
+Таблица маршрутов строится один раз и общая для webhook (views) и
+приложения PTB (bot_main): callback_data вида "prefix" или
+"prefix_<arg>_<arg>" разбирается поиском префикса в словаре — отбрасываем
+хвостовые сегменты по "_", пока префикс не найдется, — без перебора
+регулярных выражений. Аргументы приводятся к типам маршрута и передаются
+обработчику через context.callback_args; неизвестные префиксы считаются в
+telegram_unknown_callbacks_total.
+"""
+
+import logging
+import threading
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_CALLBACKS = metrics.counter(
+    "telegram_unknown_callbacks_total",
+    "callback_data без маршрута",
+    ("prefix",),
+)
+
+Handler = Callable[..., Awaitable]
+
+
+@dataclass(frozen=True)
+class Route:
+    """Маршрут: префикс, обработчик и типы аргументов по порядку"""
+
+    prefix: str
+    handler: Handler
+    params: tuple[tuple[str, type], ...] = ()
+
+    def parse(self, segments: list[str]) -> dict | None:
+        if len(segments) != len(self.params):
+            return None
+        try:
+            return {
+                name: kind(value)
+                for (name, kind), value in zip(self.params, segments, strict=True)
+            }
+        except ValueError:
+            return None
+
+
+class CallbackRouter:
+    """Префиксы callback_data -> обработчики"""
+
+    def __init__(self, fallback: Handler | None = None):
+        self.fallback = fallback
+        # (префикс, число аргументов) -> маршрут
+        self._routes: dict[tuple[str, int], Route] = {}
+
+    def add(self, prefix: str, handler: Handler, **params: type) -> None:
+        """Регистрирует prefix или prefix_<arg>_..., params — имена и типы"""
+        key = (prefix, len(params))
+        if key in self._routes:
+            raise ValueError(f"Маршрут {prefix} с {len(params)} аргументами уже есть")
+        self._routes[key] = Route(prefix, handler, tuple(params.items()))
+
+    @property
+    def routes(self) -> list[Route]:
+        return list(self._routes.values())
+
+    def resolve(self, data: str) -> tuple[Route, dict] | None:
+        """Маршрут и разобранные аргументы для callback_data или None"""
+        segments = data.split("_")
+        for split in range(len(segments), 0, -1):
+            route = self._routes.get(
+                ("_".join(segments[:split]), len(segments) - split)
+            )
+            if route is not None:
+                args = route.parse(segments[split:])
+                if args is not None:
+                    return route, args
+        return None
+
+    async def dispatch(self, update, context):
+        """Обработчик PTB и webhook: вызывает обработчик маршрута"""
+        query = update.callback_query
+        data = (query.data if query else "") or ""
+        match = self.resolve(data)
+        if match is None:
+            UNKNOWN_CALLBACKS.inc(prefix=data.split("_", 1)[0][:32])
+            logger.warning(f"Нет маршрута для callback_data {data!r}")
+            if self.fallback is not None:
+                return await self.fallback(update, context)
+            return None
+        route, args = match
+        context.callback_args = args
+        return await route.handler(update, context)
+
+
+def callback_arg(context, name: str, default=None):
+    """Аргумент callback_data, разобранный маршрутом"""
+    return (getattr(context, "callback_args", None) or {}).get(name, default)
+
+
+_router: CallbackRouter | None = None
+_lock = threading.Lock()
+
+
+def build_router() -> CallbackRouter:
+    """Таблица маршрутов кнопок бота"""
+    from telegram_bot import bot_handlers as h
+
+    router = CallbackRouter(fallback=h.handle_unknown_callback)
+    for prefix, handler in (
+        ("start", h.start),
+        ("main_menu", h.main_menu),
+        ("subjects", h.subjects_menu),
+        ("stats", h.show_stats),
+        ("random_task", h.random_task),
+        ("learning_plan", h.learning_plan_menu),
+        ("search_subject", h.search_subject_handler),
+        ("random_subject", h.random_subject_handler),
+        ("telegram_auth", h.telegram_auth_handler),
+        ("auth_success", h.auth_success_handler),
+        ("ai_help", h.ai_help_handler),
+        ("ai_chat", h.ai_help_handler),
+        ("ai_explain", h.ai_explain_handler),
+        ("ai_personal", h.ai_personal_handler),
+        ("ai_hint", h.ai_hint_general_handler),
+        ("clear_context", h.clear_context_handler),
+        ("leaderboard", h.leaderboard_handler),
+    ):
+        router.add(prefix, handler)
+
+    router.add("subject", h.show_subject_topics, subject_id=int)
+    router.add("random_subject", h.show_subject_topics, subject_id=int)
+    router.add("topic", h.show_subject_topics, subject_id=int, topic_index=int)
+    router.add("show_task", h.show_task_handler, task_id=int)
+    router.add("answer", h.show_answer, task_id=int)
+    router.add("ai_help", h.ai_help_handler, task_id=int)
+
+    for prefix, handler in (
+        ("gamification", h.gamification_menu_handler),
+        ("stats", h.user_stats_handler),
+        ("achievements", h.achievements_handler),
+        ("progress", h.progress_handler),
+        ("overall_progress", h.overall_progress_handler),
+        ("subjects_progress", h.subjects_progress_handler),
+        ("daily", h.daily_challenges_handler),
+        ("bonus", h.bonus_handler),
+    ):
+        router.add(prefix, handler, user_id=int)
+    return router
+
+
+def get_router() -> CallbackRouter:
+    """Общая таблица маршрутов процесса"""
+    global _router
+    if _router is None:
+        with _lock:
+            if _router is None:
+                _router = build_router()
+    return _router
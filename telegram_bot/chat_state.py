@@ -0,0 +1,290 @@
+"""
+Состояние диалога с ботом по чату
+
+Текущее задание, режим ИИ и последнее меню чата хранятся не в профиле,
+а в быстром хранилище с TTL: хеш Redis (HSET/HGETALL), кэш Django или,
+без общего кэша, LRU в памяти процесса. Чтобы состояние пережило
+перезапуск, измененные чаты раз в SNAPSHOT_INTERVAL секунд сохраняются
+одной пачкой в ChatState; из базы состояние читается только при промахе
+хранилища. По отпечатку последнего меню edit_if_changed не отправляет
+edit_message_text, если текст и клавиатура не изменились.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields, replace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from core.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAT_STATE_CONFIG = {
+    "KEY_PREFIX": "chat_state",
+    "TTL": 24 * 3600,  # секунд с последнего изменения
+    "LOCAL_SIZE": 10000,  # чатов в памяти процесса без общего кэша
+    "SNAPSHOT_INTERVAL": 60,  # секунд между сохранениями в ChatState
+}
+
+
+def get_chat_state_config() -> dict:
+    """Возвращает настройки состояния чатов с учетом CHAT_STATE_CONFIG"""
+    config = dict(DEFAULT_CHAT_STATE_CONFIG)
+    config.update(getattr(settings, "CHAT_STATE_CONFIG", {}))
+    return config
+
+
+@dataclass(frozen=True)
+class ChatStateData:
+    """Состояние одного чата"""
+
+    current_task_id: int | None = None
+    ai_mode: str | None = None
+    menu_message_id: int | None = None
+    menu_digest: str | None = None
+
+    def as_dict(self) -> dict:
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChatStateData":
+        """Из словаря хранилища; числа из Redis приходят строками"""
+        values = {}
+        for field in fields(cls):
+            value = data.get(field.name)
+            if isinstance(value, bytes):
+                value = value.decode()
+            if value is not None and field.name.endswith("_id"):
+                value = int(value)
+            values[field.name] = value
+        return cls(**values)
+
+
+class LocalStateStore:
+    """Состояния в памяти процесса (когда общего кэша нет)"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lock = threading.Lock()
+        self._values: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+
+    def get(self, key: str) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            if item[1] <= now:
+                del self._values[key]
+                return None
+            self._values.move_to_end(key)
+            return dict(item[0])
+
+    def set(self, key: str, data: dict, ttl: int) -> None:
+        with self._lock:
+            self._values[key] = (dict(data), time.monotonic() + ttl)
+            self._values.move_to_end(key)
+            while len(self._values) > self.size:
+                self._values.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+
+class CacheStateStore:
+    """Состояния в кэше Django (словарь под ключом чата)"""
+
+    def __init__(self, backend=None):
+        self.cache = backend or cache
+
+    def get(self, key: str) -> dict | None:
+        return self.cache.get(key)
+
+    def set(self, key: str, data: dict, ttl: int) -> None:
+        self.cache.set(key, data, ttl)
+
+    def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+
+class RedisStateStore:
+    """Состояния в хешах Redis: поле хеша на поле состояния, TTL на ключ"""
+
+    def __init__(self, backend=None):
+        self.cache = backend or cache
+
+    def _client(self, key: str):
+        return self.cache._cache.get_client(key, write=True)
+
+    def get(self, key: str) -> dict | None:
+        redis_key = self.cache.make_key(key)
+        values = self._client(redis_key).hgetall(redis_key)
+        if not values:
+            return None
+        return {
+            (name.decode() if isinstance(name, bytes) else name): value
+            for name, value in values.items()
+        }
+
+    def set(self, key: str, data: dict, ttl: int) -> None:
+        redis_key = self.cache.make_key(key)
+        pipe = self._client(redis_key).pipeline()
+        pipe.delete(redis_key)
+        # Поле "_" отличает пустое состояние от промаха
+        mapping = {"_": "1", **{name: str(value) for name, value in data.items()}}
+        pipe.hset(redis_key, mapping=mapping)
+        pipe.expire(redis_key, ttl)
+        pipe.execute()
+
+    def delete(self, key: str) -> None:
+        redis_key = self.cache.make_key(key)
+        self._client(redis_key).delete(redis_key)
+
+
+def get_state_store(config: dict | None = None):
+    """Выбирает хранилище состояний по бэкенду кэша по умолчанию"""
+    config = config or get_chat_state_config()
+    backend_name = type(cache).__name__
+    if backend_name == "RedisCache":
+        return RedisStateStore()
+    if backend_name == "DummyCache":
+        return LocalStateStore(config["LOCAL_SIZE"])
+    return CacheStateStore()
+
+
+class ChatStateManager:
+    """Чтение и запись состояния чатов с пакетным снимком в ChatState"""
+
+    def __init__(self, store=None, config: dict | None = None):
+        self.config = {**get_chat_state_config(), **(config or {})}
+        self.store = store or get_state_store(self.config)
+        self._dirty: dict[int, dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def _key(self, chat_id: int) -> str:
+        return f"{self.config['KEY_PREFIX']}:{chat_id}"
+
+    def get(self, chat_id: int) -> ChatStateData:
+        """Состояние чата; база — только при промахе хранилища"""
+        data = self.store.get(self._key(chat_id))
+        if data is not None:
+            CACHE_LOOKUPS.inc(cache="chat_state", result="hit")
+            return ChatStateData.from_dict(data)
+        CACHE_LOOKUPS.inc(cache="chat_state", result="miss")
+        with self._lock:
+            pending = self._dirty.get(chat_id)
+        if pending is None:
+            pending = self._load_snapshot(chat_id)
+        state = ChatStateData.from_dict(pending or {})
+        self.store.set(self._key(chat_id), state.as_dict(), self.config["TTL"])
+        return state
+
+    def update(self, chat_id: int, **changes) -> ChatStateData:
+        """Меняет поля состояния чата; в базу — со следующим снимком"""
+        state = replace(self.get(chat_id), **changes)
+        data = state.as_dict()
+        self.store.set(self._key(chat_id), data, self.config["TTL"])
+        with self._lock:
+            self._dirty[chat_id] = data
+            elapsed = time.monotonic() - self._last_flush
+        if elapsed >= self.config["SNAPSHOT_INTERVAL"]:
+            self.flush()
+        return state
+
+    def _load_snapshot(self, chat_id: int) -> dict | None:
+        from core.models import ChatState
+
+        try:
+            return (
+                ChatState.objects.filter(chat_id=chat_id)  # type: ignore
+                .values_list("data", flat=True)
+                .first()
+            )
+        except Exception as e:
+            logger.error(f"Не удалось прочитать состояние чата {chat_id}: {e}")
+            return None
+
+    def flush(self) -> int:
+        """Сохраняет измененные состояния одним запросом; возвращает число чатов"""
+        from core.models import ChatState
+
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+                self._last_flush = time.monotonic()
+            if not dirty:
+                return 0
+            try:
+                ChatState.objects.bulk_create(  # type: ignore
+                    [
+                        ChatState(chat_id=chat_id, data=data)
+                        for chat_id, data in dirty.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["chat_id"],
+                    update_fields=["data", "updated_at"],
+                )
+            except Exception as e:
+                logger.error(f"Не удалось сохранить {len(dirty)} состояний чатов: {e}")
+                return 0
+            return len(dirty)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._dirty)
+
+
+_manager: ChatStateManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_chat_states() -> ChatStateManager:
+    """Общее для процесса состояние чатов; снимок дописывается при остановке"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ChatStateManager()
+                atexit.register(_manager.flush)
+    return _manager
+
+
+def message_digest(text: str, reply_markup=None, parse_mode=None) -> str:
+    """Отпечаток текста, клавиатуры и разметки сообщения"""
+    markup = reply_markup.to_dict() if reply_markup is not None else None
+    payload = json.dumps([text, markup, parse_mode], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+async def edit_if_changed(query, text: str, reply_markup=None, parse_mode=None):
+    """
+    edit_message_text, только если меню чата отличается от показанного
+
+    Returns:
+        True, если сообщение отредактировано
+    """
+    message = query.message
+    chat_id, message_id = message.chat_id, message.message_id
+    digest = message_digest(text, reply_markup, parse_mode)
+    states = get_chat_states()
+    state = await sync_to_async(states.get)(chat_id)
+    if state.menu_message_id == message_id and state.menu_digest == digest:
+        return False
+    await query.edit_message_text(
+        text, reply_markup=reply_markup, parse_mode=parse_mode
+    )
+    await sync_to_async(states.update)(
+        chat_id, menu_message_id=message_id, menu_digest=digest
+    )
+    return True
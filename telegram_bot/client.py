@@ -0,0 +1,257 @@
+"""
+Общий клиент Telegram Bot API процесса
+
+Один telegram.Bot с пулом keep-alive соединений (HTTPXRequest) живет в
+отдельном потоке со своим event loop: соединения httpx привязаны к циклу,
+поэтому все вызовы Bot API выполняются в нем. Webhook отправляет туда
+обработку обновлений, синхронный код вызывает run(), код из других
+циклов — await arun(). Синхронные запросы (рассылки, getMe, setWebhook)
+идут через общий requests.Session с пулом соединений (api_session()).
+
+Время и исход каждого вызова пишутся в telegram_api_seconds по методу.
+Библиотека telegram загружается при первом обращении к боту, а не при
+импорте модуля: синхронный call_api() и веб-запросы без бота ее не ждут.
+"""
+
+import asyncio
+import atexit
+import functools
+import logging
+import threading
+import time
+from collections.abc import Coroutine
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TELEGRAM_CLIENT_CONFIG = {
+    "API_URL": "https://api.telegram.org",
+    "POOL_SIZE": 32,  # keep-alive соединений к api.telegram.org
+    "CONNECT_TIMEOUT": 5.0,
+    "READ_TIMEOUT": 10.0,
+    "WRITE_TIMEOUT": 10.0,
+    "POOL_TIMEOUT": 3.0,  # ожидание свободного соединения из пула
+    "CALL_TIMEOUT": 30.0,  # run(): сколько синхронный код ждет результата
+}
+
+API_SECONDS = metrics.histogram(
+    "telegram_api_seconds",
+    "Время вызова Telegram Bot API",
+    ("method", "outcome"),
+)
+
+
+def get_client_config() -> dict:
+    """Возвращает настройки клиента с учетом TELEGRAM_CLIENT_CONFIG"""
+    config = dict(DEFAULT_TELEGRAM_CLIENT_CONFIG)
+    config.update(getattr(settings, "TELEGRAM_CLIENT_CONFIG", {}))
+    return config
+
+
+def _api_method(url: str) -> str:
+    return url.rstrip("/").rsplit("/", 1)[-1].split("?", 1)[0] or "unknown"
+
+
+@functools.cache
+def instrumented_request_class():
+    """HTTPXRequest, который пишет время вызова в API_SECONDS"""
+    from telegram.request import HTTPXRequest  # type: ignore
+
+    class InstrumentedRequest(HTTPXRequest):
+        async def do_request(self, url, method, *args, **kwargs):
+            with API_SECONDS.time(method=_api_method(url)) as labels:
+                try:
+                    code, payload = await super().do_request(
+                        url, method, *args, **kwargs
+                    )
+                except Exception:
+                    labels["outcome"] = "error"
+                    raise
+                labels["outcome"] = "ok" if code == 200 else str(code)
+                return code, payload
+
+    return InstrumentedRequest
+
+
+class BotClient:
+    """telegram.Bot и event loop, в котором выполняются его вызовы"""
+
+    def __init__(self, token: str | None = None, **config):
+        self.config = {**get_client_config(), **config}
+        self.token = token if token is not None else settings.TELEGRAM_BOT_TOKEN
+        self._lock = threading.Lock()
+        self._bot = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+
+    def _request(self):
+        return instrumented_request_class()(
+            connection_pool_size=self.config["POOL_SIZE"],
+            connect_timeout=self.config["CONNECT_TIMEOUT"],
+            read_timeout=self.config["READ_TIMEOUT"],
+            write_timeout=self.config["WRITE_TIMEOUT"],
+            pool_timeout=self.config["POOL_TIMEOUT"],
+        )
+
+    @property
+    def bot(self):
+        """Общий telegram.Bot; InvalidToken, если токен не задан"""
+        if self._bot is None:
+            from telegram import Bot  # type: ignore
+
+            with self._lock:
+                if self._bot is None:
+                    self._bot = Bot(
+                        self.token,
+                        base_url=f"{self.config['API_URL']}/bot",
+                        request=self._request(),
+                    )
+        return self._bot
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop клиента; поток запускается при первом обращении"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(
+                        target=loop.run_forever, name="telegram-client", daemon=True
+                    )
+                    self._thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def _in_loop(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Запускает корутину в цикле клиента, не дожидаясь результата"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: float | None = None):
+        """Выполняет корутину в цикле клиента и возвращает результат"""
+        if self._in_loop():
+            coro.close()
+            raise RuntimeError("run() из цикла клиента заблокирует его, нужен await")
+        return self.submit(coro).result(timeout or self.config["CALL_TIMEOUT"])
+
+    async def arun(self, coro: Coroutine):
+        """await из любого цикла: корутина выполняется в цикле клиента"""
+        if self._in_loop():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Закрывает соединения бота и останавливает цикл"""
+        with self._lock:
+            loop, thread, bot = self._loop, self._thread, self._bot
+            self._loop = self._thread = self._bot = None
+        if loop is None:
+            return
+        if bot is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(bot.shutdown(), loop).result(timeout)
+            except Exception as e:
+                logger.debug(f"Ошибка закрытия клиента Telegram: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        loop.close()
+
+
+_client: BotClient | None = None
+_session = None
+_lock = threading.Lock()
+
+
+def get_bot_client() -> BotClient:
+    """Общий BotClient процесса"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = BotClient()
+    return _client
+
+
+def _observe_response(response, *args, **kwargs):
+    outcome = "ok" if response.status_code == 200 else str(response.status_code)
+    API_SECONDS.observe(
+        response.elapsed.total_seconds(),
+        method=_api_method(response.request.url),
+        outcome=outcome,
+    )
+
+
+def api_session():
+    """Общий requests.Session к Bot API с пулом соединений и метриками"""
+    global _session
+    if _session is None:
+        try:
+            import requests  # type: ignore
+            from requests.adapters import HTTPAdapter  # type: ignore
+        except Exception:  # pragma: no cover
+            return None
+        with _lock:
+            if _session is None:
+                pool_size = get_client_config()["POOL_SIZE"]
+                session = requests.Session()
+                session.mount(
+                    "https://",
+                    HTTPAdapter(pool_connections=1, pool_maxsize=pool_size),
+                )
+                session.hooks["response"].append(_observe_response)
+                _session = session
+    return _session
+
+
+def call_api(
+    method: str, token: str | None = None, timeout: float | None = None, **payload
+):
+    """
+    Синхронный вызов метода Bot API через api_session()
+
+    Returns:
+        поле result ответа; RuntimeError, если Telegram вернул ok=false
+    """
+    config = get_client_config()
+    token = token if token is not None else settings.TELEGRAM_BOT_TOKEN
+    session = api_session()
+    if session is None:
+        raise RuntimeError("requests недоступен")
+    started = time.perf_counter()
+    try:
+        resp = session.post(
+            f"{config['API_URL']}/bot{token}/{method}",
+            json=payload,
+            timeout=timeout or config["READ_TIMEOUT"],
+        )
+    except Exception:
+        API_SECONDS.observe(
+            time.perf_counter() - started, method=method, outcome="error"
+        )
+        raise
+    data = resp.json()
+    if not data.get("ok"):
+        raise RuntimeError(f"{method}: {data.get('description', resp.status_code)}")
+    return data.get("result")
+
+
+def shutdown() -> None:
+    """Закрывает общий клиент и сессию (при выходе из процесса)"""
+    global _client, _session
+    with _lock:
+        client, session = _client, _session
+        _client = _session = None
+    if client is not None:
+        client.shutdown()
+    if session is not None:
+        session.close()
+
+
+atexit.register(shutdown)
@@ -9,10 +9,18 @@
 
 from typing import Any, Dict, Optional
 
+from asgiref.sync import sync_to_async
+
+from .achievement_engine import AchievementEngine, get_achievement_engine
 from .achievements_manager import AchievementsManager
 from .points_manager import PointsManager
 
-__all__ = ["PointsManager", "AchievementsManager", "TelegramGamification"]
+__all__ = [
+    "PointsManager",
+    "AchievementsManager",
+    "AchievementEngine",
+    "TelegramGamification",
+]
 
 
 class TelegramGamification:
@@ -27,18 +35,26 @@ class TelegramGamification:
 
     async def process_correct_answer(self, user_id: int) -> dict:  # type: ignore
         """Обрабатывает правильный ответ пользователя"""
-        # Добавляем очки
-        points_result = await self.points_manager.add_points(
-            user_id, self.points_manager.points_per_correct, "Правильный ответ"
+        # Очки, серия и достижения — одним событием и одной записью профиля
+        award = await sync_to_async(get_achievement_engine().record_answer)(
+            user_id, True
         )
-
-        # Проверяем достижения
-        new_achievements = await self.achievements_manager.check_achievements(user_id)
+        if award is None:
+            return {
+                "points": {"success": False},
+                "achievements": [],
+                "level_up": False,
+            }
 
         return {
-            "points": points_result,
-            "achievements": new_achievements,
-            "level_up": points_result.get("level_up", False),
+            "points": {
+                "success": True,
+                "points_added": award.points,
+                "level": award.level,
+                "level_up": award.level_up,
+            },
+            "achievements": [rule.as_dict() for rule in award.achievements],
+            "level_up": award.level_up,
         }
 
     async def get_user_profile(self, user_id: int) -> dict:  # type: ignore
@@ -0,0 +1,291 @@
+"""
+Движок достижений, управляемый событиями
+
+Достижение — порог по одному счетчику профиля (решено задач, текущая
+серия, уровень). Правила сгруппированы по счетчику и отсортированы по
+порогу; событие (верный ответ, изменение серии, новый уровень) называет
+затронутые счетчики, и проверяются только пороги, которые счетчик
+перешел в этом событии, — поиском делением пополам, без перебора всех
+определений. Новые значения счетчиков, выданные достижения и очки за них
+записываются в UnifiedProfile одним update().
+"""
+
+import logging
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACHIEVEMENT_CONFIG = {
+    "POINTS_PER_CORRECT": 10,
+    "POINTS_PER_LEVEL": 100,
+    "RULES": [
+        {
+            "key": "first_correct",
+            "title": "🎯 Первый успех",
+            "description": "Правильно ответил на первое задание",
+            "points": 25,
+            "counter": "total_solved",
+            "threshold": 1,
+        },
+        {
+            "key": "streak_5",
+            "title": "🔥 Серия 5",
+            "description": "Правильно ответил на 5 заданий подряд",
+            "points": 50,
+            "counter": "current_streak",
+            "threshold": 5,
+        },
+        {
+            "key": "streak_10",
+            "title": "🚀 Серия 10",
+            "description": "Правильно ответил на 10 заданий подряд",
+            "points": 100,
+            "counter": "current_streak",
+            "threshold": 10,
+        },
+        {
+            "key": "level_5",
+            "title": "⭐ Уровень 5",
+            "description": "Достиг 5-го уровня",
+            "points": 200,
+            "counter": "level",
+            "threshold": 5,
+        },
+        {
+            "key": "daily_learner",
+            "title": "📅 Ежедневное обучение",
+            "description": "Решил 7 заданий",
+            "points": 150,
+            "counter": "total_solved",
+            "threshold": 7,
+        },
+    ],
+}
+
+# Событие -> счетчики профиля, которые оно меняет
+EVENTS = {
+    "answer_correct": ("total_solved",),
+    "streak": ("current_streak",),
+    "level_up": ("level",),
+}
+COUNTERS = ("total_solved", "current_streak", "level")
+
+
+def get_achievement_config() -> dict:
+    """Возвращает настройки достижений с учетом ACHIEVEMENT_CONFIG"""
+    config = dict(DEFAULT_ACHIEVEMENT_CONFIG)
+    config.update(getattr(settings, "ACHIEVEMENT_CONFIG", {}))
+    return config
+
+
+@dataclass(frozen=True)
+class AchievementRule:
+    """Достижение: порог счетчика и награда"""
+
+    key: str
+    title: str
+    description: str
+    points: int
+    counter: str
+    threshold: int
+
+    def as_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "title": self.title,
+            "description": self.description,
+            "points": self.points,
+        }
+
+
+@dataclass(frozen=True)
+class AnswerAward:
+    """Итог ответа для профиля"""
+
+    points: int = 0
+    level: int = 1
+    level_up: bool = False
+    achievements: tuple[AchievementRule, ...] = ()
+
+
+def granted_keys(achievements) -> set[str]:
+    """Ключи выданных достижений (список ключей или старый словарь)"""
+    return set(achievements or ())
+
+
+class AchievementEngine:
+    """Индекс правил по счетчикам и применение событий к профилю"""
+
+    def __init__(self, config: dict | None = None):
+        self.config = {**get_achievement_config(), **(config or {})}
+        self.rules: dict[str, AchievementRule] = {}
+        by_counter: dict[str, list[AchievementRule]] = {}
+        for item in self.config["RULES"]:
+            rule = AchievementRule(**item)
+            if rule.counter not in COUNTERS:
+                raise ValueError(f"Неизвестный счетчик достижения {rule.key}")
+            if rule.key in self.rules:
+                raise ValueError(f"Достижение {rule.key} задано дважды")
+            self.rules[rule.key] = rule
+            by_counter.setdefault(rule.counter, []).append(rule)
+        self._index = {}
+        for counter, rules in by_counter.items():
+            rules.sort(key=lambda rule: rule.threshold)
+            self._index[counter] = ([rule.threshold for rule in rules], rules)
+
+    def crossed(self, counter: str, old, new) -> list[AchievementRule]:
+        """Правила счетчика с порогом в (old, new]"""
+        thresholds, rules = self._index.get(counter, ((), ()))
+        low, high = bisect_right(thresholds, old), bisect_right(thresholds, new)
+        return list(rules[low:high])
+
+    def evaluate(
+        self, events, before: dict, after: dict, granted: set[str]
+    ) -> list[AchievementRule]:
+        """Новые достижения по правилам, подписанным на события"""
+        found = []
+        for event in events:
+            for counter in EVENTS[event]:
+                for rule in self.crossed(counter, before[counter], after[counter]):
+                    if rule.key not in granted:
+                        found.append(rule)
+        return found
+
+    def level_for(self, points: int) -> int:
+        return points // self.config["POINTS_PER_LEVEL"] + 1
+
+    def _award(self, events, before: dict, after: dict, points: int, granted):
+        """
+        Новые достижения и уровень после событий
+
+        Очки за достижение могут поднять уровень, а новый уровень — дать
+        достижение, поэтому проверка повторяется, пока что-то выдается.
+
+        Returns:
+            (новые достижения, очки с наградами); after["level"] обновляется
+        """
+        granted = set(granted)
+        new_rules: list[AchievementRule] = []
+        level = after["level"]
+        while True:
+            after["level"] = max(level, self.level_for(points))
+            level_up = ("level_up",) if after["level"] > before["level"] else ()
+            fresh = self.evaluate((*events, *level_up), before, after, granted)
+            if not fresh:
+                return new_rules, points
+            for rule in fresh:
+                granted.add(rule.key)
+                new_rules.append(rule)
+                points += rule.points
+
+    def record_answer(self, telegram_id: int, is_correct: bool) -> AnswerAward | None:
+        """
+        Учитывает ответ в профиле одним update()
+
+        Returns:
+            AnswerAward или None, если профиля нет
+        """
+        from core.models import UnifiedProfile
+
+        with transaction.atomic():
+            row = (
+                UnifiedProfile.objects.select_for_update()  # type: ignore
+                .filter(telegram_id=telegram_id)
+                .values(
+                    "pk",
+                    "best_streak",
+                    "experience_points",
+                    "achievements",
+                    *COUNTERS,
+                )
+                .first()
+            )
+            if row is None:
+                return None
+            profile = UnifiedProfile.objects.filter(pk=row["pk"])  # type: ignore
+            if not is_correct:
+                if row["current_streak"]:
+                    profile.update(current_streak=0)
+                return AnswerAward(level=row["level"])
+
+            before = {counter: row[counter] for counter in COUNTERS}
+            after = dict(
+                before,
+                total_solved=before["total_solved"] + 1,
+                current_streak=before["current_streak"] + 1,
+            )
+            points = row["experience_points"] + self.config["POINTS_PER_CORRECT"]
+            granted = granted_keys(row["achievements"])
+            new_rules, points = self._award(
+                ("answer_correct", "streak"), before, after, points, granted
+            )
+            changes = {
+                "total_solved": after["total_solved"],
+                "current_streak": after["current_streak"],
+                "best_streak": max(row["best_streak"], after["current_streak"]),
+                "experience_points": points,
+                "level": after["level"],
+            }
+            if new_rules:
+                changes["achievements"] = sorted(
+                    granted | {rule.key for rule in new_rules}
+                )
+            profile.update(**changes)
+
+        return AnswerAward(
+            points=points - row["experience_points"],
+            level=after["level"],
+            level_up=after["level"] > before["level"],
+            achievements=tuple(new_rules),
+        )
+
+    def sync(self, telegram_id: int) -> list[AchievementRule]:
+        """
+        Полная сверка: выдает все достижения, пороги которых уже пройдены
+
+        Нужна после изменений профиля в обход событий; награды — одним update()
+        """
+        from core.models import UnifiedProfile
+
+        with transaction.atomic():
+            row = (
+                UnifiedProfile.objects.select_for_update()  # type: ignore
+                .filter(telegram_id=telegram_id)
+                .values("pk", "experience_points", "achievements", *COUNTERS)
+                .first()
+            )
+            if row is None:
+                return []
+            before = {counter: float("-inf") for counter in COUNTERS}
+            after = {counter: row[counter] for counter in COUNTERS}
+            granted = granted_keys(row["achievements"])
+            new_rules, points = self._award(
+                tuple(EVENTS), before, after, row["experience_points"], granted
+            )
+            if not new_rules:
+                return []
+            UnifiedProfile.objects.filter(pk=row["pk"]).update(  # type: ignore
+                experience_points=points,
+                level=after["level"],
+                achievements=sorted(granted | {rule.key for rule in new_rules}),
+            )
+        return new_rules
+
+
+_engine: AchievementEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_achievement_engine() -> AchievementEngine:
+    """Общий для процесса индекс правил достижений"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AchievementEngine()
+    return _engine
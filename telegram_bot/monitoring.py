@@ -24,9 +24,8 @@ from django.conf import settings
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "examflow_project.settings")
 django.setup()
 
-from telegram import Bot
-
-from core.container import Container
+from core.health_probes import get_health_report
+from telegram_bot.client import get_bot_client
 
 logger = logging.getLogger(__name__)
 
@@ -43,63 +42,35 @@ class BotMonitor:
         self.max_failures = 3
 
     async def check_bot_health(self) -> dict[str, Any]:
-        """Проверка здоровья бота"""
-        health_status = {
-            "timestamp": datetime.now().isoformat(),
-            "bot_online": False,
-            "api_responsive": False,
-            "database_connected": False,
-            "ai_working": False,
-            "errors": [],
-        }
-
-        try:
-            # 1. Проверка Telegram Bot API
-            bot = Bot(token=self.bot_token)
-            me = await bot.get_me()
-            health_status["bot_online"] = True
-            health_status["bot_info"] = {
-                "username": me.username,
-                "id": me.id,
-                "first_name": me.first_name,
-            }
-            logger.info(f"✅ Bot API: @{me.username}")
-
-        except Exception as e:
-            health_status["errors"].append(f"Bot API error: {str(e)}")
-            logger.error(f"❌ Bot API: {e}")
-
-        try:
-            # 2. Проверка базы данных
-            from learning.models import Subject
-
-            subjects_count = Subject.objects.count()  # type: ignore
-            health_status["database_connected"] = True
-            health_status["database_info"] = {"subjects_count": subjects_count}
-            logger.info(f"✅ Database: {subjects_count} subjects")
+        """
+        Проверка здоровья бота по дешевым пробам (core.health_probes)
 
-        except Exception as e:
-            health_status["errors"].append(f"Database error: {str(e)}")
-            logger.error(f"❌ Database: {e}")
+        Пробы не делают генераций ИИ и не читают таблицы; отчет берется из
+        кэша, если его недавно обновил health check.
+        """
+        report = await asyncio.to_thread(get_health_report)
+        probes = report["probes"]
 
-        try:
-            # 3. Проверка AI системы
-            ai_orchestrator = Container.ai_orchestrator()
-            test_response = ai_orchestrator.ask("Тест")
-            if isinstance(test_response, dict) and "answer" in test_response:
-                health_status["ai_working"] = True
-                health_status["ai_info"] = {
-                    "response_length": len(test_response["answer"])
-                }
-                logger.info("✅ AI System: Working")
-            else:
-                health_status["errors"].append("AI returned unexpected format")
+        def _ok(name: str) -> bool:
+            return bool(probes.get(name, {}).get("ok"))
 
-        except Exception as e:
-            health_status["errors"].append(f"AI error: {str(e)}")
-            logger.error(f"❌ AI System: {e}")
+        health_status = {
+            "timestamp": datetime.now().isoformat(),
+            "bot_online": _ok("telegram"),
+            "api_responsive": _ok("telegram"),
+            "database_connected": _ok("database"),
+            "ai_working": _ok("ai"),
+            "probes": probes,
+            "errors": [
+                f"{name}: {result['detail']}"
+                for name, result in probes.items()
+                if not result["ok"]
+            ],
+        }
+        for name, result in probes.items():
+            mark = "✅" if result["ok"] else "❌"
+            logger.info(f"{mark} {name}: {result['detail']}")
 
-        # 4. Общий статус
         health_status["overall_healthy"] = (
             health_status["bot_online"]
             and health_status["database_connected"]
@@ -115,7 +86,7 @@ class BotMonitor:
             return
 
         try:
-            bot = Bot(token=self.bot_token)
+            client = get_bot_client()
 
             # Эмодзи в зависимости от приоритета
             emoji = {"info": "ℹ️", "warning": "⚠️", "error": "🚨", "success": "✅"}.get(
@@ -124,10 +95,12 @@ class BotMonitor:
 
             formatted_message = f"{emoji} **ExamFlow Bot Alert**\n\n{message}\n\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
 
-            await bot.send_message(
-                chat_id=self.admin_chat_id,
-                text=formatted_message,
-                parse_mode="Markdown",
+            await client.arun(
+                client.bot.send_message(
+                    chat_id=self.admin_chat_id,
+                    text=formatted_message,
+                    parse_mode="Markdown",
+                )
             )
 
         except Exception as e:
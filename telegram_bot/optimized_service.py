@@ -17,9 +17,10 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from ai.optimized_service import ai_service
 from core.services.unified_profile import UnifiedProfileService
-from learning.models import Subject, Task
+from learning.models import Task
 
 from .gamification import TelegramGamification
+from .utils.catalog_keyboards import catalog_keyboard, get_catalog_async
 
 logger = logging.getLogger(__name__)
 
@@ -73,10 +74,10 @@ class OptimizedBotService:
     async def get_subjects_menu(self) -> tuple[str, InlineKeyboardMarkup]:
         """Получает меню предметов"""
         try:
-            subjects = await self._get_subjects()
+            catalog = await get_catalog_async()
 
             message = "📚 Выбери предмет для изучения:"
-            keyboard = self._get_subjects_keyboard(subjects)
+            keyboard = catalog_keyboard(catalog, "subjects")
 
             return message, keyboard
 
@@ -89,18 +90,19 @@ class OptimizedBotService:
     ) -> tuple[str, InlineKeyboardMarkup]:
         """Получает темы предмета"""
         try:
-            subject = await self._get_subject(subject_id)
+            catalog = await get_catalog_async()
+            subject = catalog.subject(subject_id)
             if not subject:
-                return "❌ Предмет не найден", self._get_subjects_keyboard([])
+                return "❌ Предмет не найден", catalog_keyboard(catalog, "subjects")
 
-            message = f"📖 {subject['name']} - {subject['exam_type']}\n\nВыбери тему:"
-            keyboard = self._get_topics_keyboard(subject_id, subject.get("topics", []))
+            message = f"📖 {subject.name} - {subject.exam_type_display}\n\nВыбери тему:"
+            keyboard = catalog_keyboard(catalog, f"topics_{subject_id}")
 
             return message, keyboard
 
         except Exception as e:
             self.logger.error(f"Ошибка получения тем: {e}")
-            return "❌ Ошибка загрузки тем", self._get_subjects_keyboard([])
+            return "❌ Ошибка загрузки тем", self._get_main_menu_keyboard()
 
     async def get_random_task(self, subject_id: int = None) -> tuple[str, InlineKeyboardMarkup]:  # type: ignore
         """Получает случайное задание"""
@@ -201,31 +203,6 @@ class OptimizedBotService:
             self.logger.error(f"Ошибка получения Django пользователя: {e}")
             return None
 
-    async def _get_subjects(self) -> list[dict[str, Any]]:
-        """Получает список предметов"""
-        try:
-            subjects = await sync_to_async(list)(
-                Subject.objects.all().values("id", "name", "exam_type")  # type: ignore
-            )
-            return list(subjects)
-        except Exception as e:
-            self.logger.error(f"Ошибка получения предметов: {e}")
-            return []
-
-    async def _get_subject(self, subject_id: int) -> dict[str, Any] | None:
-        """Получает предмет по ID"""
-        try:
-            subject = await sync_to_async(Subject.objects.get)(id=subject_id)  # type: ignore
-            return {
-                "id": subject.id,
-                "name": subject.name,
-                "exam_type": subject.exam_type,
-                "topics": [],  # Можно добавить загрузку тем
-            }
-        except Exception as e:
-            self.logger.error(f"Ошибка получения предмета: {e}")
-            return None
-
     async def _get_random_task(self, subject_id: int = None) -> dict[str, Any] | None:  # type: ignore
         """Получает случайное задание"""
         try:
@@ -281,37 +258,6 @@ class OptimizedBotService:
         ]
         return InlineKeyboardMarkup(keyboard)
 
-    def _get_subjects_keyboard(
-        self, subjects: list[dict[str, Any]]
-    ) -> InlineKeyboardMarkup:
-        """Клавиатура предметов"""
-        keyboard = []
-        for subject in subjects[:6]:  # Максимум 6 предметов
-            keyboard.append(
-                [
-                    InlineKeyboardButton(
-                        f"{subject['name']} ({subject['exam_type']})",
-                        callback_data=f"subject_{subject['id']}",
-                    )
-                ]
-            )
-
-        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="main_menu")])
-        return InlineKeyboardMarkup(keyboard)
-
-    def _get_topics_keyboard(
-        self, subject_id: int, topics: list[str]
-    ) -> InlineKeyboardMarkup:
-        """Клавиатура тем"""
-        keyboard = []
-        for i, topic in enumerate(topics[:5]):  # Максимум 5 тем
-            keyboard.append(
-                [InlineKeyboardButton(topic, callback_data=f"topic_{subject_id}_{i}")]
-            )
-
-        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="subjects")])
-        return InlineKeyboardMarkup(keyboard)
-
     def _get_task_keyboard(self, task_id: int) -> InlineKeyboardMarkup:
         """Клавиатура задания"""
         keyboard = [
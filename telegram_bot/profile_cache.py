@@ -0,0 +1,191 @@
+"""
+Кэш профиля пользователя бота
+
+По telegram_id в кэше Django держится ProfileSnapshot: ID пользователя и
+профиля и горячие поля (уровень, очки, серия). При попадании обработчику
+не нужны get_or_create пользователя, профиля и рейтинга; очки за ответы
+из бота сразу записываются и в снимок. Время последней активности не
+пишется на каждое сообщение: отметки копятся в памяти и уходят в
+UnifiedProfile одним update() не чаще раза в ACTIVITY_INTERVAL секунд.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_CACHE_CONFIG = {
+    "CACHE_PREFIX": "bot_profile",
+    "CACHE_TTL": 15 * 60,  # секунд
+    "ACTIVITY_INTERVAL": 5 * 60,  # секунд между записями last_activity
+}
+
+
+def get_profile_cache_config() -> dict:
+    """Возвращает настройки кэша профилей с учетом PROFILE_CACHE_CONFIG"""
+    config = dict(DEFAULT_PROFILE_CACHE_CONFIG)
+    config.update(getattr(settings, "PROFILE_CACHE_CONFIG", {}))
+    return config
+
+
+@dataclass(frozen=True)
+class ProfileSnapshot:
+    """Горячие данные пользователя бота"""
+
+    telegram_id: int
+    user_id: int
+    profile_id: int | None = None
+    username: str = ""
+    level: int = 1
+    points: int = 0
+    streak: int = 0
+
+
+def _cache_key(telegram_id: int, config: dict) -> str:
+    return f"{config['CACHE_PREFIX']}:{telegram_id}"
+
+
+def get_snapshot(telegram_id: int) -> ProfileSnapshot | None:
+    """Снимок профиля из кэша или None"""
+    snapshot = cache.get(_cache_key(telegram_id, get_profile_cache_config()))
+    CACHE_LOOKUPS.inc(
+        cache="bot_profile", result="miss" if snapshot is None else "hit"
+    )
+    return snapshot
+
+
+def store_snapshot(snapshot: ProfileSnapshot) -> ProfileSnapshot:
+    """Кладет снимок в кэш"""
+    config = get_profile_cache_config()
+    cache.set(_cache_key(snapshot.telegram_id, config), snapshot, config["CACHE_TTL"])
+    return snapshot
+
+
+def update_snapshot(telegram_id: int, **changes) -> ProfileSnapshot | None:
+    """
+    Обновляет поля закэшированного снимка после записи в базу
+
+    Returns:
+        новый снимок или None, если пользователя нет в кэше
+    """
+    snapshot = cache.get(_cache_key(telegram_id, get_profile_cache_config()))
+    if snapshot is None:
+        return None
+    return store_snapshot(replace(snapshot, **changes))
+
+
+def invalidate_snapshot(telegram_id: int) -> None:
+    """Убирает снимок пользователя из кэша"""
+    cache.delete(_cache_key(telegram_id, get_profile_cache_config()))
+
+
+def load_snapshot(
+    user, profile_id: int | None = None, points: int | None = None
+) -> ProfileSnapshot:
+    """
+    Собирает снимок пользователя Django из базы
+
+    Args:
+        user: пользователь Django с telegram_id
+        profile_id, points: уже известные вызывающему ID профиля и очки
+    """
+    from core.models import UnifiedProfile, UserProfile
+    from learning.models import UserRating
+
+    if profile_id is None:
+        profile_id = (
+            UserProfile.objects.filter(user=user)  # type: ignore
+            .values_list("pk", flat=True)
+            .first()
+        )
+    if points is None:
+        points = (
+            UserRating.objects.filter(user=user)  # type: ignore
+            .values_list("total_points", flat=True)
+            .first()
+        ) or 0
+    level, streak = (
+        UnifiedProfile.objects.filter(telegram_id=user.telegram_id)  # type: ignore
+        .values_list("level", "current_streak")
+        .first()
+    ) or (1, 0)
+    return ProfileSnapshot(
+        telegram_id=user.telegram_id,
+        user_id=user.pk,
+        profile_id=profile_id,
+        username=user.telegram_username or "",
+        level=level,
+        points=points,
+        streak=streak,
+    )
+
+
+class ActivityTracker:
+    """Отметки активности с записью в UnifiedProfile одним update()"""
+
+    def __init__(self, config: dict | None = None):
+        self.config = {**get_profile_cache_config(), **(config or {})}
+        self._pending: set[int] = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def touch(self, telegram_id: int) -> int:
+        """
+        Отмечает активность; раз в ACTIVITY_INTERVAL пишет накопленное
+
+        Returns:
+            число обновленных профилей (0, если запись отложена)
+        """
+        with self._lock:
+            self._pending.add(telegram_id)
+            due = (
+                time.monotonic() - self._last_flush >= self.config["ACTIVITY_INTERVAL"]
+            )
+        return self.flush() if due else 0
+
+    def flush(self) -> int:
+        """Пишет last_activity всех отмеченных профилей одним запросом"""
+        from core.models import UnifiedProfile
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, set()
+                self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+            try:
+                return UnifiedProfile.objects.filter(  # type: ignore
+                    telegram_id__in=pending
+                ).update(last_activity=timezone.now())
+            except Exception as e:
+                logger.error(f"Не удалось записать активность профилей: {e}")
+                return 0
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+
+_tracker: ActivityTracker | None = None
+_tracker_lock = threading.Lock()
+
+
+def get_activity_tracker() -> ActivityTracker:
+    """Общий для процесса учет активности; дописывается при остановке"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = ActivityTracker()
+                atexit.register(_tracker.flush)
+    return _tracker
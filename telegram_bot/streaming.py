@@ -0,0 +1,94 @@
+"""
+Потоковый вывод ответа ИИ в Telegram
+
+Ответ провайдера приходит частями; сообщение-заглушка редактируется по мере
+накопления текста, но не чаще STREAM_EDIT_INTERVAL секунд и только при
+заметном приросте текста — так пользователь видит начало ответа сразу и
+бот не упирается в ограничения Telegram на частоту edit_message_text.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Iterator
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_TEXT_LIMIT = 4000
+DEFAULT_EDIT_INTERVAL = 1.5  # секунд между правками сообщения
+DEFAULT_MIN_DELTA = 40  # символов прироста для промежуточной правки
+
+_END = object()
+
+
+def get_stream_settings() -> tuple[float, int]:
+    """(интервал между правками, минимальный прирост текста)"""
+    config = getattr(settings, "TELEGRAM_BOT_CONFIG", {})
+    return (
+        config.get("STREAM_EDIT_INTERVAL", DEFAULT_EDIT_INTERVAL),
+        config.get("STREAM_MIN_DELTA", DEFAULT_MIN_DELTA),
+    )
+
+
+def _fit(text: str) -> str:
+    if len(text) > TELEGRAM_TEXT_LIMIT:
+        return text[: TELEGRAM_TEXT_LIMIT - 3] + "..."
+    return text
+
+
+async def stream_to_message(
+    message,
+    chunks: Iterator[str],
+    format_text: Callable[[str], str] = lambda text: text,
+    interval: float | None = None,
+    min_delta: int | None = None,
+    **edit_kwargs,
+) -> str:
+    """
+    Выводит фрагменты из синхронного генератора в сообщение message
+
+    Генератор читается в отдельном потоке, чтобы не блокировать цикл
+    событий бота. Промежуточные правки троттлятся, последняя правка
+    содержит весь ответ. Ошибки генератора пробрасываются вызывающему.
+
+    Returns:
+        Полный (неотформатированный) текст ответа
+    """
+    default_interval, default_min_delta = get_stream_settings()
+    interval = default_interval if interval is None else interval
+    min_delta = default_min_delta if min_delta is None else min_delta
+
+    parts: list[str] = []
+    shown = ""
+    last_edit = time.monotonic()
+
+    async def edit(text: str) -> None:
+        nonlocal shown, last_edit
+        if not text or text == shown:
+            return
+        try:
+            await message.edit_text(text, **edit_kwargs)
+        except Exception as e:
+            # Промежуточная правка не критична (например, "message is not modified")
+            logger.warning(f"Не удалось обновить сообщение: {e}")
+        shown = text
+        last_edit = time.monotonic()
+
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, _END)
+        if chunk is _END:
+            break
+        parts.append(chunk)  # type: ignore
+
+        text = _fit(format_text("".join(parts)))
+        if (
+            time.monotonic() - last_edit >= interval
+            and len(text) - len(shown) >= min_delta
+        ):
+            await edit(text)
+
+    full_text = "".join(parts)
+    await edit(_fit(format_text(full_text)))
+    return full_text
@@ -0,0 +1,35 @@
+"""
+Клавиатуры меню каталога из снимка learning.catalog
+
+InlineKeyboardMarkup неизменяем, поэтому клавиатура строится один раз на
+версию снимка и переиспользуется всеми нажатиями.
+"""
+
+from asgiref.sync import sync_to_async
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from learning.catalog import CatalogSnapshot, get_catalog
+
+_keyboards: dict[tuple[str, str], InlineKeyboardMarkup] = {}
+
+
+async def get_catalog_async() -> CatalogSnapshot:
+    """Снимок каталога из асинхронного обработчика"""
+    return await sync_to_async(get_catalog)()
+
+
+def catalog_keyboard(snapshot: CatalogSnapshot, name: str) -> InlineKeyboardMarkup:
+    """Готовая клавиатура name для версии снимка"""
+    key = (snapshot.version, name)
+    keyboard = _keyboards.get(key)
+    if keyboard is None:
+        # Клавиатуры прошлых версий больше не нужны
+        if any(version != snapshot.version for version, _ in _keyboards):
+            _keyboards.clear()
+        keyboard = _keyboards[key] = InlineKeyboardMarkup(
+            [
+                [InlineKeyboardButton(text, callback_data=data) for text, data in row]
+                for row in snapshot.keyboard(name)
+            ]
+        )
+    return keyboard
@@ -9,23 +9,46 @@
 
 import json
 import logging
-import threading
+import time
 
-import requests  # type: ignore
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
-try:
-    from telegram import Update
-except ImportError:
-    Update = None
 from django.conf import settings
 from django.utils import timezone
 
-from .bot_main import get_bot
+from core import metrics
+from core.startup_profile import lazy_import
+
+from .callback_router import get_router
+from .client import call_api, get_bot_client
+
+# Библиотека telegram и обработчики бота загружаются при первом обновлении,
+# а не при импорте URLconf: остальные запросы холодного воркера их не ждут
+try:
+    telegram = lazy_import("telegram")
+except ImportError:
+    telegram = None
+bot_handlers = lazy_import("telegram_bot.bot_handlers")
 
 logger = logging.getLogger(__name__)
 
+WEBHOOK_UPDATES = metrics.counter(
+    "telegram_webhook_updates_total", "Обновления, полученные webhook", ("update_type",)
+)
+UPDATE_SECONDS = metrics.histogram(
+    "telegram_update_seconds",
+    "Время обработки обновления Telegram",
+    ("update_type",),
+)
+UPDATE_TYPES = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "inline_query",
+    "my_chat_member",
+)
+
 # 🔒 БЕЗОПАСНОСТЬ: Разрешенные IP для webhook (опционально)
 # Временно отключаем фильтрацию IP, чтобы не блокировать Telegram (403 Forbidden)
 # При необходимости можно вернуть списки сетей Telegram и корректную проверку CIDR
@@ -94,21 +117,25 @@ def telegram_webhook(request):
             logger.warning("Пустой или некорректный JSON в webhook — возвращаем OK")
             return HttpResponse(b"OK")
         logger.info(f"Webhook data: {json.dumps(data, indent=2, ensure_ascii=False)}")
+        if isinstance(data, dict):
+            WEBHOOK_UPDATES.inc(
+                update_type=next((k for k in UPDATE_TYPES if k in data), "other")
+            )
 
         # Упрощенный путь для callback_query в тестовой среде: мгновенно подтверждаем
         if isinstance(data, dict) and data.get("callback_query"):
             return HttpResponse(b"OK")
 
         # Получаем экземпляр бота
-        bot = get_bot()
+        bot = get_bot_client().bot
         logger.info(f"Bot instance получен: {bot is not None}")
 
         # Создаем объект Update
-        if Update is None:
+        if telegram is None:
             logger.warning("Telegram library not installed — возвращаем OK для вебхука")
             return HttpResponse(b"OK")
 
-        update = Update.de_json(data, bot)
+        update = telegram.Update.de_json(data, bot)
         logger.info(f"Update создан: {update is not None}")
 
         if update:
@@ -135,18 +162,14 @@ def telegram_webhook(request):
                             f"Отправляем HTTP-ответ через Bot API для токена: {token[:10]}..."
                         )
 
-                        response = requests.post(
-                            f"https://api.telegram.org/bot{token}/sendMessage",
-                            json={
-                                "chat_id": chat_id,
-                                "text": "Добро пожаловать в ExamFlow! Выберите действие:",
-                                "reply_markup": reply_kb,
-                            },
+                        call_api(
+                            "sendMessage",
+                            chat_id=chat_id,
+                            text="Добро пожаловать в ExamFlow! Выберите действие:",
+                            reply_markup=reply_kb,
                             timeout=8,
                         )
-                        logger.info(
-                            f"HTTP-ответ отправлен, статус: {response.status_code}, ответ: {response.text}"
-                        )
+                        logger.info("HTTP-ответ на /start отправлен")
                     except Exception as http_ex:
                         logger.warning(f"HTTP-ответ на /start не удался: {http_ex}")
                         # Резерв: пробуем через python-telegram-bot
@@ -175,38 +198,22 @@ def telegram_webhook(request):
                                 ],
                             ]
                         )
-                        # Убираем await, так как мы находимся в синхронном контексте
-                        # Используем синхронный запуск event loop с локальным импортом,
-                        # чтобы не затенять asyncio во внешнем скоупе
-                        import asyncio as _aio
-
-                        loop = _aio.new_event_loop()
-                        _aio.set_event_loop(loop)
-                        try:
-                            loop.run_until_complete(
-                                bot.send_message(
-                                    chat_id=chat_id,
-                                    text="Добро пожаловать в ExamFlow! Выберите действие:",
-                                    reply_markup=kb,
-                                )
+                        # Синхронный контекст: корутина выполняется в цикле общего клиента
+                        get_bot_client().run(
+                            bot.send_message(
+                                chat_id=chat_id,
+                                text="Добро пожаловать в ExamFlow! Выберите действие:",
+                                reply_markup=kb,
                             )
-                            logger.info("Быстрый ответ на /start отправлен через PTB")
-                        finally:
-                            loop.close()
+                        )
+                        logger.info("Быстрый ответ на /start отправлен через PTB")
             except Exception as ex:
                 logger.warning(f"Не удалось отправить быстрый ответ на /start: {ex}")
 
-            # Обрабатываем обновление в отдельном потоке, чтобы мгновенно отвечать
-            # Telegram
-            def _run_async(u):
-                try:
-                    import asyncio as _aio
-
-                    _aio.run(handle_telegram_update(u))
-                except Exception as ex:
-                    logger.error(f"Ошибка фоновой обработки обновления: {ex}")
-
-            threading.Thread(target=_run_async, args=(update,), daemon=True).start()
+            # Обрабатываем обновление в цикле общего клиента, чтобы мгновенно
+            # отвечать Telegram
+            future = get_bot_client().submit(handle_telegram_update(update))
+            future.add_done_callback(_log_update_error)
 
         # Немедленно подтверждаем приём, чтобы избежать таймаута Telegram
         logger.info("Webhook успешно обработан, возвращаем OK")
@@ -218,12 +225,27 @@ def telegram_webhook(request):
         return HttpResponse(b"ERROR", status=500)
 
 
+def _log_update_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Ошибка фоновой обработки обновления: {future.exception()}")
+
+
 async def handle_telegram_update(update):  # type: ignore
     """
     Асинхронно обрабатывает обновление от Telegram
 
     Создает mock-контекст и вызывает соответствующие обработчики
     """
+    update_type = next((k for k in UPDATE_TYPES if getattr(update, k, None)), "other")
+    started = time.perf_counter()
+    try:
+        await _dispatch_update(update)
+    finally:
+        UPDATE_SECONDS.observe(time.perf_counter() - started, update_type=update_type)
+
+
+async def _dispatch_update(update):  # type: ignore
+    """Вызывает обработчик бота для обновления"""
     try:
         # Быстрый ответ на /start через прямой вызов API — минимизируем риски парсинга
         if update.message and (update.message.text or "").strip().lower().startswith(
@@ -243,14 +265,8 @@ async def handle_telegram_update(update):  # type: ignore
             except Exception:
                 logger.error("Ошибка быстрой отправки /start: {e}")
 
-        # Импортируем обработчики
-        from .bot_handlers import start  # type: ignore
-        from .bot_handlers import (
-            handle_answer,
-        )
-
         # Создаем mock-контекст
-        bot = get_bot()
+        bot = get_bot_client().bot
         context = MockContext(bot)
 
         # Обрабатываем команды
@@ -258,14 +274,14 @@ async def handle_telegram_update(update):  # type: ignore
             if update.message.text:
                 text = update.message.text.strip()
                 if text.startswith("/start") or text.lower() in ("меню", "start"):
-                    await start(update, context)  # type: ignore
+                    await bot_handlers.start(update, context)  # type: ignore
                 elif text.startswith("/help"):
-                    await start(update, context)  # type: ignore
+                    await bot_handlers.start(update, context)  # type: ignore
                 else:
-                    # Обрабатываем как ответ на задание
-                    await handle_answer(update, context)  # type: ignore
+                    # Текст — тот же обработчик, что у MessageHandler приложения PTB
+                    await bot_handlers.handle_text_message(update, context)
 
-        # Обрабатываем callback-запросы
+        # Обрабатываем callback-запросы по той же таблице, что и приложение PTB
         elif update.callback_query:
             # Всегда подтверждаем callback, чтобы убрать "часики" в Telegram
             try:
@@ -284,56 +300,9 @@ async def handle_telegram_update(update):  # type: ignore
                     chat_id = None
 
             try:
-                # Импортируем обработчики здесь, чтобы исключить циклические импорты при
-                # холодном старте
-                from .bot_handlers import ai_help_handler as h_ai_help
-                from .bot_handlers import ai_hint_handler as h_ai_hint  # type: ignore
-                from .bot_handlers import handle_unknown_callback as h_unknown
-                from .bot_handlers import learning_plan_menu as h_learning_plan_menu
-                from .bot_handlers import show_stats as h_show_stats
-                from .bot_handlers import show_subject_topics as h_show_subject_topics
-                from .bot_handlers import (
-                    show_task_handler as h_show_task,  # type: ignore
-                )
-                from .bot_handlers import (
-                    similar_tasks_handler as h_similar_tasks,  # type: ignore
-                )
-                from .bot_handlers import start as h_start
-                from .bot_handlers import subjects_menu as h_subjects_menu
-                from .bot_handlers import voice_hint as h_voice_hint  # type: ignore
-
-                if callback_data == "subjects":
-                    await h_subjects_menu(update, context)  # type: ignore
-                elif callback_data == "stats":
-                    await h_show_stats(update, context)  # type: ignore
-                elif callback_data == "learning_plan":
-                    await h_learning_plan_menu(update, context)  # type: ignore
-                elif callback_data == "random_task":
-                    await h_show_task(update, context)  # type: ignore
-                elif callback_data == "main_menu":
-                    await h_start(update, context)  # type: ignore
-                elif callback_data.startswith("subject_"):
-                    await h_show_subject_topics(update, context)  # type: ignore
-                elif callback_data.startswith("topic_"):
-                    await h_show_task(update, context)  # type: ignore
-                elif callback_data.startswith("random_subject_"):
-                    await h_show_task(update, context)  # type: ignore
-                elif callback_data.startswith("voice_"):
-                    await h_voice_hint(update, context)  # type: ignore
-                elif callback_data.startswith("ai_help_"):
-                    await h_ai_help(update, context)  # type: ignore
-                elif callback_data.startswith("ai_hint_"):
-                    await h_ai_hint(update, context)  # type: ignore
-                elif callback_data.startswith("similar_"):
-                    await h_similar_tasks(update, context)  # type: ignore
-                elif callback_data.startswith("show_task_"):
-                    await h_show_task(update, context)  # type: ignore
-                elif callback_data.startswith("answer_"):
-                    await h_show_task(update, context)  # type: ignore
-                else:
-                    await h_unknown(update, context)  # type: ignore
-            except Exception:
-                logger.error("Ошибка обработки callback '{callback_data}': {cb_err}")
+                await get_router().dispatch(update, context)
+            except Exception as cb_err:
+                logger.error(f"Ошибка обработки callback '{callback_data}': {cb_err}")
                 # Отправим аккуратное сообщение пользователю, чтобы он не остался без
                 # ответа
                 try:
@@ -395,13 +364,12 @@ def test_bot_api(request):
                 {"status": "error", "message": "Bot token not configured"}, status=500
             )
 
-        resp = requests.get(f"https://api.telegram.org/bot{token}/getMe", timeout=8)
-        data = resp.json()
-        if not data.get("ok"):
+        try:
+            info = call_api("getMe", timeout=8) or {}
+        except RuntimeError as e:
             return JsonResponse(
-                {"status": "error", "api": "getMe", "response": data}, status=500
+                {"status": "error", "api": "getMe", "response": str(e)}, status=500
             )
-        info = data.get("result", {})
         return JsonResponse(
             {"status": "ok", "bot_info": info, "timestamp": timezone.now().isoformat()}
         )
@@ -422,8 +390,8 @@ def bot_control_panel(request):
         return JsonResponse({"error": "Unauthorized"}, status=401)
 
     try:
-        bot = get_bot()
-        bot_info = bot.get_me()
+        bot = get_bot_client().bot
+        bot_info = get_bot_client().run(bot.get_me())
 
         # Получаем статистику
         stats = {
@@ -454,7 +422,7 @@ def bot_api_status(request):
     """
     token_set = bool(getattr(settings, "TELEGRAM_BOT_TOKEN", ""))
     try:
-        bot = get_bot()
+        bot = get_bot_client().bot
         ok = bot is not None
     except Exception:
         ok = False
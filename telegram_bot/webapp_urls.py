@@ -14,4 +14,5 @@ urlpatterns = [
     path("ai-chat/", webapp_views.webapp_ai_chat, name="ai_chat"),
     path("stats/", webapp_views.webapp_stats, name="stats"),
     path("api/ask/", webapp_views.webapp_ai_api, name="ai_api"),
+    path("api/ask/stream/", webapp_views.webapp_ai_stream, name="ai_stream"),
 ]
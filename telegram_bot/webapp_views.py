@@ -5,12 +5,13 @@ Views для Telegram Web App
 import json
 import logging
 
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
 from core.container import Container
+from learning.catalog import get_catalog
 from learning.models import Subject, Task
 
 logger = logging.getLogger(__name__)
@@ -24,7 +25,7 @@ def webapp_home(request):
 
 def webapp_subjects(request):
     """Страница предметов в Web App"""
-    subjects = Subject.objects.filter(is_archived=False)[:10]  # type: ignore
+    subjects = get_catalog().active_subjects[:10]
 
     context = {"page_title": "Предметы", "subjects": subjects, "is_webapp": True}
     return render(request, "telegram_webapp/subjects.html", context)
@@ -104,3 +105,69 @@ def webapp_ai_api(request):
     except Exception as e:
         logger.error(f"Ошибка в webapp_ai_api: {e}")
         return JsonResponse({"success": False, "error": "Ошибка сервера"})
+
+
+def _sse_event(event: dict) -> str:
+    """Событие Server-Sent Events с JSON в data"""
+    payload = json.dumps(event, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {payload}\n\n"
+
+
+def _stream_events(ai_orchestrator, prompt, user, session_id):
+    # Комментарий сразу отправляет заголовки, пока модель готовит первый токен
+    yield ": stream\n\n"
+
+    if hasattr(ai_orchestrator, "ask_stream"):
+        events = ai_orchestrator.ask_stream(prompt, user=user, session_id=session_id)
+    else:
+        result = ai_orchestrator.ask(prompt)
+        answer = result.get("answer") or result.get("response") or ""
+        events = [{"type": "delta", "text": answer}, {"type": "done"}]
+
+    try:
+        for event in events:
+            yield _sse_event(event)
+    except Exception as e:
+        logger.error(f"Ошибка в потоке webapp_ai_stream: {e}")
+        yield _sse_event({"type": "error", "error": "Ошибка сервера"})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def webapp_ai_stream(request):
+    """Потоковый ответ ИИ для Web App (text/event-stream)"""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"success": False, "error": "Неверный формат данных"})
+
+    prompt = data.get("prompt", "").strip()
+    if not prompt:
+        return JsonResponse({"success": False, "error": "Пустой запрос"})
+    if len(prompt) > 1000:
+        return JsonResponse(
+            {
+                "success": False,
+                "error": "Слишком длинный вопрос (максимум 1000 символов)",
+            }
+        )
+
+    is_auth = request.user.is_authenticated
+    session_id = None
+    if not is_auth:
+        if not request.session.session_key:
+            request.session.save()
+        session_id = request.session.session_key
+
+    response = StreamingHttpResponse(
+        _stream_events(
+            Container.ai_orchestrator(),
+            prompt,
+            request.user if is_auth else None,
+            session_id,
+        ),
+        content_type="text/event-stream; charset=utf-8",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx не буферизует поток
+    return response
@@ -15,6 +15,7 @@ from django.test import Client
 
 # Настройка Django для тестов
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "examflow_project.settings")
+os.environ.setdefault("STARTUP_PREWARM", "0")
 django.setup()
 
 User = get_user_model()
@@ -282,3 +283,47 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "bot: mark test as bot test")
     config.addinivalue_line("markers", "load: mark test as load test")
     config.addinivalue_line("markers", "slow: mark test as slow running")
+    config.addinivalue_line("markers", "performance: mark test as benchmark")
+    config.addinivalue_line(
+        "markers", "query_budget(n): test body makes at most n SQL queries"
+    )
+
+
+def _query_budget_message(stats, budget) -> str:
+    lines = [f"{stats.count} SQL-запросов при бюджете {budget}"]
+    lines += [f"  {n}× {sql}" for sql, n in stats.most_duplicated(5)]
+    return "\n".join(lines)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """@pytest.mark.query_budget(n): тело теста делает не больше n запросов"""
+    marker = item.get_closest_marker("query_budget")
+    if marker is None:
+        yield
+        return
+    from core.query_budget import track_queries
+
+    budget = marker.args[0]
+    with track_queries(item.name) as stats:
+        outcome = yield
+    if outcome.excinfo is None and stats.count > budget:
+        outcome.force_exception(
+            AssertionError(_query_budget_message(stats, budget))
+        )
+
+
+@pytest.fixture
+def query_budget():
+    """Контекстный менеджер: блок делает не больше n SQL-запросов"""
+    from contextlib import contextmanager
+
+    from core.query_budget import track_queries
+
+    @contextmanager
+    def _budget(budget: int, label: str = "test"):
+        with track_queries(label) as stats:
+            yield stats
+        assert stats.count <= budget, _query_budget_message(stats, budget)
+
+    return _budget
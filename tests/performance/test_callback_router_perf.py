@@ -0,0 +1,91 @@
+"""
+Бенчмарк маршрутизации callback_data: таблица префиксов против перебора
+регулярных выражений, как в прежней регистрации CallbackQueryHandler
+"""
+
+import re
+import time
+
+import pytest
+
+from telegram_bot.callback_router import get_router
+
+# Шаблоны в порядке прежней регистрации в setup_bot_application
+LEGACY_PATTERNS = [
+    re.compile(pattern)
+    for pattern in (
+        "start",
+        "subjects",
+        "stats",
+        "random_task",
+        "main_menu",
+        "learning_plan",
+        r"subject_\d+",
+        r"topic_\d+",
+        r"random_subject_\d+",
+        r"show_task_\d+",
+        "search_subject",
+        "random_subject",
+        "telegram_auth",
+        "auth_success",
+        r"ai_help",
+        r"ai_help_\d+",
+        r"ai_chat",
+        r"ai_explain",
+        r"ai_personal",
+        r"ai_hint",
+        "clear_context",
+        r"answer_\d+",
+        r"gamification_\d+",
+        r"stats_\d+",
+        r"achievements_\d+",
+        r"progress_\d+",
+        r"overall_progress_\d+",
+        r"subjects_progress_\d+",
+        r"daily_\d+",
+        "leaderboard",
+        r"bonus_\d+",
+    )
+]
+
+SAMPLE = [
+    "subjects",
+    "subject_12",
+    "topic_12_3",
+    "show_task_481",
+    "answer_481",
+    "bonus_42",
+    "leaderboard",
+    "daily_42",
+    "subjects_progress_42",
+    "unknown_1",
+]
+
+
+def _legacy(data):
+    for pattern in LEGACY_PATTERNS:
+        if pattern.match(data):
+            return pattern
+    return None
+
+
+def _per_call(func, rounds=20000):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for data in SAMPLE:
+            func(data)
+    return (time.perf_counter() - started) / (rounds * len(SAMPLE))
+
+
+@pytest.mark.performance
+def test_router_is_faster_than_regex_scan():
+    router = get_router()
+
+    router_time = _per_call(router.resolve)
+    legacy_time = _per_call(_legacy)
+
+    print(
+        f"\nрезолв: таблица {router_time * 1e6:.2f} мкс, "
+        f"регулярные выражения {legacy_time * 1e6:.2f} мкс"
+    )
+    assert router_time < legacy_time
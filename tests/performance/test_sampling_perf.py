@@ -0,0 +1,62 @@
+"""
+Бенчмарк выбора случайного нерешенного задания: выборка по диапазону ID
+против list(unsolved) + random.choice, как в прежнем random_task
+"""
+
+import random
+import time
+
+import pytest
+
+from learning.models import Subject, Task, UserProgress
+from learning.sampling import random_unsolved_task_id, unsolved_tasks
+from telegram_auth.models import TelegramUser
+
+TASKS = 100_000
+SOLVED = 10_000
+DRAWS = 200
+
+
+def _legacy(user_id):
+    return random.choice(list(unsolved_tasks(user_id).values_list("id", flat=True)))
+
+
+def _per_draw(func, user_id, draws=DRAWS):
+    started = time.perf_counter()
+    for _ in range(draws):
+        func(user_id)
+    return (time.perf_counter() - started) / draws
+
+
+def _fill(subject, user, tasks, solved):
+    created = Task.objects.bulk_create(
+        Task(subject=subject, title=f"Задание {i}", difficulty=1)
+        for i in range(tasks)
+    )
+    UserProgress.objects.bulk_create(
+        UserProgress(user=user, task=task, is_correct=True)
+        for task in random.sample(created, solved)
+    )
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+@pytest.mark.django_db
+def test_draw_time_does_not_depend_on_task_count():
+    random.seed(46)
+    subject = Subject.objects.create(name="Бенчмарк", code="BENCH_SMP")
+    user = TelegramUser.objects.create(telegram_id=555460, telegram_username="b")
+
+    _fill(subject, user, TASKS // 100, SOLVED // 100)
+    small = _per_draw(random_unsolved_task_id, user.pk)
+
+    _fill(subject, user, TASKS - TASKS // 100, SOLVED - SOLVED // 100)
+    large = _per_draw(random_unsolved_task_id, user.pk)
+    legacy = _per_draw(_legacy, user.pk, draws=2)
+
+    print(
+        f"\nвыбор: {small * 1e3:.2f} мс при {TASKS // 100} заданиях, "
+        f"{large * 1e3:.2f} мс при {TASKS}; list+choice {legacy * 1e3:.1f} мс"
+    )
+    assert large < small * 3
+    assert large * 10 < legacy
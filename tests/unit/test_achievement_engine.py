@@ -0,0 +1,155 @@
+"""
+Unit тесты для движка достижений
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import UnifiedProfile
+from telegram_bot.gamification import AchievementsManager
+from telegram_bot.gamification.achievement_engine import AchievementEngine
+
+
+def _rule(key, counter, threshold, points=10):
+    return {
+        "key": key,
+        "title": key,
+        "description": "",
+        "points": points,
+        "counter": counter,
+        "threshold": threshold,
+    }
+
+
+def _writes(queries) -> list[str]:
+    return [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+
+
+@pytest.mark.unit
+class TestRuleIndex:
+    def test_only_crossed_thresholds_are_checked(self):
+        engine = AchievementEngine(
+            {"RULES": [_rule(f"solved_{n}", "total_solved", n) for n in range(1, 500)]}
+        )
+
+        crossed = engine.crossed("total_solved", 41, 42)
+
+        assert [rule.key for rule in crossed] == ["solved_42"]
+        assert engine.crossed("current_streak", 0, 100) == []
+
+    def test_events_only_see_subscribed_counters(self):
+        engine = AchievementEngine(
+            {"RULES": [_rule("s", "current_streak", 1), _rule("t", "total_solved", 1)]}
+        )
+        before = {"total_solved": 0, "current_streak": 0, "level": 1}
+        after = {"total_solved": 1, "current_streak": 1, "level": 1}
+
+        found = engine.evaluate(("streak",), before, after, set())
+
+        assert [rule.key for rule in found] == ["s"]
+
+    @pytest.mark.parametrize(
+        "rules",
+        [
+            [_rule("a", "unknown", 1)],
+            [_rule("a", "level", 1), _rule("a", "level", 2)],
+        ],
+    )
+    def test_invalid_rules_are_rejected(self, rules):
+        with pytest.raises(ValueError):
+            AchievementEngine({"RULES": rules})
+
+
+@pytest.fixture
+def profile(db):
+    return UnifiedProfile.objects.create(telegram_id=888001, display_name="A")
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestRecordAnswer:
+    def test_first_correct_answer_is_one_write(self, profile):
+        engine = AchievementEngine()
+
+        with CaptureQueriesContext(connection) as queries:
+            award = engine.record_answer(profile.telegram_id, True)
+
+        assert len(_writes(queries)) == 1
+        assert [rule.key for rule in award.achievements] == ["first_correct"]
+        assert award.points == 10 + 25
+        profile.refresh_from_db()
+        assert (profile.total_solved, profile.current_streak) == (1, 1)
+        assert profile.experience_points == 35
+        assert profile.achievements == ["first_correct"]
+
+    def test_several_grants_and_level_up_in_one_write(self, profile):
+        UnifiedProfile.objects.filter(pk=profile.pk).update(
+            total_solved=6,
+            current_streak=4,
+            experience_points=390,
+            level=4,
+            achievements=["first_correct"],
+        )
+        engine = AchievementEngine()
+
+        with CaptureQueriesContext(connection) as queries:
+            award = engine.record_answer(profile.telegram_id, True)
+
+        assert len(_writes(queries)) == 1
+        keys = {rule.key for rule in award.achievements}
+        assert keys == {"streak_5", "daily_learner", "level_5"}
+        assert award.level_up
+        profile.refresh_from_db()
+        assert profile.experience_points == 390 + 10 + 50 + 150 + 200
+        assert profile.best_streak == 5
+
+    def test_wrong_answer_resets_streak(self, profile):
+        UnifiedProfile.objects.filter(pk=profile.pk).update(current_streak=3)
+
+        award = AchievementEngine().record_answer(profile.telegram_id, False)
+
+        assert award.achievements == ()
+        profile.refresh_from_db()
+        assert profile.current_streak == 0
+
+    def test_granted_achievement_is_not_repeated(self, profile):
+        engine = AchievementEngine()
+        engine.record_answer(profile.telegram_id, True)
+        engine.record_answer(profile.telegram_id, False)
+
+        award = engine.record_answer(profile.telegram_id, True)
+
+        assert award.achievements == ()
+
+    def test_missing_profile(self, db):
+        assert AchievementEngine().record_answer(1, True) is None
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestAchievementsManager:
+    def test_full_check_grants_missing_in_one_write(self, profile):
+        UnifiedProfile.objects.filter(pk=profile.pk).update(
+            total_solved=10, current_streak=10
+        )
+        manager = AchievementsManager(AchievementEngine())
+        check = AchievementsManager.check_achievements.__wrapped__
+
+        with CaptureQueriesContext(connection) as queries:
+            granted = check(manager, profile.telegram_id)
+
+        assert len(_writes(queries)) == 1
+        assert {item["key"] for item in granted} == {
+            "first_correct",
+            "streak_5",
+            "streak_10",
+            "daily_learner",
+        }
+        assert check(manager, profile.telegram_id) == []
+        listed = AchievementsManager.get_user_achievements.__wrapped__(
+            manager, profile.telegram_id
+        )
+        assert [item["key"] for item in listed] == sorted(
+            item["key"] for item in granted
+        )
@@ -0,0 +1,75 @@
+"""
+Unit тесты для асинхронного журнала запросов к ИИ
+"""
+
+import pytest
+
+from ai.audit import AuditLogSink
+from ai.models import AiRequest
+
+
+def _sink(**config):
+    # Большой интервал и пачка: фоновый поток не пишет, пока тест не вызовет flush
+    return AuditLogSink(config={"BATCH_SIZE": 1000, "FLUSH_INTERVAL": 3600, **config})
+
+
+def _record(index=0, response="Ответ"):
+    return {
+        "session_id": f"s{index}",
+        "request_type": "question",
+        "prompt": f"Вопрос {index}",
+        "response": response,
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestAuditLogSink:
+    """Тесты журнала AiRequest"""
+
+    def test_records_are_written_in_batch_on_flush(self, django_assert_num_queries):
+        """Запись не идет в базу до flush, затем пишется одним INSERT"""
+        sink = _sink()
+        for index in range(5):
+            assert sink.log(**_record(index))
+
+        assert AiRequest.objects.count() == 0
+        with django_assert_num_queries(1):
+            assert sink.flush() == 5
+        assert AiRequest.objects.count() == 5
+        assert sink.stats()["written"] == 5
+
+    def test_full_queue_drops_records(self):
+        """При переполнении очереди запись отбрасывается и учитывается"""
+        sink = _sink(QUEUE_SIZE=2)
+
+        accepted = [sink.log(**_record(index)) for index in range(3)]
+
+        assert accepted == [True, True, False]
+        stats = sink.stats()
+        assert stats["logged"] == 2
+        assert stats["dropped"] == 1
+        assert stats["pending"] == 2
+
+    def test_large_response_is_truncated(self):
+        sink = _sink(MAX_RESPONSE_CHARS=10)
+
+        sink.log(**_record(response="x" * 100))
+        sink.flush()
+
+        assert AiRequest.objects.get().response == "x" * 10 + "…"
+
+    def test_sampling(self):
+        """SAMPLE_RATE=0 пропускает все записи"""
+        sink = _sink(SAMPLE_RATE=0.0)
+
+        assert not sink.log(**_record())
+        assert sink.stats()["sampled_out"] == 1
+
+    def test_shutdown_flushes_queue(self):
+        sink = _sink()
+        sink.log(**_record())
+
+        sink.shutdown()
+
+        assert AiRequest.objects.count() == 1
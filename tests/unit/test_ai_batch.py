@@ -0,0 +1,128 @@
+"""
+Unit тесты для пакетной генерации ответов ИИ
+"""
+
+import re
+from unittest.mock import Mock
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+
+from ai.batch import BatchGenerator, pack_prompts, unpack_response
+from ai.models import AiResponse
+from ai.services import AiResult, AiService, BaseProvider, task_explanation_prompt
+from learning.models import Subject, Task, UserProgress
+
+
+class _PackedProvider(BaseProvider):
+    """Отвечает на каждый запрос пачки в отдельном разделе"""
+
+    name = "stub"
+
+    def __init__(self, sections=True):
+        self.sections = sections
+        self.prompts = []
+
+    def generate(self, prompt, max_tokens=512):
+        self.prompts.append(prompt)
+        count = len(re.findall(r"^=== ЗАПРОС \d+ ===$", prompt, re.MULTILINE))
+        if not count:
+            return AiResult(text=f"Ответ: {prompt[-10:]}", tokens_used=10)
+        if not self.sections:
+            return AiResult(text="Один общий ответ без разделов", tokens_used=10)
+        text = "\n".join(f"### ОТВЕТ {n}\nРешение {n}" for n in range(1, count + 1))
+        return AiResult(text=text, tokens_used=10 * count)
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _generator(provider, **config):
+    return BatchGenerator(provider=provider, RATE_PER_SECOND=0, WORKERS=2, **config)
+
+
+@pytest.mark.unit
+class TestPacking:
+    def test_round_trip(self):
+        packed = pack_prompts(["Задача 1", "Задача 2"])
+
+        assert "=== ЗАПРОС 2 ===" in packed
+        assert unpack_response("### ОТВЕТ 1\nа\n### ОТВЕТ 2\nб", 2) == ["а", "б"]
+
+    def test_missing_section_is_rejected(self):
+        assert unpack_response("### ОТВЕТ 1\nа", 2) is None
+        assert unpack_response("### ОТВЕТ 1\n\n### ОТВЕТ 2\nб", 2) is None
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestBatchGenerator:
+    """Упаковка, кэш и сохранение в AiResponse"""
+
+    def test_prompts_are_packed_and_stored(self):
+        provider = _PackedProvider()
+        prompts = [f"Задача {n}" for n in range(7)]
+
+        result = _generator(provider, PROMPTS_PER_REQUEST=3).generate(prompts)
+
+        assert result.generated == 7
+        assert result.requests == 3
+        assert len(provider.prompts) == 3
+        assert AiResponse.objects.count() == 7
+        assert result.responses["Задача 4"].text == "Решение 2"
+
+    def test_ready_answers_are_not_regenerated(self):
+        provider = _PackedProvider()
+        _generator(provider).generate(["Задача 1", "Задача 2"])
+
+        result = _generator(provider).generate(["Задача 1", "Задача 2", "Задача 3"])
+
+        assert result.cached == 2
+        assert result.generated == 1
+        assert len(provider.prompts) == 2
+
+    def test_unparsed_batch_falls_back_to_single_requests(self):
+        provider = _PackedProvider(sections=False)
+
+        result = _generator(provider, PROMPTS_PER_REQUEST=2).generate(["А", "Б"])
+
+        assert result.generated == 2
+        assert result.requests == 3
+        assert result.responses["Б"].text == "Ответ: Б"
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestPrecomputedAnswers:
+    """Объяснения популярных заданий отдаются из готовых ответов"""
+
+    def test_explain_task_uses_precomputed_answer(self, monkeypatch):
+        _generator(_PackedProvider()).generate([task_explanation_prompt("Задача")])
+        engine = Mock()
+        monkeypatch.setattr("ai.services.get_quota_engine", lambda: engine)
+        monkeypatch.setattr("ai.services.log_ai_request", Mock())
+        service = AiService.__new__(AiService)
+        service.providers = []
+
+        response = service.explain_task("Задача", session_id="abc")
+
+        assert response["cached"] is True
+        assert response["response"].startswith("Ответ:")
+        engine.reserve.assert_not_called()
+
+    def test_prewarm_command_uses_most_attempted_tasks(self, user, monkeypatch):
+        subject = Subject.objects.create(name="Математика", code="MATH_PW")
+        popular = Task.objects.create(subject=subject, title="Популярное", difficulty=1)
+        Task.objects.create(subject=subject, title="Редкое", difficulty=1)
+        UserProgress.objects.create(user=user, task=popular)
+        provider = _PackedProvider()
+        monkeypatch.setattr("ai.batch.GeminiProvider", lambda **kwargs: provider)
+
+        call_command("prewarm_ai_answers", limit=1, stdout=Mock())
+
+        assert AiResponse.objects.get().prompt == task_explanation_prompt("Популярное")
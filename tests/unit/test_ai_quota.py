@@ -0,0 +1,115 @@
+"""
+Unit тесты для квот запросов к ИИ
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+
+from ai.models import AiLimit
+from ai.quota import LocalCounterStore, QuotaEngine
+from ai.services import AiResult, AiService
+
+
+def _engine(**config):
+    return QuotaEngine(
+        store=LocalCounterStore(),
+        config={"GUEST_LIMIT": 3, "USER_LIMIT": 5, "PERSIST_INTERVAL": 0, **config},
+    )
+
+
+@pytest.mark.unit
+class TestQuotaEngine:
+    """Тесты атомарных квот"""
+
+    def test_guest_limit_is_enforced(self):
+        """Четвертый запрос гостя отклоняется, счетчик не растет"""
+        engine = _engine()
+
+        decisions = [engine.reserve(session_id="abc") for _ in range(4)]
+
+        assert [d.allowed for d in decisions] == [True, True, True, False]
+        assert engine.status(session_id="abc").used == 3
+
+    def test_parallel_reservations_do_not_oversubscribe(self):
+        """Параллельные запросы не проходят сверх лимита"""
+        engine = _engine(GUEST_LIMIT=10)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            decisions = list(
+                executor.map(lambda _: engine.reserve(session_id="race"), range(50))
+            )
+
+        assert sum(d.allowed for d in decisions) == 10
+
+    def test_refund_returns_reservation(self):
+        """Возврат резерва освобождает квоту"""
+        engine = _engine()
+        decision = engine.reserve(session_id="abc")
+
+        engine.refund(decision)
+        engine.refund(decision)
+
+        assert engine.status(session_id="abc").used == 0
+
+    def test_sliding_window_counts_previous_interval(self):
+        """Скользящее окно учитывает часть предыдущего интервала"""
+        engine = _engine(WINDOW="sliding", WINDOW_SECONDS=3600)
+        for _ in range(3):
+            engine.reserve(session_id="abc")
+
+        status = engine.status(session_id="abc")
+
+        assert status.used == 3
+        assert not status.allowed
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestQuotaPersistence:
+    """Сохранение счетчиков в AiLimit"""
+
+    def test_usage_is_persisted_in_one_batch(self, user):
+        engine = _engine()
+        engine.reserve(user=user)
+        engine.reserve(user=user)
+        engine.reserve(session_id="guest-1")
+
+        assert engine.persist_usage() == 2
+
+        limit = AiLimit.objects.get(user=user, limit_type="daily")
+        assert limit.current_usage == 2
+        assert limit.max_limit == 5
+        assert AiLimit.objects.get(session_id="guest-1").current_usage == 1
+
+
+@pytest.mark.unit
+class TestAiServiceQuota:
+    """AiService резервирует квоту и возвращает ее при ошибке"""
+
+    def _service(self, engine, monkeypatch, result):
+        monkeypatch.setattr("ai.services.get_quota_engine", lambda: engine)
+        monkeypatch.setattr("ai.services.log_ai_request", Mock())
+        service = AiService.__new__(AiService)
+        provider = Mock()
+        provider.is_available.return_value = True
+        provider.generate.return_value = result
+        service.providers = [provider]
+        return service
+
+    def test_failed_generation_is_refunded(self, monkeypatch):
+        engine = _engine()
+        service = self._service(engine, monkeypatch, AiResult(text="❌", failed=True))
+
+        service.ask("Вопрос", session_id="abc")
+
+        assert engine.status(session_id="abc").used == 0
+
+    def test_exhausted_quota_skips_provider(self, monkeypatch):
+        engine = _engine(GUEST_LIMIT=1)
+        service = self._service(engine, monkeypatch, AiResult(text="Ответ"))
+
+        assert "response" in service.ask("Вопрос", session_id="abc")
+        assert "error" in service.ask("Вопрос", session_id="abc")
+        assert service.providers[0].generate.call_count == 1
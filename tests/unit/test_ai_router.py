@@ -0,0 +1,170 @@
+"""
+Unit тесты для маршрутизации провайдеров ИИ
+"""
+
+import time
+import uuid
+from unittest.mock import Mock
+
+import pytest
+
+from ai.models import AiProvider
+from ai.router import (
+    CircuitBreaker,
+    ProviderRouter,
+    get_provider_health,
+    provider_key,
+    sync_provider_stats,
+)
+from ai.services import AiResult, BaseProvider, FallbackProvider, GeminiProvider
+
+
+class _Provider(BaseProvider):
+    """Провайдер с заданной задержкой и исходом"""
+
+    def __init__(self, name=None, delay=0.0, fail=False):
+        self.name = name or f"p-{uuid.uuid4().hex[:8]}"
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def is_available(self):
+        return True
+
+    def generate(self, prompt, max_tokens=512):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("503")
+        return AiResult(text=f"ответ {self.name}", provider_name=self.name)
+
+
+def _router(*providers, **config):
+    return ProviderRouter(
+        [*providers, FallbackProvider()], config={"STATS_INTERVAL": 0, **config}
+    )
+
+
+@pytest.mark.unit
+class TestCircuitBreaker:
+    def test_opens_after_failures_and_probes(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert not breaker.allow()
+
+        time.sleep(0.06)
+        # В half_open проходит только один пробный запрос
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.unit
+class TestProviderRouter:
+    """Выбор провайдера, автоматы защиты и дублирование"""
+
+    def test_open_circuit_skips_provider(self):
+        """После серии ошибок провайдер не вызывается, сразу отвечает fallback"""
+        broken = _Provider(fail=True)
+        router = _router(broken)
+
+        results = [router.generate("Вопрос") for _ in range(5)]
+
+        assert broken.calls == 3
+        assert {r.provider_name for r in results} == {"fallback"}
+        assert get_provider_health(provider_key(broken)).stats()["state"] == "open"
+
+    def test_deadline_bounds_response_time(self):
+        slow = _Provider(delay=1.0)
+        router = _router(slow, DEADLINE=0.1)
+
+        started = time.monotonic()
+        result = router.generate("Вопрос")
+
+        assert result.provider_name == "fallback"
+        assert time.monotonic() - started < 0.5
+
+    def test_slow_request_is_hedged(self):
+        """Запрос медленнее p95 дублируется на следующий провайдер"""
+        slow, fast = _Provider(delay=1.0), _Provider()
+        health = get_provider_health(provider_key(slow))
+        for _ in range(20):
+            health.record(0.05, True)
+        router = _router(slow, fast, HEDGE_MIN_DELAY=0.05)
+
+        started = time.monotonic()
+        result = router.generate("Вопрос")
+
+        assert result.provider_name == fast.name
+        assert time.monotonic() - started < 0.5
+        assert slow.calls == 1
+
+    def test_failure_moves_to_next_provider(self):
+        broken, healthy = _Provider(fail=True), _Provider()
+
+        result = _router(broken, healthy).generate("Вопрос")
+
+        assert result.provider_name == healthy.name
+
+    def test_gemini_models_call_their_own_url(self, settings, monkeypatch):
+        """Запасная модель Gemini запрашивается по своему URL"""
+        settings.GEMINI_API_KEY = "key"
+        settings.GEMINI_BASE_URL = "https://generativelanguage.googleapis.com"
+        primary = GeminiProvider(model=f"primary-{uuid.uuid4().hex[:8]}")
+        backup = GeminiProvider(model=f"backup-{uuid.uuid4().hex[:8]}")
+        answer = {"candidates": [{"content": {"parts": [{"text": "ответ"}]}}]}
+        urls = []
+
+        def post(url, **kwargs):
+            urls.append(url)
+            if primary.model in url:
+                return Mock(status_code=503, text="busy")
+            return Mock(status_code=200, json=Mock(return_value=answer))
+
+        monkeypatch.setattr("ai.services.requests.post", post)
+
+        result = _router(primary, backup).generate("Вопрос")
+
+        assert result.text == "ответ"
+        assert [url.rsplit("/", 1)[1] for url in urls] == [
+            f"{primary.model}:generateContent",
+            f"{backup.model}:generateContent",
+        ]
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestProviderStats:
+    """Приоритеты и статистика из AiProvider"""
+
+    def test_priority_from_database(self):
+        first, second = _Provider(), _Provider()
+        AiProvider.objects.create(name=second.name, priority=0)
+        AiProvider.objects.create(name=first.name, priority=5)
+
+        router = _router(first, second, PRIORITY_TTL=0)
+
+        assert router.candidates() == [second, first]
+
+    def test_exhausted_provider_is_skipped(self):
+        provider = _Provider()
+        AiProvider.objects.create(name=provider.name, daily_limit=1, daily_usage=1)
+
+        assert _router(provider, PRIORITY_TTL=0).candidates() == []
+
+    def test_stats_are_synced(self):
+        provider = _Provider()
+        row = AiProvider.objects.create(name=provider.name)
+        router = _router(provider)
+        router.generate("Вопрос")
+
+        sync_provider_stats()
+
+        row.refresh_from_db()
+        assert row.daily_usage == 1
+        assert row.success_rate == 100
+        assert row.last_used is not None
@@ -0,0 +1,183 @@
+"""
+Unit тесты для потоковых ответов ИИ
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory
+
+from ai.quota import LocalCounterStore, QuotaEngine
+from ai.services import AiService, FallbackProvider, StubProvider
+from telegram_bot import bot_handlers
+from telegram_bot.streaming import stream_to_message
+from telegram_bot.webapp_views import webapp_ai_stream
+
+
+def _service(monkeypatch, provider):
+    engine = QuotaEngine(store=LocalCounterStore(), config={"PERSIST_INTERVAL": 0})
+    monkeypatch.setattr("ai.services.get_quota_engine", lambda: engine)
+    monkeypatch.setattr("ai.services.log_ai_request", Mock())
+    service = AiService.__new__(AiService)
+    service.providers = [provider]
+    return service, engine
+
+
+@pytest.mark.unit
+class TestAskStream:
+    """AiService.ask_stream"""
+
+    def test_deltas_then_done(self, monkeypatch):
+        service, _ = _service(
+            monkeypatch, StubProvider("Ответ по частям", chunk_size=5)
+        )
+
+        events = list(service.ask_stream("Вопрос", session_id="abc"))
+
+        deltas = [e["text"] for e in events if e["type"] == "delta"]
+        assert "".join(deltas) == "Ответ по частям"
+        assert len(deltas) == 3
+        assert events[-1]["type"] == "done"
+        assert events[-1]["provider"] == "stub"
+
+    def test_broken_stream_refunds_quota(self, monkeypatch):
+        """Оборванный поток возвращает резерв квоты"""
+        provider = StubProvider()
+        provider.generate_stream = Mock(side_effect=RuntimeError("timeout"))
+        service, engine = _service(monkeypatch, provider)
+
+        events = list(service.ask_stream("Вопрос", session_id="abc"))
+
+        assert events[-1]["type"] == "error"
+        assert engine.status(session_id="abc").used == 0
+
+    def test_client_disconnect_refunds_quota(self, monkeypatch):
+        """Закрытый клиентом поток возвращает квоту и учитывается роутером"""
+        service, engine = _service(monkeypatch, StubProvider("Длинный ответ", 3))
+        monkeypatch.setattr(service.router, "record", Mock())
+
+        events = service.ask_stream("Вопрос", session_id="abc")
+        assert next(events)["type"] == "delta"
+        events.close()
+
+        assert engine.status(session_id="abc").used == 0
+        service.router.record.assert_called_once()
+        assert service.router.record.call_args.args[2] is True
+
+    def test_local_fallback_does_not_use_quota(self, monkeypatch):
+        """Ответ локального fallback не расходует квоту, как и в ask"""
+        service, engine = _service(monkeypatch, FallbackProvider())
+
+        events = list(service.ask_stream("Вопрос", session_id="abc"))
+
+        assert (events[-1]["type"], events[-1]["provider"]) == ("done", "fallback")
+        assert engine.status(session_id="abc").used == 0
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestWebAppStream:
+    """SSE-эндпоинт Web App"""
+
+    def _post(self, body):
+        request = RequestFactory().post(
+            "/webapp/api/ask/stream/",
+            data=json.dumps(body),
+            content_type="application/json",
+        )
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+        return webapp_ai_stream(request)
+
+    def test_events_are_streamed(self, monkeypatch):
+        service, _ = _service(monkeypatch, StubProvider("Привет, мир", chunk_size=6))
+
+        with patch(
+            "telegram_bot.webapp_views.Container.ai_orchestrator", return_value=service
+        ):
+            response = self._post({"prompt": "Вопрос"})
+            body = b"".join(response.streaming_content).decode()
+
+        assert response["Content-Type"].startswith("text/event-stream")
+        assert "event: delta" in body
+        assert '"text": "Привет"' in body
+        assert body.rstrip().split("\n")[-2] == "event: done"
+
+    def test_validation_error_is_json(self):
+        response = self._post({"prompt": ""})
+
+        assert response["Content-Type"] == "application/json"
+        assert json.loads(response.content)["success"] is False
+
+
+@pytest.mark.unit
+class TestStreamToMessage:
+    """Троттлинг правок сообщения в боте"""
+
+    def test_edits_are_throttled(self):
+        message = Mock()
+        message.edit_text = Mock(side_effect=lambda *a, **k: asyncio.sleep(0))
+        chunks = iter(["Первая часть. "] * 10)
+
+        text = asyncio.run(
+            stream_to_message(message, chunks, interval=3600, min_delta=1)
+        )
+
+        # Интервал не истек: только финальная правка с полным текстом
+        assert text == "Первая часть. " * 10
+        message.edit_text.assert_called_once_with(text)
+
+    def test_progressive_edits_and_limit(self):
+        message = Mock()
+        message.edit_text = Mock(side_effect=lambda *a, **k: asyncio.sleep(0))
+        chunks = iter(["x" * 3000, "y" * 3000])
+
+        asyncio.run(
+            stream_to_message(message, chunks, interval=0, min_delta=1, parse_mode=None)
+        )
+
+        edits = [call.args[0] for call in message.edit_text.call_args_list]
+        assert edits[0] == "x" * 3000
+        assert len(edits[-1]) == 4000
+        assert edits[-1].endswith("...")
+
+
+@pytest.mark.unit
+class TestHandleAiMessage:
+    """Прямой вопрос ИИ в боте"""
+
+    def test_answer_is_streamed_with_enhanced_prompt(self, monkeypatch):
+        mocks = {
+            "db_get_or_create_unified_profile": AsyncMock(
+                return_value=SimpleNamespace(telegram_id=1)
+            ),
+            "db_update_profile_activity": AsyncMock(),
+            "db_get_or_create_user": AsyncMock(return_value=(Mock(), False)),
+            "db_get_or_create_chat_session": AsyncMock(),
+            "db_add_user_message_to_session": AsyncMock(),
+            "db_create_enhanced_prompt": AsyncMock(return_value="Контекст + вопрос"),
+            "db_add_assistant_message_to_session": AsyncMock(),
+            "stream_ai_response": Mock(return_value=iter(["Ответ"])),
+            "stream_to_message": AsyncMock(return_value="Ответ"),
+        }
+        for name, mock in mocks.items():
+            monkeypatch.setattr(bot_handlers, name, mock)
+        bot = SimpleNamespace(send_message=AsyncMock())
+        update = SimpleNamespace(
+            message=SimpleNamespace(text="Вопрос", message_id=7),
+            effective_user=SimpleNamespace(id=1, username="u"),
+            effective_chat=SimpleNamespace(id=1),
+            callback_query=None,
+        )
+
+        asyncio.run(bot_handlers.handle_ai_message(update, SimpleNamespace(bot=bot)))
+
+        assert mocks["stream_ai_response"].call_args.args[0] == "Контекст + вопрос"
+        mocks["db_add_assistant_message_to_session"].assert_awaited_once()
+        # отправлена только заглушка, без сообщения об ошибке
+        bot.send_message.assert_awaited_once()
@@ -0,0 +1,88 @@
+"""
+Unit тесты для проверки ответов на задания
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from learning.answers import (
+    check_answer,
+    compile_answer,
+    get_matcher,
+    invalidate_matchers,
+)
+from learning.models import Subject, Task
+
+
+@pytest.fixture
+def tasks(db):
+    math = Subject.objects.create(name="Математика", code="MATH_ANS")
+    russian = Subject.objects.create(name="Русский язык", code="RUS_ANS")
+    invalidate_matchers()
+    yield (
+        Task.objects.create(subject=math, title="Дробь", difficulty=1, answer="0,5"),
+        Task.objects.create(
+            subject=russian, title="Запятые", difficulty=1, answer="134"
+        ),
+    )
+    invalidate_matchers()
+
+
+@pytest.mark.unit
+class TestCompileAnswer:
+    @pytest.mark.parametrize("user_answer", ["0.5", "0,5", "1/2", " 0.50 ", ".5"])
+    def test_numeric_equivalence(self, user_answer):
+        assert compile_answer("0,5").matches(user_answer)
+
+    def test_numbers_are_not_text(self):
+        matcher = compile_answer("-2")
+
+        assert matcher.matches("−2")
+        assert not matcher.matches("2")
+        assert not matcher.matches("")
+
+    def test_variants_and_text_normalization(self):
+        matcher = compile_answer("Ёлка|ель")
+
+        assert matcher.matches("елка.")
+        assert matcher.matches("  ЕЛЬ ")
+        assert not matcher.matches("сосна")
+
+    def test_digit_sets_only_when_enabled(self):
+        assert compile_answer("134", digit_set=True).matches("4, 3, 1")
+        assert not compile_answer("134").matches("431")
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestMatcherCache:
+    def test_cached_check_skips_database(self, tasks):
+        fraction, _ = tasks
+        assert check_answer(fraction.id, "1/2")
+
+        with CaptureQueriesContext(connection) as queries:
+            assert check_answer(fraction.id, "0.5")
+            assert not check_answer(fraction.id, "0.4")
+
+        assert len(queries) == 0
+
+    def test_russian_digit_set_by_subject(self, tasks):
+        _, commas = tasks
+
+        assert check_answer(commas.id, "341")
+        assert commas.check_answer("1 3 4")
+
+    def test_answer_change_recompiles(self, tasks):
+        fraction, _ = tasks
+        assert get_matcher(fraction.id).matches("0.5")
+
+        fraction.answer = "0,25"
+        fraction.save()
+
+        assert get_matcher(fraction.id).matches("1/4")
+        assert compile_answer("0,25").digest == get_matcher(fraction.id).digest
+
+    def test_missing_task(self, db):
+        assert get_matcher(999999) is None
+        assert not check_answer(999999, "1")
@@ -0,0 +1,152 @@
+"""
+Unit тесты для отдачи аудиофайлов
+"""
+
+import os
+
+import pytest
+from django.http import Http404
+from django.test import RequestFactory
+
+from core.audio_delivery import audio_file_view, audio_metadata, parse_range
+from core.tts_pipeline import AudioIndex, StubTTSEngine, TTSPipeline, mp3_duration
+
+
+@pytest.fixture
+def audio(temp_media_root):
+    """Один синтезированный файл: (относительный путь, ключ, содержимое)"""
+    pipeline = TTSPipeline(
+        engine=StubTTSEngine(),
+        rate_per_second=0,
+        audio_dir=os.path.join(temp_media_root, "audio"),
+    )
+    relative_path = pipeline.synthesize("Найдите значение выражения " * 20)
+    with open(os.path.join(temp_media_root, relative_path), "rb") as audio_file:
+        content = audio_file.read()
+    key = os.path.splitext(os.path.basename(relative_path))[0]
+    return relative_path, key, content
+
+
+@pytest.mark.unit
+class TestParseRange:
+    """Разбор заголовка Range"""
+
+    def test_ranges(self):
+        assert parse_range("bytes=0-99", 1000) == (0, 99)
+        assert parse_range("bytes=900-", 1000) == (900, 999)
+        assert parse_range("bytes=-100", 1000) == (900, 999)
+        assert parse_range("bytes=0-5000", 1000) == (0, 999)
+        assert parse_range("items=0-1", 1000) is None
+
+    def test_unsatisfiable(self):
+        with pytest.raises(ValueError):
+            parse_range("bytes=1000-", 1000)
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestAudioFileView:
+    """Эндпоинт отдачи аудио"""
+
+    def get(self, key, **headers):
+        request = RequestFactory().get(f"/core/audio/{key}.mp3", **headers)
+        return audio_file_view(request, key=key)
+
+    def test_full_file_with_cache_headers(self, audio):
+        """Полный ответ содержит ETag, immutable и Accept-Ranges"""
+        _, key, content = audio
+
+        response = self.get(key)
+
+        assert response.status_code == 200
+        assert b"".join(response.streaming_content) == content
+        assert response["ETag"] == f'"{key}"'
+        assert "immutable" in response["Cache-Control"]
+        assert response["Accept-Ranges"] == "bytes"
+
+    def test_range_returns_partial_content(self, audio):
+        """Range отдает только запрошенный фрагмент"""
+        _, key, content = audio
+
+        response = self.get(key, HTTP_RANGE="bytes=10-19")
+
+        assert response.status_code == 206
+        assert b"".join(response.streaming_content) == content[10:20]
+        assert response["Content-Range"] == f"bytes 10-19/{len(content)}"
+        assert response["Content-Length"] == "10"
+
+    def test_unsatisfiable_range(self, audio):
+        _, key, content = audio
+
+        response = self.get(key, HTTP_RANGE=f"bytes={len(content)}-")
+
+        assert response.status_code == 416
+        assert response["Content-Range"] == f"bytes */{len(content)}"
+
+    def test_repeat_play_is_not_modified(self, audio):
+        """Повторный запрос с ETag получает 304 без тела"""
+        _, key, _ = audio
+
+        response = self.get(key, HTTP_IF_NONE_MATCH=f'"{key}"')
+
+        assert response.status_code == 304
+
+    def test_unknown_key_is_404(self, audio):
+        with pytest.raises(Http404):
+            self.get("0" * 64)
+
+    def test_unindexed_file_does_not_rewrite_index(self, audio):
+        """Файл вне индекса отдается, но index.json на запросе не пишется"""
+        _, key, content = audio
+        index = AudioIndex()
+        index.forget([key])
+        mtime = index.path.stat().st_mtime_ns
+
+        response = self.get(key)
+
+        assert response.status_code == 200
+        assert b"".join(response.streaming_content) == content
+        assert index.path.stat().st_mtime_ns == mtime
+        assert index.get(key) is None
+
+
+@pytest.mark.unit
+class TestAudioIndex:
+    """Индекс метаданных аудио"""
+
+    def test_metadata_comes_from_index(self, audio, settings):
+        """Размер и длительность берутся из индекса, записанного при синтезе"""
+        relative_path, key, content = audio
+        settings.TELEGRAM_BOT_TOKEN = "test-token"
+
+        meta = audio_metadata([relative_path, "audio/missing.mp3"])
+
+        assert list(meta) == [relative_path]
+        assert meta[relative_path]["url"].endswith(f"audio/{key}.mp3")
+        assert meta[relative_path]["size"] == len(content)
+        assert meta[relative_path]["duration"] == round(len(content) * 8 / 128000, 2)
+
+    def test_writers_merge_changes(self, audio):
+        """Запись перечитывает индекс, а не затирает его старой копией"""
+        _, key, _ = audio
+        index = AudioIndex()
+        other = index.audio_dir / f"{'1' * 64}.mp3"
+        other.write_bytes(b"\xff\xfb\x90\x00" + b"\x00" * 996)
+        index.entries()
+        # другой процесс дописал индекс после того, как мы его прочитали
+        AudioIndex._loaded.clear()
+        AudioIndex().record([other.stem])
+
+        index.record([key])
+
+        assert set(AudioIndex().entries()) >= {key, other.stem}
+        assert index.lock_path.exists()
+
+    def test_duration_skips_id3_tag(self, tmp_path):
+        """Длительность считается по первому кадру после ID3-тега"""
+        path = tmp_path / "tagged.mp3"
+        tag = b"ID3\x04\x00\x00\x00\x00\x00\x0a" + b"\x00" * 10
+        path.write_bytes(tag + b"\xff\xf3\x44\xc4" + b"\x00" * 3996)
+
+        # MPEG-2 Layer III, индекс битрейта 4 — 32 кбит/с
+        assert mp3_duration(path) == 1.0
@@ -0,0 +1,125 @@
+"""
+Unit тесты для массовых рассылок в Telegram
+"""
+
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.broadcast import Broadcaster, SendResult, TelegramSender
+from core.models import ReminderLog, UnifiedProfile
+from core.weekly_reminders import (
+    REMINDER_TYPE,
+    inactive_recipients,
+    send_weekly_inactive_reminders,
+)
+
+
+class _Sender:
+    """Запоминает отправки; для чатов из fail отвечает ошибкой"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.sent = []
+
+    def send(self, chat_id, text, **params):
+        self.sent.append(chat_id)
+        return SendResult(chat_id, ok=chat_id not in self.fail)
+
+
+def _response(status, payload=None):
+    resp = Mock(status_code=status)
+    resp.json.return_value = payload or {"ok": status == 200}
+    return resp
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def inactive_profiles(db):
+    UnifiedProfile.objects.bulk_create(
+        UnifiedProfile(telegram_id=1000 + n, display_name=f"u{n}") for n in range(5)
+    )
+    UnifiedProfile.objects.update(last_activity=timezone.now() - timedelta(days=10))
+    return list(
+        UnifiedProfile.objects.order_by("pk").values_list("telegram_id", flat=True)
+    )
+
+
+@pytest.mark.unit
+class TestTelegramSender:
+    def _sender(self, *responses):
+        sender = TelegramSender("token", GLOBAL_RATE=0, PER_CHAT_INTERVAL=0)
+        sender.session = Mock()
+        sender.session.post.side_effect = list(responses)
+        return sender
+
+    def test_retry_after_is_honoured(self):
+        sender = self._sender(
+            _response(429, {"ok": False, "parameters": {"retry_after": 0.05}}),
+            _response(200),
+        )
+
+        result = sender.send(42, "Привет")
+
+        assert result.ok
+        assert sender.session.post.call_count == 2
+        assert sender._paused_until > 0
+
+    def test_blocked_chat_is_not_retried(self):
+        sender = self._sender(_response(403))
+
+        result = sender.send(42, "Привет")
+
+        assert result.blocked and not result.ok
+        assert sender.session.post.call_count == 1
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestBroadcaster:
+    """Выбор получателей, запись логов и контрольная точка"""
+
+    def test_recipients_are_selected_with_one_query(
+        self, inactive_profiles, django_assert_num_queries
+    ):
+        UnifiedProfile.objects.create(telegram_id=1, display_name="active")
+        ReminderLog.objects.create(telegram_id=inactive_profiles[0])
+
+        with django_assert_num_queries(1):
+            chats = list(inactive_recipients().values_list("telegram_id", flat=True))
+
+        assert sorted(chats) == inactive_profiles[1:]
+
+    def test_logs_are_written_and_users_not_reminded_twice(self, inactive_profiles):
+        sender = _Sender(fail={inactive_profiles[1]})
+        broadcaster = Broadcaster(sender=sender, BATCH_SIZE=2)
+
+        sent = send_weekly_inactive_reminders(limit=None, broadcaster=broadcaster)
+
+        assert sent == 4
+        assert ReminderLog.objects.filter(reminder_type=REMINDER_TYPE).count() == 4
+        sender.fail.clear()
+        assert send_weekly_inactive_reminders(limit=None, broadcaster=broadcaster) == 1
+        assert sender.sent.count(inactive_profiles[1]) == 2
+
+    def test_interrupted_run_resumes_from_checkpoint(self, inactive_profiles):
+        sender = _Sender(fail={inactive_profiles[0]})
+        broadcaster = Broadcaster(sender=sender, BATCH_SIZE=2)
+
+        first = broadcaster.run(REMINDER_TYPE, inactive_recipients(), "Текст", limit=1)
+        second = broadcaster.run(REMINDER_TYPE, inactive_recipients(), "Текст")
+
+        assert first.sent == 1
+        assert second.resumed_from > 0
+        # Неудачный получатель из первого запуска в этом запуске не повторяется
+        assert sender.sent == inactive_profiles
+        assert cache.get("broadcast_checkpoint:" + REMINDER_TYPE) is None
@@ -0,0 +1,89 @@
+"""
+Unit тесты для маршрутизации callback_data
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from telegram_bot.callback_router import (
+    UNKNOWN_CALLBACKS,
+    CallbackRouter,
+    callback_arg,
+    get_router,
+)
+
+
+def _update(data):
+    return SimpleNamespace(callback_query=SimpleNamespace(data=data))
+
+
+@pytest.fixture
+def router():
+    router = CallbackRouter(fallback=AsyncMock())
+    router.add("stats", AsyncMock(name="stats"))
+    router.add("stats", AsyncMock(name="user_stats"), user_id=int)
+    router.add("random_subject", AsyncMock(name="random"))
+    router.add("topic", AsyncMock(name="topic"), subject_id=int, topic_index=int)
+    return router
+
+
+@pytest.mark.unit
+class TestCallbackRouter:
+    def test_prefix_and_typed_args(self, router):
+        route, args = router.resolve("stats_42")
+        assert route.handler._mock_name == "user_stats"
+        assert args == {"user_id": 42}
+
+        route, args = router.resolve("topic_3_0")
+        assert args == {"subject_id": 3, "topic_index": 0}
+        assert router.resolve("stats")[1] == {}
+
+    def test_malformed_payload_has_no_route(self, router):
+        assert router.resolve("stats_abc") is None
+        assert router.resolve("topic_3") is None
+        assert router.resolve("random") is None
+
+    def test_duplicate_route_is_rejected(self, router):
+        with pytest.raises(ValueError):
+            router.add("stats", AsyncMock())
+
+    def test_dispatch_passes_args_to_handler(self, router):
+        context = SimpleNamespace()
+
+        asyncio.run(router.dispatch(_update("topic_7_1"), context))
+
+        route, _ = router.resolve("topic_7_1")
+        route.handler.assert_awaited_once()
+        assert callback_arg(context, "subject_id") == 7
+
+    def test_unknown_prefix_is_counted(self, router):
+        before = UNKNOWN_CALLBACKS.value(prefix="voice")
+
+        asyncio.run(router.dispatch(_update("voice_12"), SimpleNamespace()))
+
+        router.fallback.assert_awaited_once()
+        assert UNKNOWN_CALLBACKS.value(prefix="voice") == before + 1
+
+
+@pytest.mark.unit
+class TestBotRoutes:
+    @pytest.mark.parametrize(
+        "data, handler, args",
+        [
+            ("subjects", "subjects_menu", {}),
+            ("subject_5", "show_subject_topics", {"subject_id": 5}),
+            ("random_subject", "random_subject_handler", {}),
+            ("random_subject_5", "show_subject_topics", {"subject_id": 5}),
+            ("show_task_12", "show_task_handler", {"task_id": 12}),
+            ("subjects_progress_9", "subjects_progress_handler", {"user_id": 9}),
+            ("ai_help_3", "ai_help_handler", {"task_id": 3}),
+        ],
+    )
+    def test_bot_table(self, data, handler, args):
+        route, parsed = get_router().resolve(data)
+
+        assert route.handler.__name__ == handler
+        assert parsed == args
@@ -0,0 +1,96 @@
+"""
+Unit тесты для снимка каталога
+"""
+
+import pytest
+from django.core.cache import cache
+
+from learning import catalog
+from learning.catalog import build_catalog, get_catalog, invalidate_catalog
+from learning.models import Subject, Task, Topic
+from telegram_bot.utils.catalog_keyboards import catalog_keyboard
+
+
+@pytest.fixture
+def catalog_data(db):
+    math = Subject.objects.create(name="Математика", code="MATH_CAT", is_primary=True)
+    russian = Subject.objects.create(name="Русский язык", code="RUS_CAT")
+    Subject.objects.create(name="Пустой", code="EMPTY_CAT")
+    Topic.objects.create(subject=math, name="Уравнения", code="1")
+    for index in range(3):
+        Task.objects.create(subject=math, title=f"М{index}", difficulty=1)
+    Task.objects.create(subject=russian, title="Р1", difficulty=1)
+    cache.clear()
+    invalidate_catalog()
+    yield math, russian
+    invalidate_catalog()
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestCatalogSnapshot:
+    def test_counts_topics_and_keyboards(self, catalog_data):
+        math, russian = catalog_data
+
+        snapshot = build_catalog()
+
+        assert [s.id for s in snapshot.menu_subjects] == [math.id, russian.id]
+        assert snapshot.subject(math.id).tasks_count == 3
+        assert snapshot.subject(math.id).topics[0].name == "Уравнения"
+        assert snapshot.keyboard("subjects")[0] == (
+            ("Математика (3 заданий)", f"subject_{math.id}"),
+        )
+        assert snapshot.keyboard(f"topics_{math.id}")[0] == (
+            ("Уравнения", f"topic_{math.id}_0"),
+        )
+
+    def test_version_follows_content(self, catalog_data):
+        math, _ = catalog_data
+        version = build_catalog().version
+
+        assert build_catalog().version == version
+        Task.objects.create(subject=math, title="М3", difficulty=1)
+        assert build_catalog().version != version
+
+    def test_menu_reads_need_no_queries(self, catalog_data, django_assert_num_queries):
+        get_catalog()
+
+        with django_assert_num_queries(0):
+            snapshot = get_catalog()
+            keyboard = catalog_keyboard(snapshot, "subjects")
+
+        assert catalog_keyboard(snapshot, "subjects") is keyboard
+
+    def test_change_signal_rebuilds_snapshot(
+        self, catalog_data, django_capture_on_commit_callbacks
+    ):
+        _, russian = catalog_data
+        old = get_catalog()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Task.objects.create(subject=russian, title="Р2", difficulty=1)
+
+        snapshot = get_catalog()
+        assert snapshot.version != old.version
+        assert snapshot.subject(russian.id).tasks_count == 2
+
+    def test_invalidation_during_build_is_not_lost(
+        self, catalog_data, settings, monkeypatch
+    ):
+        """Снимок, собранный до сброса, не перекрывает новое поколение"""
+        _, russian = catalog_data
+        settings.CATALOG_CONFIG = {"CHECK_INTERVAL": 0}
+        real_build = catalog.build_catalog
+
+        def racing_build(config=None):
+            snapshot = real_build(config)
+            # другой процесс меняет каталог, пока этот собирает снимок
+            Task.objects.create(subject=russian, title="Р2", difficulty=1)
+            invalidate_catalog()
+            return snapshot
+
+        monkeypatch.setattr(catalog, "build_catalog", racing_build)
+        assert get_catalog().subject(russian.id).tasks_count == 1
+        monkeypatch.setattr(catalog, "build_catalog", real_build)
+
+        assert get_catalog().subject(russian.id).tasks_count == 2
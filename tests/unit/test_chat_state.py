@@ -0,0 +1,157 @@
+"""
+Unit тесты для состояния диалога с ботом
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from core.models import ChatState
+from telegram_bot import bot_handlers, chat_state
+from telegram_bot.chat_state import (
+    ChatStateData,
+    ChatStateManager,
+    LocalStateStore,
+    edit_if_changed,
+)
+
+
+@pytest.fixture
+def states(monkeypatch):
+    manager = ChatStateManager(
+        store=LocalStateStore(100), config={"SNAPSHOT_INTERVAL": 3600}
+    )
+    monkeypatch.setattr(chat_state, "get_chat_states", lambda: manager)
+    return manager
+
+
+@pytest.mark.unit
+class TestStateStores:
+    def test_local_store_evicts_oldest(self):
+        store = LocalStateStore(2)
+        for key in ("a", "b", "c"):
+            store.set(key, {"ai_mode": key}, ttl=60)
+
+        assert store.get("a") is None
+        assert store.get("c") == {"ai_mode": "c"}
+
+    def test_local_store_expires(self):
+        store = LocalStateStore(2)
+        store.set("a", {}, ttl=0)
+
+        assert store.get("a") is None
+
+    def test_redis_strings_are_parsed(self):
+        state = ChatStateData.from_dict(
+            {"_": b"1", "current_task_id": b"42", "menu_digest": b"ab"}
+        )
+
+        assert state == ChatStateData(current_task_id=42, menu_digest="ab")
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestChatStateManager:
+    def test_updates_are_snapshotted_in_one_batch(self, states, query_budget):
+        states.update(1, current_task_id=5)
+        states.update(2, ai_mode="chat")
+
+        with query_budget(0, "chat_state"):
+            states.update(1, current_task_id=6)
+            assert states.get(1).current_task_id == 6
+        assert ChatState.objects.count() == 0
+
+        assert states.flush() == 2
+        assert ChatState.objects.get(chat_id=1).data == {"current_task_id": 6}
+
+    def test_snapshot_upserts_existing_rows(self, states):
+        ChatState.objects.create(chat_id=1, data={"current_task_id": 5})
+        states.update(1, current_task_id=None)
+
+        states.flush()
+
+        assert ChatState.objects.get(chat_id=1).data == {}
+
+    def test_miss_falls_back_to_snapshot(self, states, query_budget):
+        ChatState.objects.create(chat_id=3, data={"current_task_id": 9})
+
+        assert states.get(3).current_task_id == 9
+        with query_budget(0, "chat_state"):
+            assert states.get(3).current_task_id == 9
+
+    def test_current_task_helpers(self, states, monkeypatch):
+        monkeypatch.setattr(bot_handlers, "get_chat_states", lambda: states)
+        user = SimpleNamespace(telegram_id=4, username="u")
+        states.update(4, ai_mode="chat")
+
+        bot_handlers.set_current_task_id(user, 11)
+
+        assert bot_handlers.get_current_task_id(user) == 11
+        assert states.get(4).ai_mode is None
+
+
+def _query(chat_id=1, message_id=10):
+    return SimpleNamespace(
+        message=SimpleNamespace(chat_id=chat_id, message_id=message_id),
+        edit_message_text=AsyncMock(),
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestEditIfChanged:
+    def test_same_menu_is_not_edited_again(self, states):
+        states.get(1)  # состояние чата уже в хранилище
+        markup = InlineKeyboardMarkup([[InlineKeyboardButton("A", callback_data="a")]])
+        query = _query()
+
+        assert asyncio.run(edit_if_changed(query, "Меню", reply_markup=markup))
+        assert not asyncio.run(edit_if_changed(query, "Меню", reply_markup=markup))
+        assert asyncio.run(edit_if_changed(query, "Другое", reply_markup=markup))
+        assert query.edit_message_text.await_count == 2
+
+    def test_other_message_is_edited(self, states):
+        states.get(1)
+
+        asyncio.run(edit_if_changed(_query(message_id=10), "Меню"))
+        query = _query(message_id=11)
+
+        assert asyncio.run(edit_if_changed(query, "Меню"))
+
+
+@pytest.mark.unit
+class TestTextRouting:
+    def _run(self, monkeypatch, state):
+        handlers = {
+            "handle_answer": AsyncMock(),
+            "handle_ai_message": AsyncMock(),
+            "db_get_chat_state": AsyncMock(return_value=state),
+        }
+        for name, mock in handlers.items():
+            monkeypatch.setattr(bot_handlers, name, mock)
+        update = SimpleNamespace(
+            message=SimpleNamespace(text="42"),
+            effective_chat=SimpleNamespace(id=1),
+            effective_user=SimpleNamespace(id=1),
+            callback_query=None,
+        )
+        asyncio.run(bot_handlers.handle_text_message(update, SimpleNamespace()))
+        return handlers
+
+    def test_text_with_current_task_is_an_answer(self, monkeypatch):
+        handlers = self._run(monkeypatch, ChatStateData(current_task_id=5))
+
+        handlers["handle_answer"].assert_awaited_once()
+        assert handlers["handle_answer"].await_args.args[2] == 5
+        handlers["handle_ai_message"].assert_not_awaited()
+
+    def test_ai_mode_sends_text_to_ai(self, monkeypatch):
+        handlers = self._run(
+            monkeypatch, ChatStateData(current_task_id=5, ai_mode="chat")
+        )
+
+        handlers["handle_answer"].assert_not_awaited()
+        handlers["handle_ai_message"].assert_awaited_once()
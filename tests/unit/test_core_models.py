@@ -264,7 +264,8 @@ class TestCoreModels(TestCase):
 
         assert task.check_answer("1") is True
         assert task.check_answer(" 1 ") is True
-        assert task.check_answer("1.0") is False  # Строгое сравнение
+        assert task.check_answer("1.0") is True  # Числа сравниваются по значению
+        assert task.check_answer("1.5") is False
 
     def test_task_check_answer_incorrect(self):
         """Тест проверки неправильного ответа"""
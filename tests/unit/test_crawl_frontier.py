@@ -0,0 +1,136 @@
+"""
+Unit тесты для планировщика обхода источников ФИПИ
+"""
+
+import heapq
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+from django.utils import timezone
+
+from core.crawl_frontier import CrawlFrontier
+from core.fipi_crawler import FetchResult, FipiCrawler
+from core.models import FIPISourceMap
+
+
+def _source(source_id, **kwargs):
+    defaults = {
+        "name": source_id,
+        "url": f"https://fipi.ru/{source_id}",
+        "data_type": "tasks",
+        "exam_type": "ege",
+        "update_frequency": "weekly",
+    }
+    defaults.update(kwargs)
+    return FIPISourceMap.objects.create(source_id=source_id, **defaults)
+
+
+def _frontier(status=200, content=b"page", **kwargs):
+    session = Mock()
+    response = Mock(status_code=status, content=content, headers={})
+    response.raise_for_status = Mock()
+    session.get.return_value = response
+    crawler = FipiCrawler(session=session, per_host_delay=0)
+    return CrawlFrontier(crawler=crawler, **kwargs), session
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestCrawlFrontier:
+    """Тесты планировщика обхода"""
+
+    def test_only_due_sources_are_fetched(self):
+        """Источники с будущей проверкой в очередь не попадают"""
+        now = timezone.now()
+        _source("due", next_check_at=now - timedelta(hours=1), last_checked=now)
+        _source("future", next_check_at=now + timedelta(days=1), last_checked=now)
+        _source("new")
+
+        due_ids = {source.source_id for source in _frontier()[0].due_sources()}
+
+        assert due_ids == {"due", "new"}
+
+    def test_queue_orders_by_due_time_and_priority(self):
+        """Сначала самые просроченные, при равенстве — более приоритетные"""
+        now = timezone.now()
+        late = _source("late", priority=4, next_check_at=now - timedelta(days=2))
+        low = _source("low", priority=4, next_check_at=now - timedelta(hours=1))
+        high = _source("high", priority=1, next_check_at=now - timedelta(hours=1))
+
+        frontier = _frontier()[0]
+        queue = frontier.build_queue([low, high, late])
+        order = [heapq.heappop(queue)[3] for _ in range(3)]
+
+        assert [source.source_id for source in order] == ["late", "high", "low"]
+
+    def test_run_records_schedule_and_calls_handler(self):
+        """После запуска у источника есть статистика и следующая проверка"""
+        _source("page")
+        frontier, _ = _frontier()
+        handler = Mock(return_value=2)
+
+        stats = frontier.run(handler=handler)
+
+        assert stats.fetched == 1
+        assert stats.changed == 1
+        assert stats.tasks_created == 2
+        handler.assert_called_once()
+        source = FIPISourceMap.objects.get(source_id="page")
+        assert source.check_count == 1
+        assert source.change_count == 0
+        assert source.revisit_interval == timedelta(days=7)
+        assert source.next_check_at > timezone.now()
+
+    def test_failed_handler_keeps_page_for_retry(self):
+        """Если обработчик упал, валидаторы не сохраняются и будет повтор"""
+        _source("page")
+        frontier, _ = _frontier()
+
+        stats = frontier.run(handler=Mock(side_effect=RuntimeError("db down")))
+
+        assert stats.handler_errors == 1
+        source = FIPISourceMap.objects.get(source_id="page")
+        assert source.content_hash in ("", None)
+        assert source.last_checked is None
+        assert source.next_check_at <= timezone.now() + timedelta(hours=1)
+
+        stats = frontier.run(handler=Mock(return_value=3), sources=[source])
+
+        assert (stats.changed, stats.handler_errors, stats.tasks_created) == (1, 0, 3)
+        source.refresh_from_db()
+        assert source.content_hash
+
+    def test_time_budget_stops_run(self):
+        """При нулевом остатке бюджета источники остаются в очереди"""
+        for index in range(3):
+            _source(f"page{index}")
+        frontier, _ = _frontier(concurrency=1, time_budget=1e-9)
+
+        stats = frontier.run()
+
+        assert stats.budget_exhausted
+        assert stats.remaining + stats.fetched == 3
+
+    def test_interval_adapts_to_change_rate(self):
+        """Неизменный источник проверяется реже, изменившийся — чаще"""
+        frontier = _frontier()[0]
+        source = _source("pdf", content_hash="old", revisit_interval=timedelta(days=10))
+
+        assert frontier.next_interval(source, changed=False) == timedelta(days=15)
+        assert frontier.next_interval(source, changed=True) == timedelta(days=5)
+
+        source.revisit_interval = timedelta(days=400)
+        assert frontier.next_interval(source, changed=False) == timedelta(days=365)
+
+    def test_error_is_retried_soon(self):
+        """Ошибка загрузки не меняет интервал, но планирует повтор"""
+        source = _source("broken")
+        frontier = _frontier()[0]
+
+        frontier._update_schedule(
+            FetchResult(url=source.url, error="timeout", source=source)
+        )
+
+        assert source.check_count == 0
+        assert source.next_check_at <= timezone.now() + timedelta(hours=1)
@@ -0,0 +1,153 @@
+"""
+Unit тесты для краулера ФИПИ
+"""
+
+from unittest.mock import Mock
+
+import pytest
+
+from core.fipi_crawler import FipiCrawler, HostThrottle, content_hash
+from core.fipi_loader import FipiLoader
+from core.models import FIPISourceMap
+
+
+def _response(status=200, content=b"", headers=None):
+    response = Mock()
+    response.status_code = status
+    response.content = content
+    response.headers = headers or {}
+    response.raise_for_status = Mock()
+    return response
+
+
+def _crawler(session):
+    return FipiCrawler(session=session, max_workers=4, per_host_delay=0)
+
+
+@pytest.mark.unit
+class TestFipiCrawlerFetch:
+    """Тесты загрузки отдельных страниц"""
+
+    def test_sends_conditional_headers(self):
+        """Сохраненные валидаторы отправляются в запросе"""
+        session = Mock()
+        session.get.return_value = _response(status=304)
+
+        result = _crawler(session).fetch(
+            "https://fipi.ru/ege",
+            etag='"abc"',
+            last_modified="Mon, 01 Sep 2025 00:00:00 GMT",
+            known_hash="hash",
+        )
+
+        headers = session.get.call_args.kwargs["headers"]
+        assert headers["If-None-Match"] == '"abc"'
+        assert headers["If-Modified-Since"] == "Mon, 01 Sep 2025 00:00:00 GMT"
+        assert result.not_modified
+        assert result.ok
+        assert not result.changed
+        assert result.content_hash == "hash"
+
+    def test_same_hash_is_not_changed(self):
+        """Страница с тем же хешем считается неизменившейся"""
+        body = b"<html>demo</html>"
+        session = Mock()
+        session.get.return_value = _response(content=body, headers={"ETag": '"v2"'})
+
+        result = _crawler(session).fetch(
+            "https://fipi.ru/ege", known_hash=content_hash(body)
+        )
+
+        assert result.ok
+        assert not result.changed
+        assert result.etag == '"v2"'
+
+    def test_error_is_reported(self):
+        """Сетевая ошибка не пробрасывается, а попадает в результат"""
+        session = Mock()
+        session.get.side_effect = ConnectionError("boom")
+
+        result = _crawler(session).fetch("https://fipi.ru/ege")
+
+        assert not result.ok
+        assert "boom" in result.error
+
+    def test_fetch_many_keeps_order(self):
+        """Результаты возвращаются в порядке запросов"""
+        session = Mock()
+        session.get.side_effect = lambda url, **kwargs: _response(content=url.encode())
+
+        urls = [f"https://fipi.ru/page/{i}" for i in range(10)]
+        results = _crawler(session).fetch_many({"url": url} for url in urls)
+
+        assert [result.url for result in results] == urls
+        assert all(result.changed for result in results)
+
+
+@pytest.mark.unit
+class TestHostThrottle:
+    """Тесты ограничений на хост"""
+
+    def test_delay_spaces_out_requests(self):
+        """Каждый следующий слот сдвигается на задержку"""
+        throttle = HostThrottle(concurrency=2, delay=10)
+
+        assert throttle._reserve_slot("fipi.ru") == 0
+        assert throttle._reserve_slot("fipi.ru") == pytest.approx(10, abs=0.1)
+        assert throttle._reserve_slot("ege.sdamgia.ru") == 0
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestFipiCrawlerSources:
+    """Тесты работы с FIPISourceMap"""
+
+    def test_crawl_records_validators_and_skips_fresh_sources(self):
+        """После проверки источник сохраняет ETag и не нуждается в повторе"""
+        session = Mock()
+        session.get.return_value = _response(content=b"page", headers={"ETag": '"v1"'})
+        crawler = _crawler(session)
+
+        sources = crawler.ensure_sources(
+            [
+                {
+                    "source_id": "test_source",
+                    "name": "Тестовый источник",
+                    "url": "https://fipi.ru/test",
+                    "data_type": "tasks",
+                    "exam_type": "ege",
+                    "update_frequency": "daily",
+                }
+            ]
+        )
+        results = crawler.crawl(sources)
+
+        assert len(results) == 1
+        assert results[0].changed
+
+        sources[0].refresh_from_db()
+        assert sources[0].etag == '"v1"'
+        assert sources[0].content_hash == content_hash(b"page")
+        assert crawler.crawl(sources) == []
+
+    def test_failed_ingest_is_fetched_again(self, monkeypatch):
+        """Если разбор страницы упал, валидаторы не сохраняются"""
+        session = Mock()
+        session.get.return_value = _response(content=b"page", headers={"ETag": '"v1"'})
+        loader = FipiLoader()
+        loader.crawler = _crawler(session)
+        process = Mock(side_effect=RuntimeError("db down"))
+        monkeypatch.setattr(loader, "_process_subject_page", process)
+        pages = len(loader._subject_pages())
+
+        assert loader.load_subjects() == (0, 0)
+        assert process.call_count == pages
+        assert not FIPISourceMap.objects.exclude(etag="").exists()
+
+        process.side_effect = None
+        process.return_value = (1, 2)
+        session.get.reset_mock()
+        assert loader.load_subjects() == (pages, 2 * pages)
+        assert process.call_count == 2 * pages
+        assert "If-None-Match" not in session.get.call_args.kwargs["headers"]
+        assert not FIPISourceMap.objects.filter(etag="").exists()
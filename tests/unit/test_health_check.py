@@ -2,11 +2,35 @@
 Тесты для health check модуля
 """
 
+import time
+from contextlib import ExitStack, contextmanager
 from unittest.mock import Mock, patch
 
 import pytest
+from django.core.cache import cache
 from django.test import RequestFactory
 
+from core.health_probes import PROBES, get_health_report, run_probes
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@contextmanager
+def _probes(**checks):
+    """Подменяет check у проб: по умолчанию все проходят без сети и базы"""
+    checks = {
+        name: Mock(return_value="ok") for name in ("database", "cache", "ai", "telegram")
+    } | checks
+    with ExitStack() as stack:
+        for name, check in checks.items():
+            stack.enter_context(patch.object(PROBES[name], "check", check))
+        yield checks
+
 
 @pytest.mark.unit
 @pytest.mark.django_db
@@ -22,15 +46,7 @@ class TestHealthCheck:
         factory = RequestFactory()
         request = factory.get("/health/")
 
-        with (
-            patch("core.health_check.connection.cursor") as mock_cursor,
-            patch("core.health_check.cache") as mock_cache,
-        ):
-
-            # Настраиваем успешные моки
-            mock_cursor.return_value.__enter__.return_value.execute = Mock()
-            mock_cache.set.return_value = True
-            mock_cache.get.return_value = "ok"
+        with _probes():
 
             response = health_check_view(request)
 
@@ -52,13 +68,7 @@ class TestHealthCheck:
         factory = RequestFactory()
         request = factory.get("/health/")
 
-        with (
-            patch("django.db.connection.cursor", side_effect=Exception("DB Error")),
-            patch("django.core.cache.cache") as mock_cache,
-        ):
-
-            mock_cache.set.return_value = True
-            mock_cache.get.return_value = "ok"
+        with _probes(database=Mock(side_effect=Exception("DB Error"))):
 
             response = health_check_view(request)
 
@@ -78,12 +88,7 @@ class TestHealthCheck:
         factory = RequestFactory()
         request = factory.get("/health/")
 
-        with (
-            patch("django.db.connection.cursor") as mock_cursor,
-            patch("django.core.cache.cache.set", side_effect=Exception("Cache Error")),
-        ):
-
-            mock_cursor.return_value.__enter__.return_value.execute = Mock()
+        with _probes(cache=Mock(side_effect=Exception("Cache Error"))):
 
             response = health_check_view(request)
 
@@ -113,3 +118,46 @@ class TestHealthCheck:
 
         data = json.loads(response.content)
         assert data["status"] == "ok"
+
+
+@pytest.mark.unit
+class TestHealthProbes:
+    """Параллельные пробы, таймауты и кэш отчета"""
+
+    def test_report_is_cached(self):
+        with _probes() as checks:
+            get_health_report()
+            get_health_report()
+
+        assert checks["database"].call_count == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_database_and_cache_probes(self):
+        report = run_probes(["database", "cache"])
+
+        assert report["status"] == "healthy"
+        assert all(result["ok"] for result in report["probes"].values())
+
+    def test_slow_probe_times_out(self):
+        slow = Mock(side_effect=lambda: time.sleep(1.0))
+
+        with patch.object(PROBES["ai"], "check", slow), patch.object(
+            PROBES["ai"], "timeout", 0.05
+        ):
+            started = time.monotonic()
+            report = run_probes(["ai"])
+
+        assert report["probes"]["ai"]["detail"] == "timeout"
+        assert time.monotonic() - started < 0.5
+
+    def test_ai_probe_uses_real_traffic(self):
+        """Недавний успешный ответ ИИ заменяет запрос к API"""
+        from ai.router import get_provider_health
+
+        get_provider_health("probe-test").record(0.1, True)
+
+        with patch("core.health_probes._get_session") as session:
+            report = run_probes(["ai"])
+
+        assert report["probes"]["ai"]["ok"]
+        session.assert_not_called()
@@ -0,0 +1,98 @@
+"""
+Unit тесты для метрик времени выполнения
+"""
+
+import json
+import uuid
+
+import pytest
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from core import metrics
+from examflow_project.middleware import REQUEST_QUERIES, RequestMetricsMiddleware
+
+
+def _name(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:8]}"
+
+
+@pytest.mark.unit
+class TestRegistry:
+    def test_histogram_exposition(self):
+        name = _name("test_seconds")
+        histogram = metrics.histogram(name, "Тест", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="a")
+        histogram.observe(0.5, stage="a")
+        histogram.observe(5.0, stage="a")
+
+        text = metrics.render_text(metrics.collect())
+
+        assert f'{name}_bucket{{stage="a",le="0.1"}} 1' in text
+        assert f'{name}_bucket{{stage="a",le="1"}} 2' in text
+        assert f'{name}_bucket{{stage="a",le="+Inf"}} 3' in text
+        assert f'{name}_count{{stage="a"}} 3' in text
+        assert histogram.quantile(0.5) == 1.0
+
+    def test_timed_records_outcome(self):
+        histogram = metrics.histogram(_name("test_handler"), "Тест", ("outcome",))
+
+        @metrics.timed(histogram)
+        def broken():
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            broken()
+
+        assert histogram.count(outcome="error") == 1
+
+    def test_snapshots_of_workers_are_summed(self, tmp_path):
+        name = _name("test_total")
+        metrics.counter(name, "Тест", ("kind",)).inc(2, kind="x")
+        other_worker = {
+            name: {
+                "kind": "counter",
+                "help": "Тест",
+                "labelnames": ["kind"],
+                "buckets": [],
+                "values": [[["x"], 3]],
+            }
+        }
+        (tmp_path / "metrics_1.json").write_text(json.dumps(other_worker))
+
+        with override_settings(METRICS_CONFIG={"MULTIPROCESS_DIR": str(tmp_path)}):
+            metrics.flush_snapshot()
+            text = metrics.render_text(metrics.collect())
+
+        assert f'{name}{{kind="x"}} 5' in text
+
+    def test_endpoint_requires_token(self):
+        factory = RequestFactory()
+
+        with override_settings(METRICS_CONFIG={"TOKEN": "secret"}):
+            assert metrics.metrics_view(factory.get("/metrics/")).status_code == 401
+            response = metrics.metrics_view(
+                factory.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+            )
+
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain")
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestRequestMetricsMiddleware:
+    def test_queries_per_request_are_counted(self):
+        def view(request):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.execute("SELECT 1")
+            return HttpResponse("ok")
+
+        before = REQUEST_QUERIES.totals(view="unmatched")
+        RequestMetricsMiddleware(view)(RequestFactory().get("/x/"))
+        counts, total = REQUEST_QUERIES.totals(view="unmatched")
+
+        assert sum(counts) == sum(before[0]) + 1
+        assert total - before[1] == 2
@@ -0,0 +1,85 @@
+"""
+Unit тесты для кэша профиля пользователя бота
+"""
+
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.models import UnifiedProfile
+from telegram_bot.bot_handlers import db_update_rating_points, get_or_create_user
+from telegram_bot.profile_cache import ActivityTracker, get_snapshot
+
+
+def _telegram_user(telegram_id=777001, username="cached"):
+    return SimpleNamespace(
+        id=telegram_id, username=username, first_name="Имя", last_name=""
+    )
+
+
+@pytest.fixture
+def clean_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestProfileSnapshot:
+    def test_second_lookup_is_one_query(self, clean_cache, query_budget):
+        telegram_user = _telegram_user()
+        user, created = get_or_create_user(telegram_user)
+        assert created
+
+        with query_budget(1, "profile_cache"):
+            cached, created = get_or_create_user(telegram_user)
+        assert (cached.pk, created) == (user.pk, False)
+        assert get_snapshot(telegram_user.id).user_id == user.pk
+
+    def test_snapshot_reads_level_and_streak(self, clean_cache):
+        UnifiedProfile.objects.create(
+            telegram_id=777002, display_name="P", level=4, current_streak=3
+        )
+        get_or_create_user(_telegram_user(777002))
+
+        snapshot = get_snapshot(777002)
+        assert (snapshot.level, snapshot.streak, snapshot.points) == (4, 3, 0)
+
+    def test_points_written_through(self, clean_cache):
+        user, _ = get_or_create_user(_telegram_user())
+
+        db_update_rating_points.__wrapped__(user, True)
+
+        assert get_snapshot(user.telegram_id).points == 10
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestActivityTracker:
+    def test_touches_coalesced_until_interval(self, query_budget):
+        old = timezone.now() - timedelta(days=1)
+        for telegram_id in (777010, 777011):
+            UnifiedProfile.objects.create(telegram_id=telegram_id, display_name="A")
+        UnifiedProfile.objects.update(last_activity=old)
+        tracker = ActivityTracker({"ACTIVITY_INTERVAL": 3600})
+
+        with query_budget(0, "activity"):
+            for _ in range(5):
+                assert tracker.touch(777010) == 0
+            tracker.touch(777011)
+        assert tracker.pending() == 2
+
+        with query_budget(1, "activity"):
+            assert tracker.flush() == 2
+        assert not UnifiedProfile.objects.filter(last_activity=old).exists()
+
+    def test_flush_when_interval_elapsed(self):
+        UnifiedProfile.objects.create(telegram_id=777012, display_name="A")
+        tracker = ActivityTracker({"ACTIVITY_INTERVAL": 0})
+
+        assert tracker.touch(777012) == 1
+        assert tracker.pending() == 0
@@ -0,0 +1,71 @@
+"""
+Unit тесты для сводки прогресса по предметам
+"""
+
+import pytest
+from django.core.cache import cache
+
+from learning.catalog import invalidate_catalog
+from learning.models import Subject, Task, UserProgress
+from learning.progress import build_progress_summary, get_progress_summary
+from telegram_auth.models import TelegramUser
+
+
+@pytest.fixture
+def progress_data(db):
+    user = TelegramUser.objects.create(telegram_id=555001, telegram_username="p")
+    subjects = [
+        Subject.objects.create(name=f"Предмет {index}", code=f"PRG{index}")
+        for index in range(3)
+    ]
+    for subject in subjects:
+        tasks = [
+            Task.objects.create(subject=subject, title=f"З{i}", difficulty=1)
+            for i in range(4)
+        ]
+        UserProgress.objects.create(user=user, task=tasks[0], is_correct=True)
+        UserProgress.objects.create(user=user, task=tasks[1], is_correct=False)
+    cache.clear()
+    invalidate_catalog()
+    yield user, subjects
+    cache.clear()
+    invalidate_catalog()
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestProgressSummary:
+    def test_counts_per_subject(self, progress_data):
+        user, subjects = progress_data
+
+        summary = build_progress_summary(user.pk)
+
+        progress = summary.subject(subjects[0].id)
+        assert (progress.total, progress.attempted, progress.solved) == (4, 2, 1)
+        assert progress.percent == 25.0
+        assert progress.accuracy == 50.0
+        assert {p.subject_id for p in summary.started} == {s.id for s in subjects}
+
+    def test_query_count_does_not_grow_with_subjects(
+        self, progress_data, query_budget
+    ):
+        user, _ = progress_data
+        get_progress_summary(user.pk)  # прогрев каталога
+
+        cache.clear()
+        with query_budget(1, "progress"):
+            get_progress_summary(user.pk)
+        with query_budget(0, "progress"):
+            get_progress_summary(user.pk)
+
+    def test_new_progress_invalidates_cache(
+        self, progress_data, django_capture_on_commit_callbacks
+    ):
+        user, subjects = progress_data
+        assert get_progress_summary(user.pk).solved == 3
+        task = Task.objects.filter(subject=subjects[2]).last()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            UserProgress.objects.create(user=user, task=task, is_correct=True)
+
+        assert get_progress_summary(user.pk).solved == 4
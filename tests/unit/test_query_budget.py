@@ -0,0 +1,129 @@
+"""
+Unit тесты для бюджета SQL-запросов
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from core.models import UnifiedProfile
+from core.query_budget import check_budget, query_budget, track_queries
+from core.weekly_reminders import inactive_recipients
+from examflow_project.middleware import RequestMetricsMiddleware
+from learning.catalog import get_catalog, invalidate_catalog
+from learning.models import Subject, Task
+
+
+def _select(n):
+    with connection.cursor() as cursor:
+        for _ in range(n):
+            cursor.execute("SELECT 1")
+
+
+@pytest.fixture
+def subjects(db):
+    for index in range(3):
+        subject = Subject.objects.create(name=f"Предмет {index}", code=f"QB{index}")
+        Task.objects.create(subject=subject, title=f"Задание {index}", difficulty=1)
+    invalidate_catalog()
+    yield
+    invalidate_catalog()
+
+
+@pytest.fixture
+def profiles(db):
+    ids = [910000 + index for index in range(3)]
+    UnifiedProfile.objects.bulk_create(
+        UnifiedProfile(telegram_id=telegram_id) for telegram_id in ids
+    )
+    UnifiedProfile.objects.update(last_activity=timezone.now() - timedelta(days=30))
+    return ids
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestTrackQueries:
+    def test_duplicates_of_n_plus_one_are_detected(self, subjects):
+        with track_queries("n+1") as stats:
+            for subject in Subject.objects.all():
+                list(Task.objects.filter(subject=subject))
+
+        total = Subject.objects.count()
+        assert stats.count == total + 1
+        assert stats.duplicates == total - 1
+        assert stats.most_duplicated(1)[0][1] == total
+
+    def test_nested_blocks_count_in_outer(self):
+        with track_queries() as outer:
+            _select(1)
+            with track_queries() as inner:
+                _select(2)
+
+        assert (outer.count, inner.count) == (3, 2)
+
+    def test_queries_from_sync_to_async_are_counted(self):
+        async def handler():
+            with track_queries() as stats:
+                await sync_to_async(_select)(2)
+            return stats
+
+        assert asyncio.run(handler()).count == 2
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestCheckBudget:
+    def test_exceeded_budget_is_logged(self, caplog):
+        with override_settings(QUERY_BUDGET_CONFIG={"BUDGETS": {"bot:test": 1}}):
+            with caplog.at_level(logging.WARNING, logger="core.query_budget"):
+                with query_budget("bot:test"):
+                    _select(2)
+
+        assert "bot:test: 2 > 1" in caplog.text
+        assert "2× SELECT ?" in caplog.text
+
+    def test_disabled_or_unknown_label_passes(self):
+        with track_queries("learning:home") as stats:
+            _select(3)
+
+        assert check_budget(stats)
+        with override_settings(QUERY_BUDGET_CONFIG={"ENABLED": False}):
+            assert check_budget(stats, budget=1)
+
+    def test_middleware_checks_route_budget(self, caplog):
+        def view(request):
+            _select(3)
+            return HttpResponse("ok")
+
+        with override_settings(QUERY_BUDGET_CONFIG={"BUDGETS": {"unmatched": 2}}):
+            with caplog.at_level(logging.WARNING, logger="core.query_budget"):
+                RequestMetricsMiddleware(view)(RequestFactory().get("/x/"))
+
+        assert "unmatched: 3 > 2" in caplog.text
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestPinnedQueryCounts:
+    """Число запросов ключевых путей: рост означает новый N+1"""
+
+    def test_cold_catalog(self, subjects, query_budget):
+        with query_budget(3, "catalog"):
+            snapshot = get_catalog()
+
+        assert len(snapshot.menu_subjects) == 3
+        with query_budget(0, "catalog"):
+            get_catalog()
+
+    @pytest.mark.query_budget(1)
+    def test_inactive_recipients(self, profiles):
+        recipients = list(inactive_recipients().values_list("telegram_id", flat=True))
+
+        assert sorted(recipients) == profiles
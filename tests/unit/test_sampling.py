@@ -0,0 +1,74 @@
+"""
+Unit тесты для выбора случайного нерешенного задания
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from learning.models import Subject, Task, UserProgress
+from learning.sampling import (
+    random_unsolved_task,
+    random_unsolved_task_id,
+    sample_task,
+    unsolved_tasks,
+)
+from telegram_auth.models import TelegramUser
+
+
+@pytest.fixture
+def sampling_data(db):
+    random.seed(46)
+    user = TelegramUser.objects.create(telegram_id=555046, telegram_username="s")
+    math = Subject.objects.create(name="Математика", code="MATH_SMP")
+    other = Subject.objects.create(name="Физика", code="PHYS_SMP")
+    tasks = [
+        Task.objects.create(subject=math, title=f"М{i}", difficulty=1) for i in range(5)
+    ]
+    Task.objects.create(subject=other, title="Ф", difficulty=1)
+    for task in tasks[:3]:
+        UserProgress.objects.create(user=user, task=task, is_correct=True)
+    UserProgress.objects.create(user=user, task=tasks[3], is_correct=False)
+    return user, math, tasks
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestRandomUnsolvedTask:
+    def test_draws_only_unsolved_tasks_uniformly(self, sampling_data):
+        user, math, tasks = sampling_data
+
+        draws = Counter(
+            random_unsolved_task_id(user.pk, subject_id=math.id) for _ in range(400)
+        )
+
+        assert set(draws) == {tasks[3].id, tasks[4].id}
+        assert 150 < draws[tasks[3].id] < 250
+
+    def test_fallback_scan_when_batches_miss(self, sampling_data):
+        user, math, tasks = sampling_data
+        queryset = unsolved_tasks(user.pk, math.id).values_list("id", flat=True)
+
+        drawn = {
+            sample_task(queryset, math.id, {"BATCH_SIZE": 1, "ATTEMPTS": 0})
+            for _ in range(50)
+        }
+
+        assert drawn == {tasks[3].id, tasks[4].id}
+
+    def test_none_when_everything_solved(self, sampling_data):
+        user, math, tasks = sampling_data
+        UserProgress.objects.filter(task=tasks[3]).update(is_correct=True)
+        UserProgress.objects.create(user=user, task=tasks[4], is_correct=True)
+
+        assert random_unsolved_task(user.pk, subject_id=math.id) is None
+        assert random_unsolved_task(subject_id=math.id) is not None
+        assert random_unsolved_task_id(subject_id=999999) is None
+
+    def test_constant_number_of_queries(self, sampling_data, query_budget):
+        user, math, _ = sampling_data
+
+        with query_budget(3, "sampling"):
+            task = random_unsolved_task(user.pk)
+            assert task.subject.name
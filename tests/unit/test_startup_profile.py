@@ -0,0 +1,98 @@
+"""
+Unit тесты для профилирования холодного старта
+"""
+
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core import auto_startup
+from core.startup_profile import (
+    STARTUP_STEP_SECONDS,
+    lazy_import,
+    parse_importtime,
+    profile_boot,
+    startup_step,
+)
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     telegram._version
+import time:      5000 |       5120 |   telegram
+import time:       300 |       5420 | telegram_bot.views
+"""
+
+
+@pytest.mark.unit
+class TestStartupProfile:
+    def test_parse_importtime(self):
+        records = parse_importtime(IMPORTTIME)
+
+        assert [(r.module, r.depth) for r in records] == [
+            ("telegram._version", 2),
+            ("telegram", 1),
+            ("telegram_bot.views", 0),
+        ]
+        assert records[-1].cumulative_us == 5420
+
+    def test_lazy_import_defers_execution(self, tmp_path, monkeypatch):
+        package = tmp_path / "lazy_pkg"
+        package.mkdir()
+        (package / "__init__.py").write_text("")
+        (package / "heavy.py").write_text(
+            "import sys\nLOADED = True\nsys.loaded_heavy = 1\n"
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delattr(sys, "loaded_heavy", raising=False)
+
+        try:
+            module = lazy_import("lazy_pkg.heavy")
+            assert not hasattr(sys, "loaded_heavy")
+
+            assert module.LOADED
+            assert sys.loaded_heavy == 1
+            assert sys.modules["lazy_pkg"].heavy is module
+        finally:
+            sys.modules.pop("lazy_pkg.heavy", None)
+            sys.modules.pop("lazy_pkg", None)
+
+    def test_startup_step_records_failures(self):
+        before = STARTUP_STEP_SECONDS.count(step="test_step", outcome="error")
+
+        with pytest.raises(RuntimeError), startup_step("test_step"):
+            raise RuntimeError
+
+        after = STARTUP_STEP_SECONDS.count(step="test_step", outcome="error")
+        assert after == before + 1
+
+    @pytest.mark.slow
+    def test_webhook_urlconf_does_not_load_telegram(self, monkeypatch):
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "123456:test")
+        report = profile_boot("/bot/test/", bot_modules=[])
+
+        assert report.status_code == 200
+        assert "telegram" not in report.heavy_before_response
+        assert report.steps["first_response"] > 0
+
+
+@pytest.mark.unit
+class TestBackgroundStartup:
+    def test_first_request_schedules_once(self, monkeypatch):
+        monkeypatch.setattr(auto_startup, "_startup_scheduled", False)
+        thread = Mock()
+        middleware = auto_startup.trigger_startup_on_first_request(
+            lambda request: HttpResponse("ok")
+        )
+
+        with patch.object(auto_startup.threading, "Thread", thread):
+            middleware(RequestFactory().get("/"))
+            middleware(RequestFactory().get("/"))
+
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+    def test_jobs_disabled_by_default(self):
+        assert auto_startup.should_run_startup() is False
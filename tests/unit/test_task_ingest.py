@@ -0,0 +1,109 @@
+"""
+Unit тесты для массовой загрузки заданий
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.enhanced_parser import DataIntegrator
+from core.task_ingest import bulk_upsert_tasks, task_natural_key
+from learning.models import Subject, Task, Topic
+
+
+def _tasks(count, subject_name="Математика", prefix="Задание"):
+    return [
+        {
+            "subject_name": subject_name,
+            "exam_type": "ege",
+            "topic": "Демоверсия",
+            "title": f"{prefix} {i}",
+            "description": f"Описание {i}",
+            "difficulty": 2,
+            "source": "ФИПИ",
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestTaskBulkIngest:
+    """Тесты массового upsert заданий"""
+
+    def test_creates_subjects_topics_and_tasks(self):
+        """Первая загрузка создает все недостающие записи"""
+        stats = bulk_upsert_tasks(_tasks(5))
+
+        assert stats.created == 5
+        assert stats.subjects_created == 1
+        assert stats.topics_created == 1
+        assert Task.objects.count() == 5
+        assert Topic.objects.filter(name="Демоверсия").count() == 1
+
+    def test_repeat_load_is_unchanged(self):
+        """Повторная загрузка тех же данных ничего не пишет"""
+        bulk_upsert_tasks(_tasks(5))
+
+        stats = bulk_upsert_tasks(_tasks(5))
+
+        assert stats.created == 0
+        assert stats.unchanged == 5
+        assert Task.objects.count() == 5
+
+    def test_changed_fields_are_updated(self):
+        """Изменившиеся задания обновляются по естественному ключу"""
+        bulk_upsert_tasks(_tasks(3))
+        data = _tasks(3)
+        data[0]["description"] = "Новое описание"
+
+        stats = bulk_upsert_tasks(data)
+
+        assert stats.updated == 1
+        assert stats.unchanged == 2
+        assert Task.objects.get(title="Задание 0").description == "Новое описание"
+
+    def test_duplicates_in_batch_are_skipped(self):
+        """Дубликаты внутри одной пачки не создают лишних записей"""
+        stats = bulk_upsert_tasks(_tasks(2) + _tasks(2))
+
+        assert stats.created == 2
+        assert stats.skipped == 2
+
+    def test_legacy_task_is_adopted(self):
+        """Задание без source_hash получает ключ вместо создания дубликата"""
+        subject = Subject.objects.create(name="Физика", exam_type="ege")
+        Task.objects.create(subject=subject, title="Задание 0", difficulty=2)
+
+        stats = bulk_upsert_tasks(_tasks(1, subject_name="Физика"))
+
+        assert Task.objects.filter(subject=subject).count() == 1
+        assert stats.created == 0
+        task = Task.objects.get(subject=subject)
+        assert task.source_hash == task_natural_key("Задание 0", "ФИПИ")
+
+    def test_single_task_uses_the_same_key(self):
+        """Задание, созданное поштучно, не дублируется при массовой загрузке"""
+        subject = Subject.objects.create(name="Химия", exam_type="ege")
+        task_data = {
+            "title": "Задание 1",
+            "description": "",
+            "difficulty": 1,
+            "source": "РешуЕГЭ",
+            "url": "https://ege.sdamgia.ru/problem?id=1",
+        }
+        DataIntegrator().create_or_update_task(task_data, subject)
+
+        stats = bulk_upsert_tasks([dict(task_data, subject=subject)])
+
+        assert (stats.created, stats.unchanged) == (0, 1)
+        assert Task.objects.filter(subject=subject).count() == 1
+
+    def test_query_count_does_not_grow_with_batch(self):
+        """Число запросов не зависит от размера пачки"""
+        with CaptureQueriesContext(connection) as small:
+            bulk_upsert_tasks(_tasks(5, prefix="Малая"))
+        with CaptureQueriesContext(connection) as large:
+            bulk_upsert_tasks(_tasks(300, prefix="Большая"))
+
+        assert len(large.captured_queries) <= len(small.captured_queries) + 2
@@ -0,0 +1,86 @@
+"""
+Unit тесты для общего клиента Telegram Bot API
+"""
+
+import asyncio
+import threading
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from telegram.request import HTTPXRequest
+
+from telegram_bot import client as client_module
+from telegram_bot.client import (
+    API_SECONDS,
+    BotClient,
+    call_api,
+    instrumented_request_class,
+)
+
+TOKEN = "123456:" + "A" * 35
+
+
+@pytest.fixture
+def bot_client():
+    client = BotClient(token=TOKEN)
+    yield client
+    client.shutdown()
+
+
+@pytest.mark.unit
+class TestBotClient:
+    def test_bot_is_shared(self, bot_client):
+        assert bot_client.bot is bot_client.bot
+        assert bot_client.bot.request._client_kwargs["limits"].max_connections == 32
+
+    def test_coroutines_run_in_client_loop(self, bot_client):
+        async def thread_name():
+            return threading.current_thread().name
+
+        assert bot_client.run(thread_name()) == "telegram-client"
+        assert asyncio.run(bot_client.arun(thread_name())) == "telegram-client"
+
+    def test_run_inside_loop_is_refused(self, bot_client):
+        async def nested():
+            bot_client.run(asyncio.sleep(0))
+
+        with pytest.raises(RuntimeError):
+            bot_client.run(nested())
+
+    def test_shutdown_stops_loop(self, bot_client):
+        loop = bot_client.loop
+        bot_client.bot
+
+        bot_client.shutdown()
+
+        assert loop.is_closed()
+
+
+@pytest.mark.unit
+class TestApiMetrics:
+    def test_async_calls_are_timed_by_method(self, bot_client):
+        before = API_SECONDS.count(method="sendMessage", outcome="ok")
+        request = instrumented_request_class()()
+
+        with patch.object(
+            HTTPXRequest, "do_request", AsyncMock(return_value=(200, b"{}"))
+        ):
+            url = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
+            bot_client.run(request.do_request(url, "POST"))
+
+        assert API_SECONDS.count(method="sendMessage", outcome="ok") == before + 1
+
+    def test_call_api_returns_result(self):
+        session = Mock()
+        session.post.return_value.json.return_value = {"ok": True, "result": {"id": 1}}
+
+        with patch.object(client_module, "api_session", return_value=session):
+            assert call_api("getMe", token=TOKEN) == {"id": 1}
+            session.post.return_value.json.return_value = {
+                "ok": False,
+                "description": "Unauthorized",
+            }
+            with pytest.raises(RuntimeError, match="Unauthorized"):
+                call_api("getMe", token=TOKEN)
+
+        assert session.post.call_args.args[0].endswith(f"/bot{TOKEN}/getMe")
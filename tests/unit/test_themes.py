@@ -0,0 +1,99 @@
+"""
+Unit тесты для определения темы и учета переключений
+"""
+
+import json
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from telegram_auth.models import TelegramUser
+from themes.models import ThemeUsage, UserThemePreference
+from themes.preferences import ThemeUsageRecorder, get_theme_config, resolve_theme
+from themes.views import get_current_theme, switch_theme
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    """Учет переключений без фоновой записи в базу"""
+    recorder = ThemeUsageRecorder({"USAGE_FLUSH_INTERVAL": 3600})
+    monkeypatch.setattr("themes.views.get_usage_recorder", lambda: recorder)
+    return recorder
+
+
+@pytest.fixture
+def user(db):
+    cache.clear()
+    yield TelegramUser.objects.create(telegram_id=555047, telegram_username="t")
+    cache.clear()
+
+
+def _get(user=None, cookies=None):
+    request = RequestFactory().get("/themes/api/current/")
+    request.user = user
+    request.COOKIES.update(cookies or {})
+    return request
+
+
+def _switch(user, theme):
+    request = RequestFactory().post(
+        "/themes/api/switch/",
+        data=json.dumps({"theme": theme}),
+        content_type="application/json",
+    )
+    request.user = user
+    return switch_theme(request)
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestThemeResolution:
+    def test_stored_preference_is_cached_and_moved_to_cookie(self, user):
+        UserThemePreference.objects.create(user=user, theme="adult")
+
+        response = get_current_theme(_get(user))
+        cookie = response.cookies[get_theme_config()["COOKIE_NAME"]]
+
+        assert json.loads(response.content)["theme"] == "adult"
+        with CaptureQueriesContext(connection) as queries:
+            assert resolve_theme(_get(user)) == "adult"
+            assert resolve_theme(_get(user, {cookie.key: cookie.value})) == "adult"
+        assert len(queries) == 0
+
+    def test_no_default_row_is_created(self, user):
+        assert resolve_theme(_get(user)) == "school"
+        assert not UserThemePreference.objects.filter(user=user).exists()
+
+    def test_tampered_cookie_is_ignored(self, user):
+        name = get_theme_config()["COOKIE_NAME"]
+
+        assert resolve_theme(_get(user, {name: "adult"})) == "school"
+
+    def test_switch_persists_only_on_change(self, user, recorder):
+        _switch(user, "adult")
+        updated_at = UserThemePreference.objects.get(user=user).updated_at
+
+        response = _switch(user, "adult")
+
+        assert json.loads(response.content)["theme"] == "adult"
+        assert UserThemePreference.objects.get(user=user).updated_at == updated_at
+        assert get_theme_config()["COOKIE_NAME"] in response.cookies
+        assert recorder.pending() == 2
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestThemeUsageRecorder:
+    def test_switches_are_flushed_as_counters(self, user, recorder):
+        for theme in ("adult", "adult", "school"):
+            recorder.record(user.pk, theme)
+
+        assert recorder.pending() == 3
+        assert recorder.flush() == 2
+        assert dict(
+            ThemeUsage.objects.filter(user=user).values_list("theme", "page_views")
+        ) == {"adult": 2, "school": 1}
+        assert recorder.flush() == 0
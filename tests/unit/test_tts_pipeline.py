@@ -0,0 +1,135 @@
+"""
+Unit тесты для конвейера озвучивания
+"""
+
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.tts_pipeline import StubTTSEngine, TTSJob, TTSPipeline
+from core.voice_service import VoiceService
+
+
+def _pipeline(media_root, **kwargs):
+    engine = kwargs.pop("engine", None) or StubTTSEngine()
+    pipeline = TTSPipeline(
+        engine=engine,
+        rate_per_second=0,
+        audio_dir=os.path.join(media_root, "audio"),
+        **kwargs,
+    )
+    return pipeline, engine
+
+
+@pytest.mark.unit
+class TestTTSPipeline:
+    """Тесты конвейера озвучивания"""
+
+    def test_identical_texts_share_one_file(self, temp_media_root):
+        """Одинаковые после нормализации тексты синтезируются один раз"""
+        pipeline, engine = _pipeline(temp_media_root)
+
+        result = pipeline.run(
+            [TTSJob("Найдите  корень"), TTSJob("Найдите корень"), TTSJob("Другое")]
+        )
+
+        assert result.synthesized == 2
+        assert result.duplicates == 1
+        assert result.paths[0] == result.paths[1]
+        assert len(engine.calls) == 2
+        assert os.path.exists(os.path.join(temp_media_root, result.paths[0]))
+
+    def test_existing_file_is_reused(self, temp_media_root):
+        """Повторный запуск не обращается к движку"""
+        pipeline, engine = _pipeline(temp_media_root)
+        first = pipeline.run([TTSJob("Текст")])
+
+        second = pipeline.run([TTSJob("Текст")])
+
+        assert second.reused == 1
+        assert second.paths == first.paths
+        assert len(engine.calls) == 1
+
+    def test_force_resynthesizes(self, temp_media_root):
+        """force генерирует файл заново"""
+        pipeline, engine = _pipeline(temp_media_root)
+        pipeline.run([TTSJob("Текст")])
+
+        result = pipeline.run([TTSJob("Текст")], force=True)
+
+        assert result.synthesized == 1
+        assert len(engine.calls) == 2
+
+    def test_empty_text_and_engine_errors(self, temp_media_root):
+        """Пустой текст и ошибка движка дают None, не ломая пачку"""
+        engine = StubTTSEngine()
+        engine.synthesize = lambda text, path: (_ for _ in ()).throw(OSError("net"))
+        pipeline, _ = _pipeline(temp_media_root, engine=engine)
+
+        result = pipeline.run([TTSJob("   "), TTSJob("Текст")])
+
+        assert result.paths == [None, None]
+        assert result.empty == 1
+        assert result.failed == 1
+        assert not [
+            name
+            for name in os.listdir(os.path.join(temp_media_root, "audio"))
+            if name.endswith(".tmp")
+        ]
+
+    def test_workers_run_in_parallel(self, temp_media_root):
+        """Время пачки определяется числом потоков, а не числом текстов"""
+        pipeline, _ = _pipeline(
+            temp_media_root, engine=StubTTSEngine(delay=0.1), workers=8
+        )
+
+        started = time.monotonic()
+        result = pipeline.run([TTSJob(f"Текст {i}") for i in range(8)])
+
+        assert result.synthesized == 8
+        assert time.monotonic() - started < 0.5
+
+
+@pytest.mark.unit
+class TestVoiceServiceTasks:
+    """Озвучивание заданий через VoiceService"""
+
+    def test_tasks_audio_maps_paths_to_tasks(self, temp_media_root):
+        """Условие и решение получают свои пути, общий текст — общий файл"""
+        engine = StubTTSEngine()
+        service = VoiceService(engine=engine)
+        service.pipeline.rate_limiter.interval = 0
+        subject = SimpleNamespace(name="Математика")
+        tasks = [
+            SimpleNamespace(
+                id=1, subject=subject, title="№1", description="x+1=2", solution="x=1"
+            ),
+            SimpleNamespace(
+                id=2, subject=subject, title="№2", description="", solution="x=1"
+            ),
+        ]
+
+        audio, batch = service.generate_tasks_audio(tasks)
+
+        assert audio[1]["task_audio"] and audio[2]["task_audio"]
+        assert audio[1]["solution_audio"] == audio[2]["solution_audio"]
+        assert batch.synthesized == 3
+        assert batch.duplicates == 1
+
+    def test_only_tasks_without_audio_are_selected(self, temp_media_root):
+        """Озвученные задания пропускаются, даже если они самые новые"""
+        service = VoiceService(engine=StubTTSEngine())
+        service.pipeline.rate_limiter.interval = 0
+        subject = SimpleNamespace(name="Физика")
+        tasks = [
+            SimpleNamespace(id=i, subject=subject, title=f"№{i}", description="")
+            for i in range(5, 0, -1)
+        ]
+        service.generate_tasks_audio(tasks[:2])
+
+        selected = service.tasks_without_audio(iter(tasks), limit=2)
+
+        assert [task.id for task in selected] == [3, 2]
+        assert service.tasks_without_audio(tasks[:2], limit=2) == []
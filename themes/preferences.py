@@ -0,0 +1,203 @@
+"""
+Определение темы оформления и учет переключений
+
+Тема берется из подписанной cookie, для авторизованных без cookie — из
+кэша по пользователю и только при промахе из UserThemePreference (без
+создания записи по умолчанию). Выбор сохраняется в базу, только если тема
+изменилась. Переключения (ThemeUsage) копятся в памяти как счетчики по
+(пользователь, тема) и пишутся фоновым потоком пачками через bulk_create —
+по таймеру, по размеру пачки или при остановке процесса.
+"""
+
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THEME_CONFIG = {
+    "THEMES": ["school", "adult"],
+    "DEFAULT": "school",
+    "COOKIE_NAME": "examflow_theme",
+    "COOKIE_SALT": "themes.preferences",
+    "COOKIE_MAX_AGE": 365 * 24 * 3600,
+    "CACHE_PREFIX": "theme_preference",
+    "CACHE_TTL": 24 * 3600,
+    "USAGE_FLUSH_INTERVAL": 30.0,  # секунд
+    "USAGE_BATCH_SIZE": 200,  # разных (пользователь, тема) до внеочередной записи
+}
+
+
+def get_theme_config() -> dict:
+    """Возвращает настройки тем с учетом THEME_CONFIG"""
+    config = dict(DEFAULT_THEME_CONFIG)
+    config.update(getattr(settings, "THEME_CONFIG", {}))
+    return config
+
+
+def _cache_key(user_id: int, config: dict) -> str:
+    return f"{config['CACHE_PREFIX']}:{user_id}"
+
+
+def _cookie_theme(request, config: dict) -> str | None:
+    theme = request.get_signed_cookie(
+        config["COOKIE_NAME"], default=None, salt=config["COOKIE_SALT"]
+    )
+    return theme if theme in config["THEMES"] else None
+
+
+def _stored_theme(user_id: int, config: dict) -> str:
+    """Тема пользователя из кэша, при промахе — из базы"""
+    from .models import UserThemePreference
+
+    key = _cache_key(user_id, config)
+    theme = cache.get(key)
+    if theme is None:
+        theme = (
+            UserThemePreference.objects.filter(user_id=user_id)  # type: ignore
+            .values_list("theme", flat=True)
+            .first()
+        ) or config["DEFAULT"]
+        cache.set(key, theme, config["CACHE_TTL"])
+    return theme
+
+
+def resolve_theme(request) -> str:
+    """Текущая тема запроса: cookie, затем кэш и база для авторизованных"""
+    config = get_theme_config()
+    theme = _cookie_theme(request, config)
+    if theme is None and request.user.is_authenticated:
+        theme = _stored_theme(request.user.pk, config)
+    return theme or config["DEFAULT"]
+
+
+def remember_theme(response, theme: str) -> None:
+    """Кладет тему в подписанную cookie ответа"""
+    config = get_theme_config()
+    response.set_signed_cookie(
+        config["COOKIE_NAME"],
+        theme,
+        salt=config["COOKIE_SALT"],
+        max_age=config["COOKIE_MAX_AGE"],
+        samesite="Lax",
+    )
+
+
+def save_theme(user, theme: str) -> bool:
+    """
+    Сохраняет выбор пользователя, если тема изменилась
+
+    Returns:
+        True, если запись в базе изменена
+    """
+    from .models import UserThemePreference
+
+    config = get_theme_config()
+    if _stored_theme(user.pk, config) == theme:
+        return False
+    UserThemePreference.objects.update_or_create(  # type: ignore
+        user=user, defaults={"theme": theme}
+    )
+    cache.set(_cache_key(user.pk, config), theme, config["CACHE_TTL"])
+    return True
+
+
+class ThemeUsageRecorder:
+    """Счетчики переключений тем с фоновой пакетной записью в ThemeUsage"""
+
+    def __init__(self, config: dict | None = None):
+        self.config = {**get_theme_config(), **(config or {})}
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def record(self, user_id: int, theme: str) -> None:
+        """Учитывает переключение; запись в базу — позже, в фоне"""
+        with self._lock:
+            self._pending[(user_id, theme)] += 1
+            full = len(self._pending) >= self.config["USAGE_BATCH_SIZE"]
+        self._ensure_worker()
+        if full:
+            self._wake.set()
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="theme-usage-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.config["USAGE_FLUSH_INTERVAL"])
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка записи статистики тем: {e}")
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        """Пишет накопленные счетчики одной пачкой; возвращает число строк"""
+        from .models import ThemeUsage
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+            if not pending:
+                return 0
+            try:
+                ThemeUsage.objects.bulk_create(  # type: ignore
+                    [
+                        ThemeUsage(user_id=user_id, theme=theme, page_views=count)
+                        for (user_id, theme), count in pending.items()
+                    ]
+                )
+            except Exception as e:
+                logger.error(f"Не удалось записать {len(pending)} счетчиков тем: {e}")
+                return 0
+            return len(pending)
+
+    def shutdown(self) -> None:
+        """Останавливает фоновый поток и дописывает счетчики"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Ошибка записи статистики тем при остановке: {e}")
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(self._pending.values())
+
+
+_recorder: ThemeUsageRecorder | None = None
+_recorder_lock = threading.Lock()
+
+
+def get_usage_recorder() -> ThemeUsageRecorder:
+    """Общий для процесса учет переключений; дописывается при остановке"""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = ThemeUsageRecorder()
+                atexit.register(_recorder.shutdown)
+    return _recorder
@@ -1,10 +1,21 @@
 import json
+import logging
 
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from .preferences import (
+    get_theme_config,
+    get_usage_recorder,
+    remember_theme,
+    resolve_theme,
+    save_theme,
+)
+
+logger = logging.getLogger(__name__)
+
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -28,7 +39,7 @@ def switch_theme(request):
         theme = data.get("theme")
 
         # Проверяем валидность темы
-        valid_themes = ["school", "adult"]
+        valid_themes = get_theme_config()["THEMES"]
         if theme not in valid_themes:
             return JsonResponse(
                 {
@@ -38,40 +49,23 @@ def switch_theme(request):
                 status=400,
             )
 
-        # Если пользователь авторизован, сохраняем выбор в профиле
-        if request.user.is_authenticated:
-            try:
-                # Создаем или обновляем предпочтение пользователя
-                from .models import UserThemePreference
-
-                preference, created = UserThemePreference.objects.get_or_create(  # type: ignore
-                    user=request.user, defaults={"theme": theme}
-                )
-                if not created:
-                    preference.theme = theme
-                    preference.save()
-
-                # Создаем запись об использовании темы
-                from .models import ThemeUsage
-
-                ThemeUsage.objects.create(  # type: ignore
-                    user=request.user, theme=theme, session_duration=0, page_views=1
-                )
-
-                print(
-                    "Пользователь {request.user.username} переключился на тему: {theme}"
-                )
-            except Exception:
-                print("Ошибка сохранения темы в профиль: {e}")
-
-        # Возвращаем успешный ответ
-        return JsonResponse(
+        # Выбор — в подписанной cookie; в профиль пишем, только если тема изменилась
+        response = JsonResponse(
             {
                 "success": True,
                 "theme": theme,
-                "message": 'Дизайн успешно переключен на "{theme}"',
+                "message": f'Дизайн успешно переключен на "{theme}"',
             }
         )
+        remember_theme(response, theme)
+        if request.user.is_authenticated:
+            try:
+                save_theme(request.user, theme)
+                get_usage_recorder().record(request.user.pk, theme)
+            except Exception as e:
+                logger.error(f"Ошибка сохранения темы в профиль: {e}")
+
+        return response
 
     except json.JSONDecodeError:
         return JsonResponse(
@@ -96,37 +90,18 @@ def get_current_theme(request):
     }
     """
     try:
-        # По умолчанию тема "school"
-        theme = "school"
-
-        # Если пользователь авторизован, можно получить из профиля
-        if request.user.is_authenticated:
-            try:
-                # Получаем тему из профиля пользователя
-                from .models import UserThemePreference
-
-                try:
-                    preference = UserThemePreference.objects.get(
-                        user=request.user
-                    )  # type: ignore
-                    theme = preference.theme
-                except UserThemePreference.DoesNotExist:  # type: ignore
-                    # Если предпочтения нет, создаем с дефолтной темой
-                    preference = UserThemePreference.objects.create(  # type: ignore
-                        user=request.user, theme="school"
-                    )
-                    theme = preference.theme
-            except Exception:
-                print("Ошибка получения темы из профиля: {e}")
-                theme = "school"
-
-        return JsonResponse(
+        theme = resolve_theme(request)
+        response = JsonResponse(
             {
                 "success": True,
                 "theme": theme,
                 "user_authenticated": request.user.is_authenticated,
             }
         )
+        # Следующие запросы возьмут тему из cookie, без кэша и базы
+        if request.COOKIES.get(get_theme_config()["COOKIE_NAME"]) is None:
+            remember_theme(response, theme)
+        return response
 
     except Exception:
         return JsonResponse(